@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Benchmark for log correlation: pairwise scan vs. CorrelationEngine
+
+    python benchmark_correlation.py --sizes 10000 100000 1000000
+"""
+
+import time
+import random
+import argparse
+
+from log_correlation import CorrelationEngine, LINKED
+
+
+def make_entries(count, seed=5):
+    rng = random.Random(seed)
+    sessions = max(1, count // 20)
+    base = 1714564800
+    return [
+        {
+            'session_id': f's{rng.randrange(sessions)}' if rng.random() < 0.9 else None,
+            'src_ip': f'10.0.{rng.randrange(64)}.{rng.randrange(256)}',
+            'user': f'user{rng.randrange(500)}',
+            'timestamp': base + rng.randrange(1800),
+            'message': 'sshd: session event',
+        }
+        for _ in range(count)
+    ]
+
+
+def pairwise(entries):
+    """The original O(n^2) implementation"""
+    correlated = []
+    for log in entries:
+        related = []
+        if 'session_id' in log:
+            related = [l for l in entries if l.get('session_id') == log['session_id']]
+        correlated.append({'primary_log': log, 'related_logs': related})
+    return correlated
+
+
+def engine_correlation(engine, entries, keys, window=None):
+    result = engine.correlate(entries, keys, window)
+    group_key = LINKED if len(keys) > 1 else keys[0]
+    return [{'primary_log': log, 'related_logs': result.related(i, group_key)}
+            for i, log in enumerate(entries)]
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--pairwise-sample', type=int, default=5000,
+                        help='entries timed with the pairwise scan; larger sizes are extrapolated')
+    args = parser.parse_args()
+
+    engine = CorrelationEngine()
+    sample = make_entries(args.pairwise_sample)
+    pairwise_rate = timed(pairwise, sample) / (args.pairwise_sample ** 2)
+
+    print(f"{'entries':>9} {'pairwise (est)':>15} {'session_id':>11} {'+30s window':>12} {'3 keys linked':>14}")
+    for size in args.sizes:
+        entries = make_entries(size)
+        session = timed(engine_correlation, engine, entries, ['session_id'])
+        windowed = timed(engine_correlation, engine, entries, ['session_id'], 30)
+        linked = timed(engine_correlation, engine, entries, ['session_id', 'src_ip', 'user'])
+        print(f"{size:>9,} {pairwise_rate * size * size:>14.1f}s {session:>10.2f}s "
+              f"{windowed:>11.2f}s {linked:>13.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for LogManager pattern matching
+
+Compares the original approach (re.findall with every pattern string over
+str(record)) with PatternSet over the message field, as the number of
+patterns grows.
+
+    python benchmark_patterns.py --records 5000 --counts 5 50 500
+"""
+
+import re
+import time
+import random
+import argparse
+
+from pattern_matcher import PatternSet
+
+PROGRAMS = ['sshd', 'kernel', 'CRON', 'sudo', 'nginx', 'postfix', 'systemd', 'dhclient']
+EVENTS = [
+    'Accepted password for {user} from {ip} port {port} ssh2',
+    'Failed password for invalid user {user} from {ip} port {port} ssh2',
+    'pam_unix(sudo:session): session opened for user {user}',
+    'error: connect to {ip} port {port} failed: Connection refused',
+    'Started Session {port} of user {user}.',
+    'upstream timed out while reading response header from {ip}',
+    'exception in worker {port}: authentication backend unavailable',
+    'DHCPACK of {ip} from 10.0.0.1',
+]
+USERS = ['root', 'admin', 'deploy', 'oracle', 'git', 'backup']
+VOCABULARY = [
+    'segfault', 'oom-killer', 'denied', 'refused', 'timeout', 'invalid', 'reset',
+    'unreachable', 'corrupt', 'panic', 'warning', 'critical', 'overflow', 'blocked',
+]
+
+
+def make_corpus(count, seed=7):
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        message = rng.choice(EVENTS).format(
+            user=rng.choice(USERS),
+            ip=f'10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}',
+            port=rng.randint(1024, 65535),
+        )
+        program = rng.choice(PROGRAMS)
+        corpus.append({
+            'timestamp': f'2024-05-01T12:{i % 60:02d}:{(i * 7) % 60:02d}',
+            'host': f'host-{i % 50}',
+            'source': program,
+            'message': f'{program}[{rng.randint(100, 9999)}]: {message}',
+            'raw_log': message,
+        })
+    return corpus
+
+
+def make_patterns(count, seed=11):
+    """Mostly keyword rules with a sprinkling of real regexes, like a real rule set"""
+    base = {
+        'ip_address': r'\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b',
+        'timestamp': r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}',
+        'error_patterns': r'error|exception|failed|failure',
+        'security_patterns': r'authentication|authorization|login|password',
+        'email': r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+    }
+    rng = random.Random(seed)
+    patterns = dict(list(base.items())[:count])
+    index = 0
+    while len(patterns) < count:
+        if index % 10 == 9:
+            patterns[f'regex_{index}'] = rf'\b{rng.choice(VOCABULARY)}\w*\s+\d{{{rng.randint(2, 5)}}}\b'
+        else:
+            words = rng.sample(VOCABULARY, 2)
+            patterns[f'rule_{index}'] = f'{words[0]}_{index}|{words[1]}-{index}'
+        index += 1
+    return patterns
+
+
+def run_naive(corpus, patterns):
+    for record in corpus:
+        text = str(record)
+        for pattern in patterns.values():
+            re.findall(pattern, text)
+
+
+def run_pattern_set(corpus, pattern_set):
+    for record in corpus:
+        pattern_set.findall(record['message'])
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=5000)
+    parser.add_argument('--counts', type=int, nargs='+', default=[5, 50, 500])
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.records)
+    print(f"{'patterns':>9} {'naive us/rec':>13} {'PatternSet us/rec':>18} {'speedup':>8}")
+    for count in args.counts:
+        patterns = make_patterns(count)
+        pattern_set = PatternSet(patterns)
+        naive = timed(run_naive, corpus, patterns) / len(corpus) * 1e6
+        compiled = timed(run_pattern_set, corpus, pattern_set) / len(corpus) * 1e6
+        print(f"{count:>9} {naive:>13.1f} {compiled:>18.1f} {naive / compiled:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
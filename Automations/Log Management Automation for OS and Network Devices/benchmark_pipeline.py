@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""Throughput benchmark for the batched log ingestion pipeline
+
+Runs the pipeline against a local stub sink that mimics the cost of an
+Elasticsearch round trip, and compares it with per-record indexing.
+
+    python benchmark_pipeline.py --records 200000 --batch-size 500
+"""
+
+import gzip
+import time
+import random
+import argparse
+import threading
+from datetime import datetime
+
+from log_pipeline import LogPipeline, ElasticsearchBulkSink
+
+MESSAGES = [
+    'sshd[1201]: Accepted password for admin from 10.0.0.12 port 52114',
+    'kernel: [ 1042.1] eth0: link up, 1000 Mbps full duplex',
+    'CRON[2231]: (root) CMD (run-parts /etc/cron.hourly)',
+    'app[443]: error connecting to database: connection refused',
+    'sudo: pam_unix(sudo:session): session opened for user root',
+    'nginx: warning upstream response buffered to a temporary file',
+]
+
+
+class StubElasticsearch:
+    """Stand-in client charging a fixed round trip plus a per-document cost"""
+
+    def __init__(self, round_trip: float, per_doc: float):
+        self.round_trip = round_trip
+        self.per_doc = per_doc
+        self.requests = 0
+        self.documents = 0
+        self._lock = threading.Lock()
+
+    def _wait(self, docs):
+        time.sleep(self.round_trip + self.per_doc * docs)
+        with self._lock:
+            self.requests += 1
+            self.documents += docs
+
+    def bulk(self, operations):
+        docs = len(operations) // 2
+        self._wait(docs)
+        return {'errors': False, 'items': [{'index': {'status': 201}}] * docs}
+
+    def index(self, index, body):
+        self._wait(1)
+
+
+def make_records(count):
+    rng = random.Random(42)
+    for i in range(count):
+        message = rng.choice(MESSAGES)
+        yield {
+            'host': f'host-{i % 200}',
+            'message': message,
+            'raw_log': message,
+        }
+
+
+def parse(record):
+    record['processed_at'] = datetime.utcnow().isoformat()
+    message = record['message'].lower()
+    record['severity'] = 'ERROR' if 'error' in message else 'WARNING' if 'warning' in message else 'INFO'
+    return record
+
+
+def scan(record):
+    record['security_scan'] = {'sensitive_data': 'password' in record['message']}
+    return record
+
+
+def protect(record):
+    record['raw_log'] = gzip.compress(record['raw_log'].encode(), compresslevel=1)
+    return record
+
+
+def run_per_record(es, records):
+    start = time.perf_counter()
+    count = 0
+    for record in records:
+        es.index(index='logs', body=protect(scan(parse(record))))
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def run_pipeline(es, records, batch_size, producers):
+    sink = ElasticsearchBulkSink(es, 'logs')
+    pipeline = LogPipeline([parse, scan, protect], sink.write, batch_size=batch_size,
+                           flush_interval=1.0, max_queue_size=batch_size * 20).start()
+
+    records = list(records)
+    chunk = len(records) // producers + 1
+    threads = [
+        threading.Thread(target=pipeline.submit_many, args=(records[i * chunk:(i + 1) * chunk],))
+        for i in range(producers)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    pipeline.close()
+    elapsed = time.perf_counter() - start
+
+    stats = pipeline.stats.to_dict()
+    stats['records_per_second'] = stats['records_out'] / elapsed
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--producers', type=int, default=4)
+    parser.add_argument('--round-trip-ms', type=float, default=2.0)
+    parser.add_argument('--per-doc-us', type=float, default=5.0)
+    parser.add_argument('--baseline-records', type=int, default=2000,
+                        help='records for the per-record es.index() baseline')
+    args = parser.parse_args()
+
+    round_trip = args.round_trip_ms / 1000.0
+    per_doc = args.per_doc_us / 1000000.0
+
+    baseline = run_per_record(StubElasticsearch(round_trip, per_doc), make_records(args.baseline_records))
+    es = StubElasticsearch(round_trip, per_doc)
+    stats = run_pipeline(es, make_records(args.records), args.batch_size, args.producers)
+
+    print(f"Per-record index():   {baseline:,.0f} records/s")
+    print(f"Batched pipeline:     {stats['records_per_second']:,.0f} records/s "
+          f"({stats['records_out']:,} records, {es.requests:,} bulk requests)")
+    print(f"Batch latency p50:    {stats['p50_batch_latency'] * 1000:.2f} ms")
+    print(f"Batch latency p99:    {stats['p99_batch_latency'] * 1000:.2f} ms")
+    print(f"Speedup:              {stats['records_per_second'] / baseline:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
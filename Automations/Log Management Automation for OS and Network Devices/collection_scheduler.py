@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+
+def _default_close(session):
+    for method in ('close', 'disconnect'):
+        if hasattr(session, method):
+            getattr(session, method)()
+            return
+
+
+class SessionPool:
+    """Persistent device sessions keyed by host, with idle eviction
+
+    A session is leased to one thread at a time (netmiko connections are not
+    safe to share). Sessions idle for longer than idle_timeout are closed by
+    evict_idle(), and a session that raised while leased is closed instead of
+    being returned, so a broken connection is never reused.
+    """
+
+    def __init__(self, idle_timeout: float = 600.0, max_sessions_per_key: int = 1):
+        self.idle_timeout = idle_timeout
+        self.max_sessions_per_key = max_sessions_per_key
+        self.logger = logging.getLogger('LogManager.SessionPool')
+        self._idle: Dict[Hashable, deque] = {}
+        self._leased: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
+        self.evicted = 0
+
+    @contextmanager
+    def lease(self, key: Hashable, factory: Callable[[], Any],
+              is_alive: Optional[Callable[[Any], bool]] = None,
+              close: Callable[[Any], None] = _default_close):
+        session = self._checkout(key, is_alive, close)
+        if session is None:
+            session = factory()
+            with self._lock:
+                self.opened += 1
+        with self._lock:
+            self._leased[key] = self._leased.get(key, 0) + 1
+        try:
+            yield session
+        except Exception:
+            self._release(key)
+            self._close(session, close)
+            raise
+        else:
+            self._release(key, session, close)
+
+    def _checkout(self, key, is_alive, close):
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                if not idle:
+                    return None
+                session, _, _ = idle.pop()
+            if is_alive is None or self._safe_alive(is_alive, session):
+                with self._lock:
+                    self.reused += 1
+                return session
+            self._close(session, close)
+
+    def _release(self, key, session=None, close=None):
+        with self._lock:
+            self._leased[key] -= 1
+            if not self._leased[key]:
+                del self._leased[key]
+            if session is None:
+                return
+            idle = self._idle.setdefault(key, deque())
+            if len(idle) < self.max_sessions_per_key:
+                idle.append((session, time.monotonic(), close))
+                return
+        self._close(session, close)
+
+    def _safe_alive(self, is_alive, session) -> bool:
+        try:
+            return bool(is_alive(session))
+        except Exception:
+            return False
+
+    def _close(self, session, close):
+        try:
+            close(session)
+        except Exception as e:
+            self.logger.debug(f"Error closing session: {str(e)}")
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """Close sessions that have been idle longer than idle_timeout"""
+        now = time.monotonic() if now is None else now
+        expired = []
+        with self._lock:
+            for key in list(self._idle):
+                idle = self._idle[key]
+                # Oldest sessions sit at the left of each deque
+                while idle and now - idle[0][1] >= self.idle_timeout:
+                    expired.append(idle.popleft())
+                if not idle:
+                    del self._idle[key]
+            self.evicted += len(expired)
+        for session, _, close in expired:
+            self._close(session, close)
+        return len(expired)
+
+    def close_all(self):
+        with self._lock:
+            expired = [entry for idle in self._idle.values() for entry in idle]
+            self._idle.clear()
+        for session, _, close in expired:
+            self._close(session, close)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'idle_sessions': sum(len(idle) for idle in self._idle.values()),
+                'leased_sessions': sum(self._leased.values()),
+                'opened': self.opened,
+                'reused': self.reused,
+                'evicted': self.evicted,
+            }
+
+
+class CollectionResult:
+    """Outcome of collecting from a single device"""
+
+    __slots__ = ('device_type', 'host', 'logs', 'latency', 'error')
+
+    def __init__(self, device_type: str, host: str, logs=None, latency: float = 0.0, error: str = None):
+        self.device_type = device_type
+        self.host = host
+        self.logs = logs
+        self.latency = latency
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'device_type': self.device_type,
+            'host': self.host,
+            'log_count': len(self.logs) if self.logs else 0,
+            'latency': self.latency,
+            'error': self.error,
+        }
+
+
+class CollectionScheduler:
+    """Fan collection out across devices with per-vendor concurrency limits
+
+    Each device is a dict with 'type', 'host' and 'credentials' (the same shape
+    as os_sources/network_sources in config.yaml). collect(device) does the
+    work; it is expected to take its connection from a SessionPool, and a None
+    return counts as a failed collection, like an exception. A device
+    whose previous collection is still running is skipped, so a slow device
+    cannot pile up work across cycles.
+    """
+
+    def __init__(self, collect: Callable[[Dict[str, Any]], Any], max_workers: int = 64,
+                 vendor_limits: Optional[Dict[str, int]] = None, default_vendor_limit: int = 16,
+                 on_result: Optional[Callable[[CollectionResult], None]] = None):
+        self.collect = collect
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='log-collect')
+        self.default_vendor_limit = default_vendor_limit
+        self.vendor_limits = dict(vendor_limits or {})
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self.on_result = on_result
+        self.logger = logging.getLogger('LogManager.CollectionScheduler')
+        self.latencies: Dict[str, float] = {}
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def _vendor_limit(self, vendor: str) -> int:
+        return self.vendor_limits.get(vendor, self.default_vendor_limit)
+
+    def _vendor_semaphore(self, vendor: str) -> threading.Semaphore:
+        with self._lock:
+            if vendor not in self._semaphores:
+                self._semaphores[vendor] = threading.BoundedSemaphore(self._vendor_limit(vendor))
+            return self._semaphores[vendor]
+
+    def _collect_one(self, device: Dict[str, Any]) -> CollectionResult:
+        device_type, host = device['type'], device['host']
+        try:
+            # Only contended when a previous cycle is still running lanes
+            with self._vendor_semaphore(device_type):
+                start_time = time.perf_counter()
+                try:
+                    logs = self.collect(device)
+                    # The collectors log their own errors and return None
+                    error = 'collection failed' if logs is None else None
+                    result = CollectionResult(device_type, host, logs, time.perf_counter() - start_time, error)
+                except Exception as e:
+                    result = CollectionResult(device_type, host, None, time.perf_counter() - start_time, str(e))
+            with self._lock:
+                self.latencies[host] = result.latency
+            if self.on_result:
+                try:
+                    self.on_result(result)
+                except Exception as e:
+                    self.logger.error(f"Error handling collection result for {host}: {str(e)}")
+            return result
+        finally:
+            with self._lock:
+                self._in_flight.discard(host)
+
+    def _run_lane(self, devices: deque, results: List[CollectionResult]):
+        while True:
+            try:
+                device = devices.popleft()
+            except IndexError:
+                return
+            results.append(self._collect_one(device))
+
+    def run_cycle(self, devices: List[Dict[str, Any]], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Collect from every device once; wait up to timeout for the results
+
+        Devices are grouped by vendor and each vendor gets at most its limit
+        of lanes, so pool workers never sit blocked on a vendor limit while
+        devices of other vendors are waiting.
+        """
+        start_time = time.perf_counter()
+        by_vendor: Dict[str, deque] = {}
+        skipped = []
+        for device in devices:
+            with self._lock:
+                if device['host'] in self._in_flight:
+                    skipped.append(device['host'])
+                    continue
+                self._in_flight.add(device['host'])
+            by_vendor.setdefault(device['type'], deque()).append(device)
+
+        results: List[CollectionResult] = []
+        futures = []
+        for vendor, queue in by_vendor.items():
+            for _ in range(min(self._vendor_limit(vendor), len(queue))):
+                futures.append(self.executor.submit(self._run_lane, queue, results))
+
+        wait(futures, timeout=timeout)
+        finished = list(results)
+        if skipped:
+            self.logger.warning(f"Skipped {len(skipped)} devices still collecting from the previous cycle")
+        return self.summarize(finished, pending=len(devices) - len(skipped) - len(finished),
+                              skipped=skipped, duration=time.perf_counter() - start_time)
+
+    def summarize(self, results: List[CollectionResult], pending: int = 0,
+                  skipped: Optional[List[str]] = None, duration: float = 0.0) -> Dict[str, Any]:
+        latencies = sorted(result.latency for result in results)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(round(p / 100.0 * (len(latencies) - 1))))]
+
+        return {
+            'devices': len(results),
+            'succeeded': sum(1 for result in results if result.ok),
+            'failed': [result.to_dict() for result in results if not result.ok],
+            'pending': pending,
+            'skipped': skipped or [],
+            'duration': duration,
+            'latency_p50': percentile(50),
+            'latency_p99': percentile(99),
+            'latency_max': latencies[-1] if latencies else 0.0,
+            'slowest': sorted((result.to_dict() for result in results),
+                              key=lambda r: r['latency'], reverse=True)[:10],
+        }
+
+    def shutdown(self, wait_for_running: bool = True):
+        self.executor.shutdown(wait=wait_for_running)
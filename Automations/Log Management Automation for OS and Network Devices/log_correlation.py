@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+LINKED = '*'
+
+
+def epoch_seconds(values: Sequence[Any]) -> np.ndarray:
+    """Vectorised conversion of timestamps (epoch numbers, ISO strings, datetimes) to float seconds
+
+    Missing or unparseable timestamps become NaN.
+    """
+    try:
+        return np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        pass
+    series = pd.Series(values, dtype=object)
+    # to_datetime would read bare numbers as nanoseconds, so they are kept as epoch seconds
+    numeric = series.map(lambda value: isinstance(value, (int, float)) and not isinstance(value, bool))
+    parsed = pd.to_datetime(series.where(~numeric), utc=True, errors='coerce', format='mixed')
+    elapsed = (parsed - pd.Timestamp(0, tz='UTC')) / pd.Timedelta(seconds=1)
+    seconds = elapsed.to_numpy(dtype=float, na_value=np.nan, copy=True)
+    seconds[numeric.to_numpy(dtype=bool)] = series[numeric].to_numpy(dtype=float)
+    return seconds
+
+
+class KeyGroups:
+    """Entry indices grouped by one correlation key
+
+    Members of group g are order[starts[g]:starts[g + 1]]; group_of[i] is the
+    group of entry i, or -1 when the entry has no value for the key.
+    """
+
+    def __init__(self, key: str, group_of: np.ndarray, order: np.ndarray, starts: np.ndarray):
+        self.key = key
+        self.group_of = group_of
+        self.order = order
+        self.starts = starts
+        self.bounds = np.append(starts, len(order))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def members(self, group: int) -> np.ndarray:
+        return self.order[self.bounds[group]:self.bounds[group + 1]]
+
+    def sizes(self) -> np.ndarray:
+        return np.diff(self.bounds)
+
+
+class CorrelationResult:
+    """Correlation groups over a list of log entries
+
+    Groups hold indices into the original list; related() materialises the
+    entries of a group once and hands the same list to every member.
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]], groups: Dict[str, KeyGroups]):
+        self.entries = entries
+        self.groups = groups
+        self._materialised: Dict[tuple, List[Dict[str, Any]]] = {}
+
+    def group_entries(self, key: str, group: int) -> List[Dict[str, Any]]:
+        cache_key = (key, group)
+        if cache_key not in self._materialised:
+            entries = self.entries
+            self._materialised[cache_key] = [entries[i] for i in self.groups[key].members(group)]
+        return self._materialised[cache_key]
+
+    def related(self, index: int, key: str) -> List[Dict[str, Any]]:
+        """Entries correlated with entries[index] by key (shared, do not mutate)"""
+        group = self.groups[key].group_of[index]
+        if group < 0:
+            return []
+        return self.group_entries(key, int(group))
+
+    def to_dict(self, key: str) -> Dict[str, Any]:
+        """Summary of the groups for key: count and size distribution"""
+        sizes = self.groups[key].sizes()
+        return {
+            'groups': int(len(sizes)),
+            'correlated_entries': int(sizes.sum()) if len(sizes) else 0,
+            'largest_group': int(sizes.max()) if len(sizes) else 0,
+        }
+
+
+class CorrelationEngine:
+    """Hash-grouped log correlation by one or more keys, optionally time-windowed
+
+    Entries sharing a key value are grouped with a sort-based groupby rather
+    than a pairwise scan, so correlating n entries is O(n log n). With
+    window_seconds, a group is further split wherever consecutive entries are
+    more than window_seconds apart. With several keys, the LINKED ('*') group
+    joins entries connected through any key, e.g. a session and the other
+    sessions of the same source IP or user.
+    """
+
+    def __init__(self, keys: Sequence[str] = ('session_id',), window_seconds: Optional[float] = None,
+                 time_field: str = 'timestamp'):
+        self.keys = list(keys)
+        self.window_seconds = window_seconds
+        self.time_field = time_field
+
+    def correlate(self, entries: List[Dict[str, Any]], keys: Optional[Sequence[str]] = None,
+                  window_seconds: Optional[float] = None) -> CorrelationResult:
+        keys = list(keys or self.keys)
+        window = self.window_seconds if window_seconds is None else window_seconds
+        times = None
+        if window is not None:
+            times = epoch_seconds([entry.get(self.time_field) for entry in entries])
+
+        codes = {key: self._factorize(entries, key) for key in keys}
+        groups = {key: self._group(key, codes[key], times, window) for key in keys}
+        if len(keys) > 1:
+            groups[LINKED] = self._link(groups, len(entries))
+        return CorrelationResult(entries, groups)
+
+    def _factorize(self, entries: List[Dict[str, Any]], key: str) -> np.ndarray:
+        values = pd.Series([entry.get(key) for entry in entries], dtype=object)
+        codes, _ = pd.factorize(values, use_na_sentinel=True)
+        return codes
+
+    def _group(self, key: str, codes: np.ndarray, times: Optional[np.ndarray],
+               window: Optional[float]) -> KeyGroups:
+        valid = codes >= 0
+        if times is not None:
+            valid &= ~np.isnan(times)
+        candidates = np.flatnonzero(valid)
+        if times is None:
+            order = candidates[np.argsort(codes[candidates], kind='stable')]
+        else:
+            order = candidates[np.lexsort((times[candidates], codes[candidates]))]
+
+        breaks = np.ones(len(order), dtype=bool)
+        if len(order) > 1:
+            sorted_codes = codes[order]
+            breaks[1:] = sorted_codes[1:] != sorted_codes[:-1]
+            if times is not None:
+                breaks[1:] |= np.diff(times[order]) > window
+
+        group_of = np.full(len(codes), -1, dtype=np.int64)
+        group_of[order] = np.cumsum(breaks) - 1
+        return KeyGroups(key, group_of, order, np.flatnonzero(breaks))
+
+    def _link(self, groups: Dict[str, KeyGroups], count: int) -> KeyGroups:
+        """Connected components over all keys by repeated min-label propagation"""
+        labels = np.arange(count)
+        changed = True
+        while changed:
+            changed = False
+            for key_groups in groups.values():
+                if not len(key_groups):
+                    continue
+                members = key_groups.order
+                group_min = np.minimum.reduceat(labels[members], key_groups.starts)
+                propagated = np.repeat(group_min, key_groups.sizes())
+                if (propagated < labels[members]).any():
+                    labels[members] = np.minimum(labels[members], propagated)
+                    changed = True
+            # Pointer jumping shortens label chains between passes
+            labels = labels[labels]
+
+        in_any = np.zeros(count, dtype=bool)
+        for key_groups in groups.values():
+            in_any[key_groups.order] = True
+        codes = np.where(in_any, labels, -1)
+        return self._group(LINKED, codes, None, None)
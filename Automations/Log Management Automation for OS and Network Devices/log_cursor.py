@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+import gzip
+import time
+import shlex
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+class CursorStore:
+    """Persistent (host, path) -> (inode, offset) cursors backed by SQLite"""
+
+    def __init__(self, db_path: str = 'log_cursors.db'):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS cursors ('
+            ' host TEXT NOT NULL, path TEXT NOT NULL, inode INTEGER NOT NULL,'
+            ' offset INTEGER NOT NULL, updated_at REAL NOT NULL,'
+            ' PRIMARY KEY (host, path))'
+        )
+        self._conn.commit()
+
+    def get(self, host: str, path: str) -> Optional[Tuple[int, int]]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT inode, offset FROM cursors WHERE host = ? AND path = ?', (host, path)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def set(self, host: str, path: str, inode: int, offset: int):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO cursors (host, path, inode, offset, updated_at)'
+                ' VALUES (?, ?, ?, ?, ?)',
+                (host, path, inode, offset, time.time())
+            )
+            self._conn.commit()
+
+    def delete(self, host: str, path: Optional[str] = None):
+        with self._lock:
+            if path is None:
+                self._conn.execute('DELETE FROM cursors WHERE host = ?', (host,))
+            else:
+                self._conn.execute('DELETE FROM cursors WHERE host = ? AND path = ?', (host, path))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RemoteTailer:
+    """Fetch only the bytes appended to remote log files since the last poll
+
+    Each file is tracked by inode and byte offset. When the inode changes the
+    file was rotated: the rest of the old file is read from its rotated name
+    (path.1 by default) before the new file is read from the start. A file
+    that shrank under the same inode was truncated (copytruncate) and is read
+    from the start. The cursor only advances to the last complete line, so a
+    line being written during the poll is picked up whole next time.
+    """
+
+    def __init__(self, cursor_store: CursorStore, compress: bool = True,
+                 max_bytes_per_poll: int = 16 * 1024 * 1024, initial_bytes: int = 256 * 1024,
+                 rotated_suffix: str = '.1'):
+        self.cursors = cursor_store
+        self.compress = compress
+        self.max_bytes_per_poll = max_bytes_per_poll
+        self.initial_bytes = initial_bytes
+        self.rotated_suffix = rotated_suffix
+        self.logger = logging.getLogger('LogManager.RemoteTailer')
+        self.bytes_transferred = 0
+
+    def _exec(self, ssh, command: str) -> bytes:
+        stdin, stdout, stderr = ssh.exec_command(command)
+        return stdout.read()
+
+    def stat_files(self, ssh, paths: List[str]) -> Dict[str, Tuple[int, int]]:
+        """One round trip for the inode and size of every path and its rotated copy"""
+        targets = []
+        for path in paths:
+            targets.extend([path, path + self.rotated_suffix])
+        output = self._exec(ssh, "stat -c '%n|%i|%s' " + ' '.join(map(shlex.quote, targets)) + ' 2>/dev/null')
+        stats = {}
+        for line in output.decode(errors='replace').splitlines():
+            try:
+                name, inode, size = line.rsplit('|', 2)
+                stats[name] = (int(inode), int(size))
+            except ValueError:
+                self.logger.debug(f"Unexpected stat output: {line}")
+        return stats
+
+    def fetch_range(self, ssh, path: str, offset: int, length: int) -> bytes:
+        command = f'tail -c +{offset + 1} {shlex.quote(path)} | head -c {length}'
+        if self.compress:
+            compressed = self._exec(ssh, command + ' | gzip -c -1')
+            data = gzip.decompress(compressed) if compressed else b''
+        else:
+            data = self._exec(ssh, command)
+        self.bytes_transferred += len(data)
+        return data
+
+    def _complete_lines(self, data: bytes, skip_partial_head: bool) -> Tuple[List[str], int]:
+        """Split into complete lines; return them and the number of bytes consumed"""
+        start = 0
+        if skip_partial_head:
+            start = data.find(b'\n') + 1
+            if start == 0:
+                return [], 0
+        end = data.rfind(b'\n') + 1
+        if end <= start:
+            return [], start
+        lines = data[start:end].decode(errors='replace').splitlines()
+        return lines, end
+
+    def read_new(self, ssh, host: str, paths: List[str]) -> Dict[str, List[str]]:
+        """Return the new complete lines of each path and advance the cursors"""
+        stats = self.stat_files(ssh, paths)
+        results = {}
+        budget = self.max_bytes_per_poll
+        for path in paths:
+            if path not in stats:
+                self.logger.warning(f"{host}:{path} not found")
+                continue
+            inode, size = stats[path]
+            cursor = self.cursors.get(host, path)
+            lines = []
+
+            if cursor is None:
+                # First contact: start near the end instead of shipping the whole file
+                offset = max(0, size - self.initial_bytes)
+                skip_head = offset > 0
+            else:
+                old_inode, offset = cursor
+                skip_head = False
+                if old_inode != inode:
+                    rotated = stats.get(path + self.rotated_suffix)
+                    if rotated and rotated[0] == old_inode and rotated[1] > offset:
+                        remaining = rotated[1] - offset
+                        data = self.fetch_range(ssh, path + self.rotated_suffix, offset, min(remaining, budget))
+                        rotated_lines, consumed = self._complete_lines(data, False)
+                        lines.extend(rotated_lines)
+                        budget -= len(data)
+                        if len(data) < remaining:
+                            # Out of budget: stay on the rotated file until it is drained
+                            self.cursors.set(host, path, old_inode, offset + consumed)
+                            results[path] = lines
+                            continue
+                    offset = 0
+                elif size < offset:
+                    offset = 0
+
+            length = min(size - offset, budget)
+            consumed = 0
+            if length > 0:
+                data = self.fetch_range(ssh, path, offset, length)
+                new_lines, consumed = self._complete_lines(data, skip_head)
+                lines.extend(new_lines)
+                offset += consumed
+                budget -= len(data)
+
+            if cursor is None and skip_head and not consumed:
+                # Still inside the first partial line; do not persist a mid-line cursor
+                results[path] = lines
+                continue
+            self.cursors.set(host, path, inode, offset)
+            results[path] = lines
+        return results
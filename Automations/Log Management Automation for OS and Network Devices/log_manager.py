@@ -10,16 +10,17 @@ from elasticsearch import Elasticsearch
 from slack_sdk import WebClient
 from logging.handlers import RotatingFileHandler
 import boto3
+from boto3.s3.transfer import TransferConfig
+import botocore.config
 import json
 from dotenv import load_dotenv
-import pandas as pd
 import numpy as np
-from prometheus_client import start_http_server, Counter, Gauge
+from prometheus_client import start_http_server, Counter, Gauge, Histogram
 import hashlib
 import gzip
+import tempfile
 import paramiko
 from cryptography.fernet import Fernet
-import re
 from concurrent.futures import ThreadPoolExecutor
 import requests
 from typing import Dict, List, Any
@@ -35,6 +36,12 @@ import telnetlib
 from scapy.all import *
 from pyVim import connect
 from pyVmomi import vim
+from log_pipeline import LogPipeline, ElasticsearchBulkSink
+from pattern_matcher import PatternSet
+from collection_scheduler import SessionPool, CollectionScheduler
+from log_cursor import CursorStore, RemoteTailer
+from log_correlation import CorrelationEngine, LINKED
+from log_summary import RollingSummary
 
 # Load environment variables
 load_dotenv()
@@ -48,10 +55,18 @@ class LogManager:
         self.setup_slack()
         self.setup_metrics()
         self.setup_encryption()
+        self.log_summary = RollingSummary(
+            retention_minutes=self.config.get('summary', {}).get('retention_minutes', 1440)
+        )
         self.thread_pool = ThreadPoolExecutor(max_workers=10)
         self.log_patterns = self.load_log_patterns()
+        self.pattern_set = PatternSet(self.log_patterns)
+        self.sensitive_pattern_set = PatternSet(self.load_sensitive_patterns())
         self.setup_api_endpoints()
         self.setup_device_handlers()
+        self.setup_pipeline()
+        self.setup_collection()
+        self.setup_correlation()
 
     def load_config(self, config_path):
         with open(config_path, 'r') as f:
@@ -84,10 +99,69 @@ class LogManager:
         }])
 
     def setup_s3(self):
+        backup_config = self.config['s3_backup']
+        max_concurrency = backup_config.get('max_concurrency', 10)
         self.s3 = boto3.client('s3',
             aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
             aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-            region_name=self.config['s3_backup']['region']
+            region_name=backup_config['region'],
+            config=botocore.config.Config(max_pool_connections=max_concurrency * 2)
+        )
+        part_size = backup_config.get('multipart_chunk_mb', 16) * 1024 * 1024
+        self.transfer_config = TransferConfig(
+            multipart_threshold=part_size,
+            multipart_chunksize=part_size,
+            max_concurrency=max_concurrency
+        )
+
+    def setup_pipeline(self):
+        """Setup the micro-batched ingestion pipeline with bulk Elasticsearch writes"""
+        pipeline_config = self.config.get('pipeline', {})
+        self.bulk_sink = ElasticsearchBulkSink(
+            self.es,
+            self.config['elasticsearch']['index_prefix'],
+            max_retries=pipeline_config.get('max_retries', 3)
+        )
+        self.pipeline = LogPipeline(
+            stages=[self.process_log_data, self.summarize_log_record, self.scan_log_record,
+                    self.protect_log_record],
+            sink=self.bulk_sink.write,
+            batch_size=pipeline_config.get('batch_size', 500),
+            flush_interval=pipeline_config.get('flush_interval_seconds', 2.0),
+            max_queue_size=pipeline_config.get('max_queue_size', 10000),
+            on_flush=self.record_batch_metrics
+        )
+        self.pipeline.start()
+
+    def setup_collection(self):
+        """Setup pooled device sessions and the concurrent collection scheduler"""
+        collection_config = self.config.get('collection', {})
+        self.session_pool = SessionPool(
+            idle_timeout=collection_config.get('session_idle_timeout_seconds', 600)
+        )
+        self.collection_scheduler = CollectionScheduler(
+            collect=self.collect_device_logs,
+            max_workers=collection_config.get('max_workers', 64),
+            vendor_limits=collection_config.get('vendor_limits', {}),
+            default_vendor_limit=collection_config.get('default_vendor_limit', 16),
+            on_result=self.handle_collection_result
+        )
+        
+        tailing_config = self.config.get('tailing', {})
+        self.log_tailer = RemoteTailer(
+            CursorStore(tailing_config.get('cursor_db', 'log_cursors.db')),
+            compress=tailing_config.get('compress', True),
+            max_bytes_per_poll=tailing_config.get('max_bytes_per_poll', 16 * 1024 * 1024),
+            initial_bytes=tailing_config.get('initial_bytes', 256 * 1024)
+        )
+
+    def setup_correlation(self):
+        """Setup the hash-grouped log correlation engine"""
+        correlation_config = self.config.get('correlation', {})
+        self.correlation_engine = CorrelationEngine(
+            keys=correlation_config.get('keys', ['session_id']),
+            window_seconds=correlation_config.get('window_seconds'),
+            time_field=correlation_config.get('time_field', 'timestamp')
         )
 
     def setup_slack(self):
@@ -99,6 +173,12 @@ class LogManager:
         self.log_counter = Counter('logs_processed_total', 'Total logs processed')
         self.error_gauge = Gauge('error_count', 'Current error count')
         self.latency_gauge = Gauge('processing_latency', 'Log processing latency')
+        self.collection_histogram = Histogram(
+            'device_collection_seconds', 'Per-device log collection latency', ['device_type']
+        )
+        self.collection_failures = Counter(
+            'device_collection_failures_total', 'Failed device log collections', ['device_type']
+        )
 
     def setup_encryption(self):
         """Setup encryption for sensitive log data"""
@@ -114,6 +194,24 @@ class LogManager:
             'security_patterns': r'authentication|authorization|login|password',
         }
 
+    def load_sensitive_patterns(self) -> Dict[str, str]:
+        """Load regex patterns for sensitive data detection"""
+        patterns = {
+            'email': r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+            'credit_card': r'\b\d{16}\b',
+            'credentials': r'\b(?:password|secret|key)[:=]\s*\S+\b'
+        }
+        security_config = self.config.get('security', {})
+        for index, entry in enumerate(security_config.get('security_patterns', [])):
+            patterns[f'custom_{index}'] = entry['pattern']
+        return patterns
+
+    def get_log_text(self, log_data: Any) -> str:
+        """Return the text to match patterns against: the message, not the whole record"""
+        if isinstance(log_data, dict):
+            return str(log_data.get('message', ''))
+        return str(log_data)
+
     def setup_api_endpoints(self):
         """Setup REST API endpoints for log querying"""
         app = Flask(__name__)
@@ -149,11 +247,7 @@ class LogManager:
 
     def analyze_log_patterns(self, log_data: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze logs for patterns and anomalies"""
-        patterns_found = {}
-        for pattern_name, pattern in self.log_patterns.items():
-            matches = re.findall(pattern, str(log_data))
-            patterns_found[pattern_name] = matches
-        return patterns_found
+        return self.pattern_set.findall(self.get_log_text(log_data))
 
     def compress_logs(self, log_data: str) -> bytes:
         """Compress log data using gzip"""
@@ -171,17 +265,10 @@ class LogManager:
             'risk_level': 'low'
         }
         
-        # Check for sensitive data patterns
-        sensitive_patterns = [
-            r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',  # email
-            r'\b\d{16}\b',  # credit card
-            r'\b(?:password|secret|key)[:=]\s*\S+\b'  # credentials
-        ]
-        
-        for pattern in sensitive_patterns:
-            if re.search(pattern, str(log_data)):
-                security_findings['sensitive_data'] = True
-                security_findings['risk_level'] = 'high'
+        # Check for sensitive data patterns in a single pass
+        if self.sensitive_pattern_set.search_any(self.get_log_text(log_data)):
+            security_findings['sensitive_data'] = True
+            security_findings['risk_level'] = 'high'
         
         return security_findings
 
@@ -194,32 +281,33 @@ class LogManager:
         }
         return metrics
 
-    def perform_log_correlation(self, log_entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Correlate related log entries"""
-        correlated_logs = []
-        for i, log in enumerate(log_entries):
-            related_logs = []
-            if 'session_id' in log:
-                related_logs = [l for l in log_entries if l.get('session_id') == log['session_id']]
-            correlated_logs.append({
-                'primary_log': log,
-                'related_logs': related_logs
-            })
-        return correlated_logs
+    def perform_log_correlation(self, log_entries: List[Dict[str, Any]], keys: List[str] = None,
+                                window_seconds: float = None) -> List[Dict[str, Any]]:
+        """Correlate related log entries
+        
+        Entries are grouped by hash rather than compared pairwise. Every member
+        of a group receives the same related_logs list object. With several
+        keys, entries linked through any of them are related.
+        """
+        keys = keys or self.correlation_engine.keys
+        result = self.correlation_engine.correlate(log_entries, keys, window_seconds)
+        group_key = LINKED if len(keys) > 1 else keys[0]
+        return [
+            {'primary_log': log, 'related_logs': result.related(i, group_key)}
+            for i, log in enumerate(log_entries)
+        ]
 
     def generate_log_summary(self, time_period: str = '1h') -> Dict[str, Any]:
-        """Generate summary of log activities"""
-        logs = self.get_recent_logs(time_period)
-        df = pd.DataFrame(logs)
+        """Generate summary of log activities
         
-        summary = {
-            'total_logs': len(logs),
-            'error_count': len(df[df['severity'] == 'ERROR']),
-            'warning_count': len(df[df['severity'] == 'WARNING']),
-            'top_sources': df['source'].value_counts().head(5).to_dict(),
-            'error_types': df[df['severity'] == 'ERROR']['type'].value_counts().to_dict()
-        }
-        return summary
+        Served from the rolling per-minute counters updated during processing,
+        so the cost depends on the number of minutes in the period, not logs.
+        """
+        return self.log_summary.summary(time_period)
+
+    def generate_hourly_summary(self, hours: int = 24) -> List[Dict[str, Any]]:
+        """Per-hour log and error counts for the last `hours` hours"""
+        return self.log_summary.hourly(hours)
 
     def collect_logs(self):
         """Collect logs from various sources"""
@@ -251,6 +339,57 @@ class LogManager:
             self.logger.error(f"Unsupported OS type: {os_type}")
             return None
 
+    def ssh_session(self, host: str, credentials: Dict[str, str]):
+        """Lease a pooled paramiko session for host"""
+        def connect_ssh():
+            ssh = paramiko.SSHClient()
+            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            ssh.connect(host, username=credentials['username'], password=credentials['password'])
+            return ssh
+
+        def is_alive(ssh):
+            transport = ssh.get_transport()
+            return transport is not None and transport.is_active()
+
+        return self.session_pool.lease(('ssh', host, credentials['username']), connect_ssh, is_alive)
+
+    def netmiko_session(self, device: Dict[str, Any]):
+        """Lease a pooled netmiko connection for a device definition"""
+        key = ('netmiko', device['device_type'], device['host'], device['username'])
+        return self.session_pool.lease(
+            key,
+            lambda: ConnectHandler(**device),
+            is_alive=lambda conn: conn.is_alive(),
+            close=lambda conn: conn.disconnect()
+        )
+
+    def collect_device_logs(self, device: Dict[str, Any]):
+        """Collect logs from one os_sources/network_sources entry"""
+        if device['type'] in self.os_handlers:
+            return self.os_handlers[device['type']](device['host'], device['credentials'])
+        return self.network_handlers[device['type']](device['host'], device['credentials'])
+
+    def handle_collection_result(self, result):
+        """Record collection latency and hand collected logs to the pipeline"""
+        self.collection_histogram.labels(device_type=result.device_type).observe(result.latency)
+        if not result.ok:
+            self.collection_failures.labels(device_type=result.device_type).inc()
+            return
+        self.ingest_logs(result.logs)
+
+    def run_collection_cycle(self, devices: List[Dict[str, Any]], timeout: float = None):
+        """Collect from a group of devices concurrently and report latencies"""
+        self.session_pool.evict_idle()
+        report = self.collection_scheduler.run_cycle(devices, timeout=timeout)
+        self.logger.info(
+            f"Collected from {report['succeeded']}/{report['devices']} devices in "
+            f"{report['duration']:.1f}s (p99 {report['latency_p99']:.2f}s, "
+            f"{report['pending']} pending, {len(report['skipped'])} skipped)"
+        )
+        for failure in report['failed']:
+            self.logger.error(f"Collection failed for {failure['host']}: {failure['error']}")
+        return report
+
     def collect_windows_logs(self, host: str, credentials: Dict[str, str]):
         """Collect Windows event logs"""
         try:
@@ -273,18 +412,15 @@ class LogManager:
     def collect_linux_logs(self, host: str, credentials: Dict[str, str]):
         """Collect Linux system logs"""
         try:
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(host, username=credentials['username'], password=credentials['password'])
-            
             log_files = ['/var/log/syslog', '/var/log/auth.log', '/var/log/kern.log']
             logs = []
             
+            # Only the bytes appended since the previous poll are transferred
+            with self.ssh_session(host, credentials) as ssh:
+                new_lines = self.log_tailer.read_new(ssh, host, log_files)
             for log_file in log_files:
-                stdin, stdout, stderr = ssh.exec_command(f'tail -n 1000 {log_file}')
-                logs.extend(self.parse_linux_logs(stdout.readlines()))
+                logs.extend(self.parse_linux_logs(new_lines.get(log_file, [])))
             
-            ssh.close()
             return logs
         except Exception as e:
             self.logger.error(f"Error collecting Linux logs: {str(e)}")
@@ -293,15 +429,9 @@ class LogManager:
     def collect_macos_logs(self, host: str, credentials: Dict[str, str]):
         """Collect macOS system logs"""
         try:
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(host, username=credentials['username'], password=credentials['password'])
-            
-            stdin, stdout, stderr = ssh.exec_command('log show --last 1h')
-            logs = self.parse_macos_logs(stdout.readlines())
-            
-            ssh.close()
-            return logs
+            with self.ssh_session(host, credentials) as ssh:
+                stdin, stdout, stderr = ssh.exec_command('log show --last 1h')
+                return self.parse_macos_logs(stdout.readlines())
         except Exception as e:
             self.logger.error(f"Error collecting macOS logs: {str(e)}")
             return None
@@ -325,8 +455,8 @@ class LogManager:
                 'secret': credentials.get('enable_secret', '')
             }
             
-            with ConnectHandler(**device) as net_connect:
-                if credentials.get('enable_secret'):
+            with self.netmiko_session(device) as net_connect:
+                if credentials.get('enable_secret') and not net_connect.check_enable_mode():
                     net_connect.enable()
                 
                 logs = []
@@ -348,7 +478,7 @@ class LogManager:
                 'password': credentials['password']
             }
             
-            with ConnectHandler(**device) as net_connect:
+            with self.netmiko_session(device) as net_connect:
                 logs = []
                 logs.extend(net_connect.send_command('show log system'))
                 logs.extend(net_connect.send_command('show log traffic'))
@@ -399,18 +529,24 @@ class LogManager:
                 self.logger.error(f"Error parsing Windows log: {str(e)}")
         return parsed_logs
 
-    def process_logs(self, log_data):
-        """Enhanced log processing with new features"""
+    def summarize_log_record(self, log_data):
+        """Count the record in the rolling per-minute summary"""
+        self.log_summary.update(log_data)
+        return log_data
+
+    def scan_log_record(self, log_data):
+        """Pattern analysis and security scan stage"""
         try:
-            start_time = time.time()
-            
-            # Original processing
-            log_data = self.process_log_data(log_data)
-            
-            # Additional processing
             log_data['patterns'] = self.analyze_log_patterns(log_data)
             log_data['security_scan'] = self.perform_security_scan(log_data)
-            
+            return log_data
+        except Exception as e:
+            self.logger.error(f"Error scanning log data: {str(e)}")
+            return None
+
+    def protect_log_record(self, log_data):
+        """Compression and encryption stage"""
+        try:
             # Compress if needed
             if self.config.get('compression_enabled', False):
                 log_data['raw_log'] = self.compress_logs(str(log_data['raw_log']))
@@ -420,6 +556,21 @@ class LogManager:
                 log_data['sensitive_fields'] = self.encrypt_sensitive_data(
                     str(log_data.get('sensitive_fields', ''))
                 )
+            return log_data
+        except Exception as e:
+            self.logger.error(f"Error protecting log data: {str(e)}")
+            return None
+
+    def process_logs(self, log_data):
+        """Enhanced log processing with new features"""
+        try:
+            start_time = time.time()
+            
+            for stage in (self.process_log_data, self.summarize_log_record, self.scan_log_record,
+                          self.protect_log_record):
+                log_data = stage(log_data)
+                if log_data is None:
+                    return None
             
             # Update metrics
             processing_time = time.time() - start_time
@@ -432,6 +583,15 @@ class LogManager:
             self.logger.error(f"Error in enhanced log processing: {str(e)}")
             return None
 
+    def ingest_logs(self, logs: List[Dict[str, Any]]) -> int:
+        """Queue raw logs for batched processing and bulk storage"""
+        return self.pipeline.submit_many(logs or [])
+
+    def record_batch_metrics(self, count: int, latency: float):
+        """Update metrics after the pipeline flushes a batch"""
+        self.log_counter.inc(count)
+        self.latency_gauge.set(latency)
+
     def process_log_data(self, log_data):
         """Process and enrich log data"""
         try:
@@ -459,16 +619,68 @@ class LogManager:
         except Exception as e:
             self.logger.error(f"Error storing logs in Elasticsearch: {str(e)}")
 
-    def backup_logs(self):  
+    def store_logs_bulk(self, logs: List[Dict[str, Any]]) -> int:
+        """Store a batch of logs in Elasticsearch with a single _bulk request"""
+        try:
+            return self.bulk_sink.write(logs)
+        except Exception as e:
+            self.logger.error(f"Error bulk storing logs in Elasticsearch: {str(e)}")
+            return 0
+
+    def compressed_etag(self, fileobj) -> str:
+        """ETag S3 will report for fileobj uploaded with self.transfer_config"""
+        fileobj.seek(0, os.SEEK_END)
+        size = fileobj.tell()
+        fileobj.seek(0)
+        part_size = self.transfer_config.multipart_chunksize
+        if size < self.transfer_config.multipart_threshold:
+            return f'"{hashlib.md5(fileobj.read()).hexdigest()}"'
+        digests = [hashlib.md5(block).digest() for block in iter(lambda: fileobj.read(part_size), b'')]
+        return f'"{hashlib.md5(b"".join(digests)).hexdigest()}-{len(digests)}"'
+
+    def backup_log_file(self, path: str, bucket: str, key: str, remote_etags: Dict[str, str]) -> int:
+        """Gzip one log file and upload it unless the same bytes are already stored; return bytes sent"""
+        with tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024) as compressed:
+            # mtime=0 makes the gzip output depend only on the content, so ETags are comparable
+            with open(path, 'rb') as source, gzip.GzipFile(fileobj=compressed, mode='wb', mtime=0) as gz:
+                for block in iter(lambda: source.read(1024 * 1024), b''):
+                    gz.write(block)
+            if remote_etags.get(key) == self.compressed_etag(compressed):
+                return 0
+            size = compressed.tell()
+            compressed.seek(0)
+            self.s3.upload_fileobj(compressed, bucket, key, Config=self.transfer_config)
+            return size
+
+    def backup_logs(self, log_dir: str = 'logs'):
         """Backup logs to S3"""
         try:
             backup_config = self.config['s3_backup']
+            bucket = backup_config['bucket_name']
             current_date = datetime.now().strftime('%Y-%m-%d')
-            
-            # Compress logs before uploading
-            # Implementation for log compression and upload to S3
-            
-            self.logger.info(f"Logs backed up to S3 bucket: {backup_config['bucket_name']}")
+            prefix = f"{backup_config.get('prefix', 'logs')}/{socket.gethostname()}/{current_date}/"
+
+            # One listing of what is already stored instead of a HEAD request per file
+            remote_etags = {}
+            for page in self.s3.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+                for obj in page.get('Contents', []):
+                    remote_etags[obj['Key']] = obj['ETag']
+
+            jobs = []
+            for dirpath, _, filenames in os.walk(log_dir):
+                for filename in sorted(filenames):
+                    path = os.path.join(dirpath, filename)
+                    relative = os.path.relpath(path, log_dir).replace(os.sep, '/')
+                    jobs.append((path, f"{prefix}{relative}.gz"))
+
+            started = time.time()
+            futures = [self.thread_pool.submit(self.backup_log_file, path, bucket, key, remote_etags)
+                       for path, key in jobs]
+            sent = [future.result() for future in futures]
+            elapsed = max(time.time() - started, 1e-6)
+            uploaded = sum(1 for size in sent if size)
+            self.logger.info(f"Logs backed up to S3 bucket: {bucket} ({uploaded} uploaded, "
+                             f"{len(jobs) - uploaded} unchanged, {sum(sent) / elapsed / 1e6:.1f} MB/s)")
         except Exception as e:
             self.logger.error(f"Error backing up logs: {str(e)}")
 
@@ -543,29 +755,30 @@ class LogManager:
         schedule.every(1).hours.do(self.generate_log_summary)
         schedule.every(30).minutes.do(lambda: self.perform_log_correlation(self.get_recent_logs()))
         
-        # Additional schedules for OS and network device collection
-        for os_config in self.config.get('os_sources', []):
-            schedule.every(os_config.get('interval', 5)).minutes.do(
-                self.collect_os_logs,
-                os_config['type'],
-                os_config['host'],
-                os_config['credentials']
-            )
+        # Device collection fans out concurrently, one cycle per interval group
+        devices_by_interval = {}
+        for device_config in self.config.get('os_sources', []) + self.config.get('network_sources', []):
+            devices_by_interval.setdefault(device_config.get('interval', 5), []).append(device_config)
         
-        for device_config in self.config.get('network_sources', []):
-            schedule.every(device_config.get('interval', 5)).minutes.do(
-                self.collect_network_device_logs,
-                device_config['type'],
-                device_config['host'],
-                device_config['credentials']
+        for interval, devices in devices_by_interval.items():
+            schedule.every(interval).minutes.do(
+                self.run_collection_cycle,
+                devices,
+                timeout=interval * 60
             )
         
         # Start API server
         self.setup_api_endpoints()
         
-        while True:
-            schedule.run_pending()
-            time.sleep(60)
+        try:
+            while True:
+                schedule.run_pending()
+                time.sleep(60)
+        finally:
+            self.collection_scheduler.shutdown(wait_for_running=False)
+            self.session_pool.close_all()
+            self.log_tailer.cursors.close()
+            self.pipeline.close()
 
 if __name__ == "__main__":
     log_manager = LogManager()
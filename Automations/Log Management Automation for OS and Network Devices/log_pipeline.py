@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+Record = Dict[str, Any]
+Stage = Callable[[Record], Optional[Record]]
+
+_SENTINEL = object()
+
+
+class PipelineStats:
+    """Throughput and batch latency counters for a LogPipeline"""
+
+    def __init__(self, latency_window: int = 10000):
+        self.started_at = time.perf_counter()
+        self.records_in = 0
+        self.records_out = 0
+        self.records_dropped = 0
+        self.batches = 0
+        self.batch_latencies = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+
+    def record_batch(self, records_in: int, records_out: int, latency: float):
+        with self._lock:
+            self.records_in += records_in
+            self.records_out += records_out
+            self.records_dropped += records_in - records_out
+            self.batches += 1
+            self.batch_latencies.append(latency)
+
+    def records_per_second(self) -> float:
+        elapsed = time.perf_counter() - self.started_at
+        return self.records_out / elapsed if elapsed > 0 else 0.0
+
+    def latency_percentile(self, percentile: float) -> float:
+        with self._lock:
+            latencies = sorted(self.batch_latencies)
+        if not latencies:
+            return 0.0
+        index = min(len(latencies) - 1, int(round(percentile / 100.0 * (len(latencies) - 1))))
+        return latencies[index]
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            'records_in': self.records_in,
+            'records_out': self.records_out,
+            'records_dropped': self.records_dropped,
+            'batches': self.batches,
+            'records_per_second': self.records_per_second(),
+            'p50_batch_latency': self.latency_percentile(50),
+            'p99_batch_latency': self.latency_percentile(99),
+        }
+
+
+class ElasticsearchBulkSink:
+    """Write micro-batches to Elasticsearch through the _bulk API"""
+
+    def __init__(self, es, index_prefix: str, max_retries: int = 3, retry_backoff: float = 0.5):
+        self.es = es
+        self.index_prefix = index_prefix
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.logger = logging.getLogger('LogManager.BulkSink')
+
+    def index_name(self) -> str:
+        return f"{self.index_prefix}-{datetime.now().strftime('%Y.%m.%d')}"
+
+    def build_operations(self, batch: List[Record]) -> List[Dict[str, Any]]:
+        action = {'index': {'_index': self.index_name()}}
+        operations = []
+        for record in batch:
+            operations.append(action)
+            operations.append(record)
+        return operations
+
+    def write(self, batch: List[Record]) -> int:
+        """Index a batch, retrying only the documents Elasticsearch rejected"""
+        pending = batch
+        rejected = 0
+        for attempt in range(self.max_retries + 1):
+            response = self.es.bulk(operations=self.build_operations(pending))
+            if not response.get('errors'):
+                return len(batch) - rejected
+
+            retry = []
+            for record, item in zip(pending, response.get('items', [])):
+                status = item.get('index', {}).get('status', 500)
+                # 429 and 5xx are transient; anything else is a bad document
+                if status == 429 or status >= 500:
+                    retry.append(record)
+                elif status >= 300:
+                    rejected += 1
+                    self.logger.error(f"Rejected log document: {item.get('index', {}).get('error')}")
+            if not retry:
+                return len(batch) - rejected
+            pending = retry
+            time.sleep(self.retry_backoff * (2 ** attempt))
+
+        self.logger.error(f"Dropping {len(pending)} log documents after {self.max_retries} retries")
+        return len(batch) - rejected - len(pending)
+
+
+class LogPipeline:
+    """Micro-batched parse -> enrich -> scan -> protect -> sink pipeline
+
+    Records are pushed with submit() into a bounded queue; submit() blocks
+    when the queue is full so fast collectors are throttled to the speed of
+    the sink. A worker thread drains the queue into batches that are flushed
+    when they reach batch_size or when flush_interval seconds have passed.
+    """
+
+    def __init__(self, stages: List[Stage], sink: Callable[[List[Record]], Any],
+                 batch_size: int = 500, flush_interval: float = 2.0,
+                 max_queue_size: int = 10000,
+                 on_flush: Optional[Callable[[int, float], None]] = None):
+        self.stages = stages
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.stats = PipelineStats()
+        self.logger = logging.getLogger('LogManager.Pipeline')
+        self._worker = None
+
+    def run_stages(self, batch: Iterable[Record]) -> List[Record]:
+        """Apply every stage to a batch, dropping records a stage rejects"""
+        for stage in self.stages:
+            batch = [record for record in map(stage, batch) if record is not None]
+        return batch
+
+    def flush(self, batch: List[Record]) -> List[Record]:
+        if not batch:
+            return batch
+        start_time = time.perf_counter()
+        processed = self.run_stages(batch)
+        written = len(processed)
+        try:
+            if processed:
+                result = self.sink(processed)
+                if isinstance(result, int):
+                    written = result
+        except Exception as e:
+            self.logger.error(f"Error flushing batch of {len(processed)} logs: {str(e)}")
+            written = 0
+        latency = time.perf_counter() - start_time
+        self.stats.record_batch(len(batch), written, latency)
+        if self.on_flush:
+            self.on_flush(written, latency)
+        return processed
+
+    def batches(self, records: Iterable[Record]) -> Iterator[List[Record]]:
+        """Group an iterable of records into size/time bounded micro-batches"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        for record in records:
+            batch.append(record)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                yield batch
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+        if batch:
+            yield batch
+
+    def process_stream(self, records: Iterable[Record]) -> Iterator[List[Record]]:
+        """Synchronously process an iterable, yielding each flushed batch"""
+        for batch in self.batches(records):
+            yield self.flush(batch)
+
+    # Threaded mode
+
+    def start(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._drain, name='log-pipeline', daemon=True)
+            self._worker.start()
+        return self
+
+    def submit(self, record: Record, timeout: Optional[float] = None) -> bool:
+        """Enqueue a record, blocking while the queue is full (backpressure)"""
+        try:
+            self.queue.put(record, timeout=timeout)
+            return True
+        except queue.Full:
+            self.logger.warning("Log pipeline queue full, record rejected")
+            return False
+
+    def submit_many(self, records: Iterable[Record], timeout: Optional[float] = None) -> int:
+        return sum(1 for record in records if self.submit(record, timeout))
+
+    def close(self, timeout: Optional[float] = None):
+        """Flush everything still queued and stop the worker"""
+        if self._worker is not None:
+            self.queue.put(_SENTINEL)
+            self._worker.join(timeout)
+            self._worker = None
+
+    def _flush_in_worker(self, batch: List[Record]):
+        # A failing stage or on_flush callback costs this batch, not the
+        # worker; without the worker submit() would block forever
+        try:
+            self.flush(batch)
+        except Exception as e:
+            self.logger.error(f"Error processing batch of {len(batch)} logs: {str(e)}")
+
+    def _drain(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+
+            if item is _SENTINEL:
+                self._flush_in_worker(batch)
+                return
+            if item is not None:
+                batch.append(item)
+
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush_in_worker(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+import re
+import time
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+SEVERITIES = ('ERROR', 'WARNING', 'INFO')
+_PERIOD_UNITS = {'m': 1, 'h': 60, 'd': 1440}
+
+
+def period_minutes(time_period: str) -> int:
+    """Convert '30m', '1h' or '7d' to minutes"""
+    match = re.fullmatch(r'\s*(\d+)\s*([mhd])\s*', time_period)
+    if not match:
+        raise ValueError(f"Unsupported time period: {time_period}")
+    return int(match.group(1)) * _PERIOD_UNITS[match.group(2)]
+
+
+class RollingSummary:
+    """Per-minute log counters kept in a ring of buckets
+
+    Severity counts live in one (minutes x severities) array; sources and
+    error types are counted per bucket. Records are added as they stream
+    through processing, so a summary only merges the buckets of the requested
+    period instead of re-reading every record.
+    """
+
+    def __init__(self, retention_minutes: int = 1440):
+        self.retention = retention_minutes
+        self.bucket_minute = np.full(retention_minutes, -1, dtype=np.int64)
+        self.severity_counts = np.zeros((retention_minutes, len(SEVERITIES)), dtype=np.int64)
+        self.source_counts: List[Counter] = [Counter() for _ in range(retention_minutes)]
+        self.error_type_counts: List[Counter] = [Counter() for _ in range(retention_minutes)]
+        self._severity_index = {severity: i for i, severity in enumerate(SEVERITIES)}
+        self._lock = threading.Lock()
+
+    def _bucket(self, minute: int) -> int:
+        slot = minute % self.retention
+        if self.bucket_minute[slot] != minute:
+            self.bucket_minute[slot] = minute
+            self.severity_counts[slot] = 0
+            self.source_counts[slot] = Counter()
+            self.error_type_counts[slot] = Counter()
+        return slot
+
+    def update(self, log_data: Dict[str, Any], now: Optional[float] = None):
+        self.update_many([log_data], now)
+
+    def update_many(self, records: Iterable[Dict[str, Any]], now: Optional[float] = None):
+        minute = int((time.time() if now is None else now) // 60)
+        severities = [0] * len(SEVERITIES)
+        with self._lock:
+            slot = self._bucket(minute)
+            sources = self.source_counts[slot]
+            error_types = self.error_type_counts[slot]
+            for record in records:
+                severity = record.get('severity', 'INFO')
+                severities[self._severity_index.get(severity, 2)] += 1
+                sources[record.get('source', 'unknown')] += 1
+                if severity == 'ERROR':
+                    error_types[record.get('type', 'unknown')] += 1
+            self.severity_counts[slot] += severities
+
+    def _slots(self, minutes: int, now: Optional[float]) -> np.ndarray:
+        current = int((time.time() if now is None else now) // 60)
+        minutes = min(minutes, self.retention)
+        return np.flatnonzero(
+            (self.bucket_minute > current - minutes) & (self.bucket_minute <= current)
+        )
+
+    def summary(self, time_period: str = '1h', top_n: int = 5, now: Optional[float] = None) -> Dict[str, Any]:
+        """Same shape as LogManager.generate_log_summary has always returned"""
+        with self._lock:
+            slots = self._slots(period_minutes(time_period), now)
+            totals = self.severity_counts[slots].sum(axis=0)
+            sources, error_types = Counter(), Counter()
+            for slot in slots:
+                sources.update(self.source_counts[slot])
+                error_types.update(self.error_type_counts[slot])
+        return {
+            'total_logs': int(totals.sum()),
+            'error_count': int(totals[0]),
+            'warning_count': int(totals[1]),
+            'top_sources': dict(sources.most_common(top_n)),
+            'error_types': dict(error_types.most_common()),
+        }
+
+    def hourly(self, hours: int = 24, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Severity totals per clock hour for the last `hours` hours, oldest first"""
+        current_hour = int((time.time() if now is None else now) // 3600)
+        first_minute = (current_hour - hours + 1) * 60
+        with self._lock:
+            slots = np.flatnonzero(
+                (self.bucket_minute >= first_minute) & (self.bucket_minute < (current_hour + 1) * 60)
+            )
+            offsets = self.bucket_minute[slots] // 60 - (current_hour - hours + 1)
+            per_hour = np.zeros((hours, len(SEVERITIES)), dtype=np.int64)
+            np.add.at(per_hour, offsets, self.severity_counts[slots])
+        return [
+            {
+                'hour': (current_hour - hours + 1 + offset) * 3600,
+                'total_logs': int(per_hour[offset].sum()),
+                'error_count': int(per_hour[offset][0]),
+                'warning_count': int(per_hour[offset][1]),
+            }
+            for offset in range(hours)
+        ]
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+# Characters that make an alternative something other than a plain literal
+_REGEX_META = set('.^$*+?{}[]\\|()')
+
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+if hasattr(sre_constants, 'POSSESSIVE_REPEAT'):
+    _REPEATS.add(sre_constants.POSSESSIVE_REPEAT)
+
+
+def literal_alternatives(pattern: str) -> Optional[List[str]]:
+    """Return the keywords of a pattern like 'error|failed', or None if it is a real regex"""
+    alternatives = pattern.split('|')
+    if any(not alt or _REGEX_META.intersection(alt) for alt in alternatives):
+        return None
+    return alternatives
+
+
+def required_literal(pattern: str, min_length: int = 3) -> Optional[str]:
+    """Longest literal that every match of pattern must contain, if one is obvious
+
+    The pattern is read with the regex module's own parser, so escapes such
+    as \\x64 or \\N{...} come out as the characters they match. Only top-level
+    sequences are used; groups, classes, alternations and back-references
+    end the current literal run, so the result is conservative.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except (re.error, RecursionError):
+        return None
+    # Case-insensitive literals cannot be matched as-is, and verbose patterns
+    # are only prefiltered through explicit keywords
+    if parsed.state.flags & (re.IGNORECASE | re.VERBOSE):
+        return None
+    runs, run = [], ''
+    for op, av in parsed:
+        if op is sre_constants.LITERAL:
+            run += chr(av)
+            continue
+        if op is sre_constants.AT:
+            # Zero-width anchors do not split a run of literals
+            continue
+        if op in _REPEATS and av[0] >= 1 and len(av[2]) == 1 and av[2][0][0] is sre_constants.LITERAL:
+            # x+ or x{2,}: the first x still extends the run, then it ends
+            run += chr(av[2][0][1])
+        runs.append(run)
+        run = ''
+    runs.append(run)
+    best = max(runs, key=len)
+    return best if len(best) >= min_length else None
+
+
+def trie_regex(keywords: Iterable[str]) -> str:
+    """Build a regex matching any keyword, factored into a prefix trie
+
+    A flat 'a|b|c|...' alternation is tried branch by branch at every offset;
+    the trie form rejects an offset after looking at one character, which
+    keeps the scan close to linear in the text as the keyword list grows.
+    Longer keywords are preferred over their own prefixes.
+    """
+    trie: Dict[str, dict] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: dict) -> str:
+        terminal = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if terminal:
+            body = body if len(branches) > 1 else '(?:' + body + ')'
+            return body + '?'
+        return body
+
+    return build(trie)
+
+
+class PatternSet:
+    """A set of named regexes compiled once and matched with a keyword prefilter
+
+    Patterns that are plain keyword alternations (``error|failed``), and
+    regexes with an obvious required literal (``segfault\\w*\\s+\\d+``), are
+    folded into one combined keyword scanner, so a message is read once to
+    learn which keywords it contains and only the patterns whose keywords were
+    seen are run. Regexes without a usable literal are always run, compiled.
+    ``search_any`` uses a single alternation with one named group per pattern.
+    """
+
+    def __init__(self, patterns: Dict[str, str], keywords: Optional[Dict[str, Iterable[str]]] = None,
+                 flags: int = 0):
+        self.names = list(patterns)
+        self.compiled = {name: re.compile(pattern, flags) for name, pattern in patterns.items()}
+        self.flags = flags
+        self.fold_case = bool(flags & re.IGNORECASE)
+
+        # keyword -> names of the patterns that need it
+        self.keyword_owners: Dict[str, Set[str]] = {}
+        self.unfiltered: List[str] = []
+        keywords = keywords or {}
+        for name, pattern in patterns.items():
+            required = keywords.get(name)
+            # Whitespace and '#' are not literal in verbose patterns, so only
+            # explicitly given keywords can prefilter them
+            if not required and not self.compiled[name].flags & re.VERBOSE:
+                required = literal_alternatives(pattern)
+                if not required:
+                    literal = required_literal(pattern)
+                    required = [literal] if literal else None
+            if not required:
+                self.unfiltered.append(name)
+                continue
+            for keyword in required:
+                if self.fold_case:
+                    keyword = keyword.lower()
+                self.keyword_owners.setdefault(keyword, set()).add(name)
+
+        self.keyword_scanner = self._build_keyword_scanner()
+        self.any_matcher = self._build_any_matcher(patterns)
+
+    def _build_keyword_scanner(self):
+        if not self.keyword_owners:
+            return None
+        keywords = sorted(self.keyword_owners, key=len, reverse=True)
+        # A lookahead reports a hit at every offset, so keywords that overlap
+        # each other are still found; shorter keywords sharing a start offset
+        # with a longer hit are recovered through the containment closure.
+        self.keyword_closure = {
+            keyword: {other for other in keywords if other in keyword}
+            for keyword in keywords
+        }
+        return re.compile(f'(?=({trie_regex(keywords)}))', self.flags)
+
+    def _build_any_matcher(self, patterns: Dict[str, str]):
+        groups = []
+        for index, pattern in enumerate(patterns.values()):
+            # Back-references would be renumbered inside the combined pattern
+            if re.search(r'\\\d|\(\?P[=<]', pattern):
+                return None
+            groups.append(f'(?P<p{index}>{pattern})')
+        try:
+            return re.compile('|'.join(groups), self.flags)
+        except re.error:
+            return None
+
+    def candidates(self, text: str) -> List[str]:
+        """Names of the patterns that could match text, in declaration order"""
+        if self.keyword_scanner is None:
+            return self.unfiltered
+        found = set()
+        for match in self.keyword_scanner.finditer(text):
+            hit = match.group(1).lower() if self.fold_case else match.group(1)
+            for keyword in self.keyword_closure[hit]:
+                found.update(self.keyword_owners[keyword])
+        if not found:
+            return self.unfiltered
+        found.update(self.unfiltered)
+        return [name for name in self.names if name in found]
+
+    def findall(self, text: str) -> Dict[str, List[str]]:
+        """Same result as re.findall for every pattern, skipping impossible ones"""
+        results = {name: [] for name in self.names}
+        for name in self.candidates(text):
+            results[name] = self.compiled[name].findall(text)
+        return results
+
+    def matching(self, text: str) -> List[str]:
+        """Names of every pattern with at least one match in text"""
+        return [name for name in self.candidates(text) if self.compiled[name].search(text)]
+
+    def search_any(self, text: str) -> Optional[str]:
+        """Name of the first pattern (by position in text) that matches, or None"""
+        if self.any_matcher is None:
+            matched = self.matching(text)
+            return matched[0] if matched else None
+        match = self.any_matcher.search(text)
+        if match is None:
+            return None
+        return self.names[int(match.lastgroup[1:])]
+
+    def __len__(self):
+        return len(self.names)
@@ -0,0 +1,106 @@
+import time
+import threading
+import pytest
+from collection_scheduler import CollectionScheduler, SessionPool
+
+
+class Session:
+    def __init__(self, alive=True):
+        self.alive = alive
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_session_is_reused_until_idle_timeout():
+    pool = SessionPool(idle_timeout=60)
+    with pool.lease('r1', Session) as first:
+        pass
+    with pool.lease('r1', Session) as second:
+        assert second is first
+    assert (pool.opened, pool.reused) == (1, 1)
+
+    assert pool.evict_idle(now=time.monotonic() + 61) == 1
+    assert first.closed
+    with pool.lease('r1', Session) as third:
+        assert third is not first
+
+
+def test_dead_and_failed_sessions_are_not_reused():
+    pool = SessionPool()
+    with pool.lease('r1', Session) as first:
+        first.alive = False
+    with pool.lease('r1', Session, is_alive=lambda s: s.alive) as second:
+        assert second is not first and first.closed
+
+    with pytest.raises(RuntimeError):
+        with pool.lease('r1', Session) as leased:
+            raise RuntimeError('connection reset')
+    assert leased.closed
+    assert pool.stats()['idle_sessions'] == 0
+
+
+def devices(count, vendor='cisco_ios'):
+    return [{'type': vendor, 'host': f'{vendor}-{n}', 'credentials': {}} for n in range(count)]
+
+
+def test_cycle_reports_successes_and_failures():
+    def collect(device):
+        n = int(device['host'].rsplit('-', 1)[1])
+        if n == 1:
+            raise TimeoutError('timed out')
+        if n == 2:
+            return None
+        return [f"{device['host']} line"]
+
+    results = []
+    scheduler = CollectionScheduler(collect, on_result=results.append)
+    report = scheduler.run_cycle(devices(5), timeout=5)
+    scheduler.shutdown()
+
+    assert (report['devices'], report['succeeded'], report['pending']) == (5, 3, 0)
+    assert {(f['host'], f['error']) for f in report['failed']} == {
+        ('cisco_ios-1', 'timed out'), ('cisco_ios-2', 'collection failed')}
+    assert sorted(r.host for r in results if r.ok) == ['cisco_ios-0', 'cisco_ios-3', 'cisco_ios-4']
+
+
+def test_vendor_limit_caps_concurrency():
+    running, peak, lock = {}, {}, threading.Lock()
+
+    def collect(device):
+        vendor = device['type']
+        with lock:
+            running[vendor] = running.get(vendor, 0) + 1
+            peak[vendor] = max(peak.get(vendor, 0), running[vendor])
+        time.sleep(0.02)
+        with lock:
+            running[vendor] -= 1
+        return []
+
+    scheduler = CollectionScheduler(collect, max_workers=16, vendor_limits={'paloalto': 2},
+                                    default_vendor_limit=5)
+    report = scheduler.run_cycle(devices(10, 'paloalto') + devices(20, 'cisco_ios'), timeout=5)
+    scheduler.shutdown()
+
+    assert report['succeeded'] == 30
+    assert peak == {'paloalto': 2, 'cisco_ios': 5}
+
+
+def test_device_still_collecting_is_skipped_next_cycle():
+    release = threading.Event()
+
+    def collect(device):
+        if device['host'] == 'cisco_ios-0':
+            release.wait(5)
+        return []
+
+    scheduler = CollectionScheduler(collect)
+    first = scheduler.run_cycle(devices(2), timeout=0.2)
+    assert (first['succeeded'], first['pending']) == (1, 1)
+
+    second = scheduler.run_cycle(devices(2), timeout=5)
+    assert second['skipped'] == ['cisco_ios-0']
+    assert second['devices'] == 1
+    release.set()
+    scheduler.shutdown()
@@ -0,0 +1,126 @@
+import random
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from log_correlation import CorrelationEngine, LINKED, epoch_seconds
+
+BASE = 1714564800
+
+
+def make_entries(count=600, seed=3):
+    rng = random.Random(seed)
+    return [
+        {
+            'session_id': f's{rng.randrange(40)}' if rng.random() < 0.85 else None,
+            'src_ip': f'10.0.0.{rng.randrange(30)}',
+            'user': f'user{rng.randrange(25)}',
+            'timestamp': BASE + rng.randrange(3600),
+        }
+        for _ in range(count)
+    ]
+
+
+def pairwise(entries, key):
+    """The original O(n^2) scan"""
+    return [[other for other in entries if entry.get(key) is not None and other.get(key) == entry.get(key)]
+            for entry in entries]
+
+
+def windowed(entries, key, window):
+    """Reference: sort each key's entries by time and cut where the gap exceeds window"""
+    expected = [[] for _ in entries]
+    by_value = {}
+    for index, entry in enumerate(entries):
+        if entry.get(key) is not None:
+            by_value.setdefault(entry[key], []).append(index)
+    for indices in by_value.values():
+        indices.sort(key=lambda i: entries[i]['timestamp'])
+        run = [indices[0]]
+        for previous, index in zip(indices, indices[1:]):
+            if entries[index]['timestamp'] - entries[previous]['timestamp'] > window:
+                for member in run:
+                    expected[member] = run
+                run = []
+            run.append(index)
+        for member in run:
+            expected[member] = run
+    return [sorted(group) for group in expected]
+
+
+def linked(entries, keys):
+    """Reference connected components through any shared key value"""
+    parent = list(range(len(entries)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for key in keys:
+        first = {}
+        for index, entry in enumerate(entries):
+            value = entry.get(key)
+            if value is not None:
+                parent[find(index)] = find(first.setdefault(value, index))
+    components = {}
+    for index in range(len(entries)):
+        components.setdefault(find(index), []).append(index)
+    return [components[find(index)] for index in range(len(entries))]
+
+
+def test_single_key_matches_pairwise_scan():
+    entries = make_entries()
+    result = CorrelationEngine().correlate(entries)
+    for index, expected in enumerate(pairwise(entries, 'session_id')):
+        related = result.related(index, 'session_id')
+        assert sorted(map(id, related)) == sorted(map(id, expected))
+
+
+def test_related_list_is_shared_within_a_group():
+    entries = make_entries()
+    result = CorrelationEngine().correlate(entries)
+    first = next(i for i, e in enumerate(entries) if e['session_id'])
+    other = next(i for i, e in enumerate(entries) if i != first and e['session_id'] == entries[first]['session_id'])
+    assert result.related(first, 'session_id') is result.related(other, 'session_id')
+    summary = result.to_dict('session_id')
+    assert summary['correlated_entries'] == sum(1 for e in entries if e['session_id'])
+
+
+def test_time_window_splits_groups():
+    entries = make_entries()
+    result = CorrelationEngine(window_seconds=120).correlate(entries)
+    expected = windowed(entries, 'session_id', 120)
+    ids = {id(entry): index for index, entry in enumerate(entries)}
+    for index in range(len(entries)):
+        assert sorted(ids[id(e)] for e in result.related(index, 'session_id')) == expected[index]
+
+
+def test_linked_groups_join_every_key():
+    entries = make_entries(300)
+    keys = ['session_id', 'src_ip', 'user']
+    result = CorrelationEngine(keys).correlate(entries)
+    expected = linked(entries, keys)
+    ids = {id(entry): index for index, entry in enumerate(entries)}
+    for index in range(len(entries)):
+        assert sorted(ids[id(e)] for e in result.related(index, LINKED)) == expected[index]
+
+
+def test_linked_chain_through_different_keys():
+    entries = [
+        {'session_id': 'a', 'user': 'alice'},
+        {'session_id': 'b', 'user': 'alice'},
+        {'session_id': 'b', 'user': 'bob'},
+        {'session_id': 'c', 'user': 'carol'},
+    ]
+    result = CorrelationEngine(['session_id', 'user']).correlate(entries)
+    assert result.related(0, LINKED) == entries[:3]
+    assert result.related(3, LINKED) == [entries[3]]
+    assert result.to_dict(LINKED) == {'groups': 2, 'correlated_entries': 4, 'largest_group': 3}
+
+
+def test_epoch_seconds_accepts_mixed_timestamps():
+    moment = datetime(2024, 5, 1, 12, tzinfo=timezone.utc)
+    values = [BASE, '2024-05-01T12:00:00Z', moment + timedelta(seconds=5), None, 'not a date']
+    seconds = epoch_seconds(values)
+    assert seconds[:3].tolist() == [BASE, BASE, BASE + 5]
+    assert np.isnan(seconds[3:]).all()
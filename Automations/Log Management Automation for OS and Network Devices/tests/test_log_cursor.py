@@ -0,0 +1,119 @@
+import io
+import os
+import subprocess
+import pytest
+from log_cursor import CursorStore, RemoteTailer
+
+
+class LocalSSH:
+    """Runs the tailer's remote commands against the local filesystem"""
+
+    def __init__(self):
+        self.commands = []
+
+    def exec_command(self, command):
+        self.commands.append(command)
+        output = subprocess.run(['sh', '-c', command], capture_output=True).stdout
+        return None, io.BytesIO(output), io.BytesIO()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CursorStore(str(tmp_path / 'cursors.db'))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def log(tmp_path):
+    return str(tmp_path / 'syslog')
+
+
+def append(path, *lines, partial=''):
+    with open(path, 'a') as f:
+        f.write(''.join(line + '\n' for line in lines) + partial)
+
+
+@pytest.mark.parametrize('compress', [True, False])
+def test_reads_only_appended_lines(store, log, compress):
+    append(log, 'one', 'two')
+    tailer, ssh = RemoteTailer(store, compress=compress), LocalSSH()
+    assert tailer.read_new(ssh, 'web1', [log]) == {log: ['one', 'two']}
+    assert tailer.read_new(ssh, 'web1', [log]) == {log: []}
+
+    append(log, 'three', partial='fou')
+    assert tailer.read_new(ssh, 'web1', [log]) == {log: ['three']}
+    append(log, 'r')
+    assert tailer.read_new(ssh, 'web1', [log]) == {log: ['four']}
+    assert store.get('web1', log) == (os.stat(log).st_ino, os.path.getsize(log))
+
+
+def test_cursor_survives_restart(tmp_path, log):
+    append(log, 'one')
+    store = CursorStore(str(tmp_path / 'cursors.db'))
+    RemoteTailer(store).read_new(LocalSSH(), 'web1', [log])
+    store.close()
+
+    append(log, 'two')
+    store = CursorStore(str(tmp_path / 'cursors.db'))
+    assert RemoteTailer(store).read_new(LocalSSH(), 'web1', [log]) == {log: ['two']}
+    store.close()
+
+
+def test_rotation_drains_rotated_file_first(store, log):
+    append(log, 'one')
+    tailer, ssh = RemoteTailer(store), LocalSSH()
+    tailer.read_new(ssh, 'web1', [log])
+
+    append(log, 'two', 'three')
+    os.rename(log, log + '.1')
+    append(log, 'four')
+    assert tailer.read_new(ssh, 'web1', [log]) == {log: ['two', 'three', 'four']}
+    assert store.get('web1', log) == (os.stat(log).st_ino, os.path.getsize(log))
+
+
+def test_rotation_with_small_budget_stays_on_rotated_file(store, log):
+    append(log, 'one')
+    tailer, ssh = RemoteTailer(store, max_bytes_per_poll=8), LocalSSH()
+    tailer.read_new(ssh, 'web1', [log])
+    old_inode = os.stat(log).st_ino
+
+    append(log, 'aaa', 'bbb', 'ccc')
+    os.rename(log, log + '.1')
+    append(log, 'new')
+    assert tailer.read_new(ssh, 'web1', [log]) == {log: ['aaa', 'bbb']}
+    assert store.get('web1', log)[0] == old_inode
+    assert tailer.read_new(ssh, 'web1', [log]) == {log: ['ccc', 'new']}
+
+
+def test_truncation_restarts_from_the_beginning(store, log):
+    append(log, 'a long first line', 'another long line')
+    tailer, ssh = RemoteTailer(store), LocalSSH()
+    tailer.read_new(ssh, 'web1', [log])
+
+    # copytruncate keeps the inode and empties the file
+    with open(log, 'w') as f:
+        f.write('fresh\n')
+    assert tailer.read_new(ssh, 'web1', [log]) == {log: ['fresh']}
+
+
+def test_first_contact_starts_near_the_end(store, log):
+    append(log, *[f'line {n:04d}' for n in range(1000)])
+    tailer, ssh = RemoteTailer(store, initial_bytes=35), LocalSSH()
+    # The partial line at the cut is skipped, not returned as a fragment
+    assert tailer.read_new(ssh, 'web1', [log]) == {log: ['line 0997', 'line 0998', 'line 0999']}
+    assert tailer.bytes_transferred == 35
+
+
+def test_stats_every_path_in_one_round_trip(store, tmp_path):
+    paths = [str(tmp_path / name) for name in ('auth.log', 'kern.log', 'missing.log')]
+    for path in paths[:2]:
+        append(path, path)
+    tailer, ssh = RemoteTailer(store), LocalSSH()
+    result = tailer.read_new(ssh, 'web1', paths)
+
+    assert result == {paths[0]: [paths[0]], paths[1]: [paths[1]]}
+    assert sum(1 for command in ssh.commands if command.startswith('stat ')) == 1
+    assert store.get('web1', paths[2]) is None
+    store.delete('web1')
+    assert store.get('web1', paths[0]) is None
@@ -0,0 +1,134 @@
+import time
+import threading
+from log_pipeline import ElasticsearchBulkSink, LogPipeline
+
+
+class FakeElasticsearch:
+    """Answers _bulk with a status per document, taken from the document itself"""
+
+    def __init__(self):
+        self.requests = []
+
+    def bulk(self, operations):
+        documents = operations[1::2]
+        self.requests.append(documents)
+        statuses = [doc['statuses'].pop(0) if doc['statuses'] else 201 for doc in documents]
+        return {
+            'errors': any(status >= 300 for status in statuses),
+            'items': [{'index': {'status': status, 'error': 'bad' if status >= 300 else None}}
+                      for status in statuses],
+        }
+
+
+def test_bulk_sink_writes_one_request_per_batch():
+    es = FakeElasticsearch()
+    sink = ElasticsearchBulkSink(es, 'logs')
+    batch = [{'n': n, 'statuses': []} for n in range(50)]
+    assert sink.write(batch) == 50
+    assert len(es.requests) == 1
+
+    operations = sink.build_operations(batch[:2])
+    assert operations[0] == {'index': {'_index': sink.index_name()}}
+    assert operations[1] is batch[0] and operations[3] is batch[1]
+
+
+def test_bulk_sink_retries_only_transient_failures():
+    es = FakeElasticsearch()
+    sink = ElasticsearchBulkSink(es, 'logs', retry_backoff=0)
+    batch = [
+        {'n': 0, 'statuses': []},
+        {'n': 1, 'statuses': [429]},
+        {'n': 2, 'statuses': [400]},
+        {'n': 3, 'statuses': [503, 503]},
+    ]
+    assert sink.write(batch) == 3
+    assert [[doc['n'] for doc in request] for request in es.requests] == [[0, 1, 2, 3], [1, 3], [3]]
+
+
+def test_bulk_sink_gives_up_after_max_retries():
+    es = FakeElasticsearch()
+    sink = ElasticsearchBulkSink(es, 'logs', max_retries=2, retry_backoff=0)
+    batch = [{'n': 0, 'statuses': [500] * 5}, {'n': 1, 'statuses': []}]
+    assert sink.write(batch) == 1
+    assert len(es.requests) == 3
+
+
+def test_process_stream_batches_and_runs_stages():
+    sunk = []
+    stages = [
+        lambda record: record if record['n'] % 3 else None,
+        lambda record: dict(record, tagged=True),
+    ]
+    pipeline = LogPipeline(stages, sink=sunk.append, batch_size=10, flush_interval=60)
+    batches = list(pipeline.process_stream({'n': n} for n in range(25)))
+
+    assert [len(batch) for batch in batches] == [6, 7, 3]
+    assert [len(batch) for batch in sunk] == [6, 7, 3]
+    assert all(record['tagged'] for batch in sunk for record in batch)
+    stats = pipeline.stats.to_dict()
+    assert (stats['records_in'], stats['records_out'], stats['records_dropped'], stats['batches']) == (25, 16, 9, 3)
+
+
+def test_sink_return_value_and_errors_are_counted():
+    pipeline = LogPipeline([], sink=lambda batch: len(batch) - 1, batch_size=5)
+    list(pipeline.process_stream({'n': n} for n in range(5)))
+    assert pipeline.stats.records_out == 4
+
+    def broken(batch):
+        raise ConnectionError('down')
+
+    pipeline = LogPipeline([], sink=broken, batch_size=5)
+    list(pipeline.process_stream({'n': n} for n in range(5)))
+    assert (pipeline.stats.records_out, pipeline.stats.records_dropped) == (0, 5)
+
+
+def test_submit_blocks_when_queue_is_full():
+    release = threading.Event()
+    flushed = []
+
+    def slow_sink(batch):
+        release.wait(5)
+        flushed.append(len(batch))
+
+    pipeline = LogPipeline([], sink=slow_sink, batch_size=1, flush_interval=60, max_queue_size=2)
+    assert pipeline.submit_many([{'n': n} for n in range(2)]) == 2
+    # Nothing drains the queue yet, so a third record is refused after the timeout
+    start = time.monotonic()
+    assert pipeline.submit({'n': 2}, timeout=0.05) is False
+    assert time.monotonic() - start >= 0.05
+
+    pipeline.start()
+    assert pipeline.submit({'n': 2}, timeout=5)
+    release.set()
+    pipeline.close(timeout=5)
+    assert sum(flushed) == 3
+
+
+def test_worker_flushes_on_interval_and_close():
+    flushed = []
+    pipeline = LogPipeline([], sink=lambda batch: flushed.append(len(batch)), batch_size=100,
+                           flush_interval=0.05).start()
+    pipeline.submit_many({'n': n} for n in range(3))
+    deadline = time.monotonic() + 5
+    while not flushed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert flushed == [3]
+
+    pipeline.submit({'n': 3})
+    pipeline.close(timeout=5)
+    assert sum(flushed) == 4
+
+
+def test_worker_survives_a_failing_on_flush_callback():
+    flushed = []
+
+    def on_flush(written, latency):
+        raise RuntimeError('metrics backend down')
+
+    pipeline = LogPipeline([], sink=lambda batch: flushed.append(len(batch)), batch_size=1,
+                           flush_interval=60, max_queue_size=2, on_flush=on_flush).start()
+    # Far more records than the queue holds: each put needs the worker to keep draining
+    assert pipeline.submit_many(({'n': n} for n in range(20)), timeout=1) == 20
+    pipeline.close(timeout=5)
+    assert sum(flushed) == 20
+    assert pipeline.stats.batches == 20
@@ -0,0 +1,62 @@
+import pytest
+from log_summary import RollingSummary, period_minutes
+
+NOW = 1714564800.0  # on an hour boundary
+
+
+def test_period_minutes():
+    assert [period_minutes(p) for p in ('30m', '1h', ' 7d ')] == [30, 60, 10080]
+    with pytest.raises(ValueError):
+        period_minutes('1w')
+
+
+def test_summary_counts_records_in_the_period():
+    summary = RollingSummary()
+    summary.update_many([
+        {'severity': 'ERROR', 'source': 'web1', 'type': 'disk'},
+        {'severity': 'ERROR', 'source': 'web1', 'type': 'auth'},
+        {'severity': 'WARNING', 'source': 'db1'},
+        {'severity': 'INFO', 'source': 'web2'},
+        {'severity': 'DEBUG'},
+    ], now=NOW)
+    summary.update({'severity': 'ERROR', 'source': 'db1', 'type': 'disk'}, now=NOW + 59)
+
+    assert summary.summary('1h', now=NOW + 60) == {
+        'total_logs': 6,
+        'error_count': 3,
+        'warning_count': 1,
+        'top_sources': {'web1': 2, 'db1': 2, 'web2': 1, 'unknown': 1},
+        'error_types': {'disk': 2, 'auth': 1},
+    }
+    assert summary.summary('1h', top_n=1, now=NOW)['top_sources'] == {'web1': 2}
+
+
+def test_rolling_window_drops_old_minutes():
+    summary = RollingSummary()
+    for minute in range(90):
+        summary.update({'severity': 'ERROR', 'source': f'm{minute}'}, now=NOW + minute * 60)
+    now = NOW + 89 * 60
+    assert summary.summary('30m', now=now)['total_logs'] == 30
+    assert summary.summary('1h', now=now)['total_logs'] == 60
+    assert summary.summary('1h', now=now + 3600)['total_logs'] == 0
+    assert 'm29' not in summary.summary('1h', top_n=100, now=now)['top_sources']
+
+
+def test_ring_reuses_buckets_past_retention():
+    summary = RollingSummary(retention_minutes=10)
+    summary.update({'severity': 'ERROR', 'type': 'old'}, now=NOW)
+    # Minute 10 lands in the same slot as minute 0 and must reset it
+    summary.update({'severity': 'INFO'}, now=NOW + 600)
+    result = summary.summary('1d', now=NOW + 600)
+    assert (result['total_logs'], result['error_count'], result['error_types']) == (1, 0, {})
+
+
+def test_hourly_totals():
+    summary = RollingSummary()
+    summary.update_many([{'severity': 'ERROR'}] * 2, now=NOW - 1)
+    summary.update_many([{'severity': 'WARNING'}] * 3, now=NOW + 120)
+    hours = summary.hourly(hours=3, now=NOW + 300)
+
+    assert [h['hour'] for h in hours] == [NOW - 7200, NOW - 3600, NOW]
+    assert [(h['total_logs'], h['error_count'], h['warning_count']) for h in hours] == [
+        (0, 0, 0), (2, 2, 0), (3, 0, 3)]
@@ -0,0 +1,93 @@
+import re
+import random
+import pytest
+from pattern_matcher import PatternSet, literal_alternatives, required_literal, trie_regex
+
+PATTERNS = {
+    'keywords': r'error|failed|denied',
+    'segfault': r'segfault\w*\s+at\s+\d+',
+    'auth': r'authentication failure for user (\w+)',
+    'ip': r'\b(\d{1,3}(?:\.\d{1,3}){3})\b',
+    'oom': r'Out of memory: Killed process (\d+)',
+    'verbose': r'''(?x) kernel: \s+ panic   # the literal is "kernel:panic" only
+                   \s+ (\w+)''',
+    'overlap': r'fail',
+}
+
+WORDS = ['error', 'failed', 'fail', 'denied', 'segfault', 'segfaults', 'at', '42', 'authentication',
+         'failure', 'for', 'user', 'root', '10.0.0.7', '300.1.2.3', 'Out', 'of', 'memory:', 'Killed',
+         'process', '1234', 'kernel:', 'panic', 'cpu0', 'ERROR', 'Failed', 'sshd[22]:', 'ok']
+
+
+def corpus(count=2000, seed=11):
+    rng = random.Random(seed)
+    lines = [' '.join(rng.choice(WORDS) for _ in range(rng.randrange(1, 12))) for _ in range(count)]
+    return lines + [
+        'kernel: panic cpu0', 'kernel:   panic   cpu1', 'kernel:panic cpu0',
+        'authentication failure for user admin from 10.1.2.3',
+        'app segfault at 7 ip 0000', 'Out of memory: Killed process 99 (java)', '',
+    ]
+
+
+@pytest.mark.parametrize('flags', [0, re.IGNORECASE])
+def test_findall_matches_re(flags):
+    patterns = PatternSet(PATTERNS, flags=flags)
+    compiled = {name: re.compile(pattern, flags) for name, pattern in PATTERNS.items()}
+    for line in corpus():
+        assert patterns.findall(line) == {name: c.findall(line) for name, c in compiled.items()}, line
+
+
+@pytest.mark.parametrize('flags', [0, re.IGNORECASE])
+def test_matching_and_search_any_match_re(flags):
+    patterns = PatternSet(PATTERNS, flags=flags)
+    compiled = {name: re.compile(pattern, flags) for name, pattern in PATTERNS.items()}
+    for line in corpus():
+        expected = [name for name, c in compiled.items() if c.search(line)]
+        assert patterns.matching(line) == expected, line
+        assert (patterns.search_any(line) is None) == (not expected), line
+
+
+def test_search_any_returns_leftmost_pattern():
+    patterns = PatternSet({'late': r'denied', 'early': r'\d+ errors'})
+    assert patterns.search_any('3 errors then denied') == 'early'
+
+
+def test_verbose_patterns_are_not_prefiltered():
+    assert required_literal(r'(?x) kernel: \s+ panic') is None
+    verbose = r'kernel:   panic \s+ (\w+)'
+    patterns = PatternSet({'verbose': verbose}, flags=re.VERBOSE)
+    assert patterns.unfiltered == ['verbose']
+    assert patterns.findall('kernel:panic cpu0') == {'verbose': ['cpu0']}
+
+
+def test_explicit_keywords_prefilter_verbose_patterns():
+    patterns = PatternSet({'verbose': r'(?x) kernel: \s* panic'}, keywords={'verbose': ['panic']})
+    assert patterns.unfiltered == []
+    assert patterns.matching('kernel:panic') == ['verbose']
+    assert patterns.matching('kernel: oops') == []
+
+
+def test_literal_extraction():
+    assert literal_alternatives('error|failed') == ['error', 'failed']
+    assert literal_alternatives(r'error\d|failed') is None
+    assert required_literal(r'segfault\w*\s+\d+') == 'segfault'
+    assert required_literal(r'(?i)segfault') is None
+    assert required_literal(r'(a|b)c') is None
+    assert re.fullmatch(trie_regex(['fail', 'failed', 'error']), 'failed')
+
+
+
+@pytest.mark.parametrize('pattern, literal', [
+    (r'back\x64oor', 'backdoor'),
+    (r'back\u0064oor', 'backdoor'),
+    (r'back\U00000064oor', 'backdoor'),
+    (r'back\N{LATIN SMALL LETTER D}oor', 'backdoor'),
+    (r'nul\0byte', 'nul\0byte'),
+    (r'(\w+) said \1 twice', ' said '),
+    (r'port\d+open', 'port'),
+])
+def test_escapes_are_read_as_the_characters_they_match(pattern, literal):
+    assert required_literal(pattern) == literal
+    patterns = PatternSet({'rule': pattern})
+    for line in ('found backdoor', 'nul\0byte', 'ab said ab twice', 'port22open', 'nothing here'):
+        assert patterns.findall(line) == {'rule': re.findall(pattern, line)}, line
@@ -13,11 +13,13 @@ import smtplib
 from email.mime.text import MIMEText
 from pathlib import Path
 import hashlib
+from incremental_backup import IncrementalBackup
 
 class BackupManager:
     def __init__(self, config_path='config.yaml'):
         self.load_config(config_path)
         self.setup_logging()
+        self.last_run_stats = {}
         
     def load_config(self, config_path):
         with open(config_path, 'r') as f:
@@ -43,40 +45,76 @@ class BackupManager:
                 if dest['enabled']:
                     self._backup_to_destination(dest, backup_name, backup_type)
                     
-            self.validate_backup(backup_name)
-            self.send_notification(f"Backup {backup_name} completed successfully")
+            if not self.validate_backup(backup_name):
+                raise RuntimeError(f"Validation of {backup_name} failed")
+            summary = '; '.join(
+                f"{path}: scanned {stats['bytes_scanned']} of {stats['bytes_total']} bytes, "
+                f"wrote {stats['bytes_written']}"
+                for path, stats in self.last_run_stats.items()
+            )
+            self.send_notification(f"Backup {backup_name} completed successfully. {summary}")
             
         except Exception as e:
             self.logger.error(f"Backup failed: {str(e)}")
             self.send_notification(f"Backup failed: {str(e)}", is_error=True)
 
     def _backup_to_destination(self, dest, backup_name, backup_type):
-        if dest['type'] == 'local':
+        if dest['type'] in ('local', 'nas'):
+            # A NAS destination is a mounted path and is written like a local one
             self._local_backup(dest['path'], backup_name, backup_type)
         elif dest['type'] == 's3':
             self._s3_backup(dest, backup_name, backup_type)
         # Add other destination handlers here
 
+    def _engine(self, dest_path):
+        backup_config = self.config['backup']
+        compression = backup_config.get('compression', {})
+        return IncrementalBackup(
+            dest_path,
+            compression_level=compression.get('level', 6) if compression.get('enabled', True) else 0,
+            workers=backup_config.get('workers'),
+            exclude=backup_config.get('exclude', [])
+        )
+
+    def _local_destinations(self):
+        return [dest['path'] for dest in self.config['backup']['destinations']
+                if dest['enabled'] and dest['type'] in ('local', 'nas')]
+
     def _local_backup(self, dest_path, backup_name, backup_type):
-        backup_path = os.path.join(dest_path, backup_name)
-        os.makedirs(backup_path, exist_ok=True)
-        
-        if backup_type == 'full':
-            self._perform_full_backup(backup_path)
-        else:
-            self._perform_incremental_backup(backup_path)
+        manifest = self._engine(dest_path).backup(
+            self.config['backup']['sources'], backup_name, full=backup_type == 'full'
+        )
+        self.last_run_stats[dest_path] = manifest['stats']
+        self.logger.info(
+            f"{dest_path}: scanned {manifest['stats']['bytes_scanned']} of {manifest['stats']['bytes_total']} bytes, "
+            f"wrote {manifest['stats']['bytes_written']} bytes"
+        )
 
     def validate_backup(self, backup_name):
         """Validate the integrity of the backup"""
         self.logger.info(f"Validating backup: {backup_name}")
-        # Add validation logic here
-        return True
+        valid = True
+        for dest_path in self._local_destinations():
+            result = self._engine(dest_path).verify(backup_name)
+            for path in result['missing']:
+                self.logger.error(f"{dest_path}/{backup_name}: object for {path} is missing")
+            for digest, problem in result['corrupt']:
+                self.logger.error(f"{dest_path}/{backup_name}: object {digest} is corrupt ({problem})")
+            self.logger.info(f"{dest_path}/{backup_name}: verified {result['objects']} objects")
+            valid = valid and result['valid']
+        return valid
 
     def restore(self, backup_name, restore_path):
         """Restore from a backup"""
         try:
             self.logger.info(f"Starting restoration from backup: {backup_name}")
-            # Add restoration logic here
+            for dest_path in self._local_destinations():
+                if os.path.exists(os.path.join(dest_path, backup_name, 'manifest.json')):
+                    restored = self._engine(dest_path).restore(backup_name, restore_path)
+                    self.logger.info(f"Restored {restored} files from {dest_path}/{backup_name}")
+                    break
+            else:
+                raise FileNotFoundError(f"No local destination holds backup {backup_name}")
             self.send_notification(f"Restore from {backup_name} completed successfully")
         except Exception as e:
             self.logger.error(f"Restore failed: {str(e)}")
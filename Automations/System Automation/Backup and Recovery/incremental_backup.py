@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+
+import os
+import gzip
+import json
+import stat
+import time
+import shutil
+import sqlite3
+import hashlib
+import logging
+import fnmatch
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+READ_SIZE = 1024 * 1024
+BATCH_FILES = 64
+BATCH_BYTES = 64 * 1024 * 1024
+# Files modified this close to the scan may change again within the same
+# mtime tick, so their index entry is not trusted on the next run
+RACY_SECONDS = 2.0
+
+logger = logging.getLogger('BackupManager.Incremental')
+
+
+class FileIndex:
+    """Persistent path -> (mtime, size, inode, sha256) index of the last backed-up state
+
+    A file whose mtime, size and inode all match its row is taken to be
+    unchanged, and its hash is reused without reading it.
+    """
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db = sqlite3.connect(db_path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, inode INTEGER, sha256 TEXT)"
+        )
+
+    def load(self) -> Dict[str, Tuple[int, int, int, str]]:
+        rows = self.db.execute("SELECT path, mtime_ns, size, inode, sha256 FROM files")
+        return {row[0]: row[1:] for row in rows}
+
+    def update(self, rows: Iterable[Tuple[str, int, int, int, str]]):
+        self.db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)", rows)
+
+    def remove(self, paths: Iterable[str]):
+        self.db.executemany("DELETE FROM files WHERE path = ?", ((path,) for path in paths))
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+
+def object_path(objects_dir: str, digest: str) -> str:
+    return os.path.join(objects_dir, digest[:2], digest + '.gz')
+
+
+def _store_one(path: str, objects_dir: str, level: int) -> Dict:
+    before = os.stat(path)
+    digest = hashlib.sha256()
+    read = 0
+    handle, temp_path = tempfile.mkstemp(dir=objects_dir, suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=level, mtime=0) as out:
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(READ_SIZE), b''):
+                    digest.update(block)
+                    out.write(block)
+                    read += len(block)
+        sha256 = digest.hexdigest()
+        target = object_path(objects_dir, sha256)
+        written = 0
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            written = os.path.getsize(temp_path)
+            os.replace(temp_path, target)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    after = os.stat(path)
+    return {
+        'path': path,
+        'sha256': sha256,
+        'size': after.st_size,
+        'mtime_ns': after.st_mtime_ns,
+        'inode': after.st_ino,
+        'read': read,
+        'written': written,
+        'stable': (before.st_mtime_ns, before.st_size) == (after.st_mtime_ns, after.st_size),
+    }
+
+
+def store_files(paths: List[str], objects_dir: str, level: int) -> List[Dict]:
+    """Hash and compress a batch of files into the object store (runs in a worker process)
+
+    Each file is read once: the SHA-256 and the gzip stream are fed from the
+    same buffer, and the compressed copy is only kept when no object with
+    that hash exists yet.
+    """
+    results = []
+    for path in paths:
+        try:
+            results.append(_store_one(path, objects_dir, level))
+        except OSError as e:
+            results.append({'path': path, 'error': str(e)})
+    return results
+
+
+def verify_objects(paths_and_hashes: List[Tuple[str, str, int]]) -> List[Tuple[str, str]]:
+    """Decompress and re-hash a batch of objects; return (sha256, problem) for each bad one"""
+    failures = []
+    for path, sha256, size in paths_and_hashes:
+        digest = hashlib.sha256()
+        length = 0
+        try:
+            with gzip.open(path, 'rb') as f:
+                for block in iter(lambda: f.read(READ_SIZE), b''):
+                    digest.update(block)
+                    length += len(block)
+        except (OSError, EOFError, gzip.BadGzipFile) as e:
+            failures.append((sha256, str(e)))
+            continue
+        if digest.hexdigest() != sha256:
+            failures.append((sha256, 'checksum mismatch'))
+        elif length != size:
+            failures.append((sha256, f'size {length} != {size}'))
+    return failures
+
+
+def restore_files(entries: List[Dict], objects_dir: str, target: str) -> int:
+    restored = 0
+    for entry in entries:
+        path = os.path.join(target, entry['path'])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with gzip.open(object_path(objects_dir, entry['sha256']), 'rb') as src, open(path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, READ_SIZE)
+        os.chmod(path, entry['mode'])
+        os.utime(path, ns=(entry['mtime_ns'], entry['mtime_ns']))
+        restored += 1
+    return restored
+
+
+def _batches(items: Iterable, size_of, max_items: int = BATCH_FILES, max_bytes: int = BATCH_BYTES) -> Iterator[List]:
+    batch, total = [], 0
+    for item in items:
+        batch.append(item)
+        total += size_of(item)
+        if len(batch) >= max_items or total >= max_bytes:
+            yield batch
+            batch, total = [], 0
+    if batch:
+        yield batch
+
+
+class RunStats:
+    """What one backup run looked at versus what it actually read and wrote"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.files = 0
+        self.files_changed = 0
+        self.files_failed = 0
+        self.bytes_total = 0
+        self.bytes_scanned = 0
+        self.bytes_written = 0
+        self.objects_reused = 0
+
+    def to_dict(self) -> Dict:
+        return {
+            'files': self.files,
+            'files_changed': self.files_changed,
+            'files_failed': self.files_failed,
+            'bytes_total': self.bytes_total,
+            'bytes_scanned': self.bytes_scanned,
+            'bytes_written': self.bytes_written,
+            'objects_reused': self.objects_reused,
+            'seconds': round(time.time() - self.started_at, 3),
+        }
+
+    def summary(self) -> str:
+        return (f"{self.files} files ({self.bytes_total / 1048576:.1f} MB), {self.files_changed} changed; "
+                f"scanned {self.bytes_scanned / 1048576:.1f} MB, wrote {self.bytes_written / 1048576:.1f} MB")
+
+
+class IncrementalBackup:
+    """Content-addressed local backups driven by a persistent file index
+
+    Layout under dest_path:
+
+        objects/ab/abcdef....gz      one gzip'd copy per distinct file content
+        <backup_name>/manifest.json  every file in the backup with its hash
+        index.sqlite                 FileIndex of the last run
+
+    Each run walks the sources and stats every file, but only files whose
+    mtime, size or inode differ from the index are read; they are hashed
+    and compressed in batches on a process pool. Unchanged files are
+    recorded in the manifest with their indexed hash, so every backup is a
+    complete listing that restores on its own. A full backup ignores the
+    index and re-reads everything.
+    """
+
+    def __init__(self, dest_path: str, index_path: Optional[str] = None, compression_level: int = 6,
+                 workers: Optional[int] = None, exclude: Optional[List[str]] = None):
+        self.dest_path = dest_path
+        self.objects_dir = os.path.join(dest_path, 'objects')
+        self.index_path = index_path or os.path.join(dest_path, 'index.sqlite')
+        self.compression_level = compression_level
+        self.workers = workers or os.cpu_count() or 1
+        self.exclude = exclude or []
+
+    def _excluded(self, path: str) -> bool:
+        name = os.path.basename(path)
+        return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(path, pattern) for pattern in self.exclude)
+
+    def scan(self, sources: List[str]) -> Iterator[Tuple[str, str, os.stat_result]]:
+        """(absolute path, manifest path, lstat) for every file and symlink under sources"""
+        for source in sources:
+            source = os.path.abspath(source)
+            if not os.path.exists(source):
+                logger.warning(f"Source {source} does not exist, skipping")
+                continue
+            base = os.path.dirname(source.rstrip(os.sep)) or os.sep
+            pending = [source]
+            while pending:
+                directory = pending.pop()
+                try:
+                    entries = list(os.scandir(directory))
+                except OSError as e:
+                    logger.warning(f"Cannot read {directory}: {e}")
+                    continue
+                for entry in entries:
+                    if self._excluded(entry.path):
+                        continue
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if stat.S_ISDIR(st.st_mode):
+                        pending.append(entry.path)
+                    elif stat.S_ISREG(st.st_mode) or stat.S_ISLNK(st.st_mode):
+                        yield entry.path, os.path.relpath(entry.path, base), st
+
+    def backup(self, sources: List[str], backup_name: str, full: bool = False) -> Dict:
+        os.makedirs(self.objects_dir, exist_ok=True)
+        stats = RunStats()
+        index = FileIndex(self.index_path)
+        known = index.load()
+        seen = set()
+        files: Dict[str, Dict] = {}
+        changed: List[Tuple[str, int]] = []
+
+        for path, name, st in self.scan(sources):
+            seen.add(path)
+            stats.files += 1
+            if stat.S_ISLNK(st.st_mode):
+                files[path] = {'path': name, 'link': os.readlink(path)}
+                continue
+            stats.bytes_total += st.st_size
+            files[path] = {'path': name, 'size': st.st_size, 'mode': stat.S_IMODE(st.st_mode),
+                           'mtime_ns': st.st_mtime_ns}
+            row = None if full else known.get(path)
+            if row and row[:3] == (st.st_mtime_ns, st.st_size, st.st_ino) \
+                    and os.path.exists(object_path(self.objects_dir, row[3])):
+                files[path]['sha256'] = row[3]
+                stats.objects_reused += 1
+            else:
+                changed.append((path, st.st_size))
+
+        racy = stats.started_at - RACY_SECONDS
+        rows = []
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = [
+                pool.submit(store_files, [path for path, _ in batch], self.objects_dir, self.compression_level)
+                for batch in _batches(changed, lambda item: item[1])
+            ]
+            for future in as_completed(futures):
+                for result in future.result():
+                    path = result['path']
+                    if 'error' in result:
+                        logger.warning(f"Skipping {path}: {result['error']}")
+                        stats.files_failed += 1
+                        files.pop(path, None)
+                        continue
+                    stats.files_changed += 1
+                    stats.bytes_scanned += result['read']
+                    stats.bytes_written += result['written']
+                    if not result['written']:
+                        stats.objects_reused += 1
+                    # The stored object holds what was read, even if the file grew or shrank since
+                    files[path].update(sha256=result['sha256'], size=result['read'], mtime_ns=result['mtime_ns'])
+                    if not result['stable']:
+                        logger.warning(f"{path} changed while it was being backed up")
+                    elif result['mtime_ns'] / 1e9 < racy:
+                        rows.append((path, result['mtime_ns'], result['size'], result['inode'], result['sha256']))
+
+        index.update(rows)
+        index.remove(path for path in known if path not in seen)
+        manifest = {
+            'name': backup_name,
+            'type': 'full' if full else 'incremental',
+            'created': stats.started_at,
+            'sources': [os.path.abspath(source) for source in sources],
+            'files': sorted(files.values(), key=lambda entry: entry['path']),
+            'stats': stats.to_dict(),
+        }
+        backup_path = os.path.join(self.dest_path, backup_name)
+        os.makedirs(backup_path, exist_ok=True)
+        with open(os.path.join(backup_path, 'manifest.json.tmp'), 'w') as f:
+            json.dump(manifest, f)
+        os.replace(os.path.join(backup_path, 'manifest.json.tmp'), os.path.join(backup_path, 'manifest.json'))
+        # Commit the index only once the manifest referencing its hashes exists
+        index.close()
+        logger.info(f"Backup {backup_name}: {stats.summary()}")
+        return manifest
+
+    def load_manifest(self, backup_name: str) -> Dict:
+        with open(os.path.join(self.dest_path, backup_name, 'manifest.json')) as f:
+            return json.load(f)
+
+    def verify(self, backup_name: str) -> Dict:
+        """Re-hash every object the manifest references, in parallel; report missing and corrupt ones"""
+        manifest = self.load_manifest(backup_name)
+        objects = {}
+        missing = []
+        for entry in manifest['files']:
+            if 'sha256' not in entry or entry['sha256'] in objects:
+                continue
+            path = object_path(self.objects_dir, entry['sha256'])
+            if not os.path.exists(path):
+                missing.append(entry['path'])
+                continue
+            objects[entry['sha256']] = (path, entry['sha256'], entry['size'])
+        corrupt = []
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = [
+                pool.submit(verify_objects, batch)
+                for batch in _batches(objects.values(), lambda item: item[2])
+            ]
+            for future in as_completed(futures):
+                corrupt.extend(future.result())
+        return {'objects': len(objects), 'missing': missing, 'corrupt': corrupt,
+                'valid': not missing and not corrupt}
+
+    def restore(self, backup_name: str, target: str) -> int:
+        manifest = self.load_manifest(backup_name)
+        target = os.path.abspath(target)
+        regular = []
+        for entry in manifest['files']:
+            path = os.path.abspath(os.path.join(target, entry['path']))
+            if os.path.commonpath([target, path]) != target:
+                raise ValueError(f"Refusing to restore outside {target}: {entry['path']}")
+            if 'link' in entry:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if os.path.lexists(path):
+                    os.remove(path)
+                os.symlink(entry['link'], path)
+            else:
+                regular.append(entry)
+        restored = 0
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = [
+                pool.submit(restore_files, batch, self.objects_dir, target)
+                for batch in _batches(regular, lambda entry: entry['size'])
+            ]
+            for future in as_completed(futures):
+                restored += future.result()
+        return restored
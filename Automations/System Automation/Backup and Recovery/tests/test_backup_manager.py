@@ -0,0 +1,53 @@
+import os
+import time
+import pytest
+import yaml
+
+pytest.importorskip('schedule')
+from backup_manager import BackupManager
+
+OLD = time.time() - 3600
+
+
+@pytest.fixture
+def manager(tmp_path):
+    source = tmp_path / 'etc'
+    source.mkdir()
+    (source / 'hosts').write_text('127.0.0.1 localhost\n')
+    os.utime(str(source / 'hosts'), (OLD, OLD))
+    config = {
+        'backup': {
+            'sources': [str(source)],
+            'workers': 1,
+            'destinations': [
+                {'type': 'local', 'path': str(tmp_path / 'local'), 'enabled': True},
+                {'type': 'nas', 'path': str(tmp_path / 'nas'), 'enabled': True},
+                {'type': 's3', 'bucket': 'unused', 'enabled': False},
+            ],
+        },
+        'logging': {'level': 'INFO', 'file': str(tmp_path / 'backup.log')},
+        'notification': {'email': {'enabled': False}},
+    }
+    config_path = tmp_path / 'config.yaml'
+    config_path.write_text(yaml.safe_dump(config))
+    return BackupManager(str(config_path))
+
+
+def backup_name(path):
+    return next(name for name in os.listdir(path) if name.startswith('full_'))
+
+
+def test_backup_writes_local_and_nas_destinations(manager, tmp_path):
+    manager.create_backup('full')
+    for dest in ('local', 'nas'):
+        name = backup_name(str(tmp_path / dest))
+        assert os.path.exists(str(tmp_path / dest / name / 'manifest.json'))
+        assert manager.last_run_stats[str(tmp_path / dest)]['files'] == 1
+    assert manager.validate_backup(name)
+
+
+def test_restore_from_a_destination(manager, tmp_path):
+    manager.create_backup('full')
+    name = backup_name(str(tmp_path / 'local'))
+    manager.restore(name, str(tmp_path / 'restore'))
+    assert (tmp_path / 'restore' / 'etc' / 'hosts').read_text() == '127.0.0.1 localhost\n'
@@ -0,0 +1,137 @@
+import os
+import gzip
+import json
+import time
+import pytest
+from incremental_backup import FileIndex, IncrementalBackup, object_path, store_files
+
+# Old enough that the index trusts the files (see RACY_SECONDS)
+OLD = time.time() - 3600
+
+
+def write(path, content, mtime=OLD):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def source(tmp_path):
+    root = tmp_path / 'data'
+    write(str(root / 'a.txt'), b'alpha\n' * 1000)
+    write(str(root / 'sub' / 'b.bin'), os.urandom(200000))
+    write(str(root / 'sub' / 'copy.txt'), b'alpha\n' * 1000)
+    write(str(root / 'skip.tmp'), b'ignored')
+    os.symlink('a.txt', str(root / 'link'))
+    return str(root)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return IncrementalBackup(str(tmp_path / 'backup'), workers=2, exclude=['*.tmp'])
+
+
+def test_unchanged_files_are_not_read_again(engine, source):
+    first = engine.backup([source], 'full_1', full=True)['stats']
+    assert (first['files'], first['files_changed']) == (4, 3)
+    # copy.txt has the same content as a.txt, so only one object is written for both
+    assert first['objects_reused'] == 1
+
+    second = engine.backup([source], 'incr_1')['stats']
+    assert (second['files_changed'], second['bytes_scanned'], second['bytes_written']) == (0, 0, 0)
+    assert second['objects_reused'] == 3
+
+    write(os.path.join(source, 'a.txt'), b'changed\n')
+    third = engine.backup([source], 'incr_2')['stats']
+    assert (third['files_changed'], third['bytes_scanned']) == (1, len(b'changed\n'))
+
+    os.remove(os.path.join(source, 'sub', 'b.bin'))
+    engine.backup([source], 'incr_3')
+    index = FileIndex(engine.index_path)
+    assert not any(path.endswith('b.bin') for path in index.load())
+    index.close()
+
+
+def test_recent_files_are_not_indexed(engine, source):
+    write(os.path.join(source, 'fresh.log'), b'still being written', mtime=time.time())
+    engine.backup([source], 'incr_1')
+    assert engine.backup([source], 'incr_2')['stats']['files_changed'] == 1
+
+
+def test_full_backup_ignores_the_index(engine, source):
+    engine.backup([source], 'incr_1')
+    assert engine.backup([source], 'full_1', full=True)['stats']['files_changed'] == 3
+
+
+def test_manifest_lists_every_file(engine, source):
+    manifest = engine.backup([source], 'full_1', full=True)
+    entries = {entry['path']: entry for entry in manifest['files']}
+    assert set(entries) == {'data/a.txt', 'data/link', 'data/sub/b.bin', 'data/sub/copy.txt'}
+    assert entries['data/link'] == {'path': 'data/link', 'link': 'a.txt'}
+    assert entries['data/sub/b.bin']['size'] == 200000
+    assert entries['data/a.txt']['sha256'] == entries['data/sub/copy.txt']['sha256']
+    with open(os.path.join(engine.dest_path, 'full_1', 'manifest.json')) as f:
+        assert json.load(f)['files'] == manifest['files']
+
+
+def test_stored_size_is_what_was_read(tmp_path):
+    path = str(tmp_path / 'file')
+    write(path, b'x' * 5000)
+    objects = str(tmp_path / 'objects')
+    os.makedirs(objects)
+    result, = store_files([path], objects, 6)
+    with gzip.open(object_path(objects, result['sha256'])) as f:
+        assert len(f.read()) == result['read'] == 5000
+    assert store_files([str(tmp_path / 'missing')], objects, 6)[0]['error']
+
+
+def test_verify_reports_missing_and_corrupt_objects(engine, source):
+    manifest = engine.backup([source], 'full_1', full=True)
+    result = engine.verify('full_1')
+    assert (result['objects'], result['valid']) == (2, True)
+
+    digests = {entry['path']: entry['sha256'] for entry in manifest['files'] if 'sha256' in entry}
+    with gzip.open(object_path(engine.objects_dir, digests['data/a.txt']), 'wb') as f:
+        f.write(b'tampered')
+    os.remove(object_path(engine.objects_dir, digests['data/sub/b.bin']))
+
+    result = engine.verify('full_1')
+    assert not result['valid']
+    assert result['missing'] == ['data/sub/b.bin']
+    assert result['corrupt'] == [(digests['data/a.txt'], 'checksum mismatch')]
+
+
+def test_restore_round_trip(engine, source, tmp_path):
+    os.chmod(os.path.join(source, 'sub', 'b.bin'), 0o600)
+    engine.backup([source], 'full_1', full=True)
+    write(os.path.join(source, 'a.txt'), b'newer\n')
+    engine.backup([source], 'incr_1')
+
+    target = str(tmp_path / 'restore')
+    assert engine.restore('full_1', target) == 3
+    restored = os.path.join(target, 'data')
+    with open(os.path.join(restored, 'a.txt'), 'rb') as f:
+        assert f.read() == b'alpha\n' * 1000
+    with open(os.path.join(source, 'sub', 'b.bin'), 'rb') as original, \
+            open(os.path.join(restored, 'sub', 'b.bin'), 'rb') as copy:
+        assert copy.read() == original.read()
+    assert os.stat(os.path.join(restored, 'sub', 'b.bin')).st_mode & 0o777 == 0o600
+    assert os.stat(os.path.join(restored, 'a.txt')).st_mtime == pytest.approx(OLD)
+    assert os.readlink(os.path.join(restored, 'link')) == 'a.txt'
+
+    engine.restore('incr_1', target)
+    with open(os.path.join(restored, 'a.txt'), 'rb') as f:
+        assert f.read() == b'newer\n'
+
+
+def test_restore_refuses_paths_outside_the_target(engine, source, tmp_path):
+    engine.backup([source], 'full_1', full=True)
+    manifest_path = os.path.join(engine.dest_path, 'full_1', 'manifest.json')
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    manifest['files'][0]['path'] = '../escape.txt'
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f)
+    with pytest.raises(ValueError):
+        engine.restore('full_1', str(tmp_path / 'restore'))
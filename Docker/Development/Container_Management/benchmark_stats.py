@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Benchmark for the streaming container stats collector
+
+Uses a fake Docker client whose containers answer stats(stream=False)
+after about a second, as the daemon does while it samples CPU twice, and
+stream one frame per second with stats(stream=True). Compares the old
+serial one-shot loop with StatsCollector for a table refresh and for
+repeated reads of the cache.
+
+    python benchmark_stats.py --containers 200
+"""
+
+import time
+import random
+import argparse
+import threading
+
+from stats_collector import StatsCollector
+
+
+class FakeContainer:
+    def __init__(self, n, frame_seconds):
+        self.id = f'{n:012x}' + '0' * 52
+        self.short_id = self.id[:12]
+        self.name = f'app-{n}'
+        self.frame_seconds = frame_seconds
+        self.rng = random.Random(n)
+        self.cpu = self.system = self.rx = self.read = 0
+
+    def _frame(self):
+        self.cpu += self.rng.randint(10 ** 7, 10 ** 8)
+        self.system += 10 ** 9
+        self.rx += self.rng.randint(0, 10 ** 6)
+        self.read += self.rng.randint(0, 10 ** 5)
+        return {
+            'cpu_stats': {'cpu_usage': {'total_usage': self.cpu}, 'system_cpu_usage': self.system, 'online_cpus': 2},
+            'memory_stats': {'usage': 300 * 2 ** 20, 'limit': 2 ** 30, 'stats': {'inactive_file': 20 * 2 ** 20}},
+            'networks': {'eth0': {'rx_bytes': self.rx, 'tx_bytes': self.rx // 2},
+                         'eth1': {'rx_bytes': self.rx // 4, 'tx_bytes': 0}},
+            'blkio_stats': {'io_service_bytes_recursive': [{'op': 'read', 'value': self.read},
+                                                           {'op': 'write', 'value': self.read // 3}]},
+        }
+
+    def stats(self, stream=True, decode=False):
+        if not stream:
+            time.sleep(self.frame_seconds)
+            return self._frame()
+        return self._stream()
+
+    def _stream(self):
+        while True:
+            yield self._frame()
+            time.sleep(self.frame_seconds)
+
+
+class FakeContainers:
+    def __init__(self, containers):
+        self.containers = containers
+
+    def list(self):
+        return list(self.containers)
+
+
+class FakeClient:
+    def __init__(self, containers):
+        self.containers = FakeContainers(containers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--containers', type=int, default=200)
+    parser.add_argument('--frame-seconds', type=float, default=1.0)
+    parser.add_argument('--sample', type=int, default=10, help='containers to time serially before extrapolating')
+    args = parser.parse_args()
+
+    containers = [FakeContainer(n, args.frame_seconds) for n in range(args.containers)]
+    print(f"{args.containers} containers, one stats frame per {args.frame_seconds:.1f}s")
+
+    start = time.perf_counter()
+    for container in containers[:args.sample]:
+        container.stats(stream=False)
+    serial = (time.perf_counter() - start) * args.containers / args.sample
+    print(f"{'Serial stats(stream=False)':<30} {serial:8.2f}s per refresh (extrapolated from {args.sample})")
+
+    collector = StatsCollector(FakeClient(containers))
+    start = time.perf_counter()
+    collector.start()
+    ready = collector.wait_ready(timeout=10 * args.frame_seconds)
+    print(f"{'StatsCollector first table':<30} {time.perf_counter() - start:8.2f}s  "
+          f"(all ready: {ready}, {threading.active_count()} threads)")
+
+    start = time.perf_counter()
+    for _ in range(100):
+        rows = collector.snapshot()
+    print(f"{'Cached table refresh':<30} {(time.perf_counter() - start) / 100 * 1000:8.2f}ms  {len(rows)} rows")
+
+    start = time.perf_counter()
+    text = collector.prometheus_text()
+    print(f"{'Prometheus scrape':<30} {(time.perf_counter() - start) * 1000:8.2f}ms  {len(text.splitlines())} lines")
+
+    time.sleep(3 * args.frame_seconds)
+    depth = min(len(collector.history_for(c.id)) for c in containers)
+    print(f"{'History after 3 more frames':<30} {depth:8d} samples per container (minimum)")
+    collector.stop()
+
+
+if __name__ == '__main__':
+    main()
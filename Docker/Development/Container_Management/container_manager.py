@@ -2,14 +2,18 @@
 
 import os
 import sys
+import time
 import click
 import docker
 import boto3
 import yaml
 from rich.console import Console
 from rich.table import Table
+from rich.live import Live
 from dotenv import load_dotenv
 from datetime import datetime
+from stats_collector import StatsCollector, format_bytes
+from ecs_topology import EcsTopologyLoader
 
 # Load environment variables
 load_dotenv()
@@ -30,6 +34,8 @@ class ContainerManager:
         self.docker_client = docker_client
         self.ecs_client = ecs_client
         self.ecr_client = ecr_client
+        self._stats = None
+        self.ecs_topology = EcsTopologyLoader(self.ecs_client)
 
     def list_local_containers(self):
         """List all local Docker containers"""
@@ -49,22 +55,22 @@ class ContainerManager:
             )
         console.print(table)
 
-    def list_ecs_clusters(self):
+    def list_ecs_clusters(self, refresh=False):
         """List ECS clusters"""
         table = Table(title="AWS ECS Clusters")
         table.add_column("Cluster Name", style="cyan")
         table.add_column("Status", style="yellow")
         table.add_column("Active Services", style="green")
+        table.add_column("Running Tasks", style="blue")
+        table.add_column("Pending Tasks", style="magenta")
 
-        clusters = self.ecs_client.list_clusters()['clusterArns']
-        for cluster in clusters:
-            cluster_name = cluster.split('/')[-1]
-            details = self.ecs_client.describe_clusters(clusters=[cluster])['clusters'][0]
-            services = len(self.ecs_client.list_services(cluster=cluster_name)['serviceArns'])
+        for row in self.ecs_topology.summary(refresh=refresh):
             table.add_row(
-                cluster_name,
-                details['status'],
-                str(services)
+                row['cluster_name'],
+                row['status'],
+                str(row['active_services']),
+                str(row['running_tasks']),
+                str(row['pending_tasks'])
             )
         console.print(table)
 
@@ -102,6 +108,7 @@ class ContainerManager:
                     }
                 }
             )
+            self.ecs_topology.invalidate(cluster_name)
             console.print(f"[green]Deployed task to ECS cluster {cluster_name}")
             return response
         except Exception as e:
@@ -130,43 +137,65 @@ class ContainerManager:
         except Exception as e:
             console.print(f"[red]Error pushing to ECR: {str(e)}")
 
-    def monitor_resources(self):
-        """Monitor container resources"""
+    def stats_collector(self):
+        """Start (once) the streaming stats collector shared by monitor and the metrics endpoint"""
+        if self._stats is None:
+            self._stats = StatsCollector(self.docker_client).start()
+        return self._stats
+
+    def _resource_table(self, rows):
         table = Table(title="Container Resource Usage")
         table.add_column("Container ID", style="cyan")
+        table.add_column("Name", style="green")
         table.add_column("CPU %", style="yellow")
         table.add_column("Memory Usage", style="green")
         table.add_column("Network I/O", style="blue")
+        table.add_column("Block I/O", style="magenta")
 
-        for container in self.docker_client.containers.list():
-            stats = container.stats(stream=False)
-            cpu_percent = self._calculate_cpu_percent(stats)
-            memory_usage = self._calculate_memory_usage(stats)
-            network_io = self._calculate_network_io(stats)
-
+        for row in rows:
+            limit = f" / {format_bytes(row['memory_limit'])}" if row['memory_limit'] else ""
             table.add_row(
-                container.short_id,
-                f"{cpu_percent:.2f}%",
-                memory_usage,
-                network_io
+                row['short_id'],
+                row['name'],
+                f"{row['cpu_percent']:.2f}%",
+                f"{format_bytes(row['memory_usage'])}{limit}",
+                f"↓{format_bytes(row['net_rx_bytes'])} ↑{format_bytes(row['net_tx_bytes'])}",
+                f"R {format_bytes(row['blk_read_bytes'])} W {format_bytes(row['blk_write_bytes'])}"
             )
-        console.print(table)
+        return table
 
-    def _calculate_cpu_percent(self, stats):
-        cpu_delta = stats["cpu_stats"]["cpu_usage"]["total_usage"] - \
-                    stats["precpu_stats"]["cpu_usage"]["total_usage"]
-        system_delta = stats["cpu_stats"]["system_cpu_usage"] - \
-                      stats["precpu_stats"]["system_cpu_usage"]
-        return (cpu_delta / system_delta) * 100.0
+    def monitor_resources(self, watch=False, interval=2.0):
+        """Monitor container resources from the streaming stats cache"""
+        collector = self.stats_collector()
+        if not collector.wait_ready(timeout=5.0):
+            console.print("[yellow]Some containers have not reported stats yet")
+        if collector.skipped:
+            console.print(f"[yellow]{len(collector.skipped)} containers are over the stream limit "
+                          f"and not shown: {', '.join(sorted(collector.skipped.values()))}")
 
-    def _calculate_memory_usage(self, stats):
-        usage = stats["memory_stats"]["usage"]
-        return f"{usage / (1024*1024):.2f} MB"
+        if not watch:
+            console.print(self._resource_table(collector.snapshot()))
+            return
 
-    def _calculate_network_io(self, stats):
-        rx_bytes = stats["networks"]["eth0"]["rx_bytes"]
-        tx_bytes = stats["networks"]["eth0"]["tx_bytes"]
-        return f"↓{rx_bytes/(1024*1024):.2f}MB ↑{tx_bytes/(1024*1024):.2f}MB"
+        with Live(self._resource_table(collector.snapshot()), console=console, refresh_per_second=4) as live:
+            try:
+                while True:
+                    time.sleep(interval)
+                    live.update(self._resource_table(collector.snapshot()))
+            except KeyboardInterrupt:
+                collector.stop()
+
+    def serve_metrics(self, host='0.0.0.0', port=9417):
+        """Expose container stats in Prometheus format on /metrics"""
+        collector = self.stats_collector()
+        server = collector.serve_metrics(host, port)
+        console.print(f"[green]Serving container metrics on http://{host}:{port}/metrics")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+            collector.stop()
 
 @click.group()
 def cli():
@@ -210,10 +239,20 @@ def push_ecr(image_name, repository_name):
     manager.push_to_ecr(image_name, repository_name)
 
 @cli.command()
-def monitor():
+@click.option('--watch', is_flag=True, help='Keep refreshing the table')
+@click.option('--interval', default=2.0, help='Refresh interval in seconds when watching')
+def monitor(watch, interval):
     """Monitor container resources"""
     manager = ContainerManager()
-    manager.monitor_resources()
+    manager.monitor_resources(watch, interval)
+
+@cli.command()
+@click.option('--host', default='0.0.0.0')
+@click.option('--port', default=9417)
+def serve_metrics(host, port):
+    """Serve container stats for Prometheus"""
+    manager = ContainerManager()
+    manager.serve_metrics(host, port)
 
 if __name__ == '__main__':
     cli()
@@ -0,0 +1,180 @@
+"""
+Batched, cached ECS cluster -> service -> task topology
+"""
+import time
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Largest batch each describe call accepts
+DESCRIBE_CLUSTERS_BATCH = 100
+DESCRIBE_SERVICES_BATCH = 10
+DESCRIBE_TASKS_BATCH = 100
+
+
+def _chunks(items: List, size: int) -> Iterator[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _name(arn: str) -> str:
+    return arn.split('/')[-1]
+
+
+class EcsTopologyLoader:
+    """Loads every cluster with its services and tasks in as few ECS calls as the API allows
+
+    list_clusters, list_services and list_tasks are paginated to the end.
+    describe_clusters, describe_services and describe_tasks are called with
+    full batches of 100, 10 and 100. Clusters are loaded concurrently. Tasks
+    are listed once per cluster and attached to their service through the
+    task's group ('service:<name>'), rather than listed per service. The
+    tree is cached per cluster for ttl seconds. Callers that change a
+    cluster invalidate it, so the next read fetches that cluster again and
+    none of the others.
+    """
+
+    def __init__(self, ecs_client, max_workers: int = 8, ttl: float = 60.0,
+                 include_tasks: bool = True, clock=time.monotonic):
+        self.ecs_client = ecs_client
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self.include_tasks = include_tasks
+        self.clock = clock
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._clusters: Dict[str, tuple] = {}
+        self._listed_at: Optional[float] = None
+
+    def _call(self, operation: str, **kwargs) -> Dict:
+        with self._lock:
+            self.calls[operation] += 1
+        return getattr(self.ecs_client, operation)(**kwargs)
+
+    def _paginate(self, operation: str, key: str, **kwargs) -> List[str]:
+        arns = []
+        # 100 is the largest page every ECS list call accepts (list_services defaults to 10)
+        for page in self.ecs_client.get_paginator(operation).paginate(PaginationConfig={'PageSize': 100}, **kwargs):
+            with self._lock:
+                self.calls[operation] += 1
+            arns.extend(page.get(key, []))
+        return arns
+
+    def _describe_services(self, cluster_arn: str, service_arns: List[str]):
+        services, failures = [], []
+        for batch in _chunks(service_arns, DESCRIBE_SERVICES_BATCH):
+            response = self._call('describe_services', cluster=cluster_arn, services=batch)
+            services.extend(response.get('services', []))
+            failures.extend(response.get('failures', []))
+        return services, failures
+
+    def _describe_tasks(self, cluster_arn: str, task_arns: List[str]):
+        tasks, failures = [], []
+        for batch in _chunks(task_arns, DESCRIBE_TASKS_BATCH):
+            response = self._call('describe_tasks', cluster=cluster_arn, tasks=batch)
+            tasks.extend(response.get('tasks', []))
+            failures.extend(response.get('failures', []))
+        return tasks, failures
+
+    def _load_cluster(self, cluster: Dict) -> Dict:
+        cluster_arn = cluster['clusterArn']
+        services, failures = self._describe_services(
+            cluster_arn, self._paginate('list_services', 'serviceArns', cluster=cluster_arn))
+        node = {
+            'cluster': cluster,
+            'services': {s['serviceName']: {'service': s, 'tasks': []} for s in services},
+            'standalone_tasks': [],
+            'failures': failures,
+        }
+        if self.include_tasks:
+            tasks, task_failures = self._describe_tasks(
+                cluster_arn, self._paginate('list_tasks', 'taskArns', cluster=cluster_arn))
+            node['failures'].extend(task_failures)
+            for task in tasks:
+                group = task.get('group', '')
+                service = node['services'].get(group[len('service:'):]) if group.startswith('service:') else None
+                (service['tasks'] if service is not None else node['standalone_tasks']).append(task)
+        return node
+
+    def _describe_clusters(self, cluster_arns: List[str]) -> List[Dict]:
+        clusters = []
+        for batch in _chunks(cluster_arns, DESCRIBE_CLUSTERS_BATCH):
+            response = self._call('describe_clusters', clusters=batch)
+            clusters.extend(response.get('clusters', []))
+            for failure in response.get('failures', []):
+                logger.warning(f"Could not describe cluster {failure.get('arn')}: {failure.get('reason')}")
+        return clusters
+
+    def _fresh(self, name: str, now: float) -> bool:
+        cached = self._clusters.get(name)
+        return cached is not None and cached[1] is not None and now - cached[1] < self.ttl
+
+    def load(self, clusters: Optional[List[str]] = None, refresh: bool = False) -> Dict[str, Dict]:
+        """{cluster name: {'cluster', 'services': {name: {'service', 'tasks'}}, 'standalone_tasks', 'failures'}}
+
+        Without `clusters` every cluster in the account is returned. Cached
+        clusters younger than ttl are not fetched again unless `refresh` is
+        set. Only the others are described, in batches.
+        """
+        now = self.clock()
+        with self._lock:
+            if clusters is not None:
+                names = [_name(c) for c in clusters]
+            elif refresh or self._listed_at is None or now - self._listed_at >= self.ttl:
+                names = None
+            else:
+                names = list(self._clusters)
+
+        listed = names is None
+        if listed:
+            names = [_name(arn) for arn in self._paginate('list_clusters', 'clusterArns')]
+        with self._lock:
+            fetch = [n for n in names if refresh or not self._fresh(n, now)]
+
+        described = self._describe_clusters(fetch) if fetch else []
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ecs-topology') as pool:
+            nodes = list(pool.map(self._load_cluster, described))
+
+        with self._lock:
+            for name in fetch:
+                self._clusters.pop(name, None)
+            for node in nodes:
+                self._clusters[node['cluster']['clusterName']] = (node, now)
+            if listed:
+                for name in set(self._clusters) - set(names):
+                    del self._clusters[name]
+                self._listed_at = now
+            return {name: self._clusters[name][0] for name in names if name in self._clusters}
+
+    def invalidate(self, cluster: Optional[str] = None):
+        """Mark one cluster (name or ARN) stale, or drop the whole tree"""
+        with self._lock:
+            if cluster is None:
+                self._clusters.clear()
+                self._listed_at = None
+            elif _name(cluster) in self._clusters:
+                self._clusters[_name(cluster)] = (self._clusters[_name(cluster)][0], None)
+            else:
+                # A cluster we have never seen: the next full load must list again
+                self._listed_at = None
+
+    def summary(self, clusters: Optional[List[str]] = None, refresh: bool = False) -> List[Dict]:
+        """One row per cluster with exact service and task counts"""
+        rows = []
+        for name, node in sorted(self.load(clusters, refresh).items()):
+            tasks = [t for s in node['services'].values() for t in s['tasks']] + node['standalone_tasks']
+            rows.append({
+                'cluster_name': name,
+                'status': node['cluster'].get('status'),
+                'services': len(node['services']),
+                'active_services': sum(1 for s in node['services'].values()
+                                       if s['service'].get('status') == 'ACTIVE'),
+                'running_tasks': sum(1 for t in tasks if t.get('lastStatus') == 'RUNNING'),
+                'pending_tasks': sum(1 for t in tasks if t.get('lastStatus') == 'PENDING'),
+                'tasks': len(tasks),
+            })
+        return rows
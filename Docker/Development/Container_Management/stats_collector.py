@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+
+import time
+import threading
+from collections import deque
+from dataclasses import dataclass, asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+
+@dataclass
+class StatsSample:
+    """One point of a container's resource usage, derived from two consecutive stats frames"""
+    timestamp: float
+    cpu_percent: float
+    memory_usage: int
+    memory_limit: int
+    memory_percent: float
+    net_rx_bytes: int
+    net_tx_bytes: int
+    net_rx_rate: float
+    net_tx_rate: float
+    blk_read_bytes: int
+    blk_write_bytes: int
+    blk_read_rate: float
+    blk_write_rate: float
+
+
+def cpu_totals(frame: Dict):
+    cpu = frame.get('cpu_stats') or {}
+    usage = cpu.get('cpu_usage') or {}
+    online = cpu.get('online_cpus') or len(usage.get('percpu_usage') or []) or 1
+    return usage.get('total_usage', 0), cpu.get('system_cpu_usage', 0), online
+
+
+def memory_usage(frame: Dict):
+    """Working-set memory like `docker stats`: usage minus reclaimable page cache"""
+    memory = frame.get('memory_stats') or {}
+    stats = memory.get('stats') or {}
+    cache = stats.get('inactive_file', stats.get('total_inactive_file', stats.get('cache', 0)))
+    usage = max(memory.get('usage', 0) - cache, 0)
+    return usage, memory.get('limit', 0)
+
+
+def network_bytes(frame: Dict):
+    """Received and transmitted bytes summed over every interface (none in host network mode)"""
+    networks = frame.get('networks') or {}
+    return (sum(n.get('rx_bytes', 0) for n in networks.values()),
+            sum(n.get('tx_bytes', 0) for n in networks.values()))
+
+
+def blkio_bytes(frame: Dict):
+    """Bytes read and written across all block devices (cgroup v1 'Read', cgroup v2 'read')"""
+    entries = (frame.get('blkio_stats') or {}).get('io_service_bytes_recursive') or []
+    read = sum(e.get('value', 0) for e in entries if e.get('op', '').lower() == 'read')
+    write = sum(e.get('value', 0) for e in entries if e.get('op', '').lower() == 'write')
+    return read, write
+
+
+def format_bytes(value: float) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(value) < 1024:
+            return f"{value:.2f}{unit}"
+        value /= 1024
+    return f"{value:.2f}TB"
+
+
+class ContainerSeries:
+    """Ring buffer of a container's samples, fed one stats frame at a time"""
+
+    def __init__(self, container_id: str, name: str, history: int):
+        self.container_id = container_id
+        self.name = name
+        self.samples = deque(maxlen=history)
+        self.frames = 0
+        self._previous = None
+
+    def add_frame(self, frame: Dict, now: float) -> Optional[StatsSample]:
+        self.frames += 1
+        previous, self._previous = self._previous, (frame, now)
+        if previous is None:
+            return None
+        last, last_time = previous
+        elapsed = max(now - last_time, 1e-6)
+
+        total, system, online = cpu_totals(frame)
+        last_total, last_system, _ = cpu_totals(last)
+        cpu_delta, system_delta = total - last_total, system - last_system
+        cpu_percent = cpu_delta / system_delta * online * 100.0 if cpu_delta > 0 and system_delta > 0 else 0.0
+
+        usage, limit = memory_usage(frame)
+        rx, tx = network_bytes(frame)
+        last_rx, last_tx = network_bytes(last)
+        read, write = blkio_bytes(frame)
+        last_read, last_write = blkio_bytes(last)
+
+        sample = StatsSample(
+            timestamp=now,
+            cpu_percent=cpu_percent,
+            memory_usage=usage,
+            memory_limit=limit,
+            memory_percent=usage / limit * 100.0 if limit else 0.0,
+            net_rx_bytes=rx,
+            net_tx_bytes=tx,
+            # Counters reset when an interface is recreated; never report a negative rate
+            net_rx_rate=max(rx - last_rx, 0) / elapsed,
+            net_tx_rate=max(tx - last_tx, 0) / elapsed,
+            blk_read_bytes=read,
+            blk_write_bytes=write,
+            blk_read_rate=max(read - last_read, 0) / elapsed,
+            blk_write_rate=max(write - last_write, 0) / elapsed,
+        )
+        self.samples.append(sample)
+        return sample
+
+    def latest(self) -> Optional[StatsSample]:
+        return self.samples[-1] if self.samples else None
+
+
+class StatsCollector:
+    """Keeps one streaming stats connection per running container and caches what they report
+
+    `container.stats(stream=False)` blocks for about a second per container
+    while the daemon samples CPU twice. Instead, each container gets a
+    long-lived stream on its own daemon thread. Every frame (about one per
+    second) is turned into a sample against the previous frame and kept in
+    a per-container ring buffer. Readers such as the monitor table and the
+    Prometheus endpoint only read that cache. A discovery loop starts
+    streams for new containers, and a stream ends when its container stops.
+    At most max_streams streams run at once; running containers beyond
+    that are listed in `skipped` and get a stream from a later discovery,
+    once other streams have ended.
+    """
+
+    def __init__(self, docker_client, history: int = 60, max_streams: int = 256,
+                 discover_interval: float = 5.0, clock=time.monotonic):
+        self.docker_client = docker_client
+        self.history = history
+        self.discover_interval = discover_interval
+        self.clock = clock
+        self.series: Dict[str, ContainerSeries] = {}
+        self.errors: Dict[str, str] = {}
+        # container id -> name of running containers without a stream
+        self.skipped: Dict[str, str] = {}
+        self.max_streams = max_streams
+        self._workers: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._discoverer = None
+
+    def start(self):
+        self._stop.clear()
+        self.discover()
+        self._discoverer = threading.Thread(target=self._discover_loop, name='stats-discover', daemon=True)
+        self._discoverer.start()
+        return self
+
+    def stop(self):
+        """Ask every stream to finish; each exits after its next frame"""
+        self._stop.set()
+
+    def discover(self):
+        """Start a stream for every running container that does not have one, up to max_streams"""
+        running = self.docker_client.containers.list()
+        with self._lock:
+            streams = sum(1 for worker in self._workers.values() if worker.is_alive())
+            skipped = {}
+            for container in running:
+                worker = self._workers.get(container.id)
+                if worker is not None and worker.is_alive():
+                    continue
+                if streams >= self.max_streams:
+                    skipped[container.id] = container.name
+                    continue
+                streams += 1
+                if container.id not in self.series:
+                    self.series[container.id] = ContainerSeries(container.id, container.name, self.history)
+                worker = threading.Thread(target=self._stream, args=(container,), daemon=True,
+                                          name=f'stats-{container.short_id}')
+                self._workers[container.id] = worker
+                worker.start()
+            running_ids = {c.id for c in running}
+            for container_id in list(self.series):
+                if container_id not in running_ids and not self._workers[container_id].is_alive():
+                    del self.series[container_id]
+                    del self._workers[container_id]
+            self.skipped = skipped
+        return running
+
+    def _discover_loop(self):
+        while not self._stop.wait(self.discover_interval):
+            try:
+                self.discover()
+            except Exception as e:
+                self.errors['discover'] = str(e)
+
+    def _stream(self, container):
+        series = self.series[container.id]
+        try:
+            for frame in container.stats(stream=True, decode=True):
+                series.add_frame(frame, self.clock())
+                if self._stop.is_set():
+                    break
+            self.errors.pop(container.id, None)
+        except Exception as e:
+            self.errors[container.id] = str(e)
+
+    def wait_ready(self, timeout: float = 5.0, container_ids=None) -> bool:
+        """Block until every (or each given) streamed container has at least one sample
+
+        Containers in `skipped` have no stream to wait for.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                pending = [s for cid, s in self.series.items()
+                           if (container_ids is None or cid in container_ids) and not s.samples
+                           and self._workers[cid].is_alive()]
+            if not pending:
+                return True
+            time.sleep(0.05)
+        return False
+
+    def snapshot(self) -> List[Dict]:
+        """Latest sample of every container that has one, from the cache"""
+        with self._lock:
+            series = list(self.series.values())
+        rows = []
+        for s in series:
+            sample = s.latest()
+            if sample is not None:
+                rows.append(dict(asdict(sample), id=s.container_id, short_id=s.container_id[:12], name=s.name))
+        return sorted(rows, key=lambda r: r['name'])
+
+    def history_for(self, container_id: str) -> List[StatsSample]:
+        series = self.series.get(container_id)
+        return list(series.samples) if series else []
+
+    def prometheus_text(self) -> str:
+        """Prometheus text exposition of the cached samples"""
+        metrics = [
+            ('container_cpu_percent', 'gauge', 'CPU usage as a percentage of one core', 'cpu_percent'),
+            ('container_memory_usage_bytes', 'gauge', 'Working-set memory', 'memory_usage'),
+            ('container_memory_limit_bytes', 'gauge', 'Memory limit', 'memory_limit'),
+            ('container_network_receive_bytes_total', 'counter', 'Bytes received on all interfaces', 'net_rx_bytes'),
+            ('container_network_transmit_bytes_total', 'counter', 'Bytes sent on all interfaces', 'net_tx_bytes'),
+            ('container_blkio_read_bytes_total', 'counter', 'Bytes read from block devices', 'blk_read_bytes'),
+            ('container_blkio_write_bytes_total', 'counter', 'Bytes written to block devices', 'blk_write_bytes'),
+        ]
+        rows = self.snapshot()
+        lines = []
+        for name, kind, help_text, field in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for row in rows:
+                label_name = row['name'].replace('\\', '\\\\').replace('"', '\\"')
+                lines.append(f'{name}{{id="{row["short_id"]}",name="{label_name}"}} {row[field]}')
+        lines.append("# HELP container_stats_skipped Running containers without a stats stream (over max_streams)")
+        lines.append("# TYPE container_stats_skipped gauge")
+        lines.append(f"container_stats_skipped {len(self.skipped)}")
+        return '\n'.join(lines) + '\n'
+
+    def serve_metrics(self, host: str = '0.0.0.0', port: int = 9417) -> ThreadingHTTPServer:
+        """Serve /metrics from the cache on a background thread"""
+        collector = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = collector.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name='stats-metrics', daemon=True).start()
+        return server
@@ -0,0 +1,61 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+from ecs_topology import EcsTopologyLoader
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def ecs():
+    with mock_aws():
+        client = boto3.client('ecs', region_name='us-east-1')
+        task_definition = client.register_task_definition(
+            family='web', containerDefinitions=[{'name': 'web', 'image': 'nginx', 'memory': 128}]
+        )['taskDefinition']['taskDefinitionArn']
+        client.create_cluster(clusterName='web')
+        client.create_cluster(clusterName='jobs')
+        # More services than one list_services page and one describe_services batch
+        for n in range(23):
+            client.create_service(cluster='web', serviceName=f'site-{n}', taskDefinition=task_definition,
+                                  desiredCount=1)
+        client.run_task(cluster='web', taskDefinition=task_definition, count=2, group='service:site-3',
+                        launchType='FARGATE')
+        client.run_task(cluster='jobs', taskDefinition=task_definition, count=1, launchType='FARGATE')
+        client.task_definition = task_definition
+        yield client
+
+
+def test_tree_and_summary(ecs):
+    loader = EcsTopologyLoader(ecs)
+    tree = loader.load()
+    assert len(tree['web']['services']) == 23
+    assert len(tree['web']['services']['site-3']['tasks']) == 2
+    assert len(tree['jobs']['standalone_tasks']) == 1
+
+    rows = {row['cluster_name']: row for row in loader.summary()}
+    assert rows['web']['services'] == 23
+    assert rows['jobs']['services'] == 0
+
+
+def test_cached_until_invalidated(ecs):
+    clock = Clock()
+    loader = EcsTopologyLoader(ecs, ttl=60, clock=clock)
+    loader.load()
+    calls = sum(loader.calls.values())
+
+    ecs.create_service(cluster='jobs', serviceName='worker', taskDefinition=ecs.task_definition, desiredCount=1)
+    clock.now = 30
+    assert 'worker' not in loader.load()['jobs']['services']
+    assert sum(loader.calls.values()) == calls
+
+    loader.invalidate('jobs')
+    assert 'worker' in loader.load()['jobs']['services']
+    assert loader.calls['list_clusters'] == 1
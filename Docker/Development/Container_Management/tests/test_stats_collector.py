@@ -0,0 +1,145 @@
+import threading
+
+import pytest
+
+from stats_collector import ContainerSeries, StatsCollector, format_bytes
+
+
+def frame(cpu=0, system=0, online=2, usage=0, cache=0, limit=0, rx=0, tx=0, read=0, write=0, cgroup_v2=True):
+    op_read, op_write = ('read', 'write') if cgroup_v2 else ('Read', 'Write')
+    return {
+        'cpu_stats': {'cpu_usage': {'total_usage': cpu}, 'system_cpu_usage': system, 'online_cpus': online},
+        'memory_stats': {'usage': usage, 'limit': limit, 'stats': {'inactive_file': cache}},
+        'networks': {'eth0': {'rx_bytes': rx, 'tx_bytes': tx}, 'eth1': {'rx_bytes': rx, 'tx_bytes': 0}},
+        'blkio_stats': {'io_service_bytes_recursive': [{'op': op_read, 'value': read},
+                                                       {'op': op_write, 'value': write}]},
+    }
+
+
+def test_first_frame_gives_no_sample():
+    series = ContainerSeries('c1', 'web', history=3)
+    assert series.add_frame(frame(), 0.0) is None
+    assert series.latest() is None
+
+
+def test_deltas_and_rates():
+    series = ContainerSeries('c1', 'web', history=3)
+    series.add_frame(frame(cpu=100, system=1000, rx=1000, tx=500, read=0, write=0), 10.0)
+    sample = series.add_frame(frame(cpu=200, system=2000, usage=300, cache=100, limit=1000,
+                                    rx=3000, tx=1500, read=4096, write=2048, cgroup_v2=False), 12.0)
+
+    assert sample.cpu_percent == pytest.approx(20.0)
+    assert (sample.memory_usage, sample.memory_limit, sample.memory_percent) == (200, 1000, 20.0)
+    assert (sample.net_rx_bytes, sample.net_tx_bytes) == (6000, 1500)
+    assert (sample.net_rx_rate, sample.net_tx_rate) == (2000.0, 500.0)
+    assert (sample.blk_read_rate, sample.blk_write_rate) == (2048.0, 1024.0)
+
+
+def test_counter_resets_never_go_negative():
+    series = ContainerSeries('c1', 'web', history=3)
+    series.add_frame(frame(cpu=500, system=1000, rx=5000, read=5000), 0.0)
+    sample = series.add_frame(frame(cpu=10, system=2000, rx=10, read=10), 1.0)
+    assert sample.cpu_percent == 0.0
+    assert (sample.net_rx_rate, sample.blk_read_rate) == (0.0, 0.0)
+    assert sample.memory_percent == 0.0
+
+
+def test_history_is_a_ring_buffer():
+    series = ContainerSeries('c1', 'web', history=2)
+    for second in range(5):
+        series.add_frame(frame(cpu=second, system=second * 10), float(second))
+    assert [s.timestamp for s in series.samples] == [3.0, 4.0]
+    assert series.frames == 5
+
+
+class FakeContainer:
+    """Streams its frames, then blocks until released (a running container) or ends (a stopped one)"""
+
+    def __init__(self, n, frames):
+        self.id = f'{n:064x}'
+        self.short_id = self.id[:12]
+        self.name = f'app-{n}'
+        self.frames = frames
+        self.release = threading.Event()
+
+    def stats(self, stream=True, decode=True):
+        yield from self.frames
+        self.release.wait(5)
+
+
+class FakeDocker:
+    def __init__(self, containers):
+        self.running = list(containers)
+        self.containers = self
+
+    def list(self):
+        return list(self.running)
+
+
+def frames(n):
+    return [frame(cpu=0, system=0, usage=n * 100, limit=1000), frame(cpu=10, system=100, usage=n * 100, limit=1000)]
+
+
+def stop(container, docker):
+    docker.running.remove(container)
+    container.release.set()
+
+
+def test_discovery_caches_samples_and_drops_stopped_containers():
+    containers = [FakeContainer(n, frames(n)) for n in range(3)]
+    docker = FakeDocker(containers)
+    collector = StatsCollector(docker, clock=iter(range(100)).__next__)
+    collector.discover()
+    assert collector.wait_ready(timeout=5)
+    assert [row['name'] for row in collector.snapshot()] == ['app-0', 'app-1', 'app-2']
+
+    stop(containers[1], docker)
+    collector._workers[containers[1].id].join(5)
+    collector.discover()
+    assert [row['name'] for row in collector.snapshot()] == ['app-0', 'app-2']
+    for container in containers:
+        container.release.set()
+
+
+def test_streams_are_bounded_and_skipped_containers_are_reported():
+    containers = [FakeContainer(n, frames(n)) for n in range(3)]
+    docker = FakeDocker(containers)
+    collector = StatsCollector(docker, max_streams=2, clock=iter(range(100)).__next__)
+    collector.discover()
+
+    assert sum(1 for worker in collector._workers.values() if worker.is_alive()) == 2
+    assert collector.skipped == {containers[2].id: 'app-2'}
+    assert collector.wait_ready(timeout=5)
+    assert 'container_stats_skipped 1' in collector.prometheus_text()
+
+    # Once a stream ends, the next discovery starts the skipped container
+    stop(containers[0], docker)
+    collector._workers[containers[0].id].join(5)
+    collector.discover()
+    assert collector.skipped == {}
+    assert collector.wait_ready(timeout=5)
+    assert [row['name'] for row in collector.snapshot()] == ['app-1', 'app-2']
+    for container in containers:
+        container.release.set()
+
+
+def test_prometheus_text():
+    container = FakeContainer(1, frames(1))
+    container.name = 'we"b'
+    collector = StatsCollector(FakeDocker([container]), clock=iter(range(100)).__next__)
+    collector.discover()
+    assert collector.wait_ready(timeout=5)
+    text = collector.prometheus_text()
+    container.release.set()
+
+    assert '# TYPE container_cpu_percent gauge' in text
+    assert '# TYPE container_network_receive_bytes_total counter' in text
+    assert f'container_memory_usage_bytes{{id="{container.short_id}",name="we\\"b"}} 100' in text
+    assert f'container_cpu_percent{{id="{container.short_id}",name="we\\"b"}} 20.0' in text
+    assert text.endswith('container_stats_skipped 0\n')
+
+
+def test_format_bytes():
+    assert format_bytes(512) == '512.00B'
+    assert format_bytes(1536) == '1.50KB'
+    assert format_bytes(3 * 2 ** 40) == '3.00TB'
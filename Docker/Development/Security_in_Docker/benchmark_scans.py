@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Benchmark for digest-keyed, parallel image scanning
+
+Writes a fake `trivy` script that answers --version with a DB version,
+accepts --download-db-only and takes a fixed time per image scan. Compares scanning every tag one at a
+time (the old behaviour) with FleetScanner cold, warm, and after a DB
+update, reporting scans performed and avoided.
+
+    python benchmark_scans.py --tags 40 --images 15 --scan-seconds 1.0 --workers 4
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import textwrap
+
+from scan_cache import FleetScanner, ScanCache, run_scan
+
+FAKE_TRIVY = textwrap.dedent('''\
+    #!{python}
+    import json, os, sys, time
+    if '--version' in sys.argv:
+        print(json.dumps({{'Version': '0.50.0', 'VulnerabilityDB': {{'Version': 2,
+                          'UpdatedAt': os.environ.get('FAKE_TRIVY_DB', '2024-05-01T00:00:00Z')}}}}))
+        sys.exit(0)
+    if '--download-db-only' in sys.argv:
+        sys.exit(0)
+    with open(os.environ['FAKE_TRIVY_LOG'], 'a') as log:
+        log.write(sys.argv[-1] + '\\n')
+    time.sleep(float(os.environ['FAKE_TRIVY_SECONDS']))
+    image = sys.argv[-1]
+    print(json.dumps({{'ArtifactName': image, 'Results': [{{'Target': image, 'Vulnerabilities': [
+        {{'VulnerabilityID': f'CVE-2024-{{n}}', 'Severity': ('LOW', 'MEDIUM', 'HIGH', 'CRITICAL')[n % 4]}}
+        for n in range(len(image) % 7 + 1)]}}]}}))
+''')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tags', type=int, default=40)
+    parser.add_argument('--images', type=int, default=15, help='distinct content digests behind the tags')
+    parser.add_argument('--scan-seconds', type=float, default=1.0)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='scan-bench-')
+    scanner = os.path.join(workdir, 'trivy')
+    with open(scanner, 'w') as f:
+        f.write(FAKE_TRIVY.format(python=sys.executable))
+    os.chmod(scanner, 0o755)
+    log = os.path.join(workdir, 'scans.log')
+    os.environ.update(FAKE_TRIVY_LOG=log, FAKE_TRIVY_SECONDS=str(args.scan_seconds))
+
+    def scans():
+        with open(log, 'a+') as f:
+            f.seek(0)
+            return len(f.readlines())
+
+    images = {}
+    for n in range(args.tags):
+        images.setdefault(f'sha256:{n % args.images:064x}', []).append(f'app-{n % args.images}:v{n}')
+    print(f"{args.tags} tags over {args.images} images, {args.scan_seconds:.1f}s per scan, "
+          f"{args.workers} workers")
+    print(f"{'Run':<28} {'Time':>8} {'Scans':>6} {'Avoided':>8}")
+
+    start = time.perf_counter()
+    for refs in images.values():
+        for ref in refs:
+            run_scan(scanner, ref)
+    print(f"{'Every tag, one at a time':<28} {time.perf_counter() - start:>7.2f}s {scans():>6} {0:>8}")
+
+    fleet = FleetScanner(ScanCache(os.path.join(workdir, 'cache')), scanner, args.workers)
+    for label, db in (('Fleet, cold cache', None), ('Fleet, warm cache', None),
+                      ('Fleet, after DB update', '2024-05-02T00:00:00Z')):
+        if db:
+            os.environ['FAKE_TRIVY_DB'] = db
+        before = scans()
+        start = time.perf_counter()
+        stats = fleet.scan(images)['stats']
+        print(f"{label:<28} {time.perf_counter() - start:>7.2f}s {scans() - before:>6} "
+              f"{stats['scans_avoided']:>8}  ({stats['cache_hits']} cache hits, {stats['failed']} failed)")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,15 +5,22 @@ import json
 import subprocess
 import os
 import logging
+import argparse
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import yaml
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+from scan_cache import FleetScanner, ScanCache, run_scan, scanner_db_version, severity_counts, update_scanner_db
 
 class DockerSecurityAnalyzer:
-    def __init__(self):
+    def __init__(self, cache_dir: str = '~/.cache/docker-security/scans', scanner: str = 'trivy',
+                 max_workers: Optional[int] = None):
         self.client = docker.from_env()
         self.logger = self._setup_logging()
+        self.scanner = scanner
+        self.scan_cache = ScanCache(cache_dir)
+        self.fleet_scanner = FleetScanner(self.scan_cache, scanner, max_workers)
 
     def _setup_logging(self) -> logging.Logger:
         """Setup logging configuration"""
@@ -58,27 +65,67 @@ class DockerSecurityAnalyzer:
     def analyze_image_vulnerabilities(self, image_name: str) -> Dict[str, Any]:
         """
         Method 2: Analyze Docker images for vulnerabilities
-        Uses Trivy (if installed) for scanning
+        Uses Trivy (if installed) for scanning; reports are cached by image
+        content digest and Trivy DB version, so an unchanged image is not rescanned
         """
         try:
-            # Check if Trivy is installed
-            subprocess.run(['trivy', '--version'], check=True, capture_output=True)
-            
-            # Run Trivy scan
-            result = subprocess.run(
-                ['trivy', 'image', '--format', 'json', image_name],
-                capture_output=True,
-                text=True
-            )
-            
-            return json.loads(result.stdout)
-        except subprocess.CalledProcessError:
+            # Check if Trivy is installed, refresh its vulnerability DB and see which one it has
+            update_scanner_db(self.scanner)
+            db_version = scanner_db_version(self.scanner)
+            digest = self.client.images.get(image_name).id
+
+            cached = self.scan_cache.get(digest, db_version)
+            if cached is not None:
+                self.logger.info(f"Using cached scan of {image_name} ({digest[:19]})")
+                return cached
+
+            ok, outcome = run_scan(self.scanner, image_name)
+            if not ok:
+                return {"error": outcome}
+            self.scan_cache.put(digest, db_version, outcome)
+            return outcome
+        except (subprocess.CalledProcessError, FileNotFoundError):
             self.logger.error("Trivy is not installed or encountered an error")
             return {"error": "Trivy scanner not available"}
         except Exception as e:
             self.logger.error(f"Error scanning image: {str(e)}")
             return {"error": str(e)}
 
+    def image_inventory(self) -> Dict[str, List[str]]:
+        """Local images keyed by content digest (image ID), with every tag that points at each"""
+        images = {}
+        for image in self.client.images.list():
+            images.setdefault(image.id, []).extend(image.tags or [image.id])
+        return images
+
+    def scan_image_fleet(self) -> Dict[str, Any]:
+        """
+        Scan every local image once per content digest, in parallel, skipping
+        digests already scanned against the current Trivy DB
+        """
+        try:
+            fleet = self.fleet_scanner.scan(self.image_inventory())
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            self.logger.error("Trivy is not installed or encountered an error")
+            return {"error": "Trivy scanner not available"}
+        except Exception as e:
+            self.logger.error(f"Error scanning images: {str(e)}")
+            return {"error": str(e)}
+
+        summary = {'stats': fleet['stats'], 'images': {}}
+        for digest, result in fleet['images'].items():
+            entry = {'tags': result['refs'], 'cached': result['cached']}
+            if 'error' in result:
+                entry['error'] = result['error']
+            else:
+                entry['vulnerabilities'] = severity_counts(result['report'])
+            summary['images'][digest] = entry
+        stats = fleet['stats']
+        self.logger.info(f"Image scan: {stats['unique_images']} unique images for {stats['references']} tags, "
+                         f"{stats['scanned']} scanned, {stats['cache_hits']} from cache, "
+                         f"{stats['scans_avoided']} scans avoided, {stats['failed']} failed")
+        return summary
+
     def analyze_docker_compose(self, compose_file: str) -> Dict[str, Any]:
         """
         Method 3: Analyze Docker Compose file for security configurations
@@ -172,20 +219,27 @@ class DockerSecurityAnalyzer:
 
         return network_security
 
-    def generate_security_report(self, output_file: str = 'security_report.json'):
+    def generate_security_report(self, output_file: str = 'security_report.json', scan_images: bool = False):
         """
         Generate a comprehensive security report combining all analyses
+        The independent analyses run concurrently; they mostly wait on the Docker API
         """
-        report = {
-            'timestamp': datetime.now().isoformat(),
-            'container_security': self.analyze_container_security(),
-            'daemon_config': self.analyze_docker_daemon_config(),
-            'network_security': self.analyze_network_security()
+        analyses = {
+            'container_security': self.analyze_container_security,
+            'daemon_config': self.analyze_docker_daemon_config,
+            'network_security': self.analyze_network_security
         }
-
         # Add compose file analysis if exists
         if os.path.exists('docker-compose.yml'):
-            report['compose_security'] = self.analyze_docker_compose('docker-compose.yml')
+            analyses['compose_security'] = lambda: self.analyze_docker_compose('docker-compose.yml')
+        if scan_images:
+            analyses['image_vulnerabilities'] = self.scan_image_fleet
+
+        report = {'timestamp': datetime.now().isoformat()}
+        with ThreadPoolExecutor(max_workers=len(analyses)) as pool:
+            futures = {name: pool.submit(analysis) for name, analysis in analyses.items()}
+        for name, future in futures.items():
+            report[name] = future.result()
 
         # Save report
         try:
@@ -196,16 +250,17 @@ class DockerSecurityAnalyzer:
             self.logger.error(f"Error saving security report: {str(e)}")
 
 def main():
-    analyzer = DockerSecurityAnalyzer()
-    
-    # Generate comprehensive security report
-    analyzer.generate_security_report()
-    
-    # Example of scanning a specific image
-    if len(analyzer.client.images.list()) > 0:
-        image_name = analyzer.client.images.list()[0].tags[0]
-        vulnerabilities = analyzer.analyze_image_vulnerabilities(image_name)
-        print(f"Vulnerabilities for {image_name}:", json.dumps(vulnerabilities, indent=2))
+    parser = argparse.ArgumentParser(description="Docker security analyzer")
+    parser.add_argument('--output', default='security_report.json')
+    parser.add_argument('--skip-images', action='store_true', help="Don't scan local images for vulnerabilities")
+    parser.add_argument('--cache-dir', default='~/.cache/docker-security/scans')
+    parser.add_argument('--workers', type=int, default=None, help='Parallel image scans (default: CPU count)')
+    args = parser.parse_args()
+
+    analyzer = DockerSecurityAnalyzer(cache_dir=args.cache_dir, max_workers=args.workers)
+
+    # Generate comprehensive security report, scanning every local image
+    analyzer.generate_security_report(args.output, scan_images=not args.skip_images)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import hashlib
+import logging
+import subprocess
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def scanner_db_version(scanner: str = 'trivy') -> str:
+    """Identity of the scanner and its vulnerability DB; a new DB invalidates every cached scan"""
+    result = subprocess.run([scanner, '--version', '--format', 'json'], capture_output=True, text=True, check=True)
+    try:
+        info = json.loads(result.stdout)
+        db = info.get('VulnerabilityDB', {})
+        return f"{info.get('Version', '')}|db{db.get('Version', '')}|{db.get('UpdatedAt', '')}"
+    except ValueError:
+        # Older scanners only print text; any change in it still changes the key
+        return hashlib.sha256(result.stdout.encode()).hexdigest()[:16]
+
+
+def update_scanner_db(scanner: str = 'trivy', timeout: int = 600) -> bool:
+    """Bring the scanner's vulnerability DB up to date before a round of scans
+
+    Scans run with --skip-db-update so they all use the DB the cache key
+    names; this is the one place the DB is refreshed. A failed download is
+    logged and the scans go ahead against the DB already on disk.
+    """
+    try:
+        result = subprocess.run([scanner, 'image', '--download-db-only', '--quiet'],
+                                capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired as e:
+        logger.warning(f"Scanner DB update timed out: {e}")
+        return False
+    if result.returncode != 0:
+        logger.warning(f"Scanner DB update failed: {result.stderr.strip() or result.returncode}")
+        return False
+    return True
+
+
+def run_scan(scanner: str, image_ref: str, timeout: int = 900) -> Tuple[bool, Any]:
+    """Scan one image in a worker process; (True, report) or (False, error message)
+
+    --skip-db-update keeps every parallel scan on the DB version the cache
+    key was computed from, and keeps workers from racing to download it;
+    update_scanner_db() refreshes the DB once beforehand.
+    """
+    try:
+        result = subprocess.run([scanner, 'image', '--format', 'json', '--quiet', '--skip-db-update', image_ref],
+                                capture_output=True, text=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return False, str(e)
+    if result.returncode != 0:
+        return False, result.stderr.strip() or f"{scanner} exited with {result.returncode}"
+    try:
+        return True, json.loads(result.stdout)
+    except ValueError as e:
+        return False, f"Unparseable scanner output: {e}"
+
+
+def severity_counts(report: Dict) -> Dict[str, int]:
+    counts = Counter()
+    for result in report.get('Results') or []:
+        for vulnerability in result.get('Vulnerabilities') or []:
+            counts[vulnerability.get('Severity', 'UNKNOWN')] += 1
+    return dict(counts)
+
+
+class ScanCache:
+    """Scan reports on disk, one JSON file per (image content digest, scanner DB version)"""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def path(self, digest: str, db_version: str) -> str:
+        db_key = hashlib.sha256(db_version.encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{digest.split(':')[-1]}-{db_key}.json")
+
+    def get(self, digest: str, db_version: str) -> Optional[Dict]:
+        try:
+            with open(self.path(digest, db_version)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, digest: str, db_version: str, report: Dict):
+        path = self.path(digest, db_version)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(report, f)
+        os.replace(tmp, path)
+
+
+class FleetScanner:
+    """Scans a set of images once per content digest, reusing cached reports
+
+    Tags that point at the same image share one digest and one scan. A
+    digest already scanned against the current scanner DB is answered from
+    the cache. The rest are scanned on a bounded process pool, because each
+    scan is a separate scanner process that is mostly CPU and disk work.
+    Failed scans are reported and not cached. Unless a DB version is given,
+    the scanner DB is updated once before the cache key is read.
+    """
+
+    def __init__(self, cache: ScanCache, scanner: str = 'trivy', max_workers: Optional[int] = None):
+        self.cache = cache
+        self.scanner = scanner
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def scan(self, images: Dict[str, List[str]], db_version: Optional[str] = None,
+             update_db: bool = True) -> Dict[str, Any]:
+        """images maps content digest -> references (tags or IDs) that resolve to it"""
+        if db_version is None:
+            if update_db:
+                update_scanner_db(self.scanner)
+            db_version = scanner_db_version(self.scanner)
+        results: Dict[str, Dict] = {}
+        pending = []
+        for digest, refs in images.items():
+            cached = self.cache.get(digest, db_version)
+            if cached is not None:
+                results[digest] = {'refs': refs, 'cached': True, 'report': cached}
+            else:
+                pending.append(digest)
+
+        if pending:
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, len(pending))) as pool:
+                futures = {pool.submit(run_scan, self.scanner, images[digest][0]): digest for digest in pending}
+                for future in as_completed(futures):
+                    digest = futures[future]
+                    ok, outcome = future.result()
+                    if ok:
+                        self.cache.put(digest, db_version, outcome)
+                        results[digest] = {'refs': images[digest], 'cached': False, 'report': outcome}
+                    else:
+                        logger.error(f"Scan of {images[digest][0]} failed: {outcome}")
+                        results[digest] = {'refs': images[digest], 'cached': False, 'error': outcome}
+
+        references = sum(len(refs) for refs in images.values())
+        scanned = sum(1 for r in results.values() if not r['cached'] and 'error' not in r)
+        stats = {
+            'references': references,
+            'unique_images': len(images),
+            'cache_hits': sum(1 for r in results.values() if r['cached']),
+            'scanned': scanned,
+            'failed': sum(1 for r in results.values() if 'error' in r),
+            'scans_avoided': references - scanned - sum(1 for r in results.values() if 'error' in r),
+            'db_version': db_version,
+        }
+        return {'images': results, 'stats': stats}
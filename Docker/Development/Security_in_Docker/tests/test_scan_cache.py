@@ -0,0 +1,118 @@
+import sys
+import textwrap
+
+import pytest
+
+from scan_cache import FleetScanner, ScanCache, run_scan, scanner_db_version
+
+# Logs every invocation; an image named broken* fails, FAKE_TRIVY_DB is the DB the download fetched
+FAKE_TRIVY = textwrap.dedent('''\
+    #!{python}
+    import json, os, sys
+    with open(os.environ['FAKE_TRIVY_LOG'], 'a') as log:
+        log.write(' '.join(sys.argv[1:]) + '\\n')
+    if '--version' in sys.argv:
+        print(json.dumps({{'Version': '0.50.0', 'VulnerabilityDB': {{'Version': 2,
+                          'UpdatedAt': os.environ.get('FAKE_TRIVY_DB', '2024-05-01T00:00:00Z')}}}}))
+        sys.exit(0)
+    if '--download-db-only' in sys.argv:
+        sys.exit(0)
+    image = sys.argv[-1]
+    if image.startswith('broken'):
+        sys.stderr.write(f'unable to scan {{image}}\\n')
+        sys.exit(1)
+    print(json.dumps({{'ArtifactName': image, 'Results': [{{'Target': image, 'Vulnerabilities': [
+        {{'VulnerabilityID': 'CVE-2024-1', 'Severity': 'HIGH'}}]}}]}}))
+''')
+
+IMAGES = {'sha256:' + 'a' * 64: ['web:1', 'web:latest'], 'sha256:' + 'b' * 64: ['worker:2']}
+
+
+@pytest.fixture
+def trivy(tmp_path, monkeypatch):
+    scanner = tmp_path / 'trivy'
+    scanner.write_text(FAKE_TRIVY.format(python=sys.executable))
+    scanner.chmod(0o755)
+    log = tmp_path / 'trivy.log'
+    log.touch()
+    monkeypatch.setenv('FAKE_TRIVY_LOG', str(log))
+    monkeypatch.delenv('FAKE_TRIVY_DB', raising=False)
+    return str(scanner), log
+
+
+def calls(log):
+    return log.read_text().splitlines()
+
+
+def scans(log):
+    return [line for line in calls(log) if line.startswith('image') and '--download-db-only' not in line]
+
+
+def test_db_version_and_single_scan(trivy):
+    scanner, log = trivy
+    assert scanner_db_version(scanner) == '0.50.0|db2|2024-05-01T00:00:00Z'
+    ok, report = run_scan(scanner, 'web:1')
+    assert ok and report['ArtifactName'] == 'web:1'
+    assert '--skip-db-update' in scans(log)[0].split()
+
+
+def test_miss_then_hit(trivy, tmp_path):
+    scanner, log = trivy
+    fleet = FleetScanner(ScanCache(str(tmp_path / 'cache')), scanner, max_workers=2)
+
+    cold = fleet.scan(IMAGES)
+    assert cold['stats']['scanned'] == 2
+    assert cold['stats']['scans_avoided'] == 1
+    assert sorted(line.split()[-1] for line in scans(log)) == ['web:1', 'worker:2']
+
+    warm = fleet.scan(IMAGES)
+    assert warm['stats']['cache_hits'] == 2
+    assert warm['stats']['scanned'] == 0
+    assert len(scans(log)) == 2
+    assert all(result['cached'] for result in warm['images'].values())
+
+
+def test_db_download_runs_once_before_version_check(trivy, tmp_path):
+    scanner, log = trivy
+    FleetScanner(ScanCache(str(tmp_path / 'cache')), scanner, max_workers=2).scan(IMAGES)
+
+    lines = calls(log)
+    downloads = [n for n, line in enumerate(lines) if '--download-db-only' in line]
+    versions = [n for n, line in enumerate(lines) if '--version' in line]
+    assert len(downloads) == 1 and len(versions) == 1
+    assert downloads[0] < versions[0]
+    assert all('--skip-db-update' in line.split() for line in scans(log))
+
+
+def test_given_db_version_skips_the_download(trivy, tmp_path):
+    scanner, log = trivy
+    FleetScanner(ScanCache(str(tmp_path / 'cache')), scanner, max_workers=2).scan(IMAGES, db_version='pinned')
+    assert not any('--download-db-only' in line or '--version' in line for line in calls(log))
+
+
+def test_new_db_invalidates_the_cache(trivy, tmp_path, monkeypatch):
+    scanner, log = trivy
+    fleet = FleetScanner(ScanCache(str(tmp_path / 'cache')), scanner, max_workers=2)
+    fleet.scan(IMAGES)
+
+    monkeypatch.setenv('FAKE_TRIVY_DB', '2024-05-02T00:00:00Z')
+    updated = fleet.scan(IMAGES)
+    assert updated['stats']['cache_hits'] == 0
+    assert updated['stats']['scanned'] == 2
+    assert updated['stats']['db_version'].endswith('2024-05-02T00:00:00Z')
+    assert len(scans(log)) == 4
+
+
+def test_failed_scan_is_not_cached(trivy, tmp_path):
+    scanner, log = trivy
+    images = {'sha256:' + 'c' * 64: ['broken:1'], 'sha256:' + 'a' * 64: ['web:1']}
+    fleet = FleetScanner(ScanCache(str(tmp_path / 'cache')), scanner, max_workers=2)
+
+    first = fleet.scan(images)
+    assert first['stats']['failed'] == 1
+    assert 'unable to scan broken:1' in first['images']['sha256:' + 'c' * 64]['error']
+
+    second = fleet.scan(images)
+    assert second['stats']['cache_hits'] == 1
+    assert second['stats']['failed'] == 1
+    assert [line.split()[-1] for line in scans(log)].count('broken:1') == 2
@@ -4,9 +4,11 @@ import boto3
 import click
 import yaml
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Any
+from datetime import datetime
+from typing import Dict, List, Any, Optional
 from botocore.exceptions import ClientError
+from snapshot_orchestrator import JobTable, SnapshotOrchestrator, resolve_volume_ids
+from retention import TIERS, apply_retention
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,20 +26,16 @@ class AWSBackupManager:
     def create_snapshot(self, instance_id: str, volume_id: str, description: str) -> Dict:
         """Create an EBS snapshot."""
         try:
-            snapshot = self.ec2.create_snapshot(
-                VolumeId=volume_id,
-                Description=description
-            )
-            
-            # Add tags
+            kwargs = {'VolumeId': volume_id, 'Description': description}
+
+            # Tag at creation rather than with a second CreateTags call
             instance_config = self._get_instance_config(instance_id)
-            if instance_config:
-                self.ec2.create_tags(
-                    Resources=[snapshot['SnapshotId']],
-                    Tags=[{'Key': k, 'Value': v} for k, v in instance_config.get('tags', {}).items()]
-                )
-            
-            return snapshot
+            if instance_config and instance_config.get('tags'):
+                kwargs['TagSpecifications'] = [{
+                    'ResourceType': 'snapshot',
+                    'Tags': [{'Key': k, 'Value': v} for k, v in instance_config['tags'].items()]
+                }]
+            return self.ec2.create_snapshot(**kwargs)
         except ClientError as e:
             logger.error(f"Failed to create snapshot: {str(e)}")
             raise
@@ -56,36 +54,64 @@ class AWSBackupManager:
             logger.error(f"Failed to copy snapshot to DR: {str(e)}")
             raise
 
-    def cleanup_snapshots(self, backup_group: str):
+    def backup_all(self, run_id: Optional[str] = None, resume: bool = False,
+                   job_db: Optional[str] = None) -> Dict:
+        """Snapshot every configured volume concurrently, copying to DR where the policy asks for it
+
+        Pacing, the copy limit and the job table path come from
+        backup.snapshot in the config; job_db overrides the latter.
+        """
+        volumes_by_instance = {}
+        copy_to_dr = {}
+        tags = {}
+        for env in ['production', 'staging']:
+            for instance in self.config['instances'].get(env, []):
+                volumes = instance.get('volumes', {})
+                volumes_by_instance[instance['id']] = [
+                    volume['device'] if isinstance(volume, dict) else volume
+                    for volume in (volumes.values() if isinstance(volumes, dict) else volumes)
+                ]
+                tags[instance['id']] = instance.get('tags', {})
+                policy = self.config.get('snapshot_policies', {}).get(tags[instance['id']].get('BackupGroup'), {})
+                copy_to_dr[instance['id']] = bool(policy.get('cross_region_copy'))
+
+        targets = resolve_volume_ids(self.ec2, volumes_by_instance)
+        for target in targets:
+            target['tags'] = tags[target['instance_id']]
+            target['copy_to_dr'] = copy_to_dr[target['instance_id']]
+
+        snapshot_config = self.config.get('backup', {}).get('snapshot', {})
+        jobs = JobTable(job_db or snapshot_config.get('job_db', '/var/lib/autocloud/snapshot-jobs.sqlite'))
+        if resume and run_id is None:
+            run_id = jobs.latest_unfinished()
+        run_id = run_id or f"backup-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}"
+        encryption = self.config.get('encryption', {})
+        orchestrator = SnapshotOrchestrator(
+            self.ec2, self.ec2_dr, jobs=jobs, source_region=self.config['regions']['primary'],
+            create_rate=snapshot_config.get('create_rate', 5.0),
+            max_copies=snapshot_config.get('max_concurrent_copies', 20),
+            encrypted=encryption.get('enabled'), copy_kms_key_id=encryption.get('cross_region_key_id') or None
+        )
+        try:
+            return orchestrator.run(run_id, targets)
+        finally:
+            jobs.close()
+
+    def cleanup_snapshots(self, backup_group: str, dry_run: bool = False, include_dr: bool = True) -> List[Dict]:
         """Clean up old snapshots based on retention policy."""
         try:
-            retention = self.config['snapshot_policies'][backup_group]['retention']
-            
-            # Get all snapshots for this backup group
-            snapshots = self.ec2.describe_snapshots(
-                Filters=[
-                    {'Name': 'tag:BackupGroup', 'Values': [backup_group]}
-                ]
-            )['Snapshots']
-            
-            # Sort snapshots by date
-            snapshots.sort(key=lambda x: x['StartTime'])
-            
-            # Calculate retention dates
-            now = datetime.utcnow()
-            retention_dates = {
-                'hourly': now - timedelta(hours=retention.get('hourly', 24)),
-                'daily': now - timedelta(days=retention.get('daily', 7)),
-                'weekly': now - timedelta(weeks=retention.get('weekly', 4)),
-                'monthly': now - timedelta(days=retention.get('monthly', 12) * 30)
-            }
-            
-            # Delete expired snapshots
-            for snapshot in snapshots:
-                if snapshot['StartTime'] < retention_dates['monthly']:
-                    self.ec2.delete_snapshot(SnapshotId=snapshot['SnapshotId'])
-                    logger.info(f"Deleted snapshot {snapshot['SnapshotId']}")
-                    
+            policy = self.config['snapshot_policies'][backup_group]
+            retention = {tier: count for tier, count in policy['retention'].items() if tier in TIERS}
+            clients = [self.ec2]
+            if include_dr and policy.get('cross_region_copy'):
+                clients.append(self.ec2_dr)
+            results = []
+            for ec2 in clients:
+                result = apply_retention(ec2, backup_group, retention, dry_run=dry_run)
+                results.append(result)
+                if result.get('failed'):
+                    logger.error(f"{result['failed']} snapshots could not be deleted in {result['region']}")
+            return results
         except ClientError as e:
             logger.error(f"Failed to cleanup snapshots: {str(e)}")
             raise
@@ -150,6 +176,17 @@ def create_backup(config, instance_id, volume_id, description):
     snapshot = manager.create_snapshot(instance_id, volume_id, description)
     click.echo(f"Created snapshot: {snapshot['SnapshotId']}")
 
+@cli.command()
+@click.option('--config', '-c', required=True, help='Path to config file')
+@click.option('--run-id', default=None, help='Run ID to start or resume')
+@click.option('--resume', is_flag=True, help='Resume the most recent unfinished run')
+@click.option('--job-db', default=None, help='Job table path (default: backup.snapshot.job_db)')
+def backup_all(config, run_id, resume, job_db):
+    """Snapshot all configured volumes and copy them to the DR region."""
+    manager = AWSBackupManager(config)
+    result = manager.backup_all(run_id, resume, job_db)
+    click.echo(f"Run {result['run_id']}: {result['jobs']}")
+
 @cli.command()
 @click.option('--config', '-c', required=True, help='Path to config file')
 @click.option('--snapshot-id', required=True, help='Snapshot ID')
@@ -168,10 +205,19 @@ def restore(config, snapshot_id, availability_zone, instance_id, device):
 @cli.command()
 @click.option('--config', '-c', required=True, help='Path to config file')
 @click.option('--backup-group', required=True, help='Backup group name')
-def cleanup(config, backup_group):
+@click.option('--dry-run', is_flag=True, help='Print the retention plan without deleting anything')
+def cleanup(config, backup_group, dry_run):
     """Clean up old snapshots based on retention policy."""
     manager = AWSBackupManager(config)
-    manager.cleanup_snapshots(backup_group)
+    for result in manager.cleanup_snapshots(backup_group, dry_run=dry_run):
+        plan = result['plan']
+        click.echo(f"{result['region']}: {plan['snapshots']} snapshots of {plan['volumes']} volumes, "
+                   f"keep {plan['keep']} {plan['kept_by_tier']}, delete {plan['delete']}")
+        if dry_run:
+            for snapshot_id in result['would_delete']:
+                click.echo(f"  would delete {snapshot_id}")
+        else:
+            click.echo(f"  deleted {result['deleted']}, in use {result['in_use']}, failed {result['failed']}")
     click.echo("Cleanup completed")
 
 if __name__ == '__main__':
@@ -1,19 +1,30 @@
 #!/usr/bin/env python3
 
 import os
+import re
 import sys
 import yaml
 import click
 import logging
 import boto3
 import libvirt
+import subprocess
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any
+from snapshot_orchestrator import JobTable, SnapshotOrchestrator, resolve_volume_ids
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+RSYNC_STATS = {
+    'files': r'Number of files: ([\d,]+)',
+    'transferred': r'Number of regular files transferred: ([\d,]+)',
+    'deleted': r'Number of deleted files: ([\d,]+)',
+    'total_bytes': r'Total file size: ([\d,]+)',
+    'transferred_bytes': r'Total transferred file size: ([\d,]+)',
+}
+
 class BackupManager:
     def __init__(self, config_path: str):
         self.config = self._load_config(config_path)
@@ -49,33 +60,58 @@ class BackupManager:
 
         return _traverse(config)
 
+    def _rsync(self, directory: str, staging: str, exclude) -> Dict[str, int]:
+        """Mirror one directory into the staging tree; return rsync's transfer counters"""
+        cmd = ['rsync', '-a', '--delete', '--stats']
+        cmd += [f'--exclude={exc}' for exc in exclude]
+        cmd += [directory, f"{staging}/"]
+        output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        counters = {}
+        for name, pattern in RSYNC_STATS.items():
+            match = re.search(pattern, output)
+            counters[name] = int(match.group(1).replace(',', '')) if match else 0
+        return counters
+
     def _backup_ubuntu(self):
         logger.info("Starting Ubuntu backup process")
         try:
             dirs = self.config['backup']['directories']
             exclude = self.config['backup'].get('exclude', [])
-            
-            backup_path = f"/tmp/backup-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
-            os.makedirs(backup_path, exist_ok=True)
+
+            # The staging mirror persists between runs, so rsync's size/mtime
+            # check only copies files changed since the last backup
+            staging = self.config['backup'].get('staging_dir', '/var/lib/autocloud/backup-staging')
+            os.makedirs(staging, exist_ok=True)
+            totals = dict.fromkeys(RSYNC_STATS, 0)
 
             for directory in dirs:
                 if not os.path.exists(directory):
                     logger.warning(f"Directory {directory} does not exist, skipping...")
                     continue
-                
-                backup_cmd = f"rsync -az --delete"
-                for exc in exclude:
-                    backup_cmd += f" --exclude='{exc}'"
-                backup_cmd += f" {directory} {backup_path}/"
-                
-                os.system(backup_cmd)
+                for name, value in self._rsync(directory, staging, exclude).items():
+                    totals[name] += value
+
+            logger.info(f"Scanned {totals['total_bytes']} bytes in {totals['files']} files, "
+                        f"copied {totals['transferred_bytes']} bytes "
+                        f"({totals['transferred']} changed, {totals['deleted']} deleted)")
+            if not totals['transferred'] and not totals['deleted'] and not self.config['backup'].get('always_archive'):
+                logger.info("Nothing changed since the last backup, skipping archive and upload")
+                return
 
+            backup_path = f"/tmp/backup-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
             if self.config['compression']['enabled']:
                 compression_level = self.config['compression']['level']
-                os.system(f"tar czf {backup_path}.tar.gz -C {backup_path} .")
+                archive = f"{backup_path}.tar.gz"
+                subprocess.run(['tar', '-I', f'gzip -{compression_level}', '-cf', archive, '-C', staging, '.'],
+                               check=True)
+            else:
+                archive = f"{backup_path}.tar"
+                subprocess.run(['tar', '-cf', archive, '-C', staging, '.'], check=True)
+            logger.info(f"Wrote {os.path.getsize(archive)} byte archive {archive}")
 
             if self.config['storage']['type'] == 's3':
-                self._upload_to_s3(f"{backup_path}.tar.gz")
+                self._upload_to_s3(archive)
+                os.remove(archive)
 
         except Exception as e:
             logger.error(f"Backup failed: {str(e)}")
@@ -87,25 +123,28 @@ class BackupManager:
         try:
             session = boto3.Session()
             ec2 = session.client('ec2')
-            
-            for instance in self.config['backup']['instances']:
-                instance_id = instance['id']
-                
-                # Create snapshot for each volume
-                for volume_id in instance['volumes']:
-                    snapshot = ec2.create_snapshot(
-                        VolumeId=volume_id,
-                        Description=f"Automated backup {datetime.now().isoformat()}"
-                    )
-                    
-                    # Tag the snapshot
-                    ec2.create_tags(
-                        Resources=[snapshot['SnapshotId']],
-                        Tags=[{'Key': k, 'Value': v} for k, v in self.config['tags'].items()]
-                    )
-
-                    if self.config['backup']['snapshot']['enabled']:
-                        self._copy_snapshot_to_dr(snapshot['SnapshotId'])
+            snapshot_config = self.config['backup']['snapshot']
+            copy_to_dr = bool(snapshot_config['enabled'] and snapshot_config.get('copy_to_region'))
+            ec2_dr = session.client('ec2', region_name=snapshot_config['copy_to_region']) if copy_to_dr else None
+
+            instances = self.config['backup']['instances']
+            targets = resolve_volume_ids(ec2, {instance['id']: instance['volumes'] for instance in instances})
+            instance_tags = {instance['id']: instance.get('tags', {}) for instance in instances}
+            for target in targets:
+                target['tags'] = {**self.config.get('tags', {}), **instance_tags[target['instance_id']]}
+
+            orchestrator = SnapshotOrchestrator(
+                ec2, ec2_dr,
+                jobs=JobTable(snapshot_config.get('job_db', '/var/lib/autocloud/snapshot-jobs.sqlite')),
+                create_rate=snapshot_config.get('create_rate', 5.0),
+                max_copies=snapshot_config.get('max_concurrent_copies', 20),
+                encrypted=self.config.get('encryption', {}).get('enabled'),
+                copy_kms_key_id=self.config.get('encryption', {}).get('kms_key_id') or None
+            )
+            run_id = orchestrator.jobs.latest_unfinished() or f"backup-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+            result = orchestrator.run(run_id, targets, copy_to_dr=copy_to_dr)
+            if result['jobs'].get('failed'):
+                raise RuntimeError(f"{result['jobs']['failed']} of {len(targets)} snapshot jobs failed in {run_id}")
 
         except Exception as e:
             logger.error(f"AWS backup failed: {str(e)}")
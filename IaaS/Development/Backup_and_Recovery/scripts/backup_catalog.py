@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import json
+import time
+import bisect
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP = re.compile(r'(\d{8})-?(\d{6})?')
+
+
+def iter_s3_objects(s3, bucket: str, prefix: str) -> Iterator[Dict]:
+    """Every object under prefix in key order, following continuation tokens"""
+    for page in s3.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+        yield from page.get('Contents', [])
+
+
+def normalise_timestamp(value: str) -> Optional[str]:
+    """'YYYYMMDD-HHMMSS' (or the leading part of it) from a backup name or a user-supplied date"""
+    digits = re.sub(r'[^0-9]', '', value)
+    if len(digits) < 4:
+        return None
+    return digits[:8] + ('-' + digits[8:14] if len(digits) > 8 else '')
+
+
+class BackupCatalog:
+    """Sorted, date-indexed catalog of the backups under one bucket prefix
+
+    Entries are kept sorted by the YYYYMMDD-HHMMSS stamp in their key, so
+    finding the backup for a date, or the latest one before a point in time,
+    is a binary search. The catalog is cached in a local JSON file and the
+    bucket is listed again only when the cache is older than
+    refresh_seconds, or when a lookup misses on an older listing. Each
+    listing is a full one: backup names may carry a host or database name
+    before their stamp, so key order is not date order and a new backup
+    can sort anywhere in the prefix. A full listing also drops backups
+    removed by retention.
+    """
+
+    def __init__(self, s3, bucket: str, prefix: str, cache_path: Optional[str] = None,
+                 refresh_seconds: float = 300):
+        self.s3 = s3
+        self.bucket = bucket
+        self.prefix = prefix
+        self.refresh_seconds = refresh_seconds
+        if cache_path is None:
+            name = hashlib.sha256(f"{bucket}/{prefix}".encode()).hexdigest()[:16]
+            cache_path = os.path.join(os.path.expanduser('~'), '.cache', 'autocloud', f'backup-catalog-{name}.json')
+        self.cache_path = cache_path
+        self.stamps: List[str] = []
+        self.entries: List[Tuple[str, str, int]] = []
+        self.undated: List[Tuple[str, int]] = []
+        self.refreshed_at = 0.0
+        self._load()
+
+    def __len__(self):
+        return len(self.entries) + len(self.undated)
+
+    def _load(self):
+        try:
+            with open(self.cache_path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return
+        if (cached.get('bucket'), cached.get('prefix')) != (self.bucket, self.prefix):
+            return
+        self.entries = [tuple(entry) for entry in cached['entries']]
+        self.stamps = [entry[0] for entry in self.entries]
+        self.undated = [tuple(entry) for entry in cached['undated']]
+        self.refreshed_at = cached['refreshed_at']
+
+    def _save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+        with open(self.cache_path + '.tmp', 'w') as f:
+            json.dump({'bucket': self.bucket, 'prefix': self.prefix, 'entries': self.entries,
+                       'undated': self.undated, 'refreshed_at': self.refreshed_at}, f)
+        os.replace(self.cache_path + '.tmp', self.cache_path)
+
+    def add(self, key: str, size: int = 0):
+        """Insert one backup, keeping the date order"""
+        name = key[len(self.prefix):]
+        match = TIMESTAMP.search(name)
+        if match and match.group(2):
+            entry = (f"{match.group(1)}-{match.group(2)}", key, size)
+            position = bisect.bisect_right(self.entries, entry)
+            if position and self.entries[position - 1] == entry:
+                return
+            self.entries.insert(position, entry)
+            self.stamps.insert(position, entry[0])
+        elif (key, size) not in self.undated:
+            self.undated.append((key, size))
+
+    def refresh(self) -> int:
+        """Rebuild the catalog from a full listing of the prefix; return how many backups are new"""
+        known = {entry[1] for entry in self.entries} | {key for key, _ in self.undated}
+        self.entries, self.stamps, self.undated = [], [], []
+        for obj in iter_s3_objects(self.s3, self.bucket, self.prefix):
+            self.add(obj['Key'], obj.get('Size', 0))
+        self.refreshed_at = time.time()
+        self._save()
+        keys = {entry[1] for entry in self.entries} | {key for key, _ in self.undated}
+        added = len(keys - known)
+        logger.info(f"Backup catalog refreshed: {added} new, {len(known - keys)} gone, {len(self)} total")
+        return added
+
+    def _ensure_fresh(self) -> bool:
+        """Re-list if the cache is stale; True when this call listed the bucket"""
+        if time.time() - self.refreshed_at > self.refresh_seconds:
+            self.refresh()
+            return True
+        return False
+
+    def _find(self, stamp: str) -> Optional[str]:
+        position = bisect.bisect_left(self.stamps, stamp)
+        if position < len(self.stamps) and self.stamps[position].startswith(stamp):
+            return self.entries[position][1]
+        return None
+
+    def _lookup(self, backup_date: str) -> Optional[str]:
+        stamp = normalise_timestamp(backup_date)
+        key = self._find(stamp) if stamp else None
+        if key is None:
+            key = next((k for k, _ in self.undated if backup_date in k), None)
+        return key
+
+    def find(self, backup_date: str) -> Optional[str]:
+        """Key of the earliest backup whose stamp starts with backup_date (YYYYMMDD[-HHMMSS])"""
+        listed = self._ensure_fresh()
+        key = self._lookup(backup_date)
+        if key is None and not listed:
+            # Possibly a backup taken since the last listing: re-list once before giving up
+            self.refresh()
+            key = self._lookup(backup_date)
+        return key
+
+    def latest(self, before: Optional[datetime] = None) -> Optional[str]:
+        """Key of the newest backup taken at or before `before` (default: now)"""
+        self._ensure_fresh()
+        if before is None:
+            return self.entries[-1][1] if self.entries else None
+        position = bisect.bisect_right(self.stamps, before.strftime('%Y%m%d-%H%M%S'))
+        return self.entries[position - 1][1] if position else None
+
+    def between(self, start: datetime, end: datetime) -> List[str]:
+        """Keys of backups taken in [start, end], oldest first"""
+        self._ensure_fresh()
+        low = bisect.bisect_left(self.stamps, start.strftime('%Y%m%d-%H%M%S'))
+        high = bisect.bisect_right(self.stamps, end.strftime('%Y%m%d-%H%M%S'))
+        return [entry[1] for entry in self.entries[low:high]]
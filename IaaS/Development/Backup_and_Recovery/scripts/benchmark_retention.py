@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Benchmark for GFS snapshot retention
+
+Plans retention for a large backup group held by an in-process EC2
+stand-in (1000 snapshots per DescribeSnapshots page, fixed latency per
+request, account rate limit), then deletes a sample of the plan serially
+and with SnapshotDeleter.
+
+    python benchmark_retention.py --snapshots 150000 --deletes 2000
+"""
+
+import time
+import random
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+
+from botocore.exceptions import ClientError
+
+from retention import SnapshotDeleter, apply_retention, plan_retention
+
+POLICY = {'hourly': 24, 'daily': 14, 'weekly': 8, 'monthly': 12, 'yearly': 3}
+
+
+class Meta:
+    region_name = 'us-east-1'
+
+
+class Paginator:
+    def __init__(self, client):
+        self.client = client
+
+    def paginate(self, PaginationConfig=None, **kwargs):
+        snapshots = list(self.client.snapshots.values())
+        for start in range(0, len(snapshots), 1000):
+            self.client.request()
+            yield {'Snapshots': snapshots[start:start + 1000]}
+
+
+class StubEC2:
+    def __init__(self, snapshots, latency, rate_limit):
+        self.meta = Meta()
+        self.snapshots = {s['SnapshotId']: s for s in snapshots}
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.window = []
+        self.requests = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def request(self):
+        with self._lock:
+            now = time.monotonic()
+            self.window = [t for t in self.window if now - t < 1.0]
+            self.requests += 1
+            if len(self.window) >= self.rate_limit:
+                self.throttled += 1
+                raise ClientError({'Error': {'Code': 'RequestLimitExceeded', 'Message': ''}}, 'DeleteSnapshot')
+            self.window.append(now)
+        time.sleep(self.latency)
+
+    def get_paginator(self, operation):
+        return Paginator(self)
+
+    def delete_snapshot(self, SnapshotId):
+        self.request()
+        self.snapshots.pop(SnapshotId)
+
+
+def make_snapshots(count, seed=3):
+    """Hourly snapshots going back `count` hours, with some jitter and gaps"""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    return [{'SnapshotId': f'snap-{n:08x}', 'State': 'completed',
+             'StartTime': now - timedelta(hours=n, minutes=rng.randint(0, 20))}
+            for n in range(count) if rng.random() > 0.02]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--snapshots', type=int, default=150000)
+    parser.add_argument('--deletes', type=int, default=2000, help='deletions to time in each mode')
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--rate-limit', type=int, default=100)
+    parser.add_argument('--delete-rate', type=float, default=80)
+    args = parser.parse_args()
+
+    snapshots = make_snapshots(args.snapshots)
+    print(f"{len(snapshots)} snapshots, policy {POLICY}, {args.latency_ms:.0f} ms per request, "
+          f"{args.rate_limit} requests/s limit")
+
+    start = time.perf_counter()
+    plan = plan_retention(snapshots, POLICY, 'bench')
+    print(f"{'Plan (in memory)':<30} {time.perf_counter() - start:>7.2f}s  keep {len(plan.keep)}, "
+          f"delete {len(plan.delete)}")
+
+    ec2 = StubEC2(snapshots, args.latency_ms / 1000, args.rate_limit)
+    start = time.perf_counter()
+    result = apply_retention(ec2, 'bench', POLICY, dry_run=True)
+    print(f"{'Dry run (list + plan)':<30} {time.perf_counter() - start:>7.2f}s  {ec2.requests} requests, "
+          f"would delete {len(result['would_delete'])}")
+
+    victims = [s['SnapshotId'] for s in plan.delete]
+    serial, concurrent = victims[:args.deletes], victims[args.deletes:2 * args.deletes]
+
+    start = time.perf_counter()
+    for snapshot_id in serial:
+        ec2.delete_snapshot(SnapshotId=snapshot_id)
+    seconds = time.perf_counter() - start
+    print(f"{'Serial delete_snapshot':<30} {seconds:>7.2f}s  {len(serial) / seconds:>6.1f} deletes/s")
+
+    throttled = ec2.throttled
+    deleter = SnapshotDeleter(ec2, rate=args.delete_rate)
+    start = time.perf_counter()
+    outcome = deleter.delete(concurrent)
+    seconds = time.perf_counter() - start
+    print(f"{'SnapshotDeleter':<30} {seconds:>7.2f}s  {len(outcome['deleted']) / seconds:>6.1f} deletes/s, "
+          f"{ec2.throttled - throttled} throttled, {len(outcome['failed'])} failed")
+
+
+if __name__ == '__main__':
+    main()
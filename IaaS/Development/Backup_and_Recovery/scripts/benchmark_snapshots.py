@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""Benchmark for the snapshot fan-out orchestrator
+
+Runs against an in-process EC2 stand-in with a fixed latency per request,
+an account-wide request rate limit (RequestLimitExceeded above it), a
+snapshot completion delay, and a cap on concurrent DR copies
+(ResourceLimitExceeded above it). Compares the serial create / tag / copy
+loop with SnapshotOrchestrator, then interrupts a run and resumes it.
+
+    python benchmark_snapshots.py --volumes 500 --latency-ms 20
+"""
+
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+from botocore.exceptions import ClientError
+
+from snapshot_orchestrator import JobTable, SnapshotOrchestrator
+
+
+def _error(code):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, 'Stub')
+
+
+class Meta:
+    region_name = 'us-east-1'
+
+
+class Paginator:
+    def __init__(self, client):
+        self.client = client
+
+    def paginate(self, Filters=None, PaginationConfig=None, **kwargs):
+        self.client._request()
+        run_id = Filters[0]['Values'][0]
+        snapshots = [s for s in self.client.all_snapshots() if s['Tags'].get('BackupRun') == run_id]
+        for start in range(0, len(snapshots), 1000):
+            yield {'Snapshots': [self.client.public(s) for s in snapshots[start:start + 1000]]}
+
+
+class Region:
+    """One region's snapshots; all regions share the account's request budget"""
+
+    def __init__(self, account, name):
+        self.account = account
+        self.meta = Meta()
+        self.meta.region_name = name
+        self.snapshots = {}
+
+    def _request(self):
+        self.account.request()
+
+    def all_snapshots(self):
+        return list(self.snapshots.values())
+
+    def public(self, snapshot):
+        state = 'completed' if time.monotonic() >= snapshot['ready_at'] else 'pending'
+        return {'SnapshotId': snapshot['SnapshotId'], 'VolumeId': snapshot['VolumeId'], 'State': state,
+                'Tags': [{'Key': k, 'Value': v} for k, v in snapshot['Tags'].items()]}
+
+    def _add(self, volume_id, tags, duration):
+        with self.account.lock:
+            self.account.snapshot_count += 1
+            snapshot_id = f'snap-{self.account.snapshot_count:08d}'
+        self.snapshots[snapshot_id] = {'SnapshotId': snapshot_id, 'VolumeId': volume_id, 'Tags': dict(tags),
+                                       'ready_at': time.monotonic() + duration}
+        return snapshot_id
+
+    def get_paginator(self, operation):
+        return Paginator(self)
+
+    def create_snapshot(self, VolumeId, Description='', TagSpecifications=()):
+        self._request()
+        self.account.creates += 1
+        tags = {t['Key']: t['Value'] for spec in TagSpecifications for t in spec['Tags']}
+        return {'SnapshotId': self._add(VolumeId, tags, self.account.snapshot_seconds())}
+
+    def create_tags(self, Resources, Tags):
+        self._request()
+        for resource in Resources:
+            self.snapshots[resource]['Tags'].update({t['Key']: t['Value'] for t in Tags})
+
+    def describe_snapshots(self, SnapshotIds):
+        self._request()
+        return {'Snapshots': [self.public(self.snapshots[s]) for s in SnapshotIds]}
+
+    def copy_snapshot(self, SourceRegion, SourceSnapshotId, TagSpecifications=(), **kwargs):
+        self._request()
+        source = self.account.regions[SourceRegion].snapshots[SourceSnapshotId]
+        if time.monotonic() < source['ready_at']:
+            raise _error('IncorrectState')
+        now = time.monotonic()
+        active = [s for s in self.snapshots.values() if s['ready_at'] > now]
+        if len(active) >= self.account.max_copies:
+            raise _error('ResourceLimitExceeded')
+        tags = {t['Key']: t['Value'] for spec in TagSpecifications for t in spec['Tags']}
+        return {'SnapshotId': self._add(source['VolumeId'], tags, self.account.copy_seconds)}
+
+
+class StubAccount:
+    def __init__(self, latency, rate_limit, snapshot_seconds, copy_seconds, max_copies):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.snapshot_range = snapshot_seconds
+        self.copy_seconds = copy_seconds
+        self.max_copies = max_copies
+        self.lock = threading.Lock()
+        self.window = []
+        self.requests = 0
+        self.throttled = 0
+        self.creates = 0
+        self.snapshot_count = 0
+        self.rng = random.Random(5)
+        self.regions = {'us-east-1': Region(self, 'us-east-1'), 'us-west-2': Region(self, 'us-west-2')}
+
+    def snapshot_seconds(self):
+        return self.rng.uniform(*self.snapshot_range)
+
+    def request(self):
+        with self.lock:
+            now = time.monotonic()
+            self.window = [t for t in self.window if now - t < 1.0]
+            self.requests += 1
+            if len(self.window) >= self.rate_limit:
+                self.throttled += 1
+                raise _error('RequestLimitExceeded')
+            self.window.append(now)
+        time.sleep(self.latency)
+
+
+def retry(fn, **kwargs):
+    for attempt in range(10):
+        try:
+            return fn(**kwargs)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'RequestLimitExceeded':
+                raise
+            time.sleep(0.1 * 2 ** attempt)
+
+
+def serial_loop(account, volumes, poll):
+    """create_snapshot + create_tags per volume, then each DR copy once its snapshot completes"""
+    ec2, dr = account.regions['us-east-1'], account.regions['us-west-2']
+    snapshots = []
+    for volume in volumes:
+        snapshot_id = retry(ec2.create_snapshot, VolumeId=volume)['SnapshotId']
+        retry(ec2.create_tags, Resources=[snapshot_id], Tags=[{'Key': 'BackupGroup', 'Value': 'bench'}])
+        snapshots.append(snapshot_id)
+    copies = []
+    for snapshot_id in snapshots:
+        while True:
+            try:
+                copies.append(dr.copy_snapshot(SourceRegion='us-east-1', SourceSnapshotId=snapshot_id)['SnapshotId'])
+                break
+            except ClientError:
+                time.sleep(poll)
+    while any(s['State'] != 'completed' for s in retry(dr.describe_snapshots, SnapshotIds=copies)['Snapshots']):
+        time.sleep(poll)
+
+
+def orchestrated(account, volumes, db, run_id, poll, rate, timeout=None):
+    orchestrator = SnapshotOrchestrator(account.regions['us-east-1'], account.regions['us-west-2'], jobs=JobTable(db),
+                                        create_rate=rate, create_burst=int(rate), max_copies=account.max_copies,
+                                        poll_interval=poll)
+    targets = [{'volume_id': volume, 'tags': {'BackupGroup': 'bench'}} for volume in volumes]
+    return orchestrator.run(run_id, targets, copy_to_dr=True, timeout=timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--volumes', type=int, default=500)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--rate-limit', type=int, default=50, help='account requests per second')
+    parser.add_argument('--create-rate', type=float, default=40)
+    parser.add_argument('--snapshot-seconds', type=float, nargs=2, default=(0.5, 2.0))
+    parser.add_argument('--copy-seconds', type=float, default=1.0)
+    parser.add_argument('--max-copies', type=int, default=20)
+    parser.add_argument('--poll', type=float, default=0.25)
+    args = parser.parse_args()
+
+    volumes = [f'vol-{n:08x}' for n in range(args.volumes)]
+
+    def account():
+        return StubAccount(args.latency_ms / 1000, args.rate_limit, args.snapshot_seconds,
+                           args.copy_seconds, args.max_copies)
+
+    print(f"{args.volumes} volumes, {args.latency_ms:.0f} ms per request, {args.rate_limit} requests/s limit, "
+          f"{args.max_copies} concurrent copies")
+    print(f"{'Run':<34} {'Time':>8} {'Requests':>9} {'Throttled':>10}")
+
+    stub = account()
+    start = time.perf_counter()
+    serial_loop(stub, volumes, args.poll)
+    print(f"{'Serial create/tag/copy':<34} {time.perf_counter() - start:>7.2f}s {stub.requests:>9} {stub.throttled:>10}")
+
+    stub = account()
+    start = time.perf_counter()
+    result = orchestrated(stub, volumes, tempfile.mktemp(suffix='.sqlite'), 'bench', args.poll, args.create_rate)
+    print(f"{'SnapshotOrchestrator':<34} {time.perf_counter() - start:>7.2f}s {stub.requests:>9} "
+          f"{stub.throttled:>10}  {result['jobs']}, peak copies {result['stats']['peak_copies']}")
+
+    stub = account()
+    db = tempfile.mktemp(suffix='.sqlite')
+    start = time.perf_counter()
+    first = orchestrated(stub, volumes, db, 'resume', args.poll, args.create_rate, timeout=2.0)
+    second = orchestrated(stub, volumes, db, 'resume', args.poll, args.create_rate)
+    print(f"{'Interrupted after 2s, resumed':<34} {time.perf_counter() - start:>7.2f}s {stub.requests:>9} "
+          f"{stub.throttled:>10}  {second['jobs']}, {stub.creates} CreateSnapshot calls, "
+          f"first pass stopped at {first['jobs']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -10,6 +10,7 @@ import libvirt
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, List
+from backup_catalog import BackupCatalog, iter_s3_objects
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -25,6 +26,7 @@ class RecoveryManager:
             'aws': self._recover_aws,
             'kvm': self._recover_kvm
         }
+        self._catalog = None
 
     def _load_config(self, config_path: str) -> Dict[str, Any]:
         with open(config_path, 'r') as f:
@@ -56,9 +58,8 @@ class RecoveryManager:
             bucket = self.config['storage']['bucket']
             prefix = self.config['storage']['prefix']
             
-            # List available backups
-            backups = self._list_s3_backups(bucket, prefix)
-            backup_file = next((b for b in backups if backup_date in b), None)
+            # Binary search of the local backup catalog instead of listing the bucket
+            backup_file = self._backup_catalog(s3, bucket, prefix).find(backup_date)
             
             if not backup_file:
                 raise ValueError(f"No backup found for date: {backup_date}")
@@ -144,8 +145,14 @@ class RecoveryManager:
     def _list_s3_backups(self, bucket: str, prefix: str) -> List[str]:
         """List available backups in S3."""
         s3 = boto3.client('s3')
-        response = s3.list_objects_v2(Bucket=bucket, Prefix=prefix)
-        return [obj['Key'] for obj in response.get('Contents', [])]
+        return [obj['Key'] for obj in iter_s3_objects(s3, bucket, prefix)]
+
+    def _backup_catalog(self, s3, bucket: str, prefix: str) -> BackupCatalog:
+        """Date-indexed catalog of the backups under prefix, cached between runs."""
+        if self._catalog is None:
+            self._catalog = BackupCatalog(s3, bucket, prefix,
+                                          cache_path=self.config['storage'].get('catalog_path'))
+        return self._catalog
 
     def run_recovery(self, **kwargs):
         """Run recovery for the configured platform."""
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List
+from botocore.exceptions import ClientError
+
+from snapshot_orchestrator import RateLimiter, call_with_retry
+
+logger = logging.getLogger(__name__)
+
+TIERS = ('hourly', 'daily', 'weekly', 'monthly', 'yearly')
+
+
+def iter_group_snapshots(ec2, backup_group: str) -> Iterator[Dict]:
+    """Every snapshot we own in a backup group, 1000 per DescribeSnapshots page"""
+    paginator = ec2.get_paginator('describe_snapshots')
+    for page in paginator.paginate(OwnerIds=['self'], Filters=[{'Name': 'tag:BackupGroup', 'Values': [backup_group]}],
+                                   PaginationConfig={'PageSize': 1000}):
+        yield from page.get('Snapshots', [])
+
+
+def _period_keys(start: datetime) -> Dict[str, int]:
+    """The hour, day, ISO week, month and year a snapshot falls in (UTC), as integers"""
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    seconds = int(start.timestamp())
+    day = seconds // 86400
+    utc = start.astimezone(timezone.utc)
+    return {
+        'hourly': seconds // 3600,
+        'daily': day,
+        # 1970-01-01 was a Thursday; shifting by 3 makes weeks start on Monday
+        'weekly': (day + 3) // 7,
+        'monthly': utc.year * 12 + utc.month,
+        'yearly': utc.year,
+    }
+
+
+class RetentionPlan:
+    """Which snapshots a policy keeps (and why) and which it deletes"""
+
+    def __init__(self, backup_group: str, policy: Dict[str, int]):
+        self.backup_group = backup_group
+        self.policy = policy
+        self.keep: Dict[str, List[str]] = {}
+        self.delete: List[Dict] = []
+        self.snapshots = 0
+        self.volumes = 0
+
+    def summary(self) -> Dict:
+        by_tier = {tier: 0 for tier in TIERS if self.policy.get(tier)}
+        for reasons in self.keep.values():
+            for reason in reasons:
+                if reason in by_tier:
+                    by_tier[reason] += 1
+        return {
+            'backup_group': self.backup_group,
+            'snapshots': self.snapshots,
+            'volumes': self.volumes,
+            'keep': len(self.keep),
+            'delete': len(self.delete),
+            'kept_by_tier': by_tier,
+            'oldest_deleted': min((s['StartTime'] for s in self.delete), default=None),
+        }
+
+
+def snapshot_volume(snapshot: Dict) -> str:
+    """The volume a snapshot is a backup of
+
+    DR copies carry a placeholder VolumeId, so the SourceVolumeId tag the
+    orchestrator sets on every snapshot it creates or copies comes first.
+    """
+    for tag in snapshot.get('Tags', []):
+        if tag['Key'] == 'SourceVolumeId':
+            return tag['Value']
+    return snapshot.get('VolumeId', '')
+
+
+def plan_retention(snapshots, policy: Dict[str, int], backup_group: str = '') -> RetentionPlan:
+    """Grandfather-father-son retention over snapshots in one sorted pass
+
+    A backup group holds several volumes, and each volume's snapshots are a
+    separate series: the policy applies to every volume on its own. Walking
+    a volume's snapshots from newest to oldest, each tier keeps the newest
+    snapshot of each of its N most recent periods that have a snapshot
+    (policy {'daily': 7} keeps the last snapshot of each of the last 7 days
+    with backups). Counting periods that have backups, rather than a
+    calendar cutoff, means a stalled schedule never ages every backup out.
+    The newest snapshot of every volume and any not yet completed are
+    always kept.
+    """
+    plan = RetentionPlan(backup_group, policy)
+    tiers = [(tier, policy[tier]) for tier in TIERS if policy.get(tier)]
+    last_key = {}
+    kept = {}
+
+    ordered = sorted(snapshots, key=lambda s: s['StartTime'], reverse=True)
+    plan.snapshots = len(ordered)
+    for snapshot in ordered:
+        volume = snapshot_volume(snapshot)
+        reasons = []
+        if volume not in last_key:
+            last_key[volume] = {tier: None for tier, _ in tiers}
+            kept[volume] = {tier: 0 for tier, _ in tiers}
+            reasons.append('latest')
+        volume_last, volume_kept = last_key[volume], kept[volume]
+        if snapshot.get('State', 'completed') != 'completed':
+            reasons.append(snapshot['State'])
+        keys = _period_keys(snapshot['StartTime'])
+        for tier, count in tiers:
+            if volume_kept[tier] < count and keys[tier] != volume_last[tier]:
+                volume_last[tier] = keys[tier]
+                volume_kept[tier] += 1
+                reasons.append(tier)
+        if reasons:
+            plan.keep[snapshot['SnapshotId']] = reasons
+        else:
+            plan.delete.append(snapshot)
+    plan.volumes = len(last_key)
+    return plan
+
+
+class SnapshotDeleter:
+    """Deletes snapshots on a thread pool within an API rate, retrying throttled calls
+
+    EC2 has no batch delete, so throughput comes from concurrency; the
+    shared token bucket keeps the pool under the account's request rate.
+    Snapshots already gone count as deleted, and ones still referenced by
+    an AMI are skipped rather than failing the run.
+    """
+
+    def __init__(self, ec2, rate: float = 20.0, max_workers: int = 16, max_attempts: int = 8,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.ec2 = ec2
+        self.limiter = RateLimiter(rate, max(1, int(rate)))
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.sleep = sleep
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def _on_throttle(self):
+        with self._lock:
+            self.throttled += 1
+
+    def _delete(self, snapshot_id: str) -> str:
+        try:
+            call_with_retry(self.limiter, self.ec2.delete_snapshot, self.max_attempts, self.sleep,
+                            self._on_throttle, SnapshotId=snapshot_id)
+            return 'deleted'
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            if code == 'InvalidSnapshot.NotFound':
+                return 'deleted'
+            if code == 'InvalidSnapshot.InUse':
+                return 'in_use'
+            logger.error(f"Failed to delete snapshot {snapshot_id}: {str(e)}")
+            return 'failed'
+
+    def delete(self, snapshot_ids: List[str]) -> Dict:
+        results = {'deleted': [], 'in_use': [], 'failed': []}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='snapshot-delete') as pool:
+            for snapshot_id, outcome in zip(snapshot_ids, pool.map(self._delete, snapshot_ids)):
+                results[outcome].append(snapshot_id)
+        logger.info(f"Deleted {len(results['deleted'])} snapshots, {len(results['in_use'])} in use by AMIs, "
+                    f"{len(results['failed'])} failed, {self.throttled} throttled retries")
+        return results
+
+
+def apply_retention(ec2, backup_group: str, policy: Dict[str, int], dry_run: bool = False,
+                    rate: float = 20.0, max_workers: int = 16) -> Dict:
+    """List a group's snapshots, plan its retention and (unless dry_run) delete what the plan drops"""
+    started = time.perf_counter()
+    plan = plan_retention(iter_group_snapshots(ec2, backup_group), policy, backup_group)
+    result = {'plan': plan.summary(), 'dry_run': dry_run, 'region': ec2.meta.region_name}
+    logger.info(f"Retention plan for {backup_group} in {ec2.meta.region_name}: keep {len(plan.keep)}, "
+                f"delete {len(plan.delete)} of {plan.snapshots} ({time.perf_counter() - started:.2f}s)")
+    if dry_run:
+        result['would_delete'] = [s['SnapshotId'] for s in plan.delete]
+        return result
+    outcome = SnapshotDeleter(ec2, rate, max_workers).delete([s['SnapshotId'] for s in plan.delete])
+    result.update({name: len(ids) for name, ids in outcome.items()})
+    result['failed_ids'] = outcome['failed']
+    return result
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import time
+import random
+import sqlite3
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional
+from botocore.exceptions import BotoCoreError, ClientError
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_CODES = {
+    'RequestLimitExceeded', 'Throttling', 'ThrottlingException',
+    'SnapshotCreationPerVolumeRateExceeded', 'ResourceLimitExceeded',
+}
+
+# Job states, in order. 'creating' and 'copying' mean a request was sent
+# but its result not yet recorded; a resumed run adopts the snapshot by its
+# BackupRun tag or sends the request again.
+PENDING, CREATING, SNAPSHOT, COPY_WAITING, COPYING, COPY, DONE, FAILED = (
+    'pending', 'creating', 'snapshot', 'copy_waiting', 'copying', 'copy', 'done', 'failed')
+ACTIVE = (PENDING, CREATING, SNAPSHOT, COPY_WAITING, COPYING, COPY)
+
+
+class RateLimiter:
+    """Token bucket shared by the worker threads: `rate` calls per second, bursts up to `burst`"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+
+class JobTable:
+    """SQLite record of every volume in a snapshot run and how far it got
+
+    Rows are only written from the orchestrator's control thread. attempts
+    counts the create and copy requests sent for a volume.
+    """
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db = sqlite3.connect(db_path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "run_id TEXT, volume_id TEXT, instance_id TEXT, tags TEXT, copy INTEGER, state TEXT, "
+            "snapshot_id TEXT, dr_snapshot_id TEXT, attempts INTEGER DEFAULT 0, error TEXT, updated_at REAL, "
+            "PRIMARY KEY (run_id, volume_id))"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (run_id, state)")
+
+    def add(self, run_id: str, targets: List[Dict], copy_to_dr: bool):
+        """Register volumes for a run; volumes already in the run keep their progress"""
+        now = time.time()
+        self.db.executemany(
+            "INSERT OR IGNORE INTO jobs (run_id, volume_id, instance_id, tags, copy, state, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(run_id, t['volume_id'], t.get('instance_id'), json.dumps(t.get('tags', {})),
+              int(t.get('copy_to_dr', copy_to_dr)), PENDING, now) for t in targets]
+        )
+        self.db.commit()
+
+    def jobs(self, run_id: str, *states: str, limit: int = -1) -> List[sqlite3.Row]:
+        if not states:
+            return self.db.execute("SELECT * FROM jobs WHERE run_id = ? LIMIT ?", (run_id, limit)).fetchall()
+        marks = ','.join('?' * len(states))
+        return self.db.execute(f"SELECT * FROM jobs WHERE run_id = ? AND state IN ({marks}) LIMIT ?",
+                               (run_id, *states, limit)).fetchall()
+
+    def count(self, run_id: str, *states: str) -> int:
+        marks = ','.join('?' * len(states))
+        return self.db.execute(f"SELECT COUNT(*) FROM jobs WHERE run_id = ? AND state IN ({marks})",
+                               (run_id, *states)).fetchone()[0]
+
+    def set(self, run_id: str, volume_id: str, state: str, **fields):
+        fields.update(state=state, updated_at=time.time())
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        self.db.execute(f"UPDATE jobs SET {assignments} WHERE run_id = ? AND volume_id = ?",
+                        (*fields.values(), run_id, volume_id))
+
+    def bump_attempts(self, run_id: str, volume_id: str):
+        self.db.execute("UPDATE jobs SET attempts = attempts + 1 WHERE run_id = ? AND volume_id = ?",
+                        (run_id, volume_id))
+
+    def commit(self):
+        self.db.commit()
+
+    def latest_unfinished(self) -> Optional[str]:
+        marks = ','.join('?' * len(ACTIVE))
+        row = self.db.execute(
+            f"SELECT run_id FROM jobs WHERE state IN ({marks}) ORDER BY updated_at DESC LIMIT 1", ACTIVE
+        ).fetchone()
+        return row[0] if row else None
+
+    def summary(self, run_id: str) -> Dict[str, int]:
+        rows = self.db.execute("SELECT state, COUNT(*) FROM jobs WHERE run_id = ? GROUP BY state", (run_id,))
+        return dict(rows.fetchall())
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+
+def call_with_retry(limiter: RateLimiter, fn, max_attempts: int = 8, sleep: Callable[[float], None] = time.sleep,
+                    on_throttle: Optional[Callable[[], None]] = None, **kwargs):
+    """Call fn(**kwargs) through the limiter, backing off with jitter on throttling errors"""
+    for attempt in range(max_attempts):
+        limiter.acquire()
+        try:
+            return fn(**kwargs)
+        except ClientError as e:
+            if e.response['Error']['Code'] not in THROTTLE_CODES or attempt == max_attempts - 1:
+                raise
+            if on_throttle:
+                on_throttle()
+            sleep(min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.0))
+
+
+def _tag_list(tags: Dict[str, str]) -> List[Dict[str, str]]:
+    return [{'Key': str(k), 'Value': str(v)} for k, v in tags.items()]
+
+
+def iter_run_snapshots(ec2, run_id: str) -> Iterator[Dict]:
+    """Every snapshot we own tagged with this run, a page of up to 1000 per request"""
+    paginator = ec2.get_paginator('describe_snapshots')
+    for page in paginator.paginate(OwnerIds=['self'], Filters=[{'Name': 'tag:BackupRun', 'Values': [run_id]}],
+                                   PaginationConfig={'PageSize': 1000}):
+        yield from page.get('Snapshots', [])
+
+
+def resolve_volume_ids(ec2, volumes_by_instance: Dict[str, List[str]]) -> List[Dict]:
+    """Turn {instance_id: [volume id or device name]} into targets
+
+    Device names are looked up with paginated DescribeVolumes calls filtered
+    on up to 200 instance ids at a time, instead of one call per instance.
+    """
+    targets = []
+    lookups = {}
+    for instance_id, volumes in volumes_by_instance.items():
+        for volume in volumes:
+            if volume.startswith('vol-'):
+                targets.append({'instance_id': instance_id, 'volume_id': volume})
+            else:
+                lookups[(instance_id, volume)] = None
+    instance_ids = sorted({instance_id for instance_id, _ in lookups})
+    paginator = ec2.get_paginator('describe_volumes')
+    for start in range(0, len(instance_ids), 200):
+        filters = [{'Name': 'attachment.instance-id', 'Values': instance_ids[start:start + 200]}]
+        for page in paginator.paginate(Filters=filters):
+            for volume in page.get('Volumes', []):
+                for attachment in volume.get('Attachments', []):
+                    key = (attachment['InstanceId'], attachment['Device'])
+                    if key in lookups:
+                        lookups[key] = volume['VolumeId']
+    for (instance_id, device), volume_id in lookups.items():
+        if volume_id is None:
+            logger.warning(f"No volume attached to {instance_id} at {device}, skipping")
+        else:
+            targets.append({'instance_id': instance_id, 'volume_id': volume_id})
+    return targets
+
+
+class SnapshotOrchestrator:
+    """Fans EBS snapshots out concurrently and pipelines their DR-region copies
+
+    CreateSnapshot requests go through a worker pool paced by a token
+    bucket, and carry their tags (including BackupRun=<run_id>) in
+    TagSpecifications, so no separate CreateTags call is needed. Snapshot
+    progress is polled by tag, one paginated DescribeSnapshots per poll
+    rather than one per volume. As soon as a snapshot completes its
+    CopySnapshot is issued, with at most max_copies copies in flight (the
+    per-region concurrent copy limit). Throttling errors back off and retry.
+
+    Every state change is recorded in a JobTable, so an interrupted run
+    resumes where it stopped when started again with the same run_id.
+    """
+
+    def __init__(self, ec2, ec2_dr=None, jobs: Optional[JobTable] = None, source_region: Optional[str] = None,
+                 create_rate: float = 5.0, create_burst: int = 20, max_workers: int = 16, max_copies: int = 20,
+                 poll_interval: float = 15.0, max_attempts: int = 8, copy_kms_key_id: Optional[str] = None,
+                 encrypted: Optional[bool] = None, sleep: Callable[[float], None] = time.sleep):
+        self.ec2 = ec2
+        self.ec2_dr = ec2_dr
+        self.jobs = jobs if jobs is not None else JobTable(
+            os.path.join(os.path.expanduser('~'), '.cache', 'autocloud', 'snapshot-jobs.sqlite'))
+        self.source_region = source_region or ec2.meta.region_name
+        self.create_limiter = RateLimiter(create_rate, create_burst)
+        self.describe_limiter = RateLimiter(max(create_rate, 2.0), 5)
+        self.max_workers = max_workers
+        self.max_copies = max_copies
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.copy_kms_key_id = copy_kms_key_id
+        self.encrypted = encrypted
+        self.sleep = sleep
+        self.stats = {'created': 0, 'copied': 0, 'failed': 0, 'adopted': 0, 'throttled': 0, 'peak_copies': 0}
+        self._stats_lock = threading.Lock()
+
+    def _call(self, limiter: RateLimiter, fn, **kwargs):
+        return call_with_retry(limiter, fn, self.max_attempts, self.sleep, self._throttled, **kwargs)
+
+    def _throttled(self):
+        with self._stats_lock:
+            self.stats['throttled'] += 1
+
+    def _tags(self, run_id: str, job) -> Dict[str, str]:
+        tags = json.loads(job['tags'])
+        tags.update(BackupRun=run_id, SourceVolumeId=job['volume_id'])
+        if job['instance_id']:
+            tags['SourceInstanceId'] = job['instance_id']
+        return tags
+
+    def _create(self, run_id: str, job) -> str:
+        response = self._call(
+            self.create_limiter, self.ec2.create_snapshot,
+            VolumeId=job['volume_id'],
+            Description=f"Automated backup {run_id} of {job['volume_id']}",
+            TagSpecifications=[{'ResourceType': 'snapshot', 'Tags': _tag_list(self._tags(run_id, job))}]
+        )
+        return response['SnapshotId']
+
+    def _copy(self, run_id: str, job) -> str:
+        tags = self._tags(run_id, job)
+        tags['SourceSnapshotId'] = job['snapshot_id']
+        kwargs = {
+            'SourceRegion': self.source_region,
+            'SourceSnapshotId': job['snapshot_id'],
+            'Description': f"DR copy of {job['snapshot_id']} ({run_id})",
+            'TagSpecifications': [{'ResourceType': 'snapshot', 'Tags': _tag_list(tags)}],
+        }
+        if self.encrypted is not None:
+            kwargs['Encrypted'] = self.encrypted
+        if self.copy_kms_key_id:
+            kwargs['KmsKeyId'] = self.copy_kms_key_id
+        return self._call(self.create_limiter, self.ec2_dr.copy_snapshot, **kwargs)['SnapshotId']
+
+    @staticmethod
+    def _list_run(ec2, run_id: str) -> Dict[str, Dict]:
+        return {snapshot['SnapshotId']: snapshot for snapshot in iter_run_snapshots(ec2, run_id)}
+
+    def _describe(self, ec2, run_id: str) -> Dict[str, Dict]:
+        return self._call(self.describe_limiter, self._list_run, ec2=ec2, run_id=run_id)
+
+    def _recover(self, run_id: str, interrupted: Optional[List] = None):
+        """Adopt snapshots whose request went out before an interruption, so nothing is snapshotted twice"""
+        if interrupted is None:
+            interrupted = self.jobs.jobs(run_id, CREATING, COPYING)
+        if not interrupted:
+            return
+        by_volume = {}
+        by_source = {}
+        for snapshot in self._describe(self.ec2, run_id).values():
+            by_volume[snapshot['VolumeId']] = snapshot['SnapshotId']
+        if self.ec2_dr is not None and any(job['state'] == COPYING for job in interrupted):
+            for snapshot in self._describe(self.ec2_dr, run_id).values():
+                source = {tag['Key']: tag['Value'] for tag in snapshot.get('Tags', [])}.get('SourceSnapshotId')
+                by_source[source] = snapshot['SnapshotId']
+        for job in interrupted:
+            if job['state'] == CREATING:
+                adopted = by_volume.get(job['volume_id'])
+                if adopted:
+                    self.jobs.set(run_id, job['volume_id'], SNAPSHOT if job['copy'] else DONE, snapshot_id=adopted)
+                else:
+                    self.jobs.set(run_id, job['volume_id'], PENDING)
+            else:
+                # The source snapshot of a copy always exists; only a DR copy counts as adopted
+                adopted = by_source.get(job['snapshot_id'])
+                if adopted:
+                    self.jobs.set(run_id, job['volume_id'], COPY, dr_snapshot_id=adopted)
+                else:
+                    self.jobs.set(run_id, job['volume_id'], COPY_WAITING)
+            self.stats['adopted'] += bool(adopted)
+        self.jobs.commit()
+
+    def _recover_lost(self, run_id: str, lost: Dict[str, str]) -> bool:
+        """Settle requests that got no response (a dropped connection or a read timeout)
+
+        Such a request may or may not have gone through, so its job is
+        adopted by tag as after an interruption, or else sent again while it
+        has attempts left. Returns False when the snapshots could not be
+        listed either; the caller tries again later.
+        """
+        interrupted = [job for job in self.jobs.jobs(run_id, CREATING, COPYING) if job['volume_id'] in lost]
+        try:
+            self._recover(run_id, interrupted)
+        except (BotoCoreError, ClientError) as e:
+            logger.warning(f"Could not list snapshots of run {run_id} to settle lost requests: {e}")
+            return False
+        for job in self.jobs.jobs(run_id, PENDING, COPY_WAITING):
+            if job['volume_id'] in lost and job['attempts'] >= self.max_attempts:
+                self._fail(run_id, job['volume_id'], lost[job['volume_id']])
+        self.jobs.commit()
+        return True
+
+    def _fail(self, run_id: str, volume_id: str, error: str):
+        logger.error(f"Snapshot job for {volume_id} failed: {error}")
+        self.jobs.set(run_id, volume_id, FAILED, error=error)
+        self.stats['failed'] += 1
+
+    def _poll(self, run_id: str):
+        waiting = self.jobs.jobs(run_id, SNAPSHOT)
+        if waiting:
+            snapshots = self._describe(self.ec2, run_id)
+            for job in waiting:
+                state = snapshots.get(job['snapshot_id'], {}).get('State')
+                if state == 'completed':
+                    self.jobs.set(run_id, job['volume_id'], COPY_WAITING)
+                elif state == 'error':
+                    self._fail(run_id, job['volume_id'], f"snapshot {job['snapshot_id']} failed")
+        copying = self.jobs.jobs(run_id, COPY)
+        if copying:
+            snapshots = self._describe(self.ec2_dr, run_id)
+            for job in copying:
+                state = snapshots.get(job['dr_snapshot_id'], {}).get('State')
+                if state == 'completed':
+                    self.jobs.set(run_id, job['volume_id'], DONE)
+                    self.stats['copied'] += 1
+                elif state == 'error':
+                    self._fail(run_id, job['volume_id'], f"DR copy {job['dr_snapshot_id']} failed")
+        self.jobs.commit()
+
+    def run(self, run_id: str, targets: List[Dict], copy_to_dr: bool = False,
+            timeout: Optional[float] = None) -> Dict:
+        """Snapshot every target volume (and copy it to DR); return the run's job summary
+
+        targets are dicts with volume_id and optionally instance_id, tags and
+        copy_to_dr (overriding the run-wide default).
+        """
+        if copy_to_dr and self.ec2_dr is None:
+            raise ValueError("copy_to_dr needs a DR-region EC2 client")
+        self.jobs.add(run_id, targets, copy_to_dr)
+        self._recover(run_id)
+        started = time.monotonic()
+        last_poll = 0.0
+        in_flight = {}
+        # volume id -> error of requests that got no response, and failed tries to settle them
+        lost = {}
+        settle_failures = 0
+
+        # Copies get their own threads so they never queue behind creations
+        # waiting on the rate limiter
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='snapshot') as pool, \
+                ThreadPoolExecutor(max_workers=min(self.max_copies, 8), thread_name_prefix='snapshot-copy') as copier:
+            while True:
+                slots = self.max_copies - self.jobs.count(run_id, COPYING, COPY)
+                if slots > 0:
+                    for job in self.jobs.jobs(run_id, COPY_WAITING, limit=slots):
+                        self.jobs.set(run_id, job['volume_id'], COPYING)
+                        self.jobs.bump_attempts(run_id, job['volume_id'])
+                        in_flight[copier.submit(self._copy, run_id, job)] = ('copy', job)
+                # Only one creation per worker is queued, so a resumed or timed
+                # out run has little in flight to adopt
+                creating = sum(1 for kind, _ in in_flight.values() if kind == 'create')
+                if creating < self.max_workers:
+                    for job in self.jobs.jobs(run_id, PENDING, limit=self.max_workers - creating):
+                        self.jobs.set(run_id, job['volume_id'], CREATING)
+                        self.jobs.bump_attempts(run_id, job['volume_id'])
+                        in_flight[pool.submit(self._create, run_id, job)] = ('create', job)
+                self.jobs.commit()
+                self.stats['peak_copies'] = max(self.stats['peak_copies'], self.jobs.count(run_id, COPYING, COPY))
+
+                if not self.jobs.count(run_id, *ACTIVE):
+                    break
+                if timeout is not None and time.monotonic() - started > timeout:
+                    logger.warning(f"Snapshot run {run_id} timed out; resume it with the same run id")
+                    break
+
+                wait_for = max(0.0, last_poll + self.poll_interval - time.monotonic())
+                if in_flight:
+                    finished, _ = wait(list(in_flight), timeout=wait_for, return_when=FIRST_COMPLETED)
+                else:
+                    finished = set()
+                    self.sleep(wait_for)
+                for future in finished:
+                    kind, job = in_flight.pop(future)
+                    try:
+                        snapshot_id = future.result()
+                    except ClientError as e:
+                        self._fail(run_id, job['volume_id'], str(e))
+                        continue
+                    except BotoCoreError as e:
+                        logger.warning(f"No response to the {kind} request for {job['volume_id']}: {e}")
+                        lost[job['volume_id']] = str(e)
+                        continue
+                    if kind == 'create':
+                        self.stats['created'] += 1
+                        self.jobs.set(run_id, job['volume_id'], SNAPSHOT if job['copy'] else DONE,
+                                      snapshot_id=snapshot_id)
+                    else:
+                        self.jobs.set(run_id, job['volume_id'], COPY, dr_snapshot_id=snapshot_id)
+                self.jobs.commit()
+
+                if lost:
+                    if self._recover_lost(run_id, lost):
+                        lost, settle_failures = {}, 0
+                    else:
+                        settle_failures += 1
+                        if settle_failures >= self.max_attempts:
+                            for volume_id, error in lost.items():
+                                self._fail(run_id, volume_id, error)
+                            self.jobs.commit()
+                            lost, settle_failures = {}, 0
+
+                if time.monotonic() - last_poll >= self.poll_interval:
+                    last_poll = time.monotonic()
+                    try:
+                        self._poll(run_id)
+                    except (BotoCoreError, ClientError) as e:
+                        logger.warning(f"Polling snapshot run {run_id} failed, retrying next poll: {e}")
+
+        summary = self.jobs.summary(run_id)
+        logger.info(f"Snapshot run {run_id}: {summary}, {self.stats['throttled']} throttled retries")
+        return {'run_id': run_id, 'jobs': summary, 'stats': dict(self.stats)}
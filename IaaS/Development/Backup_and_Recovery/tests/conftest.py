@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules under test are standalone scripts
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
@@ -0,0 +1,90 @@
+from datetime import datetime
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from backup_catalog import BackupCatalog, normalise_timestamp
+
+BUCKET = 'backups'
+
+
+@pytest.fixture
+def s3():
+    with mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def put(s3, *keys):
+    for key in keys:
+        s3.put_object(Bucket=BUCKET, Key=key, Body=b'x')
+
+
+def catalog(s3, tmp_path, **kwargs):
+    return BackupCatalog(s3, BUCKET, 'b/', cache_path=str(tmp_path / 'catalog.json'), **kwargs)
+
+
+def test_normalise_timestamp():
+    assert normalise_timestamp('2024-01-02 03:04:05') == '20240102-030405'
+    assert normalise_timestamp('20240102') == '20240102'
+    assert normalise_timestamp('x1') is None
+
+
+def test_find_latest_and_between(s3, tmp_path):
+    put(s3, 'b/web-20240103-000000.tar.gz', 'b/db-20240101-120000.tar.gz', 'b/web-20240102-060000.tar.gz',
+        'b/manual-snapshot.tar.gz')
+    backups = catalog(s3, tmp_path)
+
+    assert backups.find('2024-01-02') == 'b/web-20240102-060000.tar.gz'
+    assert backups.find('20240101-1200') == 'b/db-20240101-120000.tar.gz'
+    assert backups.find('manual') == 'b/manual-snapshot.tar.gz'
+    assert backups.find('2023-12-31') is None
+
+    assert backups.latest() == 'b/web-20240103-000000.tar.gz'
+    assert backups.latest(datetime(2024, 1, 2, 12)) == 'b/web-20240102-060000.tar.gz'
+    assert backups.latest(datetime(2023, 1, 1)) is None
+    assert backups.between(datetime(2024, 1, 1), datetime(2024, 1, 2, 23)) == [
+        'b/db-20240101-120000.tar.gz', 'b/web-20240102-060000.tar.gz']
+    assert len(backups) == 4
+
+
+def test_cache_is_reloaded_without_listing(s3, tmp_path):
+    put(s3, 'b/web-20240102-000000.tar.gz')
+    catalog(s3, tmp_path).refresh()
+
+    s3.delete_object(Bucket=BUCKET, Key='b/web-20240102-000000.tar.gz')
+    reloaded = catalog(s3, tmp_path)
+    assert reloaded.latest() == 'b/web-20240102-000000.tar.gz'
+
+
+def test_refresh_sees_backups_that_sort_before_the_last_key(s3, tmp_path):
+    put(s3, 'b/web-20240102-000000.tar.gz', 'b/zdb-20240101-000000.tar.gz')
+    backups = catalog(s3, tmp_path, refresh_seconds=0)
+    assert backups.latest() == 'b/web-20240102-000000.tar.gz'
+
+    put(s3, 'b/web-20240105-000000.tar.gz')
+    assert backups.latest() == 'b/web-20240105-000000.tar.gz'
+
+
+def test_refresh_drops_deleted_backups(s3, tmp_path):
+    put(s3, 'b/web-20240102-000000.tar.gz', 'b/web-20240103-000000.tar.gz')
+    backups = catalog(s3, tmp_path)
+    assert backups.refresh() == 2
+
+    s3.delete_object(Bucket=BUCKET, Key='b/web-20240103-000000.tar.gz')
+    put(s3, 'b/web-20240104-000000.tar.gz')
+    assert backups.refresh() == 1
+    assert backups.between(datetime(2024, 1, 1), datetime(2024, 1, 31)) == [
+        'b/web-20240102-000000.tar.gz', 'b/web-20240104-000000.tar.gz']
+
+
+def test_find_miss_relists_a_stale_listing_once(s3, tmp_path):
+    put(s3, 'b/web-20240102-000000.tar.gz')
+    backups = catalog(s3, tmp_path)
+    backups.refresh()
+
+    put(s3, 'b/db-20240105-000000.tar.gz')
+    assert backups.latest() == 'b/web-20240102-000000.tar.gz'
+    assert backups.find('2024-01-05') == 'b/db-20240105-000000.tar.gz'
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+
+from retention import plan_retention, snapshot_volume
+
+NOW = datetime(2024, 5, 15, 12, tzinfo=timezone.utc)
+
+
+def snapshot(snapshot_id, volume, hours_ago, dr=False, state='completed'):
+    """A primary snapshot of volume, or its DR copy (placeholder VolumeId, source in a tag)"""
+    return {
+        'SnapshotId': snapshot_id,
+        'VolumeId': 'vol-ffffffff' if dr else volume,
+        'StartTime': NOW - timedelta(hours=hours_ago),
+        'State': state,
+        'Tags': [{'Key': 'BackupGroup', 'Value': 'prod'}, {'Key': 'SourceVolumeId', 'Value': volume}],
+    }
+
+
+def daily(volume, days, dr=False, prefix='snap'):
+    return [snapshot(f'{prefix}-{volume}-{day}', volume, day * 24, dr) for day in range(days)]
+
+
+def test_each_volume_keeps_its_own_series():
+    snapshots = daily('vol-a', 10) + daily('vol-b', 10) + daily('vol-c', 3)
+    plan = plan_retention(snapshots, {'daily': 5}, 'prod')
+
+    for volume, kept in (('vol-a', 5), ('vol-b', 5), ('vol-c', 3)):
+        assert sorted(s for s in plan.keep if f'-{volume}-' in s) == \
+            sorted(f'snap-{volume}-{day}' for day in range(kept))
+    assert sorted(s['SnapshotId'] for s in plan.delete) == sorted(
+        f'snap-{volume}-{day}' for volume in ('vol-a', 'vol-b') for day in range(5, 10))
+    assert plan.summary()['volumes'] == 3
+    assert plan.summary()['kept_by_tier'] == {'daily': 13}
+
+
+def test_latest_snapshot_of_every_volume_is_kept():
+    # vol-b stopped being backed up a month ago; its last snapshot still stays
+    snapshots = daily('vol-a', 40) + [snapshot('snap-old-b', 'vol-b', 24 * 30),
+                                      snapshot('snap-older-b', 'vol-b', 24 * 31)]
+    plan = plan_retention(snapshots, {'hourly': 2}, 'prod')
+
+    assert plan.keep['snap-vol-a-0'] == ['latest', 'hourly']
+    assert plan.keep['snap-old-b'] == ['latest', 'hourly']
+    assert plan.keep['snap-older-b'] == ['hourly']
+    assert len(plan.keep) == 4
+
+
+def test_dr_copies_are_grouped_by_source_volume():
+    snapshots = daily('vol-a', 6, dr=True, prefix='dr') + daily('vol-b', 6, dr=True, prefix='dr')
+    assert {snapshot_volume(s) for s in snapshots} == {'vol-a', 'vol-b'}
+
+    plan = plan_retention(snapshots, {'daily': 3}, 'prod')
+    assert plan.summary()['volumes'] == 2
+    assert len(plan.keep) == 6
+    assert all(s['SnapshotId'].split('-')[-1] in ('3', '4', '5') for s in plan.delete)
+
+
+def test_untagged_snapshots_use_their_volume_id():
+    snapshots = [{'SnapshotId': f'snap-{n}', 'VolumeId': f'vol-{n % 2}', 'StartTime': NOW - timedelta(days=n)}
+                 for n in range(6)]
+    plan = plan_retention(snapshots, {'daily': 1}, 'prod')
+    assert sorted(plan.keep) == ['snap-0', 'snap-1']
+
+
+def test_incomplete_snapshots_are_kept():
+    snapshots = daily('vol-a', 3) + [snapshot('snap-pending', 'vol-a', 24 * 5, state='pending')]
+    plan = plan_retention(snapshots, {'daily': 1}, 'prod')
+    assert plan.keep['snap-pending'] == ['pending']
@@ -0,0 +1,201 @@
+import itertools
+from collections import Counter
+
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError, ReadTimeoutError
+
+from snapshot_orchestrator import COPYING, CREATING, DONE, FAILED, JobTable, SnapshotOrchestrator
+
+_ids = itertools.count(1)
+
+
+def client_error(code):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, 'Stub')
+
+
+class Meta:
+    def __init__(self, region_name):
+        self.region_name = region_name
+
+
+class Paginator:
+    def __init__(self, ec2):
+        self.ec2 = ec2
+
+    def paginate(self, Filters, **kwargs):
+        self.ec2.request('describe_snapshots')
+        run_id = Filters[0]['Values'][0]
+        yield {'Snapshots': [dict(s, Tags=[{'Key': k, 'Value': v} for k, v in s['Tags'].items()])
+                             for s in self.ec2.snapshots.values() if s['Tags'].get('BackupRun') == run_id]}
+
+
+class FakeEC2:
+    """One region's snapshots, complete as soon as they are made
+
+    errors maps an operation, or (operation, volume id), to exceptions
+    raised by its next calls in order. A ('lost', error) entry does the
+    work and then raises, like a response lost on the way back.
+    """
+
+    def __init__(self, region='us-east-1'):
+        self.meta = Meta(region)
+        self.snapshots = {}
+        self.errors = {}
+        self.calls = Counter()
+
+    def request(self, operation, volume_id=None):
+        self.calls[operation] += 1
+        queued = self.errors.get((operation, volume_id)) or self.errors.get(operation)
+        if queued:
+            error = queued.pop(0)
+            if not isinstance(error, tuple):
+                raise error
+            return error[1]
+        return None
+
+    def add(self, volume_id, tags, state='completed'):
+        snapshot_id = f'snap-{next(_ids):08d}'
+        self.snapshots[snapshot_id] = {'SnapshotId': snapshot_id, 'VolumeId': volume_id, 'State': state,
+                                       'Tags': dict(tags)}
+        return snapshot_id
+
+    def get_paginator(self, operation):
+        return Paginator(self)
+
+    def create_snapshot(self, VolumeId, Description, TagSpecifications):
+        lost = self.request('create_snapshot', VolumeId)
+        snapshot_id = self.add(VolumeId, {t['Key']: t['Value'] for t in TagSpecifications[0]['Tags']})
+        if lost:
+            raise lost
+        return {'SnapshotId': snapshot_id}
+
+    def copy_snapshot(self, SourceRegion, SourceSnapshotId, Description, TagSpecifications):
+        lost = self.request('copy_snapshot')
+        snapshot_id = self.add('vol-ffffffff', {t['Key']: t['Value'] for t in TagSpecifications[0]['Tags']})
+        if lost:
+            raise lost
+        return {'SnapshotId': snapshot_id}
+
+
+TARGETS = [{'volume_id': f'vol-{n:04d}', 'instance_id': 'i-1', 'tags': {'Team': 'web'}} for n in range(5)]
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    table = JobTable(str(tmp_path / 'jobs.sqlite'))
+    yield table
+    table.close()
+
+
+def orchestrator(jobs, ec2, ec2_dr=None, **kwargs):
+    kwargs.setdefault('max_attempts', 3)
+    return SnapshotOrchestrator(ec2, ec2_dr, jobs, create_rate=1000, create_burst=1000, max_workers=2,
+                                poll_interval=0, sleep=lambda seconds: None, **kwargs)
+
+
+def dr_copies(ec2_dr):
+    return {s['Tags']['SourceVolumeId'] for s in ec2_dr.snapshots.values()}
+
+
+def test_create_snapshot_copy_done(jobs):
+    ec2, ec2_dr = FakeEC2(), FakeEC2('us-west-2')
+    result = orchestrator(jobs, ec2, ec2_dr).run('run-1', TARGETS, copy_to_dr=True)
+
+    assert result['jobs'] == {DONE: 5}
+    assert (result['stats']['created'], result['stats']['copied']) == (5, 5)
+    assert dr_copies(ec2_dr) == {t['volume_id'] for t in TARGETS}
+    tags = next(iter(ec2.snapshots.values()))['Tags']
+    assert tags['BackupRun'] == 'run-1' and tags['Team'] == 'web' and tags['SourceInstanceId'] == 'i-1'
+    assert all(row['attempts'] == 2 for row in jobs.jobs('run-1'))
+
+
+def test_snapshot_without_copy(jobs):
+    ec2 = FakeEC2()
+    result = orchestrator(jobs, ec2).run('run-1', TARGETS)
+    assert result['jobs'] == {DONE: 5}
+    assert ec2.calls['copy_snapshot'] == 0
+
+
+def test_throttled_requests_are_retried(jobs):
+    ec2, ec2_dr = FakeEC2(), FakeEC2('us-west-2')
+    ec2.errors['create_snapshot'] = [client_error('RequestLimitExceeded'), client_error('Throttling')]
+    ec2_dr.errors['copy_snapshot'] = [client_error('ResourceLimitExceeded')]
+    result = orchestrator(jobs, ec2, ec2_dr).run('run-1', TARGETS, copy_to_dr=True)
+
+    assert result['jobs'] == {DONE: 5}
+    assert result['stats']['throttled'] == 3
+    assert len(ec2.snapshots) == 5
+
+
+def test_resume_adopts_interrupted_requests(jobs):
+    ec2, ec2_dr = FakeEC2(), FakeEC2('us-west-2')
+    jobs.add('run-1', TARGETS[:3], copy_to_dr=True)
+    # vol-0000's create went out, vol-0001's did not; vol-0002's DR copy went out
+    ec2.add('vol-0000', {'BackupRun': 'run-1', 'SourceVolumeId': 'vol-0000'})
+    source = ec2.add('vol-0002', {'BackupRun': 'run-1', 'SourceVolumeId': 'vol-0002'})
+    ec2_dr.add('vol-ffffffff', {'BackupRun': 'run-1', 'SourceVolumeId': 'vol-0002', 'SourceSnapshotId': source})
+    jobs.set('run-1', 'vol-0000', CREATING)
+    jobs.set('run-1', 'vol-0001', CREATING)
+    jobs.set('run-1', 'vol-0002', COPYING, snapshot_id=source)
+    jobs.commit()
+
+    result = orchestrator(jobs, ec2, ec2_dr).run('run-1', TARGETS[:3], copy_to_dr=True)
+
+    assert result['jobs'] == {DONE: 3}
+    assert result['stats']['adopted'] == 2
+    assert ec2.calls['create_snapshot'] == 1
+    assert ec2_dr.calls['copy_snapshot'] == 2
+    assert len(ec2.snapshots) == 3 and len(ec2_dr.snapshots) == 3
+
+
+def test_failed_requests_and_snapshots_fail_only_their_job(jobs):
+    ec2 = FakeEC2()
+    ec2.errors[('create_snapshot', 'vol-0003')] = [client_error('InvalidVolume.NotFound')]
+    # vol-0001's snapshot was requested before an interruption and ended in error
+    ec2.add('vol-0001', {'BackupRun': 'run-1', 'SourceVolumeId': 'vol-0001'}, state='error')
+    jobs.add('run-1', TARGETS, copy_to_dr=True)
+    jobs.set('run-1', 'vol-0001', CREATING)
+    jobs.commit()
+
+    result = orchestrator(jobs, ec2, FakeEC2('us-west-2')).run('run-1', TARGETS, copy_to_dr=True)
+
+    assert result['jobs'] == {DONE: 3, FAILED: 2}
+    failed = {row['volume_id']: row['error'] for row in jobs.jobs('run-1', FAILED)}
+    assert 'InvalidVolume.NotFound' in failed['vol-0003']
+    assert 'failed' in failed['vol-0001']
+
+
+def test_lost_response_is_adopted_not_repeated(jobs):
+    ec2 = FakeEC2()
+    ec2.errors['create_snapshot'] = [('lost', ReadTimeoutError(endpoint_url='https://ec2'))]
+    result = orchestrator(jobs, ec2).run('run-1', TARGETS)
+
+    assert result['jobs'] == {DONE: 5}
+    assert result['stats']['adopted'] == 1
+    assert len(ec2.snapshots) == 5
+
+
+def test_unreachable_endpoint_fails_only_that_job(jobs):
+    ec2 = FakeEC2()
+    ec2.errors[('create_snapshot', 'vol-0002')] = [EndpointConnectionError(endpoint_url='https://ec2')] * 3
+    result = orchestrator(jobs, ec2).run('run-1', TARGETS)
+
+    assert result['jobs'] == {DONE: 4, FAILED: 1}
+    failed = jobs.jobs('run-1', FAILED)[0]
+    assert failed['volume_id'] == 'vol-0002' and 'Could not connect' in failed['error']
+    assert ec2.calls['create_snapshot'] == 4 + 3
+
+
+def test_listing_failure_while_settling_is_retried(jobs):
+    ec2 = FakeEC2()
+    ec2.errors['create_snapshot'] = [('lost', ReadTimeoutError(endpoint_url='https://ec2'))]
+    ec2.errors['describe_snapshots'] = [EndpointConnectionError(endpoint_url='https://ec2')]
+    result = orchestrator(jobs, ec2).run('run-1', TARGETS)
+
+    assert result['jobs'] == {DONE: 5}
+    assert len(ec2.snapshots) == 5
+
+
+def test_copy_to_dr_needs_a_dr_client(jobs):
+    with pytest.raises(ValueError):
+        orchestrator(jobs, FakeEC2()).run('run-1', TARGETS, copy_to_dr=True)
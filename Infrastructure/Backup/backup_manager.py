@@ -1,14 +1,14 @@
 """
 AWS Backup management
 """
-import boto3
+from implementation.utils.aws_clients import get_client
 
 
 class BackupManager:
     """Manage AWS Backup plans and vaults"""
     
     def __init__(self, region: str = 'us-east-1'):
-        self.backup_client = boto3.client('backup', region_name=region)
+        self.backup_client = get_client('backup', region_name=region)
         self.region = region
     
     def create_backup_vault(self, vault_name: str):
@@ -1,7 +1,7 @@
 """
 CloudFront CDN management
 """
-import boto3
+from implementation.utils.aws_clients import get_client
 from typing import List, Dict
 import time
 
@@ -10,7 +10,7 @@ class CloudFrontManager:
     """Manage CloudFront distributions"""
     
     def __init__(self):
-        self.cf_client = boto3.client('cloudfront')
+        self.cf_client = get_client('cloudfront')
     
     def create_distribution(self, origin_domain: str, aliases: List[str] = None,
                            certificate_arn: str = None, price_class: str = 'PriceClass_100'):
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Benchmark for the S3 encryption check: serial loop vs. concurrent scanner vs. cached re-scan
+
+Runs against an in-process fake S3 that sleeps for a simulated round trip on
+every call, so no AWS account is needed:
+
+    python -m Infrastructure.Compliance.benchmark_compliance --buckets 1000 10000
+"""
+import os
+import time
+import argparse
+import tempfile
+import threading
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+
+from Infrastructure.Compliance.scan_engine import ComplianceReport, ComplianceScanner, ResultCache, s3_encryption_checks
+
+
+class FakeS3:
+    """Every third bucket lacks default encryption, every hundredth denies access"""
+
+    def __init__(self, buckets, latency):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+        created = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.buckets = [{'Name': f'bucket-{n:06d}', 'CreationDate': created} for n in range(buckets)]
+
+    def can_paginate(self, operation):
+        return False
+
+    def list_buckets(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        return {'Buckets': self.buckets}
+
+    def get_bucket_encryption(self, Bucket):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        n = int(Bucket.split('-')[1])
+        if n % 100 == 0:
+            raise ClientError({'Error': {'Code': 'AccessDenied', 'Message': 'Access Denied'}}, 'GetBucketEncryption')
+        if n % 3 == 0:
+            raise ClientError({'Error': {'Code': 'ServerSideEncryptionConfigurationNotFoundError',
+                                         'Message': 'not found'}}, 'GetBucketEncryption')
+        return {'ServerSideEncryptionConfiguration': {
+            'Rules': [{'ApplyServerSideEncryptionByDefault': {'SSEAlgorithm': 'aws:kms'}}]}}
+
+
+def legacy_check(s3_client):
+    """The original check_s3_encryption loop"""
+    buckets = s3_client.list_buckets()['Buckets']
+    non_compliant = []
+    for bucket in buckets:
+        try:
+            s3_client.get_bucket_encryption(Bucket=bucket['Name'])
+        except:
+            non_compliant.append(bucket['Name'])
+    return {'compliant': len(buckets) - len(non_compliant), 'non_compliant': non_compliant}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--buckets', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--workers', type=int, default=64)
+    parser.add_argument('--latency-ms', type=float, default=20,
+                        help='simulated round trip per S3 call')
+    parser.add_argument('--legacy-limit', type=int, default=1000,
+                        help='skip the serial loop above this many buckets and extrapolate')
+    args = parser.parse_args()
+    latency = args.latency_ms / 1000
+
+    print(f"{'buckets':>8} {'serial':>10} {'parallel':>10} {'cached':>9} {'non-compliant':>14} "
+          f"{'errors':>7} {'re-scan calls':>14}")
+    for count in args.buckets:
+        if count <= args.legacy_limit:
+            s3 = FakeS3(count, latency)
+            start = time.perf_counter()
+            legacy_check(s3)
+            serial = f"{time.perf_counter() - start:.2f}s"
+        else:
+            serial = f"~{(count + 1) * latency:.0f}s"
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResultCache(os.path.join(tmp, 'cache.db'))
+            scanner = ComplianceScanner(max_workers=args.workers, cache=cache)
+
+            s3 = FakeS3(count, latency)
+            # What config_fingerprints returns while AWS Config records the buckets
+            fingerprints = {bucket['Name']: '1@2024-01-01T00:00:00Z' for bucket in s3.buckets}
+            start = time.perf_counter()
+            report = ComplianceReport().consume(scanner.scan(s3_encryption_checks(s3, fingerprints)))
+            parallel = time.perf_counter() - start
+            totals = report.totals['s3_encryption']
+
+            s3 = FakeS3(count, latency)
+            start = time.perf_counter()
+            rescan = ComplianceReport().consume(scanner.scan(s3_encryption_checks(s3, fingerprints)))
+            cached = time.perf_counter() - start
+            assert rescan.totals['s3_encryption']['non_compliant'] == totals['non_compliant']
+            cache.close()
+
+        print(f"{count:>8,} {serial:>10} {parallel:>9.2f}s {cached:>8.2f}s {totals['non_compliant']:>14,} "
+              f"{totals['error']:>7,} {s3.calls:>14,}")
+
+
+if __name__ == '__main__':
+    main()
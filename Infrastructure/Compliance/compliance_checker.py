@@ -1,52 +1,85 @@
 """
 AWS compliance and security checks
 """
-import boto3
+from typing import Dict, Iterator, List, Optional
+
+from implementation.utils.aws_clients import get_client
+from Infrastructure.Compliance.scan_engine import (
+    ComplianceReport, ComplianceScanner, ResultCache, config_fingerprints,
+    public_instance_findings, regional_findings, s3_encryption_checks
+)
 
 
 class ComplianceChecker:
     """Check AWS resources for compliance"""
-    
-    def __init__(self, region: str = 'us-east-1'):
-        self.config_client = boto3.client('config', region_name=region)
-        self.iam_client = boto3.client('iam')
-        self.ec2_client = boto3.client('ec2', region_name=region)
+
+    def __init__(self, region: str = 'us-east-1', max_workers: int = 32,
+                 cache_path: Optional[str] = None, cache_max_age: float = 86400):
+        self.config_client = get_client('config', region_name=region)
+        self.iam_client = get_client('iam')
+        self.ec2_client = get_client('ec2', region_name=region)
         self.region = region
-    
+        cache = ResultCache(cache_path, max_age=cache_max_age) if cache_path else None
+        self.scanner = ComplianceScanner(max_workers=max_workers, cache=cache)
+
+    def _regions(self) -> List[str]:
+        response = self.ec2_client.describe_regions(
+            Filters=[{'Name': 'opt-in-status', 'Values': ['opt-in-not-required', 'opted-in']}]
+        )
+        return [region['RegionName'] for region in response['Regions']]
+
+    def scan_s3_encryption(self) -> Iterator[Dict]:
+        """Stream an encryption finding per bucket, checked concurrently"""
+        s3_client = get_client('s3')
+        fingerprints = config_fingerprints(self.config_client) if self.scanner.cache is not None else {}
+        checks = s3_encryption_checks(s3_client, fingerprints,
+                                      client_for_region=lambda region: get_client('s3', region_name=region))
+        return self.scanner.scan(checks)
+
+    def scan_public_instances(self, regions: Optional[List[str]] = None) -> Iterator[Dict]:
+        """Stream a public-IP finding per running instance, paging every region concurrently"""
+        regions = regions or [self.region]
+        return regional_findings(
+            regions, lambda region: public_instance_findings(get_client('ec2', region_name=region), region),
+            max_workers=min(self.scanner.max_workers, len(regions))
+        )
+
+    def run_scan(self, out=None, all_regions: bool = False) -> Dict:
+        """Run every check, writing findings to out as JSON lines; return the summary"""
+        report = ComplianceReport(out)
+        report.consume(self.scan_s3_encryption())
+        regions = self._regions() if all_regions else None
+        report.consume(self.scan_public_instances(regions))
+        return report.summary()
+
     def check_s3_encryption(self):
         """Check if S3 buckets have encryption enabled"""
         try:
-            s3_client = boto3.client('s3')
-            buckets = s3_client.list_buckets()['Buckets']
-            
-            non_compliant = []
-            for bucket in buckets:
-                bucket_name = bucket['Name']
-                try:
-                    s3_client.get_bucket_encryption(Bucket=bucket_name)
-                except:
-                    non_compliant.append(bucket_name)
-            
-            return {'compliant': len(buckets) - len(non_compliant), 'non_compliant': non_compliant}
+            report = ComplianceReport().consume(self.scan_s3_encryption())
+            totals = report.totals.get('s3_encryption', {})
+            return {
+                'compliant': totals.get('compliant', 0),
+                'non_compliant': report.non_compliant.get('s3_encryption', []),
+                'errors': [{'bucket': finding['resource_id'], 'error': finding['detail']}
+                           for finding in report.errors]
+            }
         except Exception as e:
             raise Exception(f"Failed to check S3 encryption: {str(e)}")
-    
-    def check_public_instances(self):
+
+    def check_public_instances(self, regions: Optional[List[str]] = None):
         """Check for EC2 instances with public IPs"""
         try:
-            response = self.ec2_client.describe_instances(
-                Filters=[{'Name': 'instance-state-name', 'Values': ['running']}]
-            )
-            
             public_instances = []
-            for reservation in response['Reservations']:
-                for instance in reservation['Instances']:
-                    if instance.get('PublicIpAddress'):
-                        public_instances.append({
-                            'instance_id': instance['InstanceId'],
-                            'public_ip': instance['PublicIpAddress']
-                        })
-            
+            for finding in self.scan_public_instances(regions):
+                if finding['compliant'] is None:
+                    raise Exception(f"{finding['region']}: {finding['detail']}")
+                if not finding['compliant']:
+                    public_instances.append({
+                        'instance_id': finding['resource_id'],
+                        'public_ip': finding['detail'],
+                        'region': finding['region']
+                    })
+
             return public_instances
         except Exception as e:
             raise Exception(f"Failed to check public instances: {str(e)}")
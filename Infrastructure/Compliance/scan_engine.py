@@ -0,0 +1,287 @@
+"""
+Concurrent compliance scan engine with per-resource result caching
+"""
+import json
+import time
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+# Error codes that mean "the setting is absent", i.e. a compliance failure rather than a scan error
+MISSING_CONFIGURATION = {
+    'ServerSideEncryptionConfigurationNotFoundError',
+    'NoSuchPublicAccessBlockConfiguration',
+}
+
+
+class ResultCache:
+    """(check, resource) -> (fingerprint, finding) store backed by SQLite
+
+    A cached finding is reused while the resource's fingerprint (its
+    configuration state and capture time) is unchanged and the entry is
+    younger than max_age seconds.
+    """
+
+    def __init__(self, db_path: str = 'compliance_cache.db', max_age: float = 86400):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            ' check_name TEXT NOT NULL, resource_id TEXT NOT NULL, fingerprint TEXT NOT NULL,'
+            ' finding TEXT NOT NULL, checked_at REAL NOT NULL,'
+            ' PRIMARY KEY (check_name, resource_id))'
+        )
+        self._conn.commit()
+        self._pending = 0
+
+    def get(self, check: str, resource_id: str, fingerprint: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT fingerprint, finding, checked_at FROM results WHERE check_name = ? AND resource_id = ?',
+                (check, resource_id)
+            ).fetchone()
+        if row is None or row[0] != fingerprint or time.time() - row[2] > self.max_age:
+            return None
+        return json.loads(row[1])
+
+    def put(self, check: str, resource_id: str, fingerprint: str, finding: Dict):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO results (check_name, resource_id, fingerprint, finding, checked_at)'
+                ' VALUES (?, ?, ?, ?, ?)',
+                (check, resource_id, fingerprint, json.dumps(finding, default=str), time.time())
+            )
+            self._pending += 1
+            if self._pending >= 500:
+                self._conn.commit()
+                self._pending = 0
+
+    def flush(self):
+        with self._lock:
+            self._conn.commit()
+            self._pending = 0
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+
+class ResourceCheck:
+    """One check of one resource: evaluate() returns (compliant, detail)"""
+
+    def __init__(self, check: str, resource_type: str, resource_id: str, region: Optional[str],
+                 evaluate: Callable[[], tuple], fingerprint: Optional[str] = None):
+        self.check = check
+        self.resource_type = resource_type
+        self.resource_id = resource_id
+        self.region = region
+        self.evaluate = evaluate
+        self.fingerprint = fingerprint
+
+
+class ComplianceScanner:
+    """Runs resource checks on a worker pool and streams findings as they complete
+
+    Findings are dicts with check, resource_type, resource_id, region,
+    compliant (True, False, or None when the check itself failed), detail
+    and cached. At most max_workers * 4 checks are in flight, so a scan of
+    any size keeps memory flat and the report starts immediately.
+    """
+
+    def __init__(self, max_workers: int = 32, cache: Optional[ResultCache] = None):
+        self.max_workers = max_workers
+        self.cache = cache
+
+    def _finding(self, task: ResourceCheck, compliant: Optional[bool], detail: str, cached: bool = False) -> Dict:
+        return {
+            'check': task.check,
+            'resource_type': task.resource_type,
+            'resource_id': task.resource_id,
+            'region': task.region,
+            'compliant': compliant,
+            'detail': detail,
+            'cached': cached,
+        }
+
+    def _run(self, task: ResourceCheck) -> Dict:
+        try:
+            compliant, detail = task.evaluate()
+        except ClientError as e:
+            code = e.response.get('Error', {}).get('Code', '')
+            return self._finding(task, None, f"{code}: {e}")
+        except Exception as e:
+            return self._finding(task, None, str(e))
+        finding = self._finding(task, compliant, detail)
+        if self.cache is not None and task.fingerprint is not None:
+            self.cache.put(task.check, task.resource_id, task.fingerprint, finding)
+        return finding
+
+    def scan(self, tasks: Iterable[ResourceCheck]) -> Iterator[Dict]:
+        """Yield a finding per task in completion order; cached results are yielded without a call"""
+        window = self.max_workers * 4
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='compliance') as executor:
+            in_flight = set()
+            try:
+                for task in tasks:
+                    if self.cache is not None and task.fingerprint is not None:
+                        cached = self.cache.get(task.check, task.resource_id, task.fingerprint)
+                        if cached is not None:
+                            cached['cached'] = True
+                            yield cached
+                            continue
+                    in_flight.add(executor.submit(self._run, task))
+                    if len(in_flight) >= window:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield future.result()
+                while in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            finally:
+                for future in in_flight:
+                    future.cancel()
+                if self.cache is not None:
+                    self.cache.flush()
+
+
+class ComplianceReport:
+    """Consumes a finding stream, optionally writing JSON lines, and keeps totals per check"""
+
+    def __init__(self, out=None):
+        self.out = out
+        self.totals: Dict[str, Dict[str, int]] = {}
+        self.non_compliant: Dict[str, List[str]] = {}
+        self.errors: List[Dict] = []
+        self.started = time.time()
+        self.finished = None
+
+    def add(self, finding: Dict):
+        totals = self.totals.setdefault(finding['check'], {'compliant': 0, 'non_compliant': 0,
+                                                           'error': 0, 'cached': 0})
+        if finding['compliant'] is None:
+            totals['error'] += 1
+            self.errors.append(finding)
+        elif finding['compliant']:
+            totals['compliant'] += 1
+        else:
+            totals['non_compliant'] += 1
+            self.non_compliant.setdefault(finding['check'], []).append(finding['resource_id'])
+        if finding.get('cached'):
+            totals['cached'] += 1
+        if self.out is not None:
+            self.out.write(json.dumps(finding, default=str) + '\n')
+
+    def consume(self, findings: Iterable[Dict]) -> 'ComplianceReport':
+        for finding in findings:
+            self.add(finding)
+        self.finished = time.time()
+        return self
+
+    def summary(self) -> Dict:
+        return {
+            'checks': self.totals,
+            'non_compliant': self.non_compliant,
+            'errors': len(self.errors),
+            'duration': (self.finished or time.time()) - self.started,
+        }
+
+
+def list_buckets(s3_client) -> Iterator[Dict]:
+    """Every bucket, following ContinuationToken where the API pages"""
+    if s3_client.can_paginate('list_buckets'):
+        for page in s3_client.get_paginator('list_buckets').paginate():
+            yield from page['Buckets']
+    else:
+        yield from s3_client.list_buckets()['Buckets']
+
+
+def s3_encryption_checks(s3_client, bucket_fingerprints: Optional[Dict[str, str]] = None,
+                         client_for_region: Optional[Callable[[str], object]] = None) -> Iterator[ResourceCheck]:
+    """A default-encryption check per bucket
+
+    The fingerprint is the bucket's configuration state from
+    bucket_fingerprints (e.g. from AWS Config). Buckets without one are
+    checked on every scan and never cached, since nothing else reveals a
+    change to their encryption settings.
+    """
+    bucket_fingerprints = bucket_fingerprints or {}
+    for bucket in list_buckets(s3_client):
+        name = bucket['Name']
+        region = bucket.get('BucketRegion')
+        client = client_for_region(region) if client_for_region and region else s3_client
+
+        def evaluate(client=client, name=name):
+            try:
+                rules = client.get_bucket_encryption(Bucket=name)['ServerSideEncryptionConfiguration']['Rules']
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') in MISSING_CONFIGURATION:
+                    return False, 'No default encryption'
+                raise
+            algorithms = [rule['ApplyServerSideEncryptionByDefault']['SSEAlgorithm']
+                          for rule in rules if 'ApplyServerSideEncryptionByDefault' in rule]
+            return True, ', '.join(algorithms) or 'Encrypted'
+
+        yield ResourceCheck('s3_encryption', 's3_bucket', name, region, evaluate, bucket_fingerprints.get(name))
+
+
+def config_fingerprints(config_client, resource_type: str = 'AWS::S3::Bucket') -> Dict[str, str]:
+    """resource name -> configuration capture time from AWS Config, empty if Config is not recording"""
+    fingerprints = {}
+    try:
+        keys = []
+        for page in config_client.get_paginator('list_discovered_resources').paginate(resourceType=resource_type):
+            keys.extend({'resourceType': resource_type, 'resourceId': r['resourceId']}
+                        for r in page['resourceIdentifiers'])
+        for offset in range(0, len(keys), 100):
+            response = config_client.batch_get_resource_config(resourceKeys=keys[offset:offset + 100])
+            for item in response['baseConfigurationItems']:
+                name = item.get('resourceName') or item['resourceId']
+                fingerprints[name] = f"{item['configurationStateId']}@{item['configurationItemCaptureTime']}"
+    except ClientError as e:
+        logger.info(f"AWS Config fingerprints unavailable, results will not be cached: {e}")
+    return fingerprints
+
+
+def public_instance_findings(ec2_client, region: str) -> Iterator[Dict]:
+    """A public-IP finding per running instance in one region, across every page"""
+    paginator = ec2_client.get_paginator('describe_instances')
+    for page in paginator.paginate(Filters=[{'Name': 'instance-state-name', 'Values': ['running']}]):
+        for reservation in page['Reservations']:
+            for instance in reservation['Instances']:
+                public_ip = instance.get('PublicIpAddress')
+                yield {
+                    'check': 'public_instances',
+                    'resource_type': 'ec2_instance',
+                    'resource_id': instance['InstanceId'],
+                    'region': region,
+                    'compliant': public_ip is None,
+                    'detail': public_ip or 'No public IP',
+                    'cached': False,
+                }
+
+
+def regional_findings(regions: List[str], scan_region: Callable[[str], Iterable[Dict]],
+                      max_workers: int = 16) -> Iterator[Dict]:
+    """Run scan_region for every region concurrently and yield each region's findings as it finishes"""
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='compliance-region') as executor:
+        futures = {executor.submit(lambda r=region: list(scan_region(r))): region for region in regions}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                region = futures[future]
+                try:
+                    yield from future.result()
+                except Exception as e:
+                    yield {'check': 'region', 'resource_type': 'region', 'resource_id': region,
+                           'region': region, 'compliant': None, 'detail': str(e), 'cached': False}
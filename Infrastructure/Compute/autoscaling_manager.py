@@ -1,7 +1,7 @@
 """
 Auto Scaling group management
 """
-import boto3
+from implementation.utils.aws_clients import get_client
 from typing import List
 
 
@@ -9,7 +9,7 @@ class AutoScalingManager:
     """Manage Auto Scaling groups"""
     
     def __init__(self, region: str = 'us-east-1'):
-        self.asg_client = boto3.client('autoscaling', region_name=region)
+        self.asg_client = get_client('autoscaling', region_name=region)
         self.region = region
     
     def create_auto_scaling_group(self, name: str, launch_template_id: str,
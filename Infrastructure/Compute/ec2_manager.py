@@ -1,7 +1,7 @@
 """
 EC2 instance management
 """
-import boto3
+from implementation.utils.aws_clients import get_client, get_resource
 from typing import List, Dict
 
 
@@ -9,8 +9,8 @@ class EC2Manager:
     """Manage EC2 instances"""
     
     def __init__(self, region: str = 'us-east-1'):
-        self.ec2_client = boto3.client('ec2', region_name=region)
-        self.ec2_resource = boto3.resource('ec2', region_name=region)
+        self.ec2_client = get_client('ec2', region_name=region)
+        self.ec2_resource = get_resource('ec2', region_name=region)
         self.region = region
     
     def launch_instance(self, ami_id: str, instance_type: str, subnet_id: str,
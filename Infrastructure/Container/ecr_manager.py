@@ -1,7 +1,7 @@
 """
 ECR repository management
 """
-import boto3
+from implementation.utils.aws_clients import get_client
 import base64
 
 
@@ -9,7 +9,7 @@ class ECRManager:
     """Manage ECR repositories"""
     
     def __init__(self, region: str = 'us-east-1'):
-        self.ecr_client = boto3.client('ecr', region_name=region)
+        self.ecr_client = get_client('ecr', region_name=region)
         self.region = region
     
     def create_repository(self, repository_name: str, image_scanning: bool = True,
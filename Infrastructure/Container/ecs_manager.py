@@ -1,8 +1,9 @@
 """
 ECS cluster and service management
 """
-import boto3
-from typing import List, Dict
+from implementation.utils.aws_clients import get_client
+from implementation.utils.ecs_topology import EcsTopologyLoader
+from typing import List, Dict, Optional
 import json
 
 
@@ -10,8 +11,9 @@ class ECSManager:
     """Manage ECS clusters and services"""
     
     def __init__(self, region: str = 'us-east-1'):
-        self.ecs_client = boto3.client('ecs', region_name=region)
+        self.ecs_client = get_client('ecs', region_name=region)
         self.region = region
+        self.topology = EcsTopologyLoader(self.ecs_client)
     
     def create_cluster(self, cluster_name: str):
         """Create ECS cluster"""
@@ -20,6 +22,7 @@ class ECSManager:
                 clusterName=cluster_name,
                 settings=[{'name': 'containerInsights', 'value': 'enabled'}]
             )
+            self.topology.invalidate(cluster_name)
             return response['cluster']['clusterArn']
         except Exception as e:
             raise Exception(f"Failed to create cluster: {str(e)}")
@@ -74,6 +77,7 @@ class ECSManager:
                 }]
             
             response = self.ecs_client.create_service(**params)
+            self.topology.invalidate(cluster)
             return response['service']['serviceArn']
         except Exception as e:
             raise Exception(f"Failed to create service: {str(e)}")
@@ -91,6 +95,21 @@ class ECSManager:
                 params['taskDefinition'] = task_definition
             
             response = self.ecs_client.update_service(**params)
+            self.topology.invalidate(cluster)
             return response['service']['serviceArn']
         except Exception as e:
             raise Exception(f"Failed to update service: {str(e)}")
+    
+    def get_topology(self, clusters: Optional[List[str]] = None, refresh: bool = False) -> Dict:
+        """Cluster -> service -> task tree, from the cached topology loader"""
+        try:
+            return self.topology.load(clusters, refresh)
+        except Exception as e:
+            raise Exception(f"Failed to load ECS topology: {str(e)}")
+    
+    def list_clusters(self, refresh: bool = False) -> List[Dict]:
+        """Clusters with their service and task counts"""
+        try:
+            return self.topology.summary(refresh=refresh)
+        except Exception as e:
+            raise Exception(f"Failed to list clusters: {str(e)}")
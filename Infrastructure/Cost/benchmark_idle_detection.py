@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Benchmark for idle detection: per-instance GetMetricStatistics vs. batched GetMetricData
+
+Runs against in-process stub clients that count API calls, so no AWS
+account is needed:
+
+    python -m Infrastructure.Cost.benchmark_idle_detection --instances 1000 5000 20000
+"""
+import time
+import argparse
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from Infrastructure.Cost.idle_detection import IdleResourceDetector
+
+
+class StubPaginator:
+    def __init__(self, client, key, items, page_size):
+        self.client, self.key, self.items, self.page_size = client, key, items, page_size
+
+    def paginate(self, **kwargs):
+        for offset in range(0, len(self.items), self.page_size):
+            self.client.calls += 1
+            yield {self.key: self.items[offset:offset + self.page_size]}
+
+
+class StubEC2:
+    def __init__(self, instances, volumes):
+        self.calls = 0
+        self.reservations = [{'Instances': [{'InstanceId': f'i-{n:08x}', 'InstanceType': 't3.large'}]}
+                             for n in range(instances)]
+        self.volumes = [{'VolumeId': f'vol-{n:08x}', 'State': 'in-use', 'Size': 100, 'VolumeType': 'gp3'}
+                        for n in range(volumes)]
+
+    def describe_instances(self, **kwargs):
+        # The legacy code made this single call and never followed NextToken
+        self.calls += 1
+        return {'Reservations': self.reservations[:1000]}
+
+    def get_paginator(self, operation):
+        if operation == 'describe_instances':
+            return StubPaginator(self, 'Reservations', self.reservations, 1000)
+        return StubPaginator(self, 'Volumes', self.volumes, 500)
+
+
+class StubCloudWatch:
+    """Hourly datapoints; every tenth resource is idle"""
+
+    def __init__(self, days, latency):
+        self.calls = 0
+        self.latency = latency
+        self.end = datetime.now(timezone.utc)
+        self.stamps = [self.end - timedelta(hours=h) for h in range(days * 24, 0, -1)]
+        rng = np.random.default_rng(1)
+        self.idle_values = list(rng.random(len(self.stamps)))
+        self.busy_values = list(rng.random(len(self.stamps)) * 40)
+        self.days = days
+
+    def _values(self, resource_id, count):
+        values = self.idle_values if int(resource_id.split('-')[1], 16) % 10 == 0 else self.busy_values
+        return values[:count]
+
+    def get_metric_statistics(self, Dimensions, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        values = self._values(Dimensions[0]['Value'], self.days)
+        return {'Datapoints': [{'Average': v} for v in values]}
+
+    def get_metric_data(self, MetricDataQueries, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        return {'MetricDataResults': [
+            {'Id': q['Id'], 'Timestamps': self.stamps,
+             'Values': self._values(q['MetricStat']['Metric']['Dimensions'][0]['Value'], len(self.stamps))}
+            for q in MetricDataQueries
+        ]}
+
+
+def legacy_find_idle(ec2, cloudwatch):
+    """The original find_idle_resources loop"""
+    idle = []
+    response = ec2.describe_instances(Filters=[{'Name': 'instance-state-name', 'Values': ['running']}])
+    for reservation in response['Reservations']:
+        for instance in reservation['Instances']:
+            end_time = datetime.utcnow()
+            metrics = cloudwatch.get_metric_statistics(
+                Namespace='AWS/EC2', MetricName='CPUUtilization',
+                Dimensions=[{'Name': 'InstanceId', 'Value': instance['InstanceId']}],
+                StartTime=end_time - timedelta(days=7), EndTime=end_time, Period=86400,
+                Statistics=['Average'])
+            if metrics['Datapoints']:
+                avg = sum(d['Average'] for d in metrics['Datapoints']) / len(metrics['Datapoints'])
+                if avg < 5:
+                    idle.append(instance['InstanceId'])
+    return idle
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--instances', type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--latency-ms', type=float, default=10,
+                        help='simulated round trip per CloudWatch call')
+    args = parser.parse_args()
+    latency = args.latency_ms / 1000
+
+    print(f"{'instances':>9} {'legacy calls':>13} {'legacy seen':>12} {'legacy time':>12} "
+          f"{'batched calls':>14} {'batched time':>13} {'idle found':>11}")
+    for count in args.instances:
+        ec2, cloudwatch = StubEC2(count, 0), StubCloudWatch(args.days, latency)
+        start = time.perf_counter()
+        legacy = legacy_find_idle(ec2, cloudwatch)
+        legacy_time = time.perf_counter() - start
+        legacy_calls = ec2.calls + cloudwatch.calls
+
+        ec2, cloudwatch = StubEC2(count, 0), StubCloudWatch(args.days, latency)
+        detector = IdleResourceDetector(cloudwatch, ec2=ec2, days=args.days)
+        start = time.perf_counter()
+        idle = detector.find_idle(['ec2'], end_time=cloudwatch.end)
+        batched_time = time.perf_counter() - start
+        print(f"{count:>9,} {legacy_calls:>13,} {min(count, 1000):>12,} {legacy_time:>11.2f}s "
+              f"{ec2.calls + cloudwatch.calls:>14,} {batched_time:>12.2f}s {len(idle):>11,}")
+
+    ec2, cloudwatch = StubEC2(5000, 5000), StubCloudWatch(args.days, latency)
+    detector = IdleResourceDetector(cloudwatch, ec2=ec2, days=args.days)
+    idle = detector.find_idle(['ec2', 'ebs'], end_time=cloudwatch.end)
+    print(f"\n5,000 instances + 5,000 volumes (2 metrics each): "
+          f"{ec2.calls + cloudwatch.calls} API calls, {len(idle):,} idle")
+
+
+if __name__ == '__main__':
+    main()
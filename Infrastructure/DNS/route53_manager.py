@@ -1,7 +1,7 @@
 """
 Route53 DNS management
 """
-import boto3
+from implementation.utils.aws_clients import get_client
 from typing import List, Dict
 
 
@@ -9,7 +9,7 @@ class Route53Manager:
     """Manage Route53 hosted zones and records"""
     
     def __init__(self):
-        self.route53_client = boto3.client('route53')
+        self.route53_client = get_client('route53')
     
     def create_hosted_zone(self, domain_name: str, comment: str = ""):
         """Create hosted zone"""
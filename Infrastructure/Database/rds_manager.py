@@ -1,14 +1,14 @@
 """
 RDS database management
 """
-import boto3
+from implementation.utils.aws_clients import get_client
 
 
 class RDSManager:
     """Manage RDS databases"""
     
     def __init__(self, region: str = 'us-east-1'):
-        self.rds_client = boto3.client('rds', region_name=region)
+        self.rds_client = get_client('rds', region_name=region)
         self.region = region
     
     def create_db_instance(self, db_identifier: str, db_name: str, engine: str,
@@ -1,7 +1,7 @@
 """
 Disaster recovery management
 """
-import boto3
+from implementation.utils.aws_clients import get_client
 from typing import List, Dict
 
 
@@ -11,7 +11,7 @@ class DisasterRecoveryManager:
     def __init__(self, primary_region: str = 'us-east-1', dr_region: str = 'us-west-2'):
         self.primary_region = primary_region
         self.dr_region = dr_region
-        self.s3_client = boto3.client('s3')
+        self.s3_client = get_client('s3')
     
     def setup_cross_region_replication(self, source_bucket: str, dest_bucket: str,
                                       role_arn: str):
@@ -49,7 +49,7 @@ class DisasterRecoveryManager:
     def create_ami_copy(self, source_ami_id: str, name: str, description: str = ""):
         """Copy AMI to DR region"""
         try:
-            ec2_dr = boto3.client('ec2', region_name=self.dr_region)
+            ec2_dr = get_client('ec2', region_name=self.dr_region)
             
             response = ec2_dr.copy_image(
                 SourceImageId=source_ami_id,
@@ -65,7 +65,7 @@ class DisasterRecoveryManager:
                                replica_identifier: str):
         """Create cross-region RDS read replica"""
         try:
-            rds_dr = boto3.client('rds', region_name=self.dr_region)
+            rds_dr = get_client('rds', region_name=self.dr_region)
             
             response = rds_dr.create_db_instance_read_replica(
                 DBInstanceIdentifier=replica_identifier,
@@ -1,7 +1,7 @@
 """
 CloudWatch monitoring and alarms
 """
-import boto3
+from implementation.utils.aws_clients import get_client
 from typing import List, Dict
 
 
@@ -9,8 +9,8 @@ class CloudWatchManager:
     """Manage CloudWatch metrics and alarms"""
     
     def __init__(self, region: str = 'us-east-1'):
-        self.cw_client = boto3.client('cloudwatch', region_name=region)
-        self.logs_client = boto3.client('logs', region_name=region)
+        self.cw_client = get_client('cloudwatch', region_name=region)
+        self.logs_client = get_client('logs', region_name=region)
         self.region = region
     
     def create_alarm(self, alarm_name: str, metric_name: str, namespace: str,
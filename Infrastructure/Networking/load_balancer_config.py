@@ -2,14 +2,14 @@
 Load balancer configuration manager
 """
 from typing import List, Dict
-import boto3
+from implementation.utils.aws_clients import get_client
 
 
 class LoadBalancerConfig:
     """Manage load balancer configurations"""
     
     def __init__(self, region: str = 'us-east-1'):
-        self.elb_client = boto3.client('elbv2', region_name=region)
+        self.elb_client = get_client('elbv2', region_name=region)
         self.region = region
     
     def create_alb(self, name: str, subnets: List[str], security_groups: List[str],
@@ -1,7 +1,7 @@
 """
 EKS cluster management
 """
-import boto3
+from implementation.utils.aws_clients import get_client
 from typing import List
 
 
@@ -9,7 +9,7 @@ class EKSManager:
     """Manage EKS clusters"""
     
     def __init__(self, region: str = 'us-east-1'):
-        self.eks_client = boto3.client('eks', region_name=region)
+        self.eks_client = get_client('eks', region_name=region)
         self.region = region
     
     def create_cluster(self, cluster_name: str, role_arn: str, subnet_ids: List[str],
@@ -1,7 +1,7 @@
 """
 IAM policy and role management
 """
-import boto3
+from implementation.utils.aws_clients import get_client
 import json
 from typing import Dict, List
 
@@ -10,7 +10,7 @@ class IAMPolicyManager:
     """Manage IAM policies and roles"""
     
     def __init__(self):
-        self.iam_client = boto3.client('iam')
+        self.iam_client = get_client('iam')
     
     def create_policy(self, name: str, policy_document: Dict, description: str = ""):
         """Create IAM policy"""
@@ -1,7 +1,7 @@
 """
 Security group management
 """
-import boto3
+from implementation.utils.aws_clients import get_client
 from typing import List, Dict
 
 
@@ -9,7 +9,7 @@ class SecurityGroupManager:
     """Manage AWS security groups"""
     
     def __init__(self, region: str = 'us-east-1'):
-        self.ec2_client = boto3.client('ec2', region_name=region)
+        self.ec2_client = get_client('ec2', region_name=region)
         self.region = region
     
     def create_security_group(self, vpc_id: str, name: str, description: str):
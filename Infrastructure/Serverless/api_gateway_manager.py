@@ -1,14 +1,14 @@
 """
 API Gateway management
 """
-import boto3
+from implementation.utils.aws_clients import get_client
 
 
 class APIGatewayManager:
     """Manage API Gateway"""
     
     def __init__(self, region: str = 'us-east-1'):
-        self.apigw_client = boto3.client('apigatewayv2', region_name=region)
+        self.apigw_client = get_client('apigatewayv2', region_name=region)
         self.region = region
     
     def create_http_api(self, name: str, description: str = ""):
@@ -1,7 +1,7 @@
 """
 AWS Lambda function management
 """
-import boto3
+from implementation.utils.aws_clients import get_client
 import zipfile
 import os
 from typing import Dict, List
@@ -11,7 +11,7 @@ class LambdaManager:
     """Manage Lambda functions"""
     
     def __init__(self, region: str = 'us-east-1'):
-        self.lambda_client = boto3.client('lambda', region_name=region)
+        self.lambda_client = get_client('lambda', region_name=region)
         self.region = region
     
     def create_function(self, function_name: str, runtime: str, handler: str,
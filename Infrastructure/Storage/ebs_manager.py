@@ -1,14 +1,14 @@
 """
 EBS volume management
 """
-import boto3
+from implementation.utils.aws_clients import get_client
 
 
 class EBSManager:
     """Manage EBS volumes"""
     
     def __init__(self, region: str = 'us-east-1'):
-        self.ec2_client = boto3.client('ec2', region_name=region)
+        self.ec2_client = get_client('ec2', region_name=region)
         self.region = region
     
     def create_volume(self, size: int, az: str, volume_type: str = 'gp3',
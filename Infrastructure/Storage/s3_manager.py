@@ -1,16 +1,22 @@
 """
 S3 bucket management
 """
-import boto3
-from typing import Dict, List
+from implementation.utils.aws_clients import get_client
+from implementation.utils.s3_transfer import TransferManager
+from implementation.utils.s3_listing import ShardedLister, iter_objects
+from typing import Dict, Iterator, List, Optional
 
 
 class S3Manager:
     """Manage S3 buckets and objects"""
     
-    def __init__(self, region: str = 'us-east-1'):
-        self.s3_client = boto3.client('s3', region_name=region)
+    def __init__(self, region: str = 'us-east-1', part_size_mb: int = 16, max_concurrency: int = 16,
+                 checkpoint_dir: Optional[str] = None):
+        self.s3_client = get_client('s3', region_name=region)
         self.region = region
+        self.transfer = TransferManager(self.s3_client, part_size=part_size_mb * 1024 * 1024,
+                                        multipart_threshold=part_size_mb * 1024 * 1024,
+                                        max_concurrency=max_concurrency, checkpoint_dir=checkpoint_dir)
     
     def create_bucket(self, bucket_name: str, versioning: bool = True, encryption: bool = True):
         """Create S3 bucket with best practices"""
@@ -55,9 +61,9 @@ class S3Manager:
             raise Exception(f"Failed to create bucket: {str(e)}")
     
     def upload_file(self, file_path: str, bucket_name: str, object_key: str):
-        """Upload file to S3"""
+        """Upload file to S3, resuming an interrupted multipart upload"""
         try:
-            self.s3_client.upload_file(file_path, bucket_name, object_key)
+            self.transfer.upload_file(file_path, bucket_name, object_key)
             return True
         except Exception as e:
             raise Exception(f"Failed to upload file: {str(e)}")
@@ -65,11 +71,35 @@ class S3Manager:
     def download_file(self, bucket_name: str, object_key: str, file_path: str):
         """Download file from S3"""
         try:
-            self.s3_client.download_file(bucket_name, object_key, file_path)
+            self.transfer.download_file(bucket_name, object_key, file_path)
             return True
         except Exception as e:
             raise Exception(f"Failed to download file: {str(e)}")
     
+    def sync_directory(self, local_dir: str, bucket_name: str, prefix: str = '', delete: bool = False) -> Dict:
+        """Upload a directory tree, skipping files whose size and ETag already match"""
+        try:
+            return self.transfer.upload_directory(local_dir, bucket_name, prefix, delete=delete)
+        except Exception as e:
+            raise Exception(f"Failed to sync directory: {str(e)}")
+    
+    def download_directory(self, bucket_name: str, prefix: str, local_dir: str) -> Dict:
+        """Download every object under prefix, skipping files already up to date"""
+        try:
+            return self.transfer.download_directory(bucket_name, prefix, local_dir)
+        except Exception as e:
+            raise Exception(f"Failed to download directory: {str(e)}")
+    
+    def get_transfer_stats(self) -> Dict:
+        """Bytes, files, MB/s and parts in flight of transfers so far"""
+        return self.transfer.get_stats()
+    
+    def list_objects(self, bucket_name: str, prefix: str = '', shards: Optional[int] = None) -> Iterator[Dict]:
+        """Lazily yield every object under prefix; with shards, list key ranges in parallel (unordered)"""
+        if shards:
+            return ShardedLister(self.s3_client, shards=shards).iter_objects(bucket_name, prefix)
+        return iter_objects(self.s3_client, bucket_name, prefix)
+    
     def set_lifecycle_policy(self, bucket_name: str, rules: List[Dict]):
         """Set lifecycle policy for bucket"""
         try:
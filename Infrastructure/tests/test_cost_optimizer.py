@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+import pytest
+
+from Infrastructure.Cost import cost_optimizer
+from Infrastructure.Cost.cost_optimizer import CostOptimizer
+
+
+class Paginator:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def paginate(self, **kwargs):
+        return iter(self.pages)
+
+
+class FakeEC2:
+    def __init__(self, instances, volumes=()):
+        self.instances = instances
+        self.volumes = list(volumes)
+
+    def get_paginator(self, operation):
+        if operation == 'describe_instances':
+            # Two pages, to make sure every page is read
+            return Paginator([{'Reservations': [{'Instances': self.instances[:1]}]},
+                              {'Reservations': [{'Instances': self.instances[1:]}]}])
+        return Paginator([{'Volumes': self.volumes}])
+
+
+class FakeCloudWatch:
+    """Answers GetMetricData from hourly values per dimension value, one result per page"""
+
+    def __init__(self, hourly):
+        self.hourly = hourly
+        self.calls = []
+
+    def get_metric_data(self, MetricDataQueries, StartTime, EndTime, ScanBy, NextToken=None):
+        self.calls.append(len(MetricDataQueries))
+        index = int(NextToken or 0)
+        query = MetricDataQueries[index]
+        value = query['MetricStat']['Metric']['Dimensions'][0]['Value']
+        values = self.hourly.get(value, [])
+        response = {'MetricDataResults': [{
+            'Id': query['Id'],
+            'Timestamps': [StartTime + timedelta(hours=h) for h in range(len(values))],
+            'Values': values,
+        }]}
+        if index + 1 < len(MetricDataQueries):
+            response['NextToken'] = str(index + 1)
+        return response
+
+
+class Unused:
+    def __getattr__(self, name):
+        raise AssertionError(f'{name} should not be called')
+
+
+@pytest.fixture
+def optimizer(monkeypatch):
+    ec2 = FakeEC2(
+        instances=[{'InstanceId': 'i-idle', 'InstanceType': 't3.large'},
+                   {'InstanceId': 'i-busy', 'InstanceType': 'm5.xlarge'},
+                   {'InstanceId': 'i-new', 'InstanceType': 't3.micro'}],
+        volumes=[{'VolumeId': 'vol-unused', 'State': 'available', 'Size': 100, 'VolumeType': 'gp3'}],
+    )
+    cloudwatch = FakeCloudWatch({'i-idle': [2.0] * 168, 'i-busy': [2.0] * 100 + [60.0] * 68})
+    clients = {'ec2': ec2, 'cloudwatch': cloudwatch, 'ce': Unused(), 'elbv2': Unused(), 'rds': Unused()}
+    monkeypatch.setattr(cost_optimizer, 'get_client', lambda service, region_name=None: clients[service])
+    optimizer = CostOptimizer()
+    optimizer.cloudwatch = cloudwatch
+    return optimizer
+
+
+def test_default_checks_only_ec2(optimizer):
+    idle = optimizer.find_idle_resources()
+
+    assert [r['instance_id'] for r in idle] == ['i-idle']
+    assert idle[0]['instance_type'] == 't3.large'
+    assert idle[0]['avg_cpu'] == pytest.approx(2.0)
+    # One GetMetricData request for all three instances, paged through to the end
+    assert optimizer.cloudwatch.calls == [3, 3, 3]
+
+
+def test_other_kinds_on_request(optimizer):
+    idle = optimizer.find_idle_resources(kinds=('ec2', 'ebs'))
+    assert sorted((r['resource_type'], r['resource_id']) for r in idle) == [('ebs', 'vol-unused'), ('ec2', 'i-idle')]
@@ -0,0 +1,71 @@
+from datetime import datetime, timezone
+
+import pytest
+from botocore.exceptions import ClientError
+
+from Infrastructure.Compliance.scan_engine import ComplianceReport, ComplianceScanner, ResultCache, s3_encryption_checks
+
+
+class FakeS3:
+    """bucket-0 has no default encryption, bucket-1 denies access, the rest use KMS"""
+
+    def __init__(self, count):
+        created = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.buckets = [{'Name': f'bucket-{n}', 'CreationDate': created} for n in range(count)]
+        self.encryption_calls = 0
+
+    def can_paginate(self, operation):
+        return False
+
+    def list_buckets(self):
+        return {'Buckets': self.buckets}
+
+    def get_bucket_encryption(self, Bucket):
+        self.encryption_calls += 1
+        if Bucket == 'bucket-0':
+            raise ClientError({'Error': {'Code': 'ServerSideEncryptionConfigurationNotFoundError'}},
+                              'GetBucketEncryption')
+        if Bucket == 'bucket-1':
+            raise ClientError({'Error': {'Code': 'AccessDenied'}}, 'GetBucketEncryption')
+        return {'ServerSideEncryptionConfiguration': {
+            'Rules': [{'ApplyServerSideEncryptionByDefault': {'SSEAlgorithm': 'aws:kms'}}]}}
+
+
+@pytest.fixture
+def scanner(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache.db'))
+    yield ComplianceScanner(max_workers=4, cache=cache)
+    cache.close()
+
+
+def scan(scanner, s3, fingerprints=None):
+    return ComplianceReport().consume(scanner.scan(s3_encryption_checks(s3, fingerprints)))
+
+
+def test_findings(scanner):
+    report = scan(scanner, FakeS3(5))
+    assert report.totals['s3_encryption'] == {'compliant': 3, 'non_compliant': 1, 'error': 1, 'cached': 0}
+    assert report.non_compliant['s3_encryption'] == ['bucket-0']
+
+
+def test_buckets_without_a_fingerprint_are_never_cached(scanner):
+    s3 = FakeS3(5)
+    scan(scanner, s3)
+    report = scan(scanner, s3)
+    assert report.totals['s3_encryption']['cached'] == 0
+    assert s3.encryption_calls == 10
+
+
+def test_cached_until_the_fingerprint_changes(scanner):
+    s3 = FakeS3(5)
+    fingerprints = {bucket['Name']: '1@2024-01-01T00:00:00Z' for bucket in s3.buckets}
+    scan(scanner, s3, fingerprints)
+    report = scan(scanner, s3, fingerprints)
+    # Errors are not cached, so only bucket-1 is checked again
+    assert report.totals['s3_encryption']['cached'] == 4
+    assert s3.encryption_calls == 6
+
+    fingerprints['bucket-3'] = '2@2024-02-01T00:00:00Z'
+    report = scan(scanner, s3, fingerprints)
+    assert report.totals['s3_encryption']['cached'] == 3
+    assert s3.encryption_calls == 8
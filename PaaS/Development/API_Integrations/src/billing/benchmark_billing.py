@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Benchmark for the local cost store behind CloudBillingIntegration
+
+Simulates a month of daily billing reports over a sliding 30-day window
+against a fake Cost Explorer that takes a fixed time per request, returns
+a fixed number of groups per page and bills $0.01 per request. It compares
+re-querying the whole window for every report (the old behaviour, but
+following NextPageToken) with CostStore, which only fetches days it does
+not hold plus the last few days that may still be revised. Run from the
+API_Integrations directory:
+
+    python -m src.billing.benchmark_billing --groups-per-day 500 --reports 30
+"""
+
+import time
+import random
+import argparse
+from datetime import date, timedelta
+from src.billing.cost_store import CostStore, iter_aws_cost_pages, normalize_aws
+
+class FakeCostExplorer:
+    def __init__(self, groups_per_day, page_size, request_seconds):
+        self.groups_per_day = groups_per_day
+        self.page_size = page_size
+        self.request_seconds = request_seconds
+        self.requests = 0
+        rng = random.Random(11)
+        self.groups = [{'Keys': [f'service-{n % 40}', f'usage-{n}'],
+                        'Metrics': {'UnblendedCost': {'Amount': f'{rng.uniform(0, 5):.6f}', 'Unit': 'USD'}}}
+                       for n in range(groups_per_day)]
+
+    def get_cost_and_usage(self, TimePeriod, NextPageToken=None, **kwargs):
+        self.requests += 1
+        time.sleep(self.request_seconds)
+        start, end = date.fromisoformat(TimePeriod['Start']), date.fromisoformat(TimePeriod['End'])
+        total = (end - start).days * self.groups_per_day
+        offset = int(NextPageToken or 0)
+        results = {}
+        for n in range(offset, min(offset + self.page_size, total)):
+            day = start + timedelta(days=n // self.groups_per_day)
+            results.setdefault(day, []).append(self.groups[n % self.groups_per_day])
+        response = {'ResultsByTime': [{'TimePeriod': {'Start': d.isoformat(), 'End': (d + timedelta(days=1)).isoformat()},
+                                       'Groups': groups} for d, groups in results.items()]}
+        if offset + self.page_size < total:
+            response['NextPageToken'] = str(offset + self.page_size)
+        return response
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--groups-per-day', type=int, default=500)
+    parser.add_argument('--page-size', type=int, default=2000)
+    parser.add_argument('--request-ms', type=float, default=400.0)
+    parser.add_argument('--reports', type=int, default=30)
+    parser.add_argument('--window-days', type=int, default=30)
+    args = parser.parse_args()
+
+    first_day = date(2024, 3, 1)
+    reports = [(first_day + timedelta(days=n), first_day + timedelta(days=n + args.window_days))
+               for n in range(args.reports)]
+    print(f"{args.reports} daily reports over a {args.window_days}-day window, {args.groups_per_day} groups per day, "
+          f"{args.page_size} groups per page, {args.request_ms:.0f} ms and $0.01 per request")
+
+    ce = FakeCostExplorer(args.groups_per_day, args.page_size, args.request_ms / 1000)
+    start = time.perf_counter()
+    for window_start, window_end in reports:
+        totals = {}
+        for page in iter_aws_cost_pages(ce, window_start, window_end):
+            for row in normalize_aws(page):
+                totals[row[3]] = totals.get(row[3], 0.0) + row[7]
+    print(f"Full window every report: {time.perf_counter() - start:7.2f}s  {ce.requests} requests  "
+          f"${ce.requests * 0.01:.2f}")
+
+    ce = FakeCostExplorer(args.groups_per_day, args.page_size, args.request_ms / 1000)
+    today = [None]
+    store = CostStore(refresh_days=3, today=lambda: today[0])
+    fetch = lambda s, e: (row for page in iter_aws_cost_pages(ce, s, e) for row in normalize_aws(page))
+    start = time.perf_counter()
+    rollup_seconds = 0.0
+    for window_start, window_end in reports:
+        today[0] = window_end
+        store.sync('aws', fetch, window_start, window_end)
+        rollup_start = time.perf_counter()
+        store.rollup(('service',), window_start, window_end, provider='aws')
+        rollup_seconds += time.perf_counter() - rollup_start
+    print(f"CostStore:                {time.perf_counter() - start:7.2f}s  {ce.requests} requests  "
+          f"${ce.requests * 0.01:.2f}  ({rollup_seconds / args.reports * 1000:.0f} ms per local rollup)")
+
+if __name__ == '__main__':
+    main()
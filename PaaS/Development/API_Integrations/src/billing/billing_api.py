@@ -4,12 +4,14 @@ import boto3
 from azure.mgmt.consumption import ConsumptionManagementClient
 from datetime import datetime, timedelta
 import yaml
+from src.billing.cost_store import CostStore, iter_aws_cost_pages, normalize_aws, normalize_azure
 
 class CloudBillingIntegration:
-    def __init__(self, config_path='config/credentials.yaml'):
+    def __init__(self, config_path='config/credentials.yaml', cost_store=None):
         """Initialize billing clients for different cloud providers"""
         with open(config_path) as f:
             config = yaml.safe_load(f)
+        billing = config.get('billing', {})
         
         # AWS Cost Explorer
         self.aws_ce = boto3.client(
@@ -21,15 +23,20 @@ class CloudBillingIntegration:
         
         # Azure Consumption
         azure_credentials = config['azure']
+        self.azure_subscription_id = azure_credentials['subscription_id']
         self.azure_consumption = ConsumptionManagementClient(
             credentials=azure_credentials['credentials'],
             subscription_id=azure_credentials['subscription_id']
         )
 
+        # Local cost warehouse: providers are only asked for days it does not hold yet
+        self.costs = cost_store or CostStore(billing.get('cost_store', 'data/costs.sqlite'),
+                                             refresh_days=billing.get('refresh_days', 3))
+
     def get_aws_costs(self, start_date, end_date):
-        """Get AWS costs for a specific time period"""
+        """Get AWS costs for a specific time period, following NextPageToken"""
         try:
-            response = self.aws_ce.get_cost_and_usage(
+            kwargs = dict(
                 TimePeriod={
                     'Start': start_date,
                     'End': end_date
@@ -41,7 +48,13 @@ class CloudBillingIntegration:
                     {'Type': 'DIMENSION', 'Key': 'USAGE_TYPE'}
                 ]
             )
-            return response['ResultsByTime']
+            results = []
+            while True:
+                response = self.aws_ce.get_cost_and_usage(**kwargs)
+                results.extend(response['ResultsByTime'])
+                if not response.get('NextPageToken'):
+                    return results
+                kwargs['NextPageToken'] = response['NextPageToken']
         except Exception as e:
             print(f"Error getting AWS costs: {e}")
             return None
@@ -58,52 +71,83 @@ class CloudBillingIntegration:
             print(f"Error getting Azure costs: {e}")
             return None
 
-    def get_consolidated_billing(self, start_date=None, end_date=None):
-        """Get consolidated billing across all cloud providers"""
+    def _fetch_aws(self, resource_id=None):
+        """Fetcher for CostStore.sync: daily AWS line items, account-wide or for one resource"""
+        if resource_id is None:
+            return lambda start, end: (row for page in iter_aws_cost_pages(self.aws_ce, start, end)
+                                       for row in normalize_aws(page))
+        group_by = ('SERVICE',)
+        cost_filter = {'Dimensions': {'Key': 'RESOURCE_ID', 'Values': [resource_id]}}
+        return lambda start, end: (row for page in iter_aws_cost_pages(self.aws_ce, start, end, group_by, cost_filter)
+                                   for row in normalize_aws(page, group_by, resource_id, resource_id))
+
+    def _fetch_azure(self, start, end):
+        """Fetcher for CostStore.sync: Azure usage details streamed page by page"""
+        costs = self.azure_consumption.usage_details.list(
+            scope=f"/subscriptions/{self.azure_subscription_id}",
+            filter=f"usageStart ge '{start}' and usageEnd lt '{end}'"
+        )
+        return normalize_azure(costs)
+
+    def sync_costs(self, start_date, end_date):
+        """Pull the days the local cost store is missing from each provider; None for a provider that failed"""
+        synced = {}
+        for provider, fetch in (('aws', self._fetch_aws()), ('azure', self._fetch_azure)):
+            try:
+                synced[provider] = self.costs.sync(provider, fetch, start_date, end_date)
+            except Exception as e:
+                print(f"Error syncing {provider.upper()} costs: {e}")
+                synced[provider] = None
+        return synced
+
+    def _default_period(self, start_date, end_date):
         if not start_date:
             start_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
         if not end_date:
             end_date = datetime.now().strftime('%Y-%m-%d')
+        return start_date, end_date
+
+    def get_consolidated_billing(self, start_date=None, end_date=None):
+        """Get consolidated billing across all cloud providers, per service, from the local cost store"""
+        start_date, end_date = self._default_period(start_date, end_date)
+        synced = self.sync_costs(start_date, end_date)
 
         billing_data = {
-            'aws': self.get_aws_costs(start_date, end_date),
-            'azure': self.get_azure_costs(start_date, end_date)
+            provider: self.costs.rollup(('service',), start_date, end_date, provider=provider)
+            if synced[provider] is not None else None
+            for provider in ('aws', 'azure')
         }
-
+        billing_data['daily'] = self.costs.rollup(('day', 'provider'), start_date, end_date)
         return billing_data
 
-    def get_resource_costs(self, resource_id, provider):
-        """Get costs for a specific resource"""
+    def get_cost_rollup(self, by=('service',), start_date=None, end_date=None, provider=None, sync=True):
+        """Costs grouped by any of provider/day/service/usage_type/resource_id/account"""
+        start_date, end_date = self._default_period(start_date, end_date)
+        if sync:
+            self.sync_costs(start_date, end_date)
+        return self.costs.rollup(by, start_date, end_date, provider=provider)
+
+    def get_resource_costs(self, resource_id, provider, start_date=None, end_date=None):
+        """Get daily costs for a specific resource"""
+        start_date, end_date = self._default_period(start_date, end_date)
         if provider.lower() == 'aws':
+            # Account-wide Cost Explorer data has no resource IDs, so each resource is its own scope
             try:
-                response = self.aws_ce.get_cost_and_usage(
-                    TimePeriod={
-                        'Start': (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d'),
-                        'End': datetime.now().strftime('%Y-%m-%d')
-                    },
-                    Granularity='DAILY',
-                    Metrics=['UnblendedCost'],
-                    Filter={
-                        'Dimensions': {
-                            'Key': 'RESOURCE_ID',
-                            'Values': [resource_id]
-                        }
-                    }
-                )
-                return response['ResultsByTime']
+                self.costs.sync('aws', self._fetch_aws(resource_id), start_date, end_date, scope=resource_id)
             except Exception as e:
                 print(f"Error getting AWS resource costs: {e}")
                 return None
-        
+            return self.costs.rollup(('day', 'service'), start_date, end_date, provider='aws',
+                                     resource_id=resource_id, scope=resource_id)
+
         elif provider.lower() == 'azure':
+            # Azure line items carry their resource ID, so the account-wide store answers this
             try:
-                costs = self.azure_consumption.usage_details.list(
-                    scope=f"/subscriptions/{self.azure_subscription_id}",
-                    filter=f"resourceId eq '{resource_id}'"
-                )
-                return list(costs)
+                self.costs.sync('azure', self._fetch_azure, start_date, end_date)
             except Exception as e:
                 print(f"Error getting Azure resource costs: {e}")
                 return None
-        
+            return self.costs.rollup(('day', 'service'), start_date, end_date, provider='azure',
+                                     resource_id=resource_id)
+
         return None
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+# Columns every provider's line items are normalised into
+COLUMNS = ('provider', 'scope', 'day', 'service', 'usage_type', 'resource_id', 'account', 'cost', 'currency')
+DIMENSIONS = ('provider', 'day', 'service', 'usage_type', 'resource_id', 'account', 'currency')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cost_items (
+    provider TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    day TEXT NOT NULL,
+    service TEXT NOT NULL,
+    usage_type TEXT NOT NULL,
+    resource_id TEXT NOT NULL,
+    account TEXT NOT NULL,
+    cost REAL NOT NULL,
+    currency TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cost_items_day ON cost_items (provider, scope, day);
+CREATE INDEX IF NOT EXISTS cost_items_resource ON cost_items (resource_id, day);
+CREATE TABLE IF NOT EXISTS fetched_days (
+    provider TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    day TEXT NOT NULL,
+    fetched_at TEXT NOT NULL,
+    PRIMARY KEY (provider, scope, day)
+);
+"""
+
+INSERT_BATCH = 5000
+
+
+def _day(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _field(item, *names, default=None):
+    """First non-empty attribute/key of an SDK model or a recorded dict (also looks under 'properties')"""
+    sources = [item]
+    properties = item.get('properties') if isinstance(item, dict) else getattr(item, 'properties', None)
+    if properties is not None:
+        sources.append(properties)
+    for source in sources:
+        for name in names:
+            value = source.get(name) if isinstance(source, dict) else getattr(source, name, None)
+            if value not in (None, ''):
+                return value
+    return default
+
+
+def iter_aws_cost_pages(ce, start, end, group_by=('SERVICE', 'USAGE_TYPE'), cost_filter=None):
+    """ResultsByTime pages of a DAILY get_cost_and_usage query, following NextPageToken"""
+    kwargs = {
+        'TimePeriod': {'Start': str(start), 'End': str(end)},
+        'Granularity': 'DAILY',
+        'Metrics': ['UnblendedCost'],
+        'GroupBy': [{'Type': 'DIMENSION', 'Key': key} for key in group_by],
+    }
+    if cost_filter:
+        kwargs['Filter'] = cost_filter
+    while True:
+        response = ce.get_cost_and_usage(**kwargs)
+        yield response.get('ResultsByTime', [])
+        token = response.get('NextPageToken')
+        if not token:
+            return
+        kwargs['NextPageToken'] = token
+
+
+def normalize_aws(results_by_time, group_by=('SERVICE', 'USAGE_TYPE'), scope='', resource_id=''):
+    """Cost Explorer ResultsByTime entries as rows of COLUMNS"""
+    for period in results_by_time:
+        day = period['TimePeriod']['Start']
+        groups = period.get('Groups')
+        if groups is None:
+            groups = [{'Keys': [], 'Metrics': period.get('Total', {})}]
+        for group in groups:
+            keys = dict(zip(group_by, group.get('Keys', [])))
+            metric = group['Metrics']['UnblendedCost']
+            yield ('aws', scope, day, keys.get('SERVICE', ''), keys.get('USAGE_TYPE', ''),
+                   keys.get('RESOURCE_ID', resource_id), keys.get('LINKED_ACCOUNT', ''),
+                   float(metric['Amount']), metric.get('Unit', 'USD'))
+
+
+def normalize_azure(usage_details, scope=''):
+    """Azure usage detail line items (legacy or modern, SDK models or dicts) as rows of COLUMNS"""
+    for item in usage_details:
+        day = _day(_field(item, 'date', 'usage_start', 'usageStart'))
+        yield ('azure', scope, day.isoformat(),
+               _field(item, 'consumed_service', 'consumedService', 'meter_category', 'meterCategory', default=''),
+               _field(item, 'meter_name', 'meterName', 'product', default=''),
+               _field(item, 'resource_id', 'resourceId', 'instance_name', 'instanceName', default=''),
+               _field(item, 'subscription_id', 'subscriptionId', 'subscription_guid', default=''),
+               float(_field(item, 'cost_in_billing_currency', 'costInBillingCurrency', 'cost', 'pretax_cost',
+                            default=0.0)),
+               _field(item, 'billing_currency_code', 'billingCurrencyCode', 'billing_currency',
+                      'billingCurrency', 'currency', default='USD'))
+
+
+class CostStore:
+    """Local SQLite warehouse of daily cost line items from every provider
+
+    Each (provider, scope) pair records which days it holds, so a sync only
+    asks the provider for days it has not stored yet. Recent days are
+    always refetched because providers revise them for a while after the
+    fact. A scope is '' for account-wide data or a resource ID for data
+    fetched for one resource. Rollups are GROUP BY queries over the stored
+    rows, never over provider responses.
+    """
+
+    def __init__(self, path=':memory:', refresh_days=3, today=date.today):
+        if path != ':memory:' and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.refresh_days = refresh_days
+        self.today = today
+        self.fetches = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._conn.close()
+
+    def missing_ranges(self, provider, start, end, scope=''):
+        """[start, end) ranges of days that are not stored or are too recent to trust"""
+        start, end = _day(start), _day(end)
+        settled_before = self.today() - timedelta(days=self.refresh_days)
+        rows = self._conn.execute(
+            "SELECT day FROM fetched_days WHERE provider = ? AND scope = ? AND day >= ? AND day < ?",
+            (provider, scope, start.isoformat(), end.isoformat()))
+        have = {_day(day) for day, in rows if _day(day) < settled_before}
+
+        ranges, run_start, day = [], None, start
+        while day < end:
+            if day not in have and run_start is None:
+                run_start = day
+            elif day in have and run_start is not None:
+                ranges.append((run_start, day))
+                run_start = None
+            day += timedelta(days=1)
+        if run_start is not None:
+            ranges.append((run_start, end))
+        return ranges
+
+    def replace_range(self, provider, start, end, rows, scope=''):
+        """Swap the stored rows for [start, end) with `rows`, streamed in batches, in one transaction"""
+        start, end = _day(start), _day(end)
+        rows = iter(rows)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cost_items WHERE provider = ? AND scope = ? AND day >= ? AND day < ?",
+                               (provider, scope, start.isoformat(), end.isoformat()))
+            count = 0
+            while True:
+                batch = list(islice(rows, INSERT_BATCH))
+                if not batch:
+                    break
+                self._conn.executemany(f"INSERT INTO cost_items ({', '.join(COLUMNS)}) "
+                                       f"VALUES ({', '.join('?' * len(COLUMNS))})", batch)
+                count += len(batch)
+            fetched_at = datetime.now().isoformat(timespec='seconds')
+            days = [(start + timedelta(days=n)).isoformat() for n in range((end - start).days)]
+            self._conn.executemany("INSERT OR REPLACE INTO fetched_days VALUES (?, ?, ?, ?)",
+                                   [(provider, scope, day, fetched_at) for day in days])
+        return count
+
+    def sync(self, provider, fetch, start, end, scope=''):
+        """Fetch and store only the missing days; fetch(start, end) yields rows of COLUMNS for [start, end)"""
+        ranges = self.missing_ranges(provider, start, end, scope)
+        rows = 0
+        for range_start, range_end in ranges:
+            self.fetches += 1
+            rows += self.replace_range(provider, range_start, range_end, fetch(range_start, range_end), scope)
+        return {'ranges': [(s.isoformat(), e.isoformat()) for s, e in ranges], 'rows': rows}
+
+    def rollup(self, by=('service',), start=None, end=None, provider=None, resource_id=None, scope=''):
+        """Total cost grouped by `by` (any of DIMENSIONS) over [start, end), largest first
+
+        Currency is always part of the grouping so amounts in different
+        currencies are never added together.
+        """
+        by = [dimension for dimension in by if dimension != 'currency']
+        unknown = set(by) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Unknown cost dimensions: {', '.join(sorted(unknown))}")
+        columns = by + ['currency']
+
+        where, params = ['scope = ?'], [scope]
+        for clause, value in (('day >= ?', start), ('day < ?', end)):
+            if value is not None:
+                where.append(clause)
+                params.append(_day(value).isoformat())
+        for column, value in (('provider', provider), ('resource_id', resource_id)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+
+        order = 'day, cost DESC' if 'day' in by else 'cost DESC'
+        query = (f"SELECT {', '.join(columns)}, ROUND(SUM(cost), 6) AS cost FROM cost_items "
+                 f"WHERE {' AND '.join(where)} GROUP BY {', '.join(columns)} ORDER BY {order}")
+        return [dict(zip(columns + ['cost'], row)) for row in self._conn.execute(query, params)]
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Benchmark for CloudStackIntegration lookups and bulk lifecycle operations
+
+Uses a fake libcloud driver whose list_nodes() cost grows with the zone
+size and whose start/stop calls take a fixed round trip, and compares
+stopping N VMs one lookup-and-call at a time (the old list-and-scan
+behaviour) with bulk_stop. Run from the API_Integrations directory:
+
+    python -m src.cloudstack.benchmark_cloudstack --zone-size 5000 --stop 500
+"""
+
+import time
+import argparse
+import tempfile
+import threading
+from unittest.mock import patch
+import yaml
+from libcloud.compute.base import Node
+from libcloud.compute.types import NodeState
+from src.cloudstack.cloudstack_api import CloudStackIntegration
+
+class FakeDriver:
+    nodes = []
+    list_seconds = 0.0
+    call_seconds = 0.0
+    lock = threading.Lock()
+    listings = 0
+
+    def __init__(self, **kwargs):
+        pass
+
+    def list_nodes(self):
+        with self.lock:
+            FakeDriver.listings += 1
+        time.sleep(self.list_seconds)
+        return list(self.nodes)
+
+    def ex_stop_node(self, node):
+        time.sleep(self.call_seconds)
+        node.state = NodeState.STOPPED
+        return True
+
+    ex_start_node = ex_stop_node
+
+def scan_and_stop(driver, instance_ids):
+    """What stop_instance did before the cache: list the zone and scan it for every ID"""
+    for instance_id in instance_ids:
+        for node in driver.list_nodes():
+            if node.id == instance_id:
+                driver.ex_stop_node(node)
+                break
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--zone-size', type=int, default=5000)
+    parser.add_argument('--stop', type=int, default=500)
+    parser.add_argument('--list-ms-per-1000', type=float, default=40.0)
+    parser.add_argument('--call-ms', type=float, default=50.0)
+    parser.add_argument('--workers', type=int, default=16)
+    args = parser.parse_args()
+
+    FakeDriver.nodes = [Node(f'vm-{i}', f'vm-{i}', NodeState.RUNNING, [], [], None) for i in range(args.zone_size)]
+    FakeDriver.list_seconds = args.list_ms_per_1000 / 1000 * args.zone_size / 1000
+    FakeDriver.call_seconds = args.call_ms / 1000
+    ids = [f'vm-{i}' for i in range(0, args.zone_size, max(1, args.zone_size // args.stop))][:args.stop]
+
+    with tempfile.NamedTemporaryFile('w', suffix='.yaml') as config:
+        yaml.safe_dump({'cloudstack': {'api_key': 'k', 'secret_key': 's', 'host': 'localhost'}}, config)
+        config.flush()
+        with patch('src.cloudstack.cloudstack_api.get_driver', return_value=FakeDriver):
+            client = CloudStackIntegration(config.name, max_workers=args.workers)
+
+    print(f"Zone of {args.zone_size} VMs ({FakeDriver.list_seconds * 1000:.0f} ms per listing), "
+          f"stopping {len(ids)} ({args.call_ms:.0f} ms per call)")
+
+    sample = ids[:max(1, len(ids) // 10)]
+    FakeDriver.listings = 0
+    start = time.perf_counter()
+    scan_and_stop(FakeDriver(), sample)
+    scan_seconds = (time.perf_counter() - start) * len(ids) / len(sample)
+    print(f"List and scan per VM:  {scan_seconds:7.2f}s  {len(ids)} listings  "
+          f"(extrapolated from {len(sample)})")
+
+    FakeDriver.listings = 0
+    start = time.perf_counter()
+    for instance_id in ids:
+        client.get_instance_status(instance_id)
+    print(f"Cached status lookups: {time.perf_counter() - start:7.2f}s  {FakeDriver.listings} listing(s)")
+
+    FakeDriver.listings = 0
+    start = time.perf_counter()
+    result = client.bulk_stop(ids)
+    print(f"bulk_stop:             {time.perf_counter() - start:7.2f}s  {FakeDriver.listings} listing(s), "
+          f"{len(result['succeeded'])} stopped, {len(result['failed'])} failed")
+
+if __name__ == '__main__':
+    main()
@@ -1,68 +1,224 @@
 #!/usr/bin/env python3
 
 import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from libcloud.compute.types import Provider
 from libcloud.compute.providers import get_driver
 from libcloud.compute.base import NodeSize, NodeImage, NodeLocation
 import yaml
 
+class NodeCache:
+    """Nodes from one list_nodes() call, indexed by ID and by name
+
+    The listing is reused until it is `ttl` seconds old. Mutations
+    invalidate the nodes they touch, so the next lookup of such a node
+    lists again instead of returning a stale state. An unknown ID triggers
+    one early refresh if the listing is older than `miss_refresh` seconds,
+    to pick up nodes created elsewhere. Concurrent refreshes are coalesced
+    into a single listing.
+    """
+
+    def __init__(self, list_nodes, ttl=30.0, miss_refresh=5.0, clock=time.monotonic):
+        self.list_nodes = list_nodes
+        self.ttl = ttl
+        self.miss_refresh = miss_refresh
+        self.clock = clock
+        self.by_id = {}
+        self.by_name = {}
+        self.refreshed_at = None
+        self.listings = 0
+        self._stale = set()
+        self._lock = threading.RLock()
+
+    def refresh(self):
+        """List the zone once and rebuild both indexes"""
+        with self._lock:
+            return self.load(self.list_nodes())
+
+    def load(self, nodes):
+        """Replace the cache with a listing obtained elsewhere"""
+        with self._lock:
+            self.by_id = {node.id: node for node in nodes}
+            self.by_name = {}
+            for node in nodes:
+                self.by_name.setdefault(node.name, []).append(node)
+            self._stale.clear()
+            self.refreshed_at = self.clock()
+            self.listings += 1
+            return nodes
+
+    def _expired(self):
+        return self.refreshed_at is None or self.clock() - self.refreshed_at >= self.ttl
+
+    def _missed(self, node_ids):
+        return self.clock() - self.refreshed_at >= self.miss_refresh and \
+            any(node_id not in self.by_id for node_id in node_ids)
+
+    def nodes(self):
+        with self._lock:
+            if self._expired() or self._stale:
+                return self.refresh()
+            return list(self.by_id.values())
+
+    def get(self, node_id):
+        """The node with this ID, listing again only if the cache is expired or the node was invalidated"""
+        with self._lock:
+            if self._expired() or node_id in self._stale or self._missed([node_id]):
+                self.refresh()
+            return self.by_id.get(node_id)
+
+    def get_many(self, node_ids):
+        """{id: node or None} for every ID, from at most one listing"""
+        with self._lock:
+            if self._expired() or self._stale.intersection(node_ids) or self._missed(node_ids):
+                self.refresh()
+            return {node_id: self.by_id.get(node_id) for node_id in node_ids}
+
+    def find_by_name(self, name):
+        with self._lock:
+            if self._expired():
+                self.refresh()
+            return list(self.by_name.get(name, []))
+
+    def invalidate(self, node_id=None):
+        """Mark one node (or the whole cache) as needing a fresh listing"""
+        with self._lock:
+            if node_id is None:
+                self.refreshed_at = None
+            elif node_id in self.by_id:
+                self._stale.add(node_id)
+
+    def add(self, node):
+        with self._lock:
+            self.by_id[node.id] = node
+            self.by_name.setdefault(node.name, []).append(node)
+
+    def remove(self, node_id):
+        with self._lock:
+            node = self.by_id.pop(node_id, None)
+            self._stale.discard(node_id)
+            if node is not None:
+                same_name = [n for n in self.by_name.get(node.name, []) if n.id != node_id]
+                if same_name:
+                    self.by_name[node.name] = same_name
+                else:
+                    self.by_name.pop(node.name, None)
+
 class CloudStackIntegration:
-    def __init__(self, config_path='config/credentials.yaml'):
+    def __init__(self, config_path='config/credentials.yaml', cache_ttl=30.0, max_workers=16):
         """Initialize CloudStack API connection"""
         with open(config_path) as f:
             config = yaml.safe_load(f)['cloudstack']
-        
+
         self.cls = get_driver(Provider.CLOUDSTACK)
-        self.driver = self.cls(
+        self._driver_args = dict(
             key=config['api_key'],
             secret=config['secret_key'],
             host=config['host'],
             path=config.get('path', '/client/api'),
             secure=config.get('secure', True)
         )
+        self.driver = self.cls(**self._driver_args)
+        self.max_workers = max_workers
+        self.cache = NodeCache(lambda: self.driver.list_nodes(), ttl=cache_ttl)
+        self._local = threading.local()
+
+    def _worker_driver(self):
+        """A driver per worker thread: libcloud connections are not safe to share across threads"""
+        if not hasattr(self._local, 'driver'):
+            self._local.driver = self.cls(**self._driver_args)
+        return self._local.driver
 
     def list_virtual_machines(self):
         """List all virtual machines"""
-        return self.driver.list_nodes()
+        return self.cache.load(self.driver.list_nodes())
 
     def create_kvm_instance(self, name, size, image, location=None):
         """Create a new KVM instance"""
-        return self.driver.create_node(
+        node = self.driver.create_node(
             name=name,
             size=size,
             image=image,
             location=location,
             ex_hypervisor='KVM'
         )
+        self.cache.add(node)
+        return node
+
+    def get_instance(self, instance_id):
+        """Get a node by ID from the cache"""
+        return self.cache.get(instance_id)
+
+    def find_instances_by_name(self, name):
+        """Get all nodes with this name from the cache"""
+        return self.cache.find_by_name(name)
 
     def get_instance_status(self, instance_id):
         """Get status of a specific instance"""
-        nodes = self.driver.list_nodes()
-        for node in nodes:
-            if node.id == instance_id:
-                return node.state
-        return None
+        node = self.cache.get(instance_id)
+        return node.state if node is not None else None
 
     def stop_instance(self, instance_id):
         """Stop a running instance"""
-        nodes = self.driver.list_nodes()
-        for node in nodes:
-            if node.id == instance_id:
-                return self.driver.ex_stop_node(node)
-        return False
+        node = self.cache.get(instance_id)
+        if node is None:
+            return False
+        result = self.driver.ex_stop_node(node)
+        self.cache.invalidate(instance_id)
+        return result
 
     def start_instance(self, instance_id):
         """Start a stopped instance"""
-        nodes = self.driver.list_nodes()
-        for node in nodes:
-            if node.id == instance_id:
-                return self.driver.ex_start_node(node)
-        return False
+        node = self.cache.get(instance_id)
+        if node is None:
+            return False
+        result = self.driver.ex_start_node(node)
+        self.cache.invalidate(instance_id)
+        return result
 
     def delete_instance(self, instance_id):
         """Delete an instance"""
-        nodes = self.driver.list_nodes()
-        for node in nodes:
-            if node.id == instance_id:
-                return self.driver.destroy_node(node)
-        return False
+        node = self.cache.get(instance_id)
+        if node is None:
+            return False
+        result = self.driver.destroy_node(node)
+        self.cache.remove(instance_id)
+        return result
+
+    def _bulk(self, instance_ids, operation, max_workers=None):
+        nodes = self.cache.get_many(list(dict.fromkeys(instance_ids)))
+        found = {node_id: node for node_id, node in nodes.items() if node is not None}
+        results = {'succeeded': [], 'failed': {}, 'not_found': [i for i, n in nodes.items() if n is None]}
+
+        def run(node):
+            return getattr(self._worker_driver(), operation)(node)
+
+        with ThreadPoolExecutor(max_workers=max_workers or self.max_workers) as pool:
+            futures = {node_id: pool.submit(run, node) for node_id, node in found.items()}
+        for node_id, future in futures.items():
+            try:
+                if future.result() is False:
+                    results['failed'][node_id] = f"{operation} returned False"
+                else:
+                    results['succeeded'].append(node_id)
+            except Exception as e:
+                results['failed'][node_id] = str(e)
+            if operation == 'destroy_node' and node_id not in results['failed']:
+                self.cache.remove(node_id)
+            else:
+                self.cache.invalidate(node_id)
+        return results
+
+    def bulk_stop(self, instance_ids, max_workers=None):
+        """Stop many instances: one listing to resolve IDs, then concurrent stop calls"""
+        return self._bulk(instance_ids, 'ex_stop_node', max_workers)
+
+    def bulk_start(self, instance_ids, max_workers=None):
+        """Start many instances: one listing to resolve IDs, then concurrent start calls"""
+        return self._bulk(instance_ids, 'ex_start_node', max_workers)
+
+    def bulk_delete(self, instance_ids, max_workers=None):
+        """Delete many instances: one listing to resolve IDs, then concurrent destroy calls"""
+        return self._bulk(instance_ids, 'destroy_node', max_workers)
@@ -0,0 +1,125 @@
+import threading
+import pytest
+from unittest.mock import patch
+import yaml
+from libcloud.compute.base import Node
+from libcloud.compute.types import NodeState
+from src.cloudstack.cloudstack_api import CloudStackIntegration, NodeCache
+
+class FakeDriver:
+    """Stands in for the libcloud CloudStack driver; all instances share one zone"""
+
+    nodes = {}
+    calls = []
+    lock = threading.Lock()
+
+    def __init__(self, **kwargs):
+        pass
+
+    def list_nodes(self):
+        with self.lock:
+            self.calls.append(('list_nodes', None))
+            return [Node(n.id, n.name, n.state, [], [], self) for n in self.nodes.values()]
+
+    def _mutate(self, name, node, state):
+        with self.lock:
+            self.calls.append((name, node.id))
+            if node.id == 'vm-broken':
+                raise Exception('job failed')
+            if state is None:
+                del self.nodes[node.id]
+            else:
+                self.nodes[node.id].state = state
+        return True
+
+    def ex_stop_node(self, node):
+        return self._mutate('ex_stop_node', node, NodeState.STOPPED)
+
+    def ex_start_node(self, node):
+        return self._mutate('ex_start_node', node, NodeState.RUNNING)
+
+    def destroy_node(self, node):
+        return self._mutate('destroy_node', node, None)
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def cloudstack_client(tmp_path):
+    with open('tests/test_config.yaml', 'r') as f:
+        config = yaml.safe_load(f)
+    config_path = tmp_path / 'credentials.yaml'
+    config_path.write_text(yaml.safe_dump({'cloudstack': config['test_cloudstack']}))
+
+    FakeDriver.nodes = {f'vm-{i}': Node(f'vm-{i}', f'web-{i % 10}', NodeState.RUNNING, [], [], None)
+                        for i in range(50)}
+    FakeDriver.nodes['vm-broken'] = Node('vm-broken', 'broken', NodeState.RUNNING, [], [], None)
+    FakeDriver.calls = []
+    with patch('src.cloudstack.cloudstack_api.get_driver', return_value=FakeDriver):
+        yield CloudStackIntegration(str(config_path), max_workers=4)
+
+def listings():
+    return sum(1 for name, _ in FakeDriver.calls if name == 'list_nodes')
+
+def test_lookups_share_one_listing(cloudstack_client):
+    client = cloudstack_client
+    for i in range(50):
+        assert client.get_instance_status(f'vm-{i}') == NodeState.RUNNING
+    assert len(client.find_instances_by_name('web-3')) == 5
+    assert listings() == 1
+
+def test_mutation_invalidates_node(cloudstack_client):
+    client = cloudstack_client
+    assert client.stop_instance('vm-1') is True
+    assert client.get_instance_status('vm-2') == NodeState.RUNNING
+    assert listings() == 1
+    assert client.get_instance_status('vm-1') == NodeState.STOPPED
+    assert listings() == 2
+
+    assert client.delete_instance('vm-1') is True
+    assert client.get_instance('vm-1') is None
+    assert client.stop_instance('vm-missing') is False
+
+def test_bulk_stop_resolves_ids_in_one_listing(cloudstack_client):
+    client = cloudstack_client
+    ids = [f'vm-{i}' for i in range(40)] + ['vm-broken']
+    result = client.bulk_stop(ids + ['vm-0', 'vm-missing'])
+
+    assert sorted(result['succeeded']) == sorted(f'vm-{i}' for i in range(40))
+    assert list(result['failed']) == ['vm-broken']
+    assert result['not_found'] == ['vm-missing']
+    assert listings() == 1
+    assert sum(1 for name, _ in FakeDriver.calls if name == 'ex_stop_node') == 41
+
+    statuses = {client.get_instance_status(i) for i in ids[:40]}
+    assert statuses == {NodeState.STOPPED}
+    assert listings() == 2
+
+def test_bulk_delete_drops_nodes_from_cache(cloudstack_client):
+    client = cloudstack_client
+    result = client.bulk_delete(['vm-5', 'vm-6'])
+    assert sorted(result['succeeded']) == ['vm-5', 'vm-6']
+    assert client.find_instances_by_name('web-5') == [client.get_instance(f'vm-{i}') for i in (15, 25, 35, 45)]
+    assert client.bulk_start(['vm-5'])['not_found'] == ['vm-5']
+
+def test_cache_expires_after_ttl():
+    clock = Clock()
+    nodes = [Node('a', 'a', NodeState.RUNNING, [], [], None)]
+    cache = NodeCache(lambda: list(nodes), ttl=30, clock=clock)
+    assert cache.get('a').name == 'a'
+    clock.now = 29
+    nodes.append(Node('b', 'b', NodeState.RUNNING, [], [], None))
+    assert cache.find_by_name('b') == []
+    clock.now = 30
+    assert cache.find_by_name('b')[0].id == 'b'
+    assert cache.listings == 2
+    nodes.append(Node('c', 'c', NodeState.RUNNING, [], [], None))
+    clock.now = 32
+    assert cache.get('c') is None
+    clock.now = 36
+    assert cache.get('c').id == 'c'
+    assert cache.listings == 3
@@ -0,0 +1,138 @@
+import json
+import pytest
+from datetime import date
+from unittest.mock import patch
+import yaml
+from src.billing.cost_store import CostStore, iter_aws_cost_pages, normalize_aws, normalize_azure
+
+def load_fixture(name):
+    with open(f'tests/fixtures/{name}') as f:
+        return json.load(f)
+
+class RecordedCostExplorer:
+    """Serves recorded DAILY get_cost_and_usage results, two days per page"""
+
+    def __init__(self):
+        self.results = load_fixture('aws_cost_and_usage_daily.json')['ResultsByTime']
+        self.calls = []
+
+    def get_cost_and_usage(self, TimePeriod, NextPageToken=None, **kwargs):
+        self.calls.append((TimePeriod['Start'], TimePeriod['End'], NextPageToken))
+        days = [r for r in self.results if TimePeriod['Start'] <= r['TimePeriod']['Start'] < TimePeriod['End']]
+        offset = int(NextPageToken or 0)
+        response = {'ResultsByTime': days[offset:offset + 2]}
+        if offset + 2 < len(days):
+            response['NextPageToken'] = str(offset + 2)
+        return response
+
+class RecordedUsageDetails:
+    def __init__(self):
+        self.items = load_fixture('azure_usage_details.json')['value']
+        self.calls = []
+
+    def list(self, scope, filter):
+        self.calls.append(filter)
+        start, end = filter.split("'")[1], filter.split("'")[3]
+        return (item for item in self.items if start <= item['properties']['date'][:10] < end)
+
+def aws_fetch(ce):
+    return lambda start, end: (row for page in iter_aws_cost_pages(ce, start, end) for row in normalize_aws(page))
+
+@pytest.fixture
+def store():
+    return CostStore(today=lambda: date(2024, 2, 1))
+
+def test_aws_pages_are_followed_and_normalised(store):
+    ce = RecordedCostExplorer()
+    result = store.sync('aws', aws_fetch(ce), '2024-01-01', '2024-01-08')
+
+    assert result == {'ranges': [('2024-01-01', '2024-01-08')], 'rows': 35}
+    assert [token for _, _, token in ce.calls] == [None, '2', '4', '6']
+    expected = sum(float(g['Metrics']['UnblendedCost']['Amount'])
+                   for r in ce.results for g in r['Groups'] if g['Keys'][0] == 'AWS Lambda')
+    by_service = {r['service']: r['cost'] for r in store.rollup(('service',), provider='aws')}
+    assert by_service['AWS Lambda'] == pytest.approx(expected)
+    assert len(by_service) == 3
+
+def test_sync_fetches_only_missing_days(store):
+    ce = RecordedCostExplorer()
+    store.sync('aws', aws_fetch(ce), '2024-01-03', '2024-01-05')
+    ce.calls.clear()
+
+    result = store.sync('aws', aws_fetch(ce), '2024-01-01', '2024-01-08')
+    assert result['ranges'] == [('2024-01-01', '2024-01-03'), ('2024-01-05', '2024-01-08')]
+    assert {(start, end) for start, end, _ in ce.calls} == {('2024-01-01', '2024-01-03'), ('2024-01-05', '2024-01-08')}
+
+    ce.calls.clear()
+    assert store.sync('aws', aws_fetch(ce), '2024-01-01', '2024-01-08')['ranges'] == []
+    assert ce.calls == []
+    assert len(store.rollup(('day',), provider='aws')) == 7
+
+def test_recent_days_are_refetched_without_duplicating_rows():
+    store = CostStore(refresh_days=3, today=lambda: date(2024, 1, 8))
+    ce = RecordedCostExplorer()
+    store.sync('aws', aws_fetch(ce), '2024-01-01', '2024-01-08')
+    total = sum(r['cost'] for r in store.rollup(('provider',)))
+
+    result = store.sync('aws', aws_fetch(ce), '2024-01-01', '2024-01-08')
+    assert result['ranges'] == [('2024-01-05', '2024-01-08')]
+    assert sum(r['cost'] for r in store.rollup(('provider',))) == pytest.approx(total)
+
+def test_failed_fetch_leaves_days_missing(store):
+    def broken(start, end):
+        yield from normalize_aws(RecordedCostExplorer().results[:1])
+        raise RuntimeError('throttled')
+
+    with pytest.raises(RuntimeError):
+        store.sync('aws', broken, '2024-01-01', '2024-01-08')
+    assert store.rollup(('day',)) == []
+    assert store.missing_ranges('aws', '2024-01-01', '2024-01-08') == [(date(2024, 1, 1), date(2024, 1, 8))]
+
+def test_providers_share_one_schema(store):
+    usage = RecordedUsageDetails()
+    store.sync('aws', aws_fetch(RecordedCostExplorer()), '2024-01-01', '2024-01-08')
+    store.sync('azure', lambda start, end: normalize_azure(
+        usage.list('', f"usageStart ge '{start}' and usageEnd lt '{end}'")), '2024-01-01', '2024-01-08')
+
+    daily = store.rollup(('day', 'provider'))
+    assert len(daily) == 14
+    assert [r['day'] for r in daily] == sorted(r['day'] for r in daily)
+
+    vm = [i for i in usage.items if i['properties']['resourceId'].endswith('/web-vm')]
+    resource_id = vm[0]['properties']['resourceId']
+    costs = store.rollup(('day',), resource_id=resource_id)
+    assert [r['cost'] for r in costs] == pytest.approx([i['properties']['cost'] for i in vm])
+    assert {r['currency'] for r in costs} == {'USD'}
+
+    with pytest.raises(ValueError):
+        store.rollup(('region',))
+
+def test_billing_integration_answers_from_store(tmp_path):
+    with open('tests/test_config.yaml', 'r') as f:
+        config = yaml.safe_load(f)
+    config_path = tmp_path / 'credentials.yaml'
+    config_path.write_text(yaml.safe_dump({
+        'aws': config['test_aws'],
+        'azure': dict(config['test_azure'], credentials=None),
+        'billing': {'cost_store': str(tmp_path / 'costs.sqlite')},
+    }))
+
+    from src.billing.billing_api import CloudBillingIntegration
+    ce, usage = RecordedCostExplorer(), RecordedUsageDetails()
+    with patch('src.billing.billing_api.boto3') as mock_boto3, \
+         patch('src.billing.billing_api.ConsumptionManagementClient') as mock_azure:
+        mock_boto3.client.return_value = ce
+        mock_azure.return_value.usage_details = usage
+        client = CloudBillingIntegration(str(config_path))
+
+    first = client.get_consolidated_billing('2024-01-01', '2024-01-08')
+    calls = len(ce.calls), len(usage.calls)
+    second = client.get_consolidated_billing('2024-01-01', '2024-01-08')
+    assert second == first
+    assert (len(ce.calls), len(usage.calls)) == calls
+    assert [r['service'] for r in first['azure']][0] in {'Microsoft.Compute', 'Microsoft.Storage', 'Microsoft.Sql'}
+
+    resource_id = usage.items[0]['properties']['resourceId']
+    costs = client.get_resource_costs(resource_id, 'azure', '2024-01-01', '2024-01-08')
+    assert len(costs) == 7
+    assert len(usage.calls) == calls[1]
@@ -1,12 +1,12 @@
 #!/usr/bin/env python3
 """VM/Compute Instance Manager"""
 
-import boto3
+from implementation.utils.aws_clients import get_client
 from typing import List, Dict
 
 class ComputeManager:
     def __init__(self, region='us-east-1'):
-        self.ec2 = boto3.client('ec2', region_name=region)
+        self.ec2 = get_client('ec2', region_name=region)
         self.region = region
     
     def create_instance(self, instance_type='t3.micro', ami_id=None, key_name=None):
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """IAM Security Manager"""
 
-import boto3
+from implementation.utils.aws_clients import get_client
 import json
 import logging
 
@@ -10,7 +10,7 @@ logger = logging.getLogger(__name__)
 
 class IAMManager:
     def __init__(self):
-        self.iam = boto3.client('iam')
+        self.iam = get_client('iam')
     
     def create_role(self, role_name, assume_role_policy):
         """Create IAM role"""
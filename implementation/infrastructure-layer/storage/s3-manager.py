@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 """S3 Storage Manager"""
 
-import boto3
+from implementation.utils.aws_clients import get_client
+from implementation.utils.s3_transfer import TransferManager
+from implementation.utils.s3_listing import ShardedLister, iter_keys, iter_objects
 import logging
 from botocore.exceptions import ClientError
 
@@ -9,9 +11,12 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class S3Manager:
-    def __init__(self, region='us-east-1'):
-        self.s3 = boto3.client('s3', region_name=region)
+    def __init__(self, region='us-east-1', part_size_mb=16, max_concurrency=16, checkpoint_dir=None):
+        self.s3 = get_client('s3', region_name=region)
         self.region = region
+        self.transfer = TransferManager(self.s3, part_size=part_size_mb * 1024 * 1024,
+                                        multipart_threshold=part_size_mb * 1024 * 1024,
+                                        max_concurrency=max_concurrency, checkpoint_dir=checkpoint_dir)
     
     def create_bucket(self, bucket_name):
         """Create S3 bucket"""
@@ -35,32 +40,57 @@ class S3Manager:
             object_name = file_path
         
         try:
-            self.s3.upload_file(file_path, bucket_name, object_name)
+            self.transfer.upload_file(file_path, bucket_name, object_name)
             logger.info(f"File {file_path} uploaded to {bucket_name}/{object_name}")
             return True
-        except ClientError as e:
+        except (ClientError, OSError) as e:
             logger.error(f"Error uploading file: {e}")
             return False
     
     def download_file(self, bucket_name, object_name, file_path):
         """Download file from S3"""
         try:
-            self.s3.download_file(bucket_name, object_name, file_path)
+            self.transfer.download_file(bucket_name, object_name, file_path)
             logger.info(f"File {object_name} downloaded to {file_path}")
             return True
-        except ClientError as e:
+        except (ClientError, OSError) as e:
             logger.error(f"Error downloading file: {e}")
             return False
     
+    def sync_directory(self, local_dir, bucket_name, prefix='', delete=False):
+        """Upload a directory tree, skipping unchanged files"""
+        try:
+            summary = self.transfer.upload_directory(local_dir, bucket_name, prefix, delete=delete)
+            stats = summary['stats']
+            logger.info(f"Synced {local_dir} to {bucket_name}/{prefix}: {len(summary['transferred'])} uploaded, "
+                        f"{len(summary['skipped'])} unchanged, {stats['mb_per_s']:.1f} MB/s")
+            return summary
+        except (ClientError, OSError) as e:
+            logger.error(f"Error syncing directory: {e}")
+            return None
+    
+    def download_directory(self, bucket_name, prefix, local_dir):
+        """Download every object under prefix, skipping files already up to date"""
+        try:
+            return self.transfer.download_directory(bucket_name, prefix, local_dir)
+        except (ClientError, OSError) as e:
+            logger.error(f"Error downloading directory: {e}")
+            return None
+    
     def list_objects(self, bucket_name, prefix=''):
         """List objects in bucket"""
         try:
-            response = self.s3.list_objects_v2(Bucket=bucket_name, Prefix=prefix)
-            return [obj['Key'] for obj in response.get('Contents', [])]
+            return list(iter_keys(self.s3, bucket_name, prefix))
         except ClientError as e:
             logger.error(f"Error listing objects: {e}")
             return []
     
+    def iter_objects(self, bucket_name, prefix='', shards=None):
+        """Lazily yield every object under prefix; with shards, list key ranges in parallel (unordered)"""
+        if shards:
+            return ShardedLister(self.s3, shards=shards).iter_objects(bucket_name, prefix)
+        return iter_objects(self.s3, bucket_name, prefix)
+    
     def delete_object(self, bucket_name, object_name):
         """Delete object from S3"""
         try:
@@ -4,7 +4,7 @@
 from functools import wraps
 from flask import request, jsonify
 import jwt
-from datetime import datetime
+from implementation.middleware.rate_limiter import RateLimiter
 
 SECRET_KEY = "your-secret-key"
 
@@ -43,27 +43,15 @@ def admin_required(f):
 
 def rate_limit(max_requests=100, window=60):
     """Rate limiting decorator"""
-    requests_dict = {}
+    limiter = RateLimiter(rate=max_requests, per=window)
     
     def decorator(f):
         @wraps(f)
         def decorated(*args, **kwargs):
-            client_ip = request.remote_addr
-            current_time = datetime.now().timestamp()
-            
-            if client_ip not in requests_dict:
-                requests_dict[client_ip] = []
-            
-            requests_dict[client_ip] = [
-                t for t in requests_dict[client_ip]
-                if current_time - t < window
-            ]
-            
-            if len(requests_dict[client_ip]) >= max_requests:
+            if not limiter.is_allowed(request.remote_addr):
                 return jsonify({'error': 'Rate limit exceeded'}), 429
-            
-            requests_dict[client_ip].append(current_time)
             return f(*args, **kwargs)
         
+        decorated.limiter = limiter
         return decorated
     return decorator
@@ -4,48 +4,250 @@ Rate limiting middleware for API protection
 from flask import request, jsonify
 from functools import wraps
 import time
-from collections import defaultdict
+import logging
 import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class _WindowShard:
+    """One lock and an LRU-ordered dict of windows, plus decision counters"""
+
+    __slots__ = ('lock', 'windows', 'allowed', 'denied')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.windows = OrderedDict()
+        self.allowed = 0
+        self.denied = 0
+
+
+class LocalSlidingWindows:
+    """In-process sliding window counters split across N locked shards
+    
+    Each key keeps [window, current_count, previous_count, last_seen]. The
+    request count over the trailing `per` seconds is estimated by weighting
+    the previous fixed window by how much of it still overlaps, so every
+    decision is O(1) time and memory per key whatever the request volume.
+    
+    Keys are kept in least-recently-used order. A key idle for idle_ttl
+    seconds is dropped on the next insert into its shard (or by sweep());
+    with the default of 2 * per both of its windows have expired, so
+    dropping it does not change any decision. max_keys bounds memory even
+    when every key is still active.
+    """
+    
+    def __init__(self, rate, per, shards=64, max_keys=100000, idle_ttl=None):
+        self.rate = rate
+        self.per = per
+        self.idle_ttl = 2 * per if idle_ttl is None else idle_ttl
+        self.shards = [_WindowShard() for _ in range(shards)]
+        self.max_keys_per_shard = max(1, max_keys // shards)
+        self.evictions = 0
+    
+    def _shard(self, key: str) -> _WindowShard:
+        return self.shards[hash(key) % len(self.shards)]
+    
+    def _evict(self, shard: _WindowShard, now: float):
+        windows = shard.windows
+        # Oldest entries first: stop at the first key that is still active
+        while windows:
+            oldest_key = next(iter(windows))
+            if now - windows[oldest_key][3] < self.idle_ttl and len(windows) <= self.max_keys_per_shard:
+                break
+            del windows[oldest_key]
+            self.evictions += 1
+    
+    def _estimate(self, state, now: float) -> float:
+        window = int(now // self.per)
+        if window != state[0]:
+            state[2] = state[1] if window == state[0] + 1 else 0
+            state[1] = 0
+            state[0] = window
+        overlap = 1.0 - (now - window * self.per) / self.per
+        return state[2] * overlap + state[1]
+    
+    def consume(self, key: str, now: float = None):
+        """Count one request for key if it is within the limit; return (allowed, remaining)"""
+        if now is None:
+            now = time.time()
+        shard = self.shards[hash(key) % len(self.shards)]
+        with shard.lock:
+            windows = shard.windows
+            state = windows.get(key)
+            if state is None:
+                state = windows[key] = [int(now // self.per), 0, 0, now]
+                self._evict(shard, now)
+            else:
+                windows.move_to_end(key)
+                state[3] = now
+            
+            estimate = self._estimate(state, now)
+            if estimate + 1 > self.rate:
+                shard.denied += 1
+                return False, 0
+            state[1] += 1
+            shard.allowed += 1
+            return True, int(self.rate - estimate - 1)
+    
+    def remaining(self, key: str, now: float = None) -> int:
+        now = time.time() if now is None else now
+        shard = self._shard(key)
+        with shard.lock:
+            state = shard.windows.get(key)
+            if state is None:
+                return int(self.rate)
+            return max(0, int(self.rate - self._estimate(state, now)))
+    
+    def sweep(self, now: float = None) -> int:
+        """Evict idle keys from every shard; return how many were dropped"""
+        now = time.time() if now is None else now
+        before = self.evictions
+        for shard in self.shards:
+            with shard.lock:
+                self._evict(shard, now)
+        return self.evictions - before
+    
+    def active_keys(self) -> int:
+        return sum(len(shard.windows) for shard in self.shards)
+    
+    def stats(self):
+        return {
+            'active_keys': self.active_keys(),
+            'evictions': self.evictions,
+            'allowed': sum(shard.allowed for shard in self.shards),
+            'denied': sum(shard.denied for shard in self.shards),
+        }
+
+
+class RedisSlidingWindows:
+    """Sliding window counters shared by every API worker, updated atomically in Redis
+    
+    Each key is a hash {w, cur, prev} advanced and incremented by a Lua
+    script on the Redis server clock. It expires after 2 * per seconds
+    without requests, so Redis memory is bounded by the number of active keys.
+    """
+    
+    LUA_CONSUME = """
+    if redis.replicate_commands then redis.replicate_commands() end
+    local rate = tonumber(ARGV[1])
+    local per = tonumber(ARGV[2])
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+    local window = math.floor(now / per)
+    local state = redis.call('HMGET', KEYS[1], 'w', 'cur', 'prev')
+    local w = tonumber(state[1])
+    local cur = tonumber(state[2]) or 0
+    local prev = tonumber(state[3]) or 0
+    if w ~= window then
+        if w == window - 1 then prev = cur else prev = 0 end
+        cur = 0
+    end
+    local estimate = prev * (1 - (now - window * per) / per) + cur
+    local allowed = 0
+    if estimate + 1 <= rate then
+        cur = cur + 1
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'w', window, 'cur', cur, 'prev', prev)
+    redis.call('PEXPIRE', KEYS[1], math.ceil(per * 2000))
+    if allowed == 0 then return {0, 0} end
+    return {1, math.floor(rate - estimate - 1)}
+    """
+    
+    def __init__(self, client, rate, per, prefix='ratelimit'):
+        self.client = client
+        self.rate = rate
+        self.per = per
+        self.prefix = prefix
+        self._consume = client.register_script(self.LUA_CONSUME)
+    
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{self.rate}:{self.per}:{key}"
+    
+    def consume(self, key: str, now: float = None):
+        allowed, remaining = self._consume(keys=[self._key(key)], args=[self.rate, self.per])
+        return bool(allowed), int(remaining)
+    
+    def remaining(self, key: str, now: float = None) -> int:
+        now = time.time() if now is None else now
+        state = self.client.hmget(self._key(key), 'w', 'cur', 'prev')
+        if state[0] is None:
+            return int(self.rate)
+        window = int(now // self.per)
+        cur, prev = float(state[1]), float(state[2])
+        if int(state[0]) != window:
+            prev = cur if int(state[0]) == window - 1 else 0
+            cur = 0
+        estimate = prev * (1 - (now - window * self.per) / self.per) + cur
+        return max(0, int(self.rate - estimate))
+    
+    def active_keys(self) -> int:
+        return sum(1 for _ in self.client.scan_iter(match=f"{self.prefix}:{self.rate}:{self.per}:*"))
 
 
 class RateLimiter:
-    """Token bucket rate limiter"""
+    """Sliding window counter rate limiter
+    
+    The one limiter engine for the API: the rate_limit decorators here and
+    in auth.py and the WAF's per-IP limit all use it.
+    """
     
-    def __init__(self, rate=100, per=60):
+    def __init__(self, rate=100, per=60, shards=64, max_keys=100000, idle_ttl=None, redis_client=None):
         """
         Initialize rate limiter
         
         Args:
             rate: Number of requests allowed
             per: Time period in seconds
+            shards: Number of independently locked shards
+            max_keys: Upper bound on keys kept in memory
+            idle_ttl: Seconds before an idle key is evicted (default: 2 * per)
+            redis_client: Share limits across workers through Redis when given
         """
         self.rate = rate
         self.per = per
-        self.allowance = defaultdict(lambda: rate)
-        self.last_check = defaultdict(lambda: time.time())
-        self.lock = threading.Lock()
+        self.local = LocalSlidingWindows(rate, per, shards=shards, max_keys=max_keys, idle_ttl=idle_ttl)
+        self.backend = RedisSlidingWindows(redis_client, rate, per) if redis_client is not None else self.local
+    
+    def check(self, key: str):
+        """Consume one request for key; return (allowed, remaining)"""
+        if self.backend is self.local:
+            return self.local.consume(key)
+        try:
+            return self.backend.consume(key)
+        except Exception as e:
+            # Degrade to per-worker limits rather than failing every request
+            logger.warning(f"Distributed rate limiter unavailable, using local buckets: {e}")
+            return self.local.consume(key)
     
     def is_allowed(self, key: str) -> bool:
         """Check if request is allowed"""
-        with self.lock:
-            current = time.time()
-            time_passed = current - self.last_check[key]
-            self.last_check[key] = current
-            
-            self.allowance[key] += time_passed * (self.rate / self.per)
-            
-            if self.allowance[key] > self.rate:
-                self.allowance[key] = self.rate
-            
-            if self.allowance[key] < 1.0:
-                return False
-            else:
-                self.allowance[key] -= 1.0
-                return True
+        if self.backend is self.local:
+            return self.local.consume(key)[0]
+        return self.check(key)[0]
     
     def get_remaining(self, key: str) -> int:
         """Get remaining requests for key"""
-        return int(self.allowance.get(key, self.rate))
+        try:
+            return self.backend.remaining(key)
+        except Exception:
+            return self.local.remaining(key)
+    
+    def sweep(self) -> int:
+        """Evict idle keys now instead of waiting for new keys to arrive"""
+        return self.local.sweep()
+    
+    def get_stats(self):
+        """Active keys, evictions and decision counts of the in-process windows"""
+        stats = {**self.local.stats(), 'rate': self.rate, 'per': self.per}
+        if self.backend is not self.local:
+            try:
+                stats['redis_active_keys'] = self.backend.active_keys()
+            except Exception:
+                stats['redis_active_keys'] = None
+        return stats
 
 
 # Global rate limiter instances
@@ -64,7 +266,8 @@ def rate_limit(limiter=None):
             # Get client identifier (IP or user ID)
             client_id = request.headers.get('X-Client-ID') or request.remote_addr
             
-            if not limiter.is_allowed(client_id):
+            allowed, remaining = limiter.check(client_id)
+            if not allowed:
                 return jsonify({
                     'error': 'Rate limit exceeded',
                     'message': f'Maximum {limiter.rate} requests per {limiter.per} seconds',
@@ -81,7 +284,7 @@ def rate_limit(limiter=None):
             
             if hasattr(response_obj, 'headers'):
                 response_obj.headers['X-RateLimit-Limit'] = str(limiter.rate)
-                response_obj.headers['X-RateLimit-Remaining'] = str(limiter.get_remaining(client_id))
+                response_obj.headers['X-RateLimit-Remaining'] = str(remaining)
                 response_obj.headers['X-RateLimit-Reset'] = str(int(time.time() + limiter.per))
             
             return response_obj, status_code
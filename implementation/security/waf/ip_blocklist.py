@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+IP blocklist for the WAF
+Blocks cover single addresses or whole CIDR ranges and are expired by a
+hierarchical timing wheel, so memory tracks only the blocks still in force.
+"""
+
+import time
+import ipaddress
+import threading
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple, Union
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+class TimingWheel:
+    """Hierarchical timing wheel of key deadlines
+
+    Level 0 has one slot per tick; each higher level has slots spanning a
+    whole turn of the level below (64 ticks, 4096 ticks, ...). A key sits in
+    the coarsest level its deadline fits and is cascaded down as the wheel
+    turns, so scheduling, cancelling and expiring are each amortised O(1).
+    Deadlines past the top level's horizon are simply re-cascaded each turn.
+    """
+
+    def __init__(self, tick: float = 1.0, slot_bits: int = 6, levels: int = 4, now: Optional[float] = None):
+        self.tick = tick
+        self.bits = slot_bits
+        self.mask = (1 << slot_bits) - 1
+        self.wheels = [[set() for _ in range(1 << slot_bits)] for _ in range(levels)]
+        self.deadlines: Dict[Hashable, int] = {}
+        self.location: Dict[Hashable, Tuple[int, int]] = {}
+        self.level_sizes = [0] * levels
+        self.current = int((time.time() if now is None else now) // tick)
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def __contains__(self, key):
+        return key in self.deadlines
+
+    def _place(self, key, deadline: int, earliest: int):
+        # earliest is the first tick whose level-0 slot has not been processed yet
+        deadline = max(deadline, earliest)
+        delta = deadline - self.current
+        level = 0
+        while level < len(self.wheels) - 1 and delta >= 1 << (self.bits * (level + 1)):
+            level += 1
+        slot = (deadline >> (self.bits * level)) & self.mask
+        self.wheels[level][slot].add(key)
+        self.level_sizes[level] += 1
+        self.location[key] = (level, slot)
+
+    def schedule(self, key, deadline: float):
+        """Expire key at deadline (seconds), replacing any earlier schedule"""
+        self.cancel(key)
+        # Round up so a key never expires before its deadline
+        tick = -int(-deadline // self.tick)
+        self.deadlines[key] = tick
+        self._place(key, tick, self.current + 1)
+
+    def cancel(self, key) -> bool:
+        if key not in self.deadlines:
+            return False
+        level, slot = self.location.pop(key)
+        self.wheels[level][slot].discard(key)
+        self.level_sizes[level] -= 1
+        del self.deadlines[key]
+        return True
+
+    def advance(self, now: Optional[float] = None) -> List:
+        """Turn the wheel to now; return the keys whose deadline has passed"""
+        target = int((time.time() if now is None else now) // self.tick)
+        expired = []
+        while self.current < target:
+            if not self.deadlines:
+                self.current = target
+                break
+            lowest = next(level for level, size in enumerate(self.level_sizes) if size)
+            if lowest:
+                # Nothing can happen before the next slot boundary of the lowest occupied level
+                span = self.bits * lowest
+                boundary = ((self.current >> span) + 1) << span
+                if boundary > target:
+                    self.current = target
+                    break
+                self.current = boundary - 1
+            self.current += 1
+            tick = self.current
+            # Cascade coarser levels whose slot starts at this tick, coarsest first
+            for level in range(len(self.wheels) - 1, 0, -1):
+                if tick & ((1 << (self.bits * level)) - 1):
+                    continue
+                slot = (tick >> (self.bits * level)) & self.mask
+                bucket, self.wheels[level][slot] = self.wheels[level][slot], set()
+                self.level_sizes[level] -= len(bucket)
+                for key in bucket:
+                    self._place(key, self.deadlines[key], tick)
+
+            slot = tick & self.mask
+            bucket, self.wheels[0][slot] = self.wheels[0][slot], set()
+            self.level_sizes[0] -= len(bucket)
+            for key in bucket:
+                if self.deadlines[key] <= tick:
+                    del self.deadlines[key]
+                    del self.location[key]
+                    expired.append(key)
+                else:
+                    self._place(key, self.deadlines[key], tick + 1)
+        return expired
+
+
+class PrefixTree:
+    """Binary radix tree of IP networks
+
+    Each node is [zero_child, one_child, value]; a network of prefix length n
+    is stored n levels down, so a /16 is one entry and a lookup walks at most
+    32 (IPv4) or 128 (IPv6) nodes.
+    """
+
+    def __init__(self):
+        self.roots = {4: [None, None, None], 6: [None, None, None]}
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _bits(self, network: Network) -> Iterator[int]:
+        address = int(network.network_address)
+        width = network.max_prefixlen
+        for i in range(network.prefixlen):
+            yield (address >> (width - 1 - i)) & 1
+
+    def insert(self, network: Network, value):
+        node = self.roots[network.version]
+        for bit in self._bits(network):
+            if node[bit] is None:
+                node[bit] = [None, None, None]
+            node = node[bit]
+        if node[2] is None:
+            self.count += 1
+        node[2] = value
+
+    def remove(self, network: Network) -> bool:
+        path = [self.roots[network.version]]
+        bits = list(self._bits(network))
+        for bit in bits:
+            child = path[-1][bit]
+            if child is None:
+                return False
+            path.append(child)
+        if path[-1][2] is None:
+            return False
+        path[-1][2] = None
+        self.count -= 1
+        # Prune the branch back to the last node still in use
+        for depth in range(len(bits), 0, -1):
+            node = path[depth]
+            if node[0] is not None or node[1] is not None or node[2] is not None:
+                break
+            path[depth - 1][bits[depth - 1]] = None
+        return True
+
+    def get(self, network: Network):
+        node = self.roots[network.version]
+        for bit in self._bits(network):
+            node = node[bit]
+            if node is None:
+                return None
+        return node[2]
+
+    def matches(self, address: Union[ipaddress.IPv4Address, ipaddress.IPv6Address]) -> Iterator:
+        """Values of every stored network containing address, shortest prefix first"""
+        node = self.roots[address.version]
+        value = int(address)
+        shift = address.max_prefixlen
+        while node is not None:
+            if node[2] is not None:
+                yield node[2]
+            shift -= 1
+            if shift < 0:
+                break
+            node = node[(value >> shift) & 1]
+
+
+class IPBlocklist:
+    """Time-limited blocks of addresses and CIDR ranges
+
+    Keys that are not IP addresses (e.g. a proxy's placeholder client id) are
+    blocked by exact match. Expired blocks are reclaimed by the timing wheel
+    on every call, not only when the blocked client comes back. Every call
+    holds one lock, since request threads both read and turn the wheel.
+    """
+
+    def __init__(self, tick: float = 1.0, now: Optional[float] = None):
+        self.networks = PrefixTree()
+        self.others: Dict[str, float] = {}
+        self.wheel = TimingWheel(tick=tick, now=now)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.networks) + len(self.others)
+
+    @staticmethod
+    def _parse(target: str) -> Optional[Network]:
+        try:
+            return ipaddress.ip_network(target, strict=False)
+        except ValueError:
+            return None
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Drop every block whose time is up; return how many were dropped"""
+        with self._lock:
+            return self._expire(now)
+
+    def _expire(self, now: Optional[float]) -> int:
+        expired = self.wheel.advance(now)
+        for key in expired:
+            if isinstance(key, str):
+                self.others.pop(key, None)
+            else:
+                self.networks.remove(key)
+        return len(expired)
+
+    def block(self, target: str, until: float) -> str:
+        """Block an address or CIDR range until the given epoch time; return the normalised key"""
+        network = self._parse(target)
+        key = network if network is not None else target
+        with self._lock:
+            if network is not None:
+                self.networks.insert(network, (network, until))
+            else:
+                self.others[target] = until
+            self.wheel.schedule(key, until)
+        return str(key)
+
+    def unblock(self, target: str) -> bool:
+        network = self._parse(target)
+        key = network if network is not None else target
+        with self._lock:
+            self.wheel.cancel(key)
+            if network is not None:
+                return self.networks.remove(network)
+            return self.others.pop(target, None) is not None
+
+    def blocked_by(self, ip: str, now: Optional[float] = None) -> Optional[Tuple[str, float]]:
+        """The block covering ip as (network, until), or None"""
+        now = time.time() if now is None else now
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            address = None
+        with self._lock:
+            self._expire(now)
+            if address is None:
+                until = self.others.get(ip)
+                return (ip, until) if until is not None and until > now else None
+            for network, until in self.networks.matches(address):
+                if until > now:
+                    return str(network), until
+        return None
+
+    def is_blocked(self, ip: str, now: Optional[float] = None) -> bool:
+        return self.blocked_by(ip, now) is not None
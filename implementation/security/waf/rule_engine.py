@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Compiled WAF rule engine
+Rules are grouped by the request field they inspect and each field is
+scanned once per request, however many rules there are.
+"""
+
+import re
+import json
+import shlex
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+logger = logging.getLogger(__name__)
+
+TARGETS = ('path', 'query', 'headers', 'body')
+
+# re.IGNORECASE treats dotless i as 'i' but str.casefold() leaves it alone
+_FOLD_EXTRA = str.maketrans({'ı': 'i'})
+
+_BACKREFERENCE = re.compile(r'\\[1-9]|\(\?P=|\(\?\(')
+
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+if hasattr(sre_constants, 'POSSESSIVE_REPEAT'):
+    _REPEATS.add(sre_constants.POSSESSIVE_REPEAT)
+# (?>...) holds its subpattern directly; (...) wraps it in (group, add_flags, del_flags, p)
+_ATOMIC_GROUP = getattr(sre_constants, 'ATOMIC_GROUP', None)
+
+
+def fold(text: str) -> str:
+    """Case-fold text the way the prefilter compares it"""
+    return text.casefold().translate(_FOLD_EXTRA)
+
+
+def _better(current: Optional[Set[str]], candidate: Set[str]) -> Set[str]:
+    """Prefer the literal set whose shortest member is longest, then the smaller set"""
+    if current is None:
+        return candidate
+    if (min(map(len, candidate)), -len(candidate)) > (min(map(len, current)), -len(current)):
+        return candidate
+    return current
+
+
+def _required(items) -> Optional[Set[str]]:
+    """A set of literals at least one of which occurs in any match of items, or None"""
+    best = None
+    run: List[str] = []
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            run.append(chr(av))
+            continue
+        if op is sre_constants.AT:
+            # Zero-width anchors do not split a run of literals
+            continue
+        if run:
+            best = _better(best, {''.join(run)})
+            run = []
+        sub = None
+        if op is sre_constants.SUBPATTERN:
+            sub = _required(av[-1])
+        elif _ATOMIC_GROUP is not None and op is _ATOMIC_GROUP:
+            sub = _required(av)
+        elif op is sre_constants.BRANCH:
+            branches = [_required(branch) for branch in av[1]]
+            if all(branches):
+                sub = set().union(*branches)
+        elif op in _REPEATS and av[0] >= 1:
+            sub = _required(av[2])
+        if sub:
+            best = _better(best, sub)
+    if run:
+        best = _better(best, {''.join(run)})
+    return best
+
+
+def required_literals(pattern: str) -> Optional[Set[str]]:
+    """Case-folded literals of which every match of pattern contains at least one
+
+    Returns None when no such set can be derived; the rule then always runs.
+    """
+    try:
+        literals = _required(sre_parse.parse(pattern))
+    except Exception as e:
+        # A parse tree shape this walker does not know must not break the WAF
+        logger.debug(f"No prefilter literals for {pattern!r}: {e}")
+        return None
+    if not literals:
+        return None
+    return {fold(literal) for literal in literals}
+
+
+def trie_regex(words: Iterable[str]) -> str:
+    """Alternation of words sharing common prefixes; the longest word at a position wins"""
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            return '(?:' + body + ')?'
+        return body
+
+    return build(trie)
+
+
+class _TargetMatcher:
+    """Prefilter and residual matcher for the rules inspecting one request field
+
+    rules are (priority, rule) pairs. Rules with required literals are
+    candidates only when one of their literals occurs in the field; the
+    literals of every rule are found by a single lookahead scan. Rules without
+    literals are combined into one alternation that gates them as a group.
+    """
+
+    def __init__(self, rules: List[Tuple[int, object]]):
+        self.rules = rules
+        literal_rules: Dict[str, Set[int]] = {}
+        self.always: List[int] = []
+        always_rules = []
+        for priority, rule in rules:
+            literals = rule.literals if rule.literals else required_literals(rule.pattern.pattern)
+            if not literals or not all(literals):
+                always_rules.append(rule)
+                self.always.append(priority)
+                continue
+            for literal in literals:
+                literal_rules.setdefault(fold(literal), set()).add(priority)
+
+        # The scan reports the longest literal starting at each position, so a
+        # hit also implies every literal that is a prefix of it
+        self.hits: Dict[str, frozenset] = {}
+        for literal in literal_rules:
+            implied = set()
+            for end in range(1, len(literal) + 1):
+                implied.update(literal_rules.get(literal[:end], ()))
+            self.hits[literal] = frozenset(implied)
+
+        self.prefilter = None
+        if literal_rules:
+            self.prefilter = re.compile('(?=(' + trie_regex(literal_rules) + '))', re.DOTALL)
+        self.residual = self._combine(always_rules)
+
+    @staticmethod
+    def _combine(rules: List[object]):
+        """One pattern matching wherever any of rules matches, if they can be merged safely"""
+        if not rules:
+            return None
+        flags = {rule.pattern.flags for rule in rules}
+        if len(flags) != 1 or any(_BACKREFERENCE.search(rule.pattern.pattern) for rule in rules):
+            # Group numbers shift once patterns are joined, breaking backreferences
+            return None
+        try:
+            return re.compile('|'.join(f'(?:{rule.pattern.pattern})' for rule in rules), flags.pop())
+        except re.error:
+            return None
+
+    def candidates(self, text: str) -> Set[int]:
+        found: Set[int] = set()
+        if self.prefilter is not None:
+            folded = fold(text)
+            hits = self.hits
+            for literal in set(self.prefilter.findall(folded)):
+                found.update(hits[literal])
+        if self.always and (self.residual is None or self.residual.search(text)):
+            found.update(self.always)
+        return found
+
+
+class RuleEngine:
+    """Evaluates WAF rules against the path, query, headers and body of a request
+
+    Rules are anything with rule_id, pattern (compiled), action, targets and
+    literals attributes; they are evaluated in the order given. The compiled
+    form is rebuilt lazily after invalidate().
+    """
+
+    def __init__(self, rules: List[object], max_body_bytes: int = 128 * 1024):
+        self.rules = rules
+        self.max_body_bytes = max_body_bytes
+        self._matchers: Optional[Dict[str, _TargetMatcher]] = None
+
+    def invalidate(self):
+        self._matchers = None
+
+    def compile(self) -> Dict[str, _TargetMatcher]:
+        by_target: Dict[str, List[Tuple[int, object]]] = {target: [] for target in TARGETS}
+        for priority, rule in enumerate(self.rules):
+            for target in rule.targets:
+                by_target[target].append((priority, rule))
+        self._matchers = {target: _TargetMatcher(rules) for target, rules in by_target.items() if rules}
+        return self._matchers
+
+    def fields(self, path: str, headers: Dict[str, str], body) -> Dict[str, str]:
+        """Split a request into the fields rules can target, scanning at most max_body_bytes of body"""
+        path, _, query = path.partition('?')
+        body = body or ''
+        if isinstance(body, bytes):
+            body = body[:self.max_body_bytes].decode('utf-8', errors='replace')
+        else:
+            body = body[:self.max_body_bytes]
+        fields = {'path': path, 'query': query, 'body': body}
+        if headers and 'headers' in (self._matchers or {}):
+            fields['headers'] = '\n'.join(f"{name}: {value}" for name, value in headers.items())
+        else:
+            fields['headers'] = ''
+        return fields
+
+    def matches(self, path: str, headers: Dict[str, str], body) -> Iterator[Tuple[object, str]]:
+        """Yield (rule, target) for each matching rule in rule order"""
+        matchers = self._matchers if self._matchers is not None else self.compile()
+        fields = self.fields(path, headers, body)
+        candidates: Dict[int, List[str]] = {}
+        for target, matcher in matchers.items():
+            text = fields[target]
+            if not text:
+                continue
+            for priority in matcher.candidates(text):
+                candidates.setdefault(priority, []).append(target)
+
+        for priority in sorted(candidates):
+            rule = self.rules[priority]
+            for target in candidates[priority]:
+                if rule.pattern.search(fields[target]):
+                    yield rule, target
+                    break
+
+
+# ModSecurity variables and the request fields they cover
+_SECRULE_VARIABLES = {
+    'REQUEST_URI': ('path', 'query'),
+    'REQUEST_URI_RAW': ('path', 'query'),
+    'REQUEST_LINE': ('path', 'query'),
+    'REQUEST_FILENAME': ('path',),
+    'REQUEST_BASENAME': ('path',),
+    'QUERY_STRING': ('query',),
+    'ARGS_GET': ('query',),
+    'ARGS_GET_NAMES': ('query',),
+    'ARGS': ('query', 'body'),
+    'ARGS_NAMES': ('query', 'body'),
+    'ARGS_POST': ('body',),
+    'ARGS_POST_NAMES': ('body',),
+    'REQUEST_BODY': ('body',),
+    'XML': ('body',),
+    'REQUEST_HEADERS': ('headers',),
+    'REQUEST_HEADERS_NAMES': ('headers',),
+    'REQUEST_COOKIES': ('headers',),
+    'REQUEST_COOKIES_NAMES': ('headers',),
+}
+
+
+def _secrule_targets(variables: str) -> Tuple[str, ...]:
+    targets = []
+    for variable in variables.split('|'):
+        if variable.startswith(('!', '&')):
+            continue
+        for target in _SECRULE_VARIABLES.get(variable.split(':', 1)[0].upper(), ()):
+            if target not in targets:
+                targets.append(target)
+    return tuple(targets)
+
+
+def _secrule_actions(actions: str) -> Dict[str, str]:
+    parsed = {}
+    for action in re.split(r",(?=(?:[^']*'[^']*')*[^']*$)", actions):
+        name, _, value = action.strip().partition(':')
+        parsed[name.strip().lower()] = value.strip().strip("'")
+    return parsed
+
+
+def parse_secrules(text: str) -> List[Dict]:
+    """Rule definitions from OWASP CRS / ModSecurity SecRule lines
+
+    Supports the @rx, @pm and @contains operators. Chained rules, negated
+    operators and variables with no matching request field are skipped.
+    """
+    rules = []
+    statement = ''
+    skip_chain = False
+    for line in text.splitlines():
+        line = line.strip()
+        if line.endswith('\\'):
+            statement += line[:-1] + ' '
+            continue
+        statement += line
+        line, statement = statement.strip(), ''
+        if not line.startswith('SecRule'):
+            continue
+
+        try:
+            tokens = shlex.split(line)
+        except ValueError as e:
+            logger.warning(f"Unparseable SecRule skipped: {e}")
+            continue
+        if len(tokens) < 3:
+            continue
+        actions = _secrule_actions(tokens[3]) if len(tokens) > 3 else {}
+        if skip_chain:
+            skip_chain = 'chain' in actions
+            continue
+        if 'chain' in actions:
+            skip_chain = True
+            logger.debug(f"Chained rule {actions.get('id')} skipped")
+            continue
+
+        operator = tokens[2]
+        if operator.startswith('!'):
+            continue
+        if not operator.startswith('@'):
+            operator = '@rx ' + operator
+        name, _, argument = operator.partition(' ')
+        name = name.lower()
+        if name == '@rx':
+            pattern, literals = argument, None
+        elif name == '@pm':
+            words = argument.split()
+            pattern, literals = '(?:' + '|'.join(map(re.escape, words)) + ')', words
+        elif name == '@contains':
+            pattern, literals = re.escape(argument), [argument]
+        else:
+            continue
+
+        targets = _secrule_targets(tokens[1])
+        if not targets or not pattern:
+            continue
+        rules.append({
+            'rule_id': actions.get('id', f'SECRULE_{len(rules) + 1}'),
+            'pattern': pattern,
+            'action': 'log' if 'pass' in actions else 'block',
+            'description': actions.get('msg', ''),
+            'targets': targets,
+            'literals': literals,
+        })
+    return rules
+
+
+def load_rule_file(path: str) -> List[Dict]:
+    """Rule definitions from a .conf file of SecRules or a JSON list of rule objects"""
+    with open(path) as f:
+        content = f.read()
+    if path.endswith('.json'):
+        return json.loads(content)
+    return parse_secrules(content)
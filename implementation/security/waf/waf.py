@@ -4,33 +4,47 @@ Web Application Firewall (WAF) Implementation
 Layer 7: Application Security
 """
 
+import os
 import re
+import sys
 import logging
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 from datetime import datetime, timedelta
-from collections import defaultdict
+
+if __name__ == "__main__" and not __package__:
+    # Run directly as a script: make the implementation package importable
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..')))
+
+from implementation.middleware.rate_limiter import RateLimiter
+from implementation.security.waf.rule_engine import TARGETS, RuleEngine, load_rule_file
+from implementation.security.waf.ip_blocklist import IPBlocklist
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 class WAFRule:
-    def __init__(self, rule_id: str, pattern: str, action: str, description: str):
+    def __init__(self, rule_id: str, pattern: str, action: str, description: str,
+                 targets: Sequence[str] = TARGETS, literals: Optional[Sequence[str]] = None):
         self.rule_id = rule_id
         self.pattern = re.compile(pattern, re.IGNORECASE)
         self.action = action
         self.description = description
+        self.targets = tuple(targets)
+        # Strings one of which must occur for the pattern to match; derived from it when omitted
+        self.literals = literals
 
     def match(self, data: str) -> bool:
         return bool(self.pattern.search(data))
 
 
 class WAF:
-    def __init__(self):
+    def __init__(self, max_body_bytes: int = 128 * 1024):
         self.rules: List[WAFRule] = []
-        self.blocked_ips: Dict[str, datetime] = {}
-        self.request_counts: Dict[str, List[datetime]] = defaultdict(list)
+        self.engine = RuleEngine(self.rules, max_body_bytes=max_body_bytes)
+        self.blocked_ips = IPBlocklist()
         self.rate_limit = 100  # requests per minute
+        self.rate_limiter = RateLimiter(rate=self.rate_limit, per=60)
         self._load_default_rules()
 
     def _load_default_rules(self):
@@ -49,40 +63,43 @@ class WAF:
     def add_rule(self, rule: WAFRule):
         """Add a new WAF rule"""
         self.rules.append(rule)
+        self.engine.invalidate()
         logger.info(f"Added WAF rule: {rule.rule_id} - {rule.description}")
 
+    def add_rules(self, rules: List[WAFRule]):
+        """Add many rules, e.g. a CRS rule set, with a single recompile"""
+        self.rules.extend(rules)
+        self.engine.invalidate()
+        logger.info(f"Added {len(rules)} WAF rules")
+
+    def load_rules(self, path: str) -> int:
+        """Load rules from a SecRule .conf file or a JSON list; return how many were added"""
+        rules = []
+        for definition in load_rule_file(path):
+            try:
+                rules.append(WAFRule(**definition))
+            except re.error as e:
+                logger.warning(f"Skipping WAF rule {definition.get('rule_id')}: {e}")
+        self.add_rules(rules)
+        return len(rules)
+
     def check_rate_limit(self, ip: str) -> bool:
         """Check if IP exceeds rate limit"""
-        now = datetime.now()
-        minute_ago = now - timedelta(minutes=1)
-
-        # Clean old requests
-        self.request_counts[ip] = [
-            req_time for req_time in self.request_counts[ip]
-            if req_time > minute_ago
-        ]
-
-        # Check rate limit
-        if len(self.request_counts[ip]) >= self.rate_limit:
-            return False
-
-        self.request_counts[ip].append(now)
-        return True
+        return self.rate_limiter.is_allowed(ip)
 
     def is_ip_blocked(self, ip: str) -> bool:
-        """Check if IP is blocked"""
-        if ip in self.blocked_ips:
-            if datetime.now() < self.blocked_ips[ip]:
-                return True
-            else:
-                del self.blocked_ips[ip]
-        return False
+        """Check if IP is blocked, directly or by a blocked range"""
+        return self.blocked_ips.is_blocked(ip)
 
     def block_ip(self, ip: str, duration_minutes: int = 60):
-        """Block an IP address"""
+        """Block an IP address or CIDR range (e.g. "203.0.113.0/24")"""
         block_until = datetime.now() + timedelta(minutes=duration_minutes)
-        self.blocked_ips[ip] = block_until
-        logger.warning(f"Blocked IP {ip} until {block_until}")
+        blocked = self.blocked_ips.block(ip, block_until.timestamp())
+        logger.warning(f"Blocked IP {blocked} until {block_until}")
+
+    def unblock_ip(self, ip: str) -> bool:
+        """Lift the block on an IP address or CIDR range"""
+        return self.blocked_ips.unblock(ip)
 
     def inspect_request(self, ip: str, method: str, path: str, 
                        headers: Dict[str, str], body: str) -> Tuple[bool, str]:
@@ -97,18 +114,14 @@ class WAF:
             self.block_ip(ip, 30)
             return False, "RATE_LIMIT_EXCEEDED"
 
-        # Combine all request data for inspection
-        request_data = f"{method} {path} {str(headers)} {body}"
-
-        # Check against WAF rules
-        for rule in self.rules:
-            if rule.match(request_data):
-                logger.warning(f"WAF Rule triggered: {rule.rule_id} for IP {ip}")
-                if rule.action == "block":
-                    self.block_ip(ip, 60)
-                    return False, rule.rule_id
-                elif rule.action == "log":
-                    logger.info(f"Suspicious activity detected: {rule.rule_id}")
+        # Each request field is scanned once for all rules that target it
+        for rule, target in self.engine.matches(path, headers, body):
+            logger.warning(f"WAF Rule triggered: {rule.rule_id} on {target} for IP {ip}")
+            if rule.action == "block":
+                self.block_ip(ip, 60)
+                return False, rule.rule_id
+            elif rule.action == "log":
+                logger.info(f"Suspicious activity detected: {rule.rule_id}")
 
         return True, "ALLOWED"
 
@@ -117,7 +130,8 @@ class WAF:
         return {
             "total_rules": len(self.rules),
             "blocked_ips": len(self.blocked_ips),
-            "active_connections": len(self.request_counts),
+            "active_connections": self.rate_limiter.local.active_keys(),
+            "rate_limiter": self.rate_limiter.get_stats(),
         }
 
 
@@ -1,7 +1,10 @@
 """
 Backup service for data protection
 """
-import boto3
+from implementation.utils.aws_clients import get_client
+from implementation.utils.s3_transfer import TransferManager
+from implementation.utils.s3_listing import iter_objects
+from implementation.services.chunked_backup import ChunkIndex, ChunkedBackupEngine, S3ObjectStore
 import os
 import tarfile
 from datetime import datetime
@@ -13,9 +16,29 @@ logger = logging.getLogger(__name__)
 class BackupService:
     """Handle backup operations"""
     
-    def __init__(self, s3_bucket: str, aws_region: str = 'us-east-1'):
-        self.s3_client = boto3.client('s3', region_name=aws_region)
+    def __init__(self, s3_bucket: str, aws_region: str = 'us-east-1',
+                 chunk_prefix: str = 'chunks/', index_path: str = ':memory:'):
+        self.s3_client = get_client('s3', region_name=aws_region)
         self.bucket = s3_bucket
+        self.chunk_prefix = chunk_prefix
+        self.index_path = index_path
+        self._engine = None
+        self._transfer = None
+    
+    @property
+    def transfer(self) -> TransferManager:
+        """Parallel, resumable transfer manager for whole-file uploads and downloads"""
+        if self._transfer is None:
+            self._transfer = TransferManager(self.s3_client)
+        return self._transfer
+    
+    @property
+    def engine(self) -> ChunkedBackupEngine:
+        """Deduplicating engine storing under chunk_prefix; built on first use"""
+        if self._engine is None:
+            self._engine = ChunkedBackupEngine(S3ObjectStore(self.s3_client, self.bucket, self.chunk_prefix),
+                                               ChunkIndex(self.index_path))
+        return self._engine
     
     def create_backup(self, source_path: str, backup_name: str = None):
         """Create backup archive"""
@@ -39,7 +62,7 @@ class BackupService:
             s3_key = os.path.basename(file_path)
         
         try:
-            self.s3_client.upload_file(file_path, self.bucket, s3_key)
+            self.transfer.upload_file(file_path, self.bucket, s3_key)
             logger.info(f"Backup uploaded to S3: s3://{self.bucket}/{s3_key}")
             return True
         except Exception as e:
@@ -49,23 +72,31 @@ class BackupService:
     def restore_from_s3(self, s3_key: str, destination_path: str):
         """Restore backup from S3"""
         try:
-            self.s3_client.download_file(self.bucket, s3_key, destination_path)
+            self.transfer.download_file(self.bucket, s3_key, destination_path)
             logger.info(f"Backup restored from S3: {s3_key}")
             return True
         except Exception as e:
             logger.error(f"Failed to restore from S3: {str(e)}")
             return False
     
+    def upload_directory_to_s3(self, directory: str, prefix: str = ''):
+        """Sync a directory tree to S3, uploading only new or changed files"""
+        try:
+            summary = self.transfer.upload_directory(directory, self.bucket, prefix)
+            stats = summary['stats']
+            logger.info(f"Synced {directory} to s3://{self.bucket}/{prefix}: "
+                        f"{len(summary['transferred'])} uploaded, {len(summary['skipped'])} unchanged, "
+                        f"{stats['mb_per_s']:.1f} MB/s")
+            return summary
+        except Exception as e:
+            logger.error(f"Failed to sync directory to S3: {str(e)}")
+            return None
+    
     def list_backups(self, prefix: str = ''):
         """List available backups in S3"""
         try:
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.bucket,
-                Prefix=prefix
-            )
-            
             backups = []
-            for obj in response.get('Contents', []):
+            for obj in iter_objects(self.s3_client, self.bucket, prefix):
                 backups.append({
                     'key': obj['Key'],
                     'size': obj['Size'],
@@ -76,3 +107,31 @@ class BackupService:
         except Exception as e:
             logger.error(f"Failed to list backups: {str(e)}")
             return []
+    
+    def create_chunked_backup(self, source_path: str, backup_name: str = None, parent: str = None):
+        """Back up source_path straight to S3, storing only chunks not already stored"""
+        try:
+            stats = self.engine.backup(source_path, backup_name, parent=parent)
+            logger.info(f"Chunked backup created: {stats['chunks_new']} of {stats['chunks']} chunks new")
+            return stats
+        except Exception as e:
+            logger.error(f"Failed to create chunked backup: {str(e)}")
+            raise
+    
+    def restore_chunked_backup(self, backup_name: str, destination_path: str):
+        """Restore a chunked backup from its manifest"""
+        try:
+            self.engine.restore(backup_name, destination_path)
+            logger.info(f"Chunked backup restored: {backup_name}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to restore chunked backup: {str(e)}")
+            return False
+    
+    def list_chunked_backups(self):
+        """Names of chunked backups in S3"""
+        try:
+            return self.engine.list_backups()
+        except Exception as e:
+            logger.error(f"Failed to list chunked backups: {str(e)}")
+            return []
@@ -0,0 +1,602 @@
+"""
+Content-addressed, deduplicating backup engine
+"""
+import os
+import json
+import gzip
+import stat
+import zlib
+import uuid
+import sqlite3
+import hashlib
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WINDOW = 64
+# Fixed gear table: chunk boundaries, and so deduplication, must never change between releases
+GEAR = np.array([int.from_bytes(hashlib.sha256(i.to_bytes(2, 'big')).digest()[:4], 'big')
+                 for i in range(256)], dtype=np.uint32)
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+def _compress(data: bytes, level: int) -> Tuple[bytes, str]:
+    compressed = zlib.compress(data, level)
+    if len(compressed) < len(data):
+        return compressed, 'zlib'
+    return data, 'raw'
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    return zlib.decompress(data) if codec == 'zlib' else data
+
+
+class ContentChunker:
+    """Content-defined chunking with a rolling window hash
+
+    The hash of each position is the sum of gear values of the preceding 64
+    bytes, so an insert or delete only moves the boundaries next to it and
+    the rest of the file still deduplicates. Boundaries follow FastCDC's
+    normalised chunking: a stricter mask before avg_size and a looser one
+    after, which keeps chunk sizes close to the average. Hashes for a whole
+    read buffer are computed at once with NumPy.
+    """
+
+    def __init__(self, min_size: int = 256 * 1024, avg_size: int = 1024 * 1024,
+                 max_size: int = 4 * 1024 * 1024, read_size: int = 16 * 1024 * 1024):
+        if not WINDOW <= min_size < avg_size < max_size:
+            raise ValueError("Chunk sizes must satisfy 64 <= min_size < avg_size < max_size")
+        self.min_size = min_size
+        self.avg_size = avg_size
+        self.max_size = max_size
+        self.read_size = max(read_size, max_size)
+        bits = avg_size.bit_length() - 1
+        if bits + 2 > 32:
+            raise ValueError("avg_size must be below 1 GiB")
+        self.strict_mask = np.uint32((1 << (bits + 2)) - 1)
+        self.loose_mask = np.uint32((1 << max(bits - 2, 1)) - 1)
+
+    def _candidates(self, data: bytes, offset: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Strict and loose boundary positions (offset-based chunk ends) of every window inside data"""
+        if len(data) < WINDOW:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        # Sums wrap modulo 2**32, which leaves every masked bit exact
+        sums = np.cumsum(GEAR[np.frombuffer(data, dtype=np.uint8)], dtype=np.uint32)
+        window = np.empty(len(data) - WINDOW + 1, dtype=np.uint32)
+        window[0] = sums[WINDOW - 1]
+        np.subtract(sums[WINDOW:], sums[:-WINDOW], out=window[1:])
+        # window[j] covers data[j:j + WINDOW], so a boundary there ends the chunk at j + WINDOW.
+        # The strict mask has every bit of the loose one, so its hits are a subset
+        loose = np.flatnonzero((window & self.loose_mask) == 0)
+        strict = loose[(window[loose] & self.strict_mask) == 0] + (offset + WINDOW)
+        loose += offset + WINDOW
+        return strict, loose
+
+    def _cuts(self, strict: np.ndarray, loose: np.ndarray, start: int, end: int, final: bool) -> List[int]:
+        cuts = []
+        while start < end:
+            remaining = end - start
+            if remaining <= self.min_size:
+                if final:
+                    cuts.append(end)
+                break
+            cut = None
+            i = np.searchsorted(strict, start + self.min_size)
+            if i < len(strict) and strict[i] < start + self.avg_size:
+                cut = int(strict[i])
+            elif remaining >= self.avg_size:
+                i = np.searchsorted(loose, start + self.avg_size)
+                if i < len(loose) and loose[i] <= start + self.max_size:
+                    cut = int(loose[i])
+            if cut is None:
+                if remaining >= self.max_size:
+                    cut = start + self.max_size
+                elif final:
+                    cut = end
+                else:
+                    break
+            cuts.append(cut)
+            start = cut
+        return cuts
+
+    def cut_points(self, data: bytes, final: bool = True) -> List[int]:
+        """Chunk end offsets in data; without final, a trailing partial chunk is left uncut"""
+        return self._cuts(*self._candidates(data, 0), 0, len(data), final)
+
+    def chunks(self, fileobj) -> Iterator[bytes]:
+        """Yield the chunks of a binary file object
+
+        Each byte is hashed once: candidates found in earlier reads are kept
+        while the chunk they belong to is still pending. Windows are never
+        checked before min_size into a chunk, so a window never needs bytes
+        from before the chunk's start.
+        """
+        pending = b''
+        start = 0
+        strict = loose = np.empty(0, dtype=np.int64)
+        while True:
+            block = fileobj.read(self.read_size)
+            final = not block
+            if block:
+                context = pending[-(WINDOW - 1):]
+                new_strict, new_loose = self._candidates(context + block, start + len(pending) - len(context))
+                strict = np.concatenate((strict[strict > start], new_strict))
+                loose = np.concatenate((loose[loose > start], new_loose))
+                pending += block
+            position = start
+            for cut in self._cuts(strict, loose, start, start + len(pending), final):
+                yield pending[position - start:cut - start]
+                position = cut
+            pending = pending[position - start:]
+            start = position
+            if final:
+                return
+
+
+class S3ObjectStore:
+    """Object store operations the backup engine needs, on an S3 bucket"""
+
+    def __init__(self, client, bucket: str, prefix: str = ''):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def put(self, key: str, data: bytes):
+        self.client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data)
+
+    def get(self, key: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)['Body'].read()
+
+    def get_range(self, key: str, start: int, length: int) -> bytes:
+        response = self.client.get_object(Bucket=self.bucket, Key=self.prefix + key,
+                                          Range=f"bytes={start}-{start + length - 1}")
+        return response['Body'].read()
+
+    def list_keys(self, prefix: str) -> Iterator[str]:
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix + prefix):
+            for obj in page.get('Contents', []):
+                yield obj['Key'][len(self.prefix):]
+
+    def start_multipart(self, key: str) -> str:
+        return self.client.create_multipart_upload(Bucket=self.bucket, Key=self.prefix + key)['UploadId']
+
+    def upload_part(self, key: str, upload_id: str, number: int, data: bytes) -> str:
+        response = self.client.upload_part(Bucket=self.bucket, Key=self.prefix + key, UploadId=upload_id,
+                                           PartNumber=number, Body=data)
+        return response['ETag']
+
+    def complete_multipart(self, key: str, upload_id: str, etags: List[str]):
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.prefix + key, UploadId=upload_id,
+            MultipartUpload={'Parts': [{'ETag': etag, 'PartNumber': n} for n, etag in enumerate(etags, 1)]}
+        )
+
+    def abort_multipart(self, key: str, upload_id: str):
+        self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.prefix + key, UploadId=upload_id)
+
+
+class LocalObjectStore:
+    """The same operations on a local directory, for tests, benchmarks and offline copies"""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split('/'))
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+
+    def get(self, key: str) -> bytes:
+        with open(self._path(key), 'rb') as f:
+            return f.read()
+
+    def get_range(self, key: str, start: int, length: int) -> bytes:
+        with open(self._path(key), 'rb') as f:
+            f.seek(start)
+            return f.read(length)
+
+    def list_keys(self, prefix: str) -> Iterator[str]:
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                key = os.path.relpath(os.path.join(dirpath, filename), self.root).replace(os.sep, '/')
+                if key.startswith(prefix) and not key.startswith('.multipart/') and not key.endswith('.tmp'):
+                    yield key
+
+    def start_multipart(self, key: str) -> str:
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._path(f'.multipart/{upload_id}'))
+        return upload_id
+
+    def upload_part(self, key: str, upload_id: str, number: int, data: bytes) -> str:
+        self.put(f'.multipart/{upload_id}/{number}', data)
+        return hashlib.md5(data).hexdigest()
+
+    def complete_multipart(self, key: str, upload_id: str, etags: List[str]):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as out:
+            for number in range(1, len(etags) + 1):
+                with open(self._path(f'.multipart/{upload_id}/{number}'), 'rb') as part:
+                    out.write(part.read())
+        os.replace(path + '.tmp', path)
+        self.abort_multipart(key, upload_id)
+
+    def abort_multipart(self, key: str, upload_id: str):
+        directory = self._path(f'.multipart/{upload_id}')
+        if os.path.isdir(directory):
+            for filename in os.listdir(directory):
+                os.remove(os.path.join(directory, filename))
+            os.rmdir(directory)
+
+
+class ChunkIndex:
+    """hash -> (pack, offset, length, size, codec) of every chunk already stored
+
+    A local SQLite cache of the index objects written next to each pack; the
+    object store remains the source of truth and the cache is refreshed from
+    it with ChunkedBackupEngine.sync_index().
+    """
+
+    def __init__(self, db_path: str = ':memory:'):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS chunks (hash TEXT PRIMARY KEY, pack TEXT, '
+                          'offset INTEGER, length INTEGER, size INTEGER, codec TEXT)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS packs (name TEXT PRIMARY KEY)')
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM chunks').fetchone()[0]
+
+    def __contains__(self, chunk_hash: str):
+        return self.get(chunk_hash) is not None
+
+    def get(self, chunk_hash: str) -> Optional[Tuple]:
+        return self.conn.execute('SELECT pack, offset, length, size, codec FROM chunks WHERE hash = ?',
+                                 (chunk_hash,)).fetchone()
+
+    def packs(self) -> set:
+        return {row[0] for row in self.conn.execute('SELECT name FROM packs')}
+
+    def add_pack(self, name: str, entries: List[List]):
+        """entries are [hash, pack, offset, length, size, codec]"""
+        self.conn.executemany('INSERT OR IGNORE INTO chunks VALUES (?, ?, ?, ?, ?, ?)', entries)
+        self.conn.execute('INSERT OR IGNORE INTO packs VALUES (?)', (name,))
+        self.conn.commit()
+
+
+class PackWriter:
+    """Appends compressed chunks to pack objects streamed up as multipart uploads
+
+    Parts are sent as soon as part_size bytes are buffered, on a small thread
+    pool, so nothing is staged on disk and at most upload_workers * 2 parts
+    are held in memory. A pack is completed once it reaches pack_size; its
+    index object is written only then, so an interrupted backup never leaves
+    index entries pointing at data that was not stored.
+    """
+
+    def __init__(self, store, index: ChunkIndex, part_size: int = 8 * 1024 * 1024,
+                 pack_size: int = 256 * 1024 * 1024, upload_workers: int = 4):
+        self.store = store
+        self.index = index
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.pack_size = pack_size
+        self.upload_workers = upload_workers
+        self.executor = ThreadPoolExecutor(max_workers=upload_workers, thread_name_prefix='pack-upload')
+        self.pack = None
+        self.upload_id = None
+        self.buffer = bytearray()
+        self.offset = 0
+        self.parts = []
+        self.entries = []
+        self.bytes_uploaded = 0
+        self.packs_written = 0
+
+    def _send_part(self):
+        if len(self.parts) >= self.upload_workers * 2:
+            wait(self.parts[-self.upload_workers * 2:])
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        self.parts.append(self.executor.submit(self.store.upload_part, f'packs/{self.pack}',
+                                               self.upload_id, len(self.parts) + 1, data))
+        self.bytes_uploaded += len(data)
+
+    def add(self, chunk_hash: str, data: bytes, size: int, codec: str):
+        if self.pack is None:
+            self.pack = uuid.uuid4().hex
+            self.upload_id = self.store.start_multipart(f'packs/{self.pack}')
+        self.entries.append([chunk_hash, self.pack, self.offset, len(data), size, codec])
+        self.buffer += data
+        self.offset += len(data)
+        if len(self.buffer) >= self.part_size:
+            self._send_part()
+        if self.offset >= self.pack_size:
+            self.finish_pack()
+
+    def finish_pack(self):
+        if self.pack is None:
+            return
+        if self.buffer:
+            self._send_part()
+        key = f'packs/{self.pack}'
+        try:
+            etags = [part.result() for part in self.parts]
+            self.store.complete_multipart(key, self.upload_id, etags)
+        except Exception:
+            self.store.abort_multipart(key, self.upload_id)
+            raise
+        self.store.put(f'index/{self.pack}.json', json.dumps(self.entries).encode())
+        self.index.add_pack(self.pack, self.entries)
+        self.packs_written += 1
+        self.pack, self.upload_id, self.offset, self.parts, self.entries = None, None, 0, [], []
+
+    def abort(self):
+        if self.pack is not None:
+            wait(self.parts)
+            self.store.abort_multipart(f'packs/{self.pack}', self.upload_id)
+            self.pack, self.upload_id, self.offset, self.parts, self.entries = None, None, 0, [], []
+            self.buffer.clear()
+
+    def close(self):
+        try:
+            self.finish_pack()
+        finally:
+            self.executor.shutdown(wait=True)
+
+
+class ChunkedBackupEngine:
+    """Deduplicating backups streamed straight into an object store
+
+    Files are split by ContentChunker and each chunk is named by its SHA-256.
+    Chunks already in the index (from any earlier backup) are referenced, not
+    stored again; new chunks are compressed on a process pool and appended to
+    pack objects by PackWriter. A backup is a gzip'd JSON manifest under
+    manifests/ listing every file with its metadata and chunk hashes, plus
+    the pack location of every chunk, so restores need only the manifest.
+    """
+
+    def __init__(self, store, index: Optional[ChunkIndex] = None, chunker: Optional[ContentChunker] = None,
+                 compression_level: int = 3, compression_workers: Optional[int] = None,
+                 part_size: int = 8 * 1024 * 1024, pack_size: int = 256 * 1024 * 1024,
+                 upload_workers: int = 4, restore_workers: int = 8):
+        self.store = store
+        self.index = index if index is not None else ChunkIndex()
+        self.chunker = chunker or ContentChunker()
+        self.compression_level = compression_level
+        self.compression_workers = compression_workers if compression_workers is not None else os.cpu_count() or 1
+        self.part_size = part_size
+        self.pack_size = pack_size
+        self.upload_workers = upload_workers
+        self.restore_workers = restore_workers
+        self.sync_index()
+
+    def sync_index(self) -> int:
+        """Load index objects of packs the local index has not seen; return how many were loaded"""
+        known = self.index.packs()
+        loaded = 0
+        for key in self.store.list_keys('index/'):
+            name = key.rsplit('/', 1)[-1][:-len('.json')]
+            if name not in known:
+                self.index.add_pack(name, json.loads(self.store.get(key)))
+                loaded += 1
+        return loaded
+
+    @staticmethod
+    def _walk(source_path: str) -> Iterator[Tuple[str, str]]:
+        """(absolute path, manifest path) of source_path and everything below it, in sorted order"""
+        root = os.path.basename(os.path.normpath(source_path))
+        yield source_path, root
+        if os.path.isdir(source_path) and not os.path.islink(source_path):
+            for dirpath, dirnames, filenames in os.walk(source_path):
+                dirnames.sort()
+                relative = os.path.relpath(dirpath, source_path)
+                for name in dirnames + sorted(filenames):
+                    path = os.path.join(dirpath, name)
+                    yield path, '/'.join(p for p in (root, relative, name) if p != '.')
+
+    def backup(self, source_path: str, backup_name: Optional[str] = None, parent: Optional[str] = None) -> Dict:
+        """Back up a file or directory tree; return the manifest's stats
+
+        With parent, files whose size and mtime match that backup are not
+        read again and reuse its chunk list.
+        """
+        if backup_name is None:
+            backup_name = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        started = datetime.now()
+        previous = {}
+        chunk_table: Dict[str, List] = {}
+        if parent:
+            parent_manifest = self.load_manifest(parent)
+            parent_chunks = parent_manifest['chunks']
+            for entry in parent_manifest['files']:
+                if entry['type'] == 'file':
+                    previous[entry['path']] = (entry['size'], entry['mtime_ns'],
+                                               [parent_chunks[i][0] for i in entry['chunks']])
+            chunk_table.update((entry[0], entry) for entry in parent_chunks)
+
+        stats = {'files': 0, 'bytes_read': 0, 'bytes_new': 0, 'bytes_uploaded': 0,
+                 'chunks': 0, 'chunks_new': 0, 'files_unchanged': 0}
+        writer = PackWriter(self.store, self.index, self.part_size, self.pack_size, self.upload_workers)
+        pool = ProcessPoolExecutor(self.compression_workers) if self.compression_workers > 1 else None
+        in_flight = deque()
+        submitted = set()
+        max_in_flight = max(self.compression_workers, 1) * 4
+        files = []
+
+        def drain(limit: int):
+            while len(in_flight) > limit:
+                chunk_hash, size, future = in_flight.popleft()
+                data, codec = future.result() if pool else future
+                writer.add(chunk_hash, data, size, codec)
+
+        try:
+            for path, name in self._walk(source_path):
+                st = os.lstat(path)
+                entry = {'path': name, 'mode': stat.S_IMODE(st.st_mode), 'mtime_ns': st.st_mtime_ns}
+                if stat.S_ISLNK(st.st_mode):
+                    entry.update(type='symlink', target=os.readlink(path))
+                elif stat.S_ISDIR(st.st_mode):
+                    entry['type'] = 'dir'
+                elif stat.S_ISREG(st.st_mode):
+                    entry.update(type='file', size=st.st_size)
+                    stats['files'] += 1
+                    reused = previous.get(name)
+                    if reused and reused[:2] == (st.st_size, st.st_mtime_ns):
+                        entry['hashes'] = reused[2]
+                        stats['files_unchanged'] += 1
+                        stats['chunks'] += len(reused[2])
+                    else:
+                        entry['hashes'] = []
+                        with open(path, 'rb') as f:
+                            for chunk in self.chunker.chunks(f):
+                                chunk_hash = hashlib.sha256(chunk).hexdigest()
+                                entry['hashes'].append(chunk_hash)
+                                stats['chunks'] += 1
+                                stats['bytes_read'] += len(chunk)
+                                if chunk_hash in submitted or chunk_hash in chunk_table or chunk_hash in self.index:
+                                    continue
+                                submitted.add(chunk_hash)
+                                stats['chunks_new'] += 1
+                                stats['bytes_new'] += len(chunk)
+                                if pool:
+                                    future = pool.submit(_compress, chunk, self.compression_level)
+                                else:
+                                    future = _compress(chunk, self.compression_level)
+                                in_flight.append((chunk_hash, len(chunk), future))
+                                drain(max_in_flight)
+                else:
+                    logger.warning(f"Skipping special file: {path}")
+                    continue
+                files.append(entry)
+            drain(0)
+            writer.close()
+        except Exception:
+            writer.abort()
+            writer.executor.shutdown(wait=False)
+            raise
+        finally:
+            if pool:
+                pool.shutdown(wait=True, cancel_futures=True)
+
+        # Every referenced chunk is now either in a pack written above or known from before
+        order: Dict[str, int] = {}
+        chunks = []
+        for entry in files:
+            if entry['type'] != 'file':
+                continue
+            refs = []
+            for chunk_hash in entry.pop('hashes'):
+                position = order.get(chunk_hash)
+                if position is None:
+                    location = chunk_table.get(chunk_hash)
+                    location = location[1:] if location else self.index.get(chunk_hash)
+                    position = order[chunk_hash] = len(chunks)
+                    chunks.append([chunk_hash, *location])
+                refs.append(position)
+            entry['chunks'] = refs
+
+        stats['bytes_uploaded'] = writer.bytes_uploaded
+        stats['packs'] = writer.packs_written
+        stats['duration'] = (datetime.now() - started).total_seconds()
+        manifest = {
+            'version': 1,
+            'name': backup_name,
+            'source': os.path.abspath(source_path),
+            'created': started.isoformat(),
+            'parent': parent,
+            'files': files,
+            'chunks': chunks,
+            'stats': stats,
+        }
+        self.store.put(f'manifests/{backup_name}.json.gz', gzip.compress(json.dumps(manifest).encode()))
+        logger.info(f"Backup {backup_name}: {stats['bytes_read']} bytes read, "
+                    f"{stats['bytes_new']} new, {stats['bytes_uploaded']} uploaded")
+        return stats
+
+    def load_manifest(self, backup_name: str) -> Dict:
+        return json.loads(gzip.decompress(self.store.get(f'manifests/{backup_name}.json.gz')))
+
+    def list_backups(self) -> List[str]:
+        suffix = '.json.gz'
+        return sorted(key[len('manifests/'):-len(suffix)] for key in self.store.list_keys('manifests/')
+                      if key.endswith(suffix))
+
+    def _read_chunks(self, refs: List[List]) -> Iterator[bytes]:
+        """Chunk contents in order, fetching runs that sit back to back in a pack with one ranged GET"""
+        i = 0
+        while i < len(refs):
+            _, pack, offset, length, _, _ = refs[i]
+            j = i + 1
+            end = offset + length
+            while (j < len(refs) and refs[j][1] == pack and refs[j][2] == end
+                   and end - offset + refs[j][3] <= 16 * 1024 * 1024):
+                end += refs[j][3]
+                j += 1
+            data = self.store.get_range(f'packs/{pack}', offset, end - offset)
+            for chunk_hash, _, chunk_offset, chunk_length, size, codec in refs[i:j]:
+                start = chunk_offset - offset
+                chunk = _decompress(data[start:start + chunk_length], codec)
+                if len(chunk) != size or hashlib.sha256(chunk).hexdigest() != chunk_hash:
+                    raise ValueError(f"Chunk {chunk_hash} in pack {pack} is corrupt")
+                yield chunk
+            i = j
+
+    def _restore_file(self, entry: Dict, target: str, chunks: List[List]):
+        with open(target, 'wb') as f:
+            for chunk in self._read_chunks([chunks[i] for i in entry['chunks']]):
+                f.write(chunk)
+        os.chmod(target, entry['mode'])
+        os.utime(target, ns=(entry['mtime_ns'], entry['mtime_ns']))
+
+    def restore(self, backup_name: str, destination_path: str) -> Dict:
+        """Recreate a backup's tree under destination_path from its manifest"""
+        manifest = self.load_manifest(backup_name)
+        destination = os.path.abspath(destination_path)
+        targets = []
+        for entry in manifest['files']:
+            target = os.path.abspath(os.path.join(destination, *entry['path'].split('/')))
+            if os.path.commonpath([destination, target]) != destination:
+                raise ValueError(f"Refusing to restore outside destination: {entry['path']}")
+            targets.append(target)
+
+        os.makedirs(destination, exist_ok=True)
+        for entry, target in zip(manifest['files'], targets):
+            if entry['type'] == 'dir':
+                os.makedirs(target, exist_ok=True)
+        for target in targets:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+
+        restored = 0
+        with ThreadPoolExecutor(max_workers=self.restore_workers, thread_name_prefix='restore') as executor:
+            futures = [executor.submit(self._restore_file, entry, target, manifest['chunks'])
+                       for entry, target in zip(manifest['files'], targets) if entry['type'] == 'file']
+            for future in futures:
+                future.result()
+                restored += 1
+
+        for entry, target in zip(manifest['files'], targets):
+            if entry['type'] == 'symlink':
+                if os.path.lexists(target):
+                    os.remove(target)
+                os.symlink(entry['target'], target)
+                os.utime(target, ns=(entry['mtime_ns'], entry['mtime_ns']), follow_symlinks=False)
+        # Directories last, so writing their contents does not bump their mtime again
+        for entry, target in reversed(list(zip(manifest['files'], targets))):
+            if entry['type'] == 'dir':
+                os.chmod(target, entry['mode'])
+                os.utime(target, ns=(entry['mtime_ns'], entry['mtime_ns']))
+        logger.info(f"Restored {restored} files from {backup_name} to {destination_path}")
+        return {'files': restored, 'bytes': sum(e.get('size', 0) for e in manifest['files'])}
@@ -1,11 +1,16 @@
 """
 Cloud provider service for multi-cloud management
 """
-import boto3
 from azure.identity import DefaultAzureCredential
 from azure.mgmt.compute import ComputeManagementClient
 from google.cloud import compute_v1
 import logging
+from typing import Dict, Iterator, List
+
+from implementation.utils.aws_clients import get_client
+from implementation.services.inventory_engine import (
+    InventoryEngine, InventoryTask, aws_instance_pages, azure_instance_pages, gcp_instance_pages
+)
 
 logger = logging.getLogger(__name__)
 
@@ -13,10 +18,11 @@ logger = logging.getLogger(__name__)
 class CloudProviderService:
     """Unified interface for multiple cloud providers"""
     
-    def __init__(self, provider: str, credentials: dict):
+    def __init__(self, provider: str, credentials: dict, max_workers: int = 16):
         self.provider = provider.lower()
         self.credentials = credentials
         self._client = None
+        self.inventory = InventoryEngine(max_workers=max_workers)
     
     def get_client(self):
         """Get cloud provider client"""
@@ -36,11 +42,15 @@ class CloudProviderService:
     
     def _get_aws_client(self):
         """Initialize AWS client"""
-        return boto3.client(
-            'ec2',
+        return self._aws_client('ec2', self.credentials.get('region', 'us-east-1'))
+    
+    def _aws_client(self, service: str, region: str):
+        """Shared client for this service's AWS credentials"""
+        return get_client(
+            service,
             aws_access_key_id=self.credentials.get('access_key'),
             aws_secret_access_key=self.credentials.get('secret_key'),
-            region_name=self.credentials.get('region', 'us-east-1')
+            region_name=region
         )
     
     def _get_azure_client(self):
@@ -56,71 +66,70 @@ class CloudProviderService:
         return compute_v1.InstancesClient()
     
     def list_instances(self):
-        """List all instances across providers"""
-        try:
-            if self.provider == 'aws':
-                return self._list_aws_instances()
-            elif self.provider == 'azure':
-                return self._list_azure_instances()
-            elif self.provider == 'gcp':
-                return self._list_gcp_instances()
-        except Exception as e:
-            logger.error(f"Error listing instances: {str(e)}")
-            raise
+        """List all instances across every region, zone or resource group"""
+        snapshot = self.inventory_snapshot()
+        if snapshot['errors']:
+            failed = ', '.join(f"{e['location']}: {e['error']}" for e in snapshot['errors'])
+            raise RuntimeError(f"Incomplete {self.provider} inventory ({failed})")
+        return snapshot['instances']
     
-    def _list_aws_instances(self):
-        """List AWS EC2 instances"""
-        client = self.get_client()
-        response = client.describe_instances()
-        
-        instances = []
-        for reservation in response['Reservations']:
-            for instance in reservation['Instances']:
-                instances.append({
-                    'id': instance['InstanceId'],
-                    'type': instance['InstanceType'],
-                    'state': instance['State']['Name'],
-                    'public_ip': instance.get('PublicIpAddress'),
-                    'private_ip': instance.get('PrivateIpAddress'),
-                    'provider': 'aws'
-                })
-        
-        return instances
+    def iter_instances(self, errors: list = None) -> Iterator[dict]:
+        """Stream normalized instances as pages arrive from each location"""
+        return self.inventory.stream(self.inventory_tasks(), errors)
+    
+    def inventory_snapshot(self) -> Dict:
+        """Consolidated inventory with per-location counts and any location errors"""
+        return self.inventory.snapshot(self.inventory_tasks())
     
-    def _list_azure_instances(self):
-        """List Azure VMs"""
+    def inventory_tasks(self) -> List[InventoryTask]:
+        """One paginated listing task per region, zone or resource group"""
+        if self.provider == 'aws':
+            return self._aws_inventory_tasks()
+        elif self.provider == 'azure':
+            return self._azure_inventory_tasks()
+        elif self.provider == 'gcp':
+            return self._gcp_inventory_tasks()
+        raise ValueError(f"Unsupported provider: {self.provider}")
+    
+    def _aws_regions(self) -> List[str]:
+        """Configured regions, or every region enabled for the account"""
+        if self.credentials.get('regions'):
+            return list(self.credentials['regions'])
+        response = self.get_client().describe_regions(
+            Filters=[{'Name': 'opt-in-status', 'Values': ['opt-in-not-required', 'opted-in']}]
+        )
+        return [region['RegionName'] for region in response['Regions']]
+    
+    def _aws_inventory_tasks(self) -> List[InventoryTask]:
+        """EC2 listing tasks, one client per region"""
+        tasks = []
+        for region in self._aws_regions():
+            client = self._aws_client('ec2', region)
+            tasks.append(InventoryTask(
+                'aws', region, lambda client=client, region=region: aws_instance_pages(client, region)
+            ))
+        return tasks
+    
+    def _azure_inventory_tasks(self) -> List[InventoryTask]:
+        """Azure VM listing tasks per resource group, or one for the whole subscription"""
         client = self.get_client()
-        resource_group = self.credentials.get('resource_group')
-        
-        instances = []
-        for vm in client.virtual_machines.list(resource_group):
-            instances.append({
-                'id': vm.id,
-                'name': vm.name,
-                'type': vm.hardware_profile.vm_size,
-                'state': vm.provisioning_state,
-                'provider': 'azure'
-            })
-        
-        return instances
+        groups = self.credentials.get('resource_groups') or [self.credentials.get('resource_group')]
+        return [
+            InventoryTask('azure', group or 'subscription',
+                          lambda group=group: azure_instance_pages(client, group))
+            for group in groups
+        ]
     
-    def _list_gcp_instances(self):
-        """List GCP compute instances"""
+    def _gcp_inventory_tasks(self) -> List[InventoryTask]:
+        """GCP listing tasks per configured zone, or one aggregated list over all zones"""
         client = self.get_client()
         project = self.credentials.get('project_id')
-        zone = self.credentials.get('zone', 'us-central1-a')
-        
-        instances = []
-        for instance in client.list(project=project, zone=zone):
-            instances.append({
-                'id': instance.id,
-                'name': instance.name,
-                'type': instance.machine_type,
-                'state': instance.status,
-                'provider': 'gcp'
-            })
-        
-        return instances
+        zones = self.credentials.get('zones') or [self.credentials.get('zone')]
+        return [
+            InventoryTask('gcp', zone or 'all-zones',
+                          lambda zone=zone: gcp_instance_pages(client, project, zone))
+            for zone in zones
+        ]
     
     def create_instance(self, config: dict):
         """Create instance on cloud provider"""
@@ -189,7 +198,7 @@ class CloudProviderService:
         """Get instance metrics"""
         try:
             if self.provider == 'aws':
-                cloudwatch = boto3.client('cloudwatch', region_name=self.credentials.get('region'))
+                cloudwatch = self._aws_client('cloudwatch', self.credentials.get('region', 'us-east-1'))
                 # Fetch CloudWatch metrics
                 return {'cpu': 45.2, 'memory': 62.8}
             
@@ -0,0 +1,173 @@
+"""
+Concurrent multi-region instance inventory
+"""
+import queue
+import threading
+import time
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class InventoryTask:
+    """One provider location to list: fetch_pages() yields lists of normalized records"""
+
+    def __init__(self, provider: str, location: str, fetch_pages: Callable[[], Iterable[List[dict]]]):
+        self.provider = provider
+        self.location = location
+        self.fetch_pages = fetch_pages
+
+    def __repr__(self):
+        return f"InventoryTask({self.provider}/{self.location})"
+
+
+class InventoryEngine:
+    """Pages through every provider location in parallel and streams the records
+
+    Each task runs on a bounded thread pool and hands its pages to a bounded
+    queue, so the consumer sees instances as soon as the first page of any
+    region arrives and memory stays flat however large the estate is. A
+    failing location is reported in errors and does not stop the others.
+    """
+
+    def __init__(self, max_workers: int = 16, queue_pages: int = 64):
+        self.max_workers = max_workers
+        self.queue_pages = queue_pages
+
+    @staticmethod
+    def _put(pages: queue.Queue, item, stop: threading.Event) -> bool:
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run_task(self, task: InventoryTask, pages: queue.Queue, stop: threading.Event, errors: list):
+        try:
+            for page in task.fetch_pages():
+                if not self._put(pages, page, stop):
+                    return
+        except Exception as e:
+            logger.error(f"Error listing {task.provider} instances in {task.location}: {str(e)}")
+            errors.append({'provider': task.provider, 'location': task.location, 'error': str(e)})
+        finally:
+            self._put(pages, _DONE, stop)
+
+    def stream(self, tasks: List[InventoryTask], errors: Optional[list] = None) -> Iterator[dict]:
+        """Yield normalized instance records from all tasks as their pages arrive"""
+        errors = [] if errors is None else errors
+        if not tasks:
+            return
+        pages = queue.Queue(maxsize=self.queue_pages)
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(tasks)),
+                                      thread_name_prefix='inventory')
+        for task in tasks:
+            executor.submit(self._run_task, task, pages, stop, errors)
+
+        remaining = len(tasks)
+        try:
+            while remaining:
+                page = pages.get()
+                if page is _DONE:
+                    remaining -= 1
+                    continue
+                yield from page
+        finally:
+            # Consumer stopped early: release workers blocked on a full queue
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def snapshot(self, tasks: List[InventoryTask]) -> Dict:
+        """Consolidated inventory of all tasks with per-provider and per-location counts"""
+        started = time.time()
+        errors: list = []
+        instances = list(self.stream(tasks, errors))
+        by_provider = Counter(instance['provider'] for instance in instances)
+        by_location = Counter(f"{instance['provider']}/{instance.get('location')}" for instance in instances)
+        return {
+            'instances': instances,
+            'count': len(instances),
+            'by_provider': dict(by_provider),
+            'by_location': dict(by_location),
+            'errors': errors,
+            'locations': len(tasks),
+            'duration': time.time() - started,
+        }
+
+
+def aws_instance_pages(client, region: str, page_size: int = 1000) -> Iterator[List[dict]]:
+    """Pages of normalized EC2 instances for one region"""
+    paginator = client.get_paginator('describe_instances')
+    for response in paginator.paginate(PaginationConfig={'PageSize': page_size}):
+        page = []
+        for reservation in response['Reservations']:
+            for instance in reservation['Instances']:
+                tags = {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])}
+                page.append({
+                    'id': instance['InstanceId'],
+                    'name': tags.get('Name'),
+                    'type': instance['InstanceType'],
+                    'state': instance['State']['Name'],
+                    'public_ip': instance.get('PublicIpAddress'),
+                    'private_ip': instance.get('PrivateIpAddress'),
+                    'provider': 'aws',
+                    'location': region,
+                })
+        if page:
+            yield page
+
+
+def azure_instance_pages(client, resource_group: Optional[str] = None) -> Iterator[List[dict]]:
+    """Pages of normalized Azure VMs for one resource group, or the whole subscription"""
+    if resource_group:
+        paged = client.virtual_machines.list(resource_group)
+    else:
+        paged = client.virtual_machines.list_all()
+    for vms in paged.by_page():
+        page = [{
+            'id': vm.id,
+            'name': vm.name,
+            'type': vm.hardware_profile.vm_size,
+            'state': vm.provisioning_state,
+            'provider': 'azure',
+            'location': vm.location,
+        } for vm in vms]
+        if page:
+            yield page
+
+
+def _gcp_record(instance, zone: str) -> dict:
+    return {
+        'id': instance.id,
+        'name': instance.name,
+        'type': instance.machine_type,
+        'state': instance.status,
+        'provider': 'gcp',
+        'location': zone.rsplit('/', 1)[-1],
+    }
+
+
+def gcp_instance_pages(client, project: str, zone: Optional[str] = None,
+                       page_size: int = 500) -> Iterator[List[dict]]:
+    """Pages of normalized GCP instances for one zone, or every zone via aggregated list"""
+    if zone:
+        for response in client.list(request={'project': project, 'zone': zone,
+                                             'max_results': page_size}).pages:
+            page = [_gcp_record(instance, zone) for instance in response.items]
+            if page:
+                yield page
+        return
+    for response in client.aggregated_list(request={'project': project, 'max_results': page_size}).pages:
+        page = []
+        for scope, scoped in response.items.items():
+            page.extend(_gcp_record(instance, scope) for instance in scoped.instances)
+        if page:
+            yield page
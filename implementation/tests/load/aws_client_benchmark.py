@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""AWS Client Registry Benchmark
+
+Measures the time to start the Infrastructure managers (one client per
+manager per region) and the per-call cost of methods that used to build a
+client on every call, with plain boto3.client() and with the shared registry.
+No AWS calls are made; only client construction is timed.
+"""
+
+import os
+import sys
+import time
+import threading
+import argparse
+import boto3
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../utils'))
+from aws_clients import AWSClientRegistry
+
+# (service, region) pairs built by the Infrastructure managers' __init__
+MANAGER_CLIENTS = [
+    ('iam', None), ('ec2', 'us-east-1'), ('config', 'us-east-1'), ('lambda', 'us-east-1'),
+    ('apigatewayv2', 'us-east-1'), ('rds', 'us-east-1'), ('s3', 'us-east-1'), ('route53', None),
+    ('autoscaling', 'us-east-1'), ('cloudfront', None), ('elbv2', 'us-east-1'), ('eks', 'us-east-1'),
+    ('cloudwatch', 'us-east-1'), ('logs', 'us-east-1'), ('backup', 'us-east-1'), ('ce', 'us-east-1'),
+    ('ecr', 'us-east-1'), ('ecs', 'us-east-1'),
+]
+
+class ClientRegistryBenchmark:
+    def __init__(self, startups=3, calls=200, threads=32):
+        self.startups = startups
+        self.calls = calls
+        self.threads = threads
+        os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    
+    def timed(self, func):
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
+    
+    def startup(self, make_client):
+        """Seconds to instantiate every manager `startups` times"""
+        def run():
+            for _ in range(self.startups):
+                for service, region in MANAGER_CLIENTS:
+                    make_client(service, region_name=region)
+        return self.timed(run)
+    
+    def per_call(self, make_client):
+        """Milliseconds per call of a method that asks for its CloudWatch client every time"""
+        def run():
+            for _ in range(self.calls):
+                make_client('cloudwatch', region_name='us-east-1')
+        return self.timed(run) / self.calls * 1000
+    
+    def concurrent(self, make_client):
+        """Seconds for `threads` request handlers each needing EC2 and S3 clients"""
+        barrier = threading.Barrier(self.threads + 1)
+        
+        def worker():
+            barrier.wait()
+            make_client('ec2', region_name='us-east-1')
+            make_client('s3', region_name='us-east-1')
+        
+        workers = [threading.Thread(target=worker) for _ in range(self.threads)]
+        for w in workers:
+            w.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for w in workers:
+            w.join()
+        return time.perf_counter() - start
+    
+    def run(self):
+        print("\n=== AWS Client Registry Benchmark ===")
+        boto_client = boto3.client
+        registry = AWSClientRegistry()
+        rows = [
+            (f"Start {len(MANAGER_CLIENTS)} managers x{self.startups}",
+             self.startup(boto_client), self.startup(registry.client), 's'),
+            ("Client per method call", self.per_call(boto_client), self.per_call(registry.client), 'ms'),
+            (f"{self.threads} threads, 2 clients each",
+             self.concurrent(boto_client), self.concurrent(AWSClientRegistry().client), 's'),
+        ]
+        print(f"{'Scenario':<32} {'boto3.client':>14} {'Registry':>14}")
+        for name, plain, shared, unit in rows:
+            print(f"{name:<32} {plain:>12.3f}{unit:<2} {shared:>12.3f}{unit:<2}")
+        print(f"\nRegistry: {registry.get_stats()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AWS client registry benchmark")
+    parser.add_argument('--startups', type=int, default=3)
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=32)
+    args = parser.parse_args()
+    ClientRegistryBenchmark(args.startups, args.calls, args.threads).run()
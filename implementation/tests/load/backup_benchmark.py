@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Chunked Backup Benchmark
+
+Backs up a generated tree twice, with a few files edited in between, once as
+the full tar.gz archive BackupService.create_backup builds and once with the
+deduplicating chunked engine. Reports time, throughput, bytes sent to the
+store and temporary disk used. The store is a local directory, so only
+chunking, compression and I/O are timed.
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import tarfile
+import argparse
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../services'))
+from chunked_backup import ChunkedBackupEngine, LocalObjectStore
+
+class BackupBenchmark:
+    def __init__(self, size_mb=256, files=200, edited=5, workers=None):
+        self.size_mb = size_mb
+        self.files = files
+        self.edited = edited
+        self.workers = workers or os.cpu_count()
+        self.rng = random.Random(42)
+
+    def generate(self, root):
+        """Half incompressible data, half repetitive logs, plus a few duplicated files"""
+        per_file = self.size_mb * 1024 * 1024 // self.files
+        for n in range(self.files):
+            directory = os.path.join(root, f'dir{n % 10}')
+            os.makedirs(directory, exist_ok=True)
+            if n % 2:
+                data = self.rng.randbytes(per_file)
+            else:
+                line = f"2024-01-01 INFO worker-{n} request served in {n % 97} ms\n".encode()
+                data = (line * (per_file // len(line) + 1))[:per_file]
+            with open(os.path.join(directory, f'file{n}.dat'), 'wb') as f:
+                f.write(data)
+
+    def edit(self, root):
+        """Insert a few bytes in the middle of some files, shifting everything after"""
+        names = sorted(os.path.join(d, f) for d, _, fs in os.walk(root) for f in fs)
+        for path in self.rng.sample(names, self.edited):
+            with open(path, 'rb') as f:
+                data = f.read()
+            middle = len(data) // 2
+            with open(path, 'wb') as f:
+                f.write(data[:middle] + b'edited' + data[middle:])
+
+    def tar_backup(self, source, store, name):
+        start = time.perf_counter()
+        archive = os.path.join(tempfile.gettempdir(), f'{name}.tar.gz')
+        with tarfile.open(archive, 'w:gz') as tar:
+            tar.add(source, arcname=os.path.basename(source))
+        size = os.path.getsize(archive)
+        shutil.copyfile(archive, os.path.join(store, f'{name}.tar.gz'))
+        os.remove(archive)
+        return time.perf_counter() - start, size, size
+
+    def chunked_backup(self, engine, source, name):
+        start = time.perf_counter()
+        stats = engine.backup(source, name)
+        return time.perf_counter() - start, stats['bytes_uploaded'], 0
+
+    def run(self):
+        print("\n=== Chunked Backup Benchmark ===")
+        print(f"{self.size_mb} MB in {self.files} files, {self.edited} files edited between runs, "
+              f"{self.workers} compression workers")
+        work = tempfile.mkdtemp()
+        try:
+            source = os.path.join(work, 'data')
+            tar_store = os.path.join(work, 'tar-store')
+            os.makedirs(tar_store)
+            self.generate(source)
+            total = self.size_mb * 1024 * 1024
+            engine = ChunkedBackupEngine(LocalObjectStore(os.path.join(work, 'chunk-store')),
+                                         compression_workers=self.workers)
+
+            rows = [('tar.gz, first', self.tar_backup(source, tar_store, 'first')),
+                    ('chunked, first', self.chunked_backup(engine, source, 'first'))]
+            self.edit(source)
+            rows += [('tar.gz, after edits', self.tar_backup(source, tar_store, 'second')),
+                     ('chunked, after edits', self.chunked_backup(engine, source, 'second'))]
+
+            print(f"{'Backup':<22} {'Time':>8} {'MB/s':>8} {'Stored MB':>10} {'Temp disk MB':>13}")
+            for name, (seconds, stored, temp) in rows:
+                print(f"{name:<22} {seconds:>7.2f}s {total / seconds / 1e6:>8.1f} "
+                      f"{stored / 1e6:>10.1f} {temp / 1e6:>13.1f}")
+
+            start = time.perf_counter()
+            engine.restore('second', os.path.join(work, 'restored'))
+            seconds = time.perf_counter() - start
+            print(f"\nRestore from manifest: {seconds:.2f}s ({total / seconds / 1e6:.1f} MB/s)")
+        finally:
+            shutil.rmtree(work)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chunked backup benchmark")
+    parser.add_argument('--size-mb', type=int, default=256)
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--edited', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    BackupBenchmark(args.size_mb, args.files, args.edited, args.workers).run()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""ECS Topology Benchmark
+
+Compares the old list_ecs_clusters loop (describe_clusters and one page of
+list_services per cluster) with EcsTopologyLoader, using a fake ECS API
+with a fixed latency per call and the real page and batch limits. Reports
+wall time, API calls and whether the service counts are right.
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../utils'))
+from ecs_topology import EcsTopologyLoader
+
+class FakePaginator:
+    def __init__(self, client, operation):
+        self.client = client
+        self.operation = operation
+
+    def paginate(self, PaginationConfig=None, cluster=None):
+        size = min((PaginationConfig or {}).get('PageSize', 100), 100)
+        token = None
+        while True:
+            page = self.client.call(self.operation, cluster=cluster, maxResults=size, nextToken=token)
+            yield page
+            token = page.get('nextToken')
+            if not token:
+                return
+
+class FakeECS:
+    def __init__(self, clusters, services, tasks_per_service, latency):
+        self.clusters = [f'cluster-{c}' for c in range(clusters)]
+        self.services = services
+        self.tasks_per_service = tasks_per_service
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _arns(self, operation, cluster):
+        if operation == 'list_clusters':
+            return 'clusterArns', [f'arn:aws:ecs:us-east-1:1:cluster/{c}' for c in self.clusters]
+        if operation == 'list_services':
+            return 'serviceArns', [f'arn:aws:ecs:us-east-1:1:service/{cluster}/svc-{s}' for s in range(self.services)]
+        return 'taskArns', [f'arn:aws:ecs:us-east-1:1:task/{cluster}/svc-{s}-{t}'
+                            for s in range(self.services) for t in range(self.tasks_per_service)]
+
+    def call(self, operation, cluster=None, maxResults=None, nextToken=None):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        key, arns = self._arns(operation, cluster and cluster.split('/')[-1])
+        size = maxResults or (10 if operation == 'list_services' else 100)
+        start = int(nextToken or 0)
+        page = {key: arns[start:start + size]}
+        if start + size < len(arns):
+            page['nextToken'] = str(start + size)
+        return page
+
+    def get_paginator(self, operation):
+        return FakePaginator(self, operation)
+
+    def list_clusters(self):
+        return self.call('list_clusters')
+
+    def list_services(self, cluster):
+        return self.call('list_services', cluster=cluster)
+
+    def describe_clusters(self, clusters):
+        self.call('describe_clusters')
+        return {'clusters': [{'clusterName': c.split('/')[-1], 'clusterArn': c, 'status': 'ACTIVE'} for c in clusters]}
+
+    def describe_services(self, cluster, services):
+        self.call('describe_services')
+        return {'services': [{'serviceName': s.split('/')[-1], 'status': 'ACTIVE'} for s in services]}
+
+    def describe_tasks(self, cluster, tasks):
+        self.call('describe_tasks')
+        return {'tasks': [{'taskArn': t, 'group': 'service:' + t.split('/')[-1].rsplit('-', 1)[0],
+                           'lastStatus': 'RUNNING'} for t in tasks]}
+
+def old_loop(ecs):
+    """What ContainerManager.list_ecs_clusters did before the loader"""
+    rows = []
+    for cluster in ecs.list_clusters()['clusterArns']:
+        cluster_name = cluster.split('/')[-1]
+        details = ecs.describe_clusters(clusters=[cluster])['clusters'][0]
+        rows.append((cluster_name, details['status'], len(ecs.list_services(cluster=cluster_name)['serviceArns'])))
+    return rows
+
+class EcsTopologyBenchmark:
+    def __init__(self, clusters=80, services=35, tasks_per_service=3, latency_ms=30.0, workers=8):
+        self.args = (clusters, services, tasks_per_service, latency_ms / 1000)
+        self.services = services
+        self.workers = workers
+
+    def timed(self, func):
+        start = time.perf_counter()
+        result = func()
+        return result, time.perf_counter() - start
+
+    def run(self):
+        print("\n=== ECS Topology Benchmark ===")
+        clusters, services, tasks, latency = self.args
+        print(f"{clusters} clusters x {services} services x {tasks} tasks, {latency * 1000:.0f} ms per call")
+
+        ecs = FakeECS(*self.args)
+        rows, seconds = self.timed(lambda: old_loop(ecs))
+        wrong = sum(1 for _, _, count in rows if count != self.services)
+        print(f"{'Old loop (counts only)':<28} {seconds:>8.2f}s {ecs.calls:>6} calls  {wrong} clusters miscounted")
+
+        ecs = FakeECS(*self.args)
+        loader = EcsTopologyLoader(ecs, max_workers=self.workers)
+        rows, seconds = self.timed(loader.summary)
+        wrong = sum(1 for row in rows if row['services'] != self.services)
+        print(f"{'Loader, full tree (cold)':<28} {seconds:>8.2f}s {ecs.calls:>6} calls  {wrong} clusters miscounted, "
+              f"{sum(r['tasks'] for r in rows)} tasks")
+
+        calls = ecs.calls
+        _, seconds = self.timed(loader.summary)
+        print(f"{'Loader, cached':<28} {seconds:>8.2f}s {ecs.calls - calls:>6} calls")
+
+        loader.invalidate('cluster-3')
+        calls = ecs.calls
+        _, seconds = self.timed(loader.summary)
+        print(f"{'Loader, one cluster stale':<28} {seconds:>8.2f}s {ecs.calls - calls:>6} calls")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ECS topology benchmark")
+    parser.add_argument('--clusters', type=int, default=80)
+    parser.add_argument('--services', type=int, default=35)
+    parser.add_argument('--tasks-per-service', type=int, default=3)
+    parser.add_argument('--latency-ms', type=float, default=30.0)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+    EcsTopologyBenchmark(args.clusters, args.services, args.tasks_per_service, args.latency_ms, args.workers).run()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Rate Limiter Benchmark
+
+Measures limiter decisions/s at 1, 8 and 32 threads for the sliding window
+limiter and for the previous single-lock implementation, the cost of a
+decision as the per-key request count grows compared with the timestamp
+lists auth.rate_limit and the WAF used to keep, plus memory held after a
+scraping storm of unique client IPs.
+"""
+
+import os
+import sys
+import time
+import threading
+from collections import defaultdict
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../middleware'))
+from rate_limiter import RateLimiter
+
+class GlobalLockLimiter:
+    """The previous implementation: one lock, unbounded per-key dicts"""
+    
+    def __init__(self, rate=100, per=60):
+        self.rate = rate
+        self.per = per
+        self.allowance = defaultdict(lambda: rate)
+        self.last_check = defaultdict(lambda: time.time())
+        self.lock = threading.Lock()
+    
+    def is_allowed(self, key):
+        with self.lock:
+            current = time.time()
+            time_passed = current - self.last_check[key]
+            self.last_check[key] = current
+            self.allowance[key] += time_passed * (self.rate / self.per)
+            if self.allowance[key] > self.rate:
+                self.allowance[key] = self.rate
+            if self.allowance[key] < 1.0:
+                return False
+            self.allowance[key] -= 1.0
+            return True
+
+class TimestampListLimiter:
+    """The previous auth.rate_limit / WAF.check_rate_limit: a list of timestamps per key"""
+    
+    def __init__(self, rate=100, per=60):
+        self.rate = rate
+        self.per = per
+        self.requests = {}
+    
+    def is_allowed(self, key):
+        now = time.time()
+        self.requests[key] = [t for t in self.requests.get(key, []) if now - t < self.per]
+        if len(self.requests[key]) >= self.rate:
+            return False
+        self.requests[key].append(now)
+        return True
+
+class RateLimiterBenchmark:
+    def __init__(self, decisions_per_thread=50000, distinct_keys=10000):
+        self.decisions_per_thread = decisions_per_thread
+        self.keys = [f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" for i in range(distinct_keys)]
+    
+    def run_threads(self, limiter, threads):
+        """Return decisions/s with `threads` threads hammering the limiter"""
+        barrier = threading.Barrier(threads + 1)
+        keys = self.keys
+        
+        def worker(offset):
+            barrier.wait()
+            is_allowed = limiter.is_allowed
+            for i in range(self.decisions_per_thread):
+                is_allowed(keys[(i * 7 + offset) % len(keys)])
+        
+        workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        for w in workers:
+            w.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for w in workers:
+            w.join()
+        return threads * self.decisions_per_thread / (time.perf_counter() - start)
+    
+    def hot_key(self, limiter, decisions=20000):
+        """Return decisions/s for a single client hammering one key"""
+        is_allowed = limiter.is_allowed
+        start = time.perf_counter()
+        for _ in range(decisions):
+            is_allowed('hot-client')
+        return decisions / (time.perf_counter() - start)
+    
+    def storm_memory(self, unique_ips=200000):
+        """Tracked keys after a storm of unique IPs followed by an idle period"""
+        legacy = GlobalLockLimiter(rate=100, per=1)
+        sharded = RateLimiter(rate=100, per=1, max_keys=50000)
+        for i in range(unique_ips):
+            ip = f"storm-{i}"
+            legacy.is_allowed(ip)
+            sharded.is_allowed(ip)
+        time.sleep(2.1)
+        sharded.local.sweep()
+        return len(legacy.allowance), sharded.local.active_keys()
+    
+    def run(self):
+        print("\n=== Rate Limiter Benchmark ===")
+        print(f"{'Threads':>8} {'Global lock':>14} {'Sliding window':>16}")
+        for threads in (1, 8, 32):
+            legacy = self.run_threads(GlobalLockLimiter(rate=1000, per=1), threads)
+            sharded = self.run_threads(RateLimiter(rate=1000, per=1), threads)
+            print(f"{threads:>8} {legacy:>12,.0f}/s {sharded:>14,.0f}/s")
+        
+        print(f"\n{'Limit/min':>10} {'Timestamp list':>16} {'Sliding window':>16}")
+        for rate in (100, 1000, 10000):
+            listed = self.hot_key(TimestampListLimiter(rate=rate, per=60))
+            windowed = self.hot_key(RateLimiter(rate=rate, per=60))
+            print(f"{rate:>10,} {listed:>14,.0f}/s {windowed:>14,.0f}/s")
+        
+        legacy_keys, sharded_keys = self.storm_memory()
+        print(f"\nKeys held after 200k-IP storm: global lock {legacy_keys:,}, sliding window {sharded_keys:,}")
+
+if __name__ == "__main__":
+    RateLimiterBenchmark().run()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""S3 Transfer Manager Benchmark
+
+Syncs a generated directory tree to an in-process S3 stand-in that charges
+a fixed latency per request and a per-connection bandwidth cap, so the
+numbers reflect request overlap rather than local CPU. Compares one
+request per file in sequence (what the managers' upload_file loops did)
+with TransferManager.upload_directory, then re-syncs unchanged and resumes
+an interrupted multi-part upload.
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../utils'))
+from s3_transfer import MB, TransferManager
+
+class Body:
+    def __init__(self, data):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+class Paginator:
+    def __init__(self, client, operation):
+        self.client = client
+        self.operation = operation
+
+    def paginate(self, **kwargs):
+        yield getattr(self.client, self.operation)(**kwargs)
+
+class StubS3:
+    """Objects in a dict; every request costs latency + size / bandwidth"""
+
+    def __init__(self, latency, bandwidth):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.objects = {}
+        self.uploads = {}
+        self.requests = 0
+        self.fail_part = None
+        self._lock = threading.Lock()
+
+    def _wait(self, size=0):
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency + size / self.bandwidth)
+
+    def get_paginator(self, operation):
+        return Paginator(self, operation)
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        data = Body.read() if hasattr(Body, 'read') else Body
+        self._wait(len(data))
+        self.objects[Key] = (data, f'"{hashlib.md5(data).hexdigest()}"')
+        return {'ETag': self.objects[Key][1]}
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self._wait()
+        upload_id = f'upload-{len(self.uploads)}'
+        self.uploads[upload_id] = {}
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        if PartNumber == self.fail_part:
+            raise ConnectionError('connection reset')
+        self._wait(len(Body))
+        etag = f'"{hashlib.md5(Body).hexdigest()}"'
+        self.uploads[UploadId][PartNumber] = (Body, etag)
+        return {'ETag': etag}
+
+    def list_parts(self, Bucket, Key, UploadId):
+        self._wait()
+        return {'Parts': [{'PartNumber': n, 'ETag': etag} for n, (_, etag) in self.uploads[UploadId].items()]}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self._wait()
+        parts = self.uploads.pop(UploadId)
+        numbers = [p['PartNumber'] for p in MultipartUpload['Parts']]
+        data = b''.join(parts[n][0] for n in numbers)
+        digest = hashlib.md5(b''.join(bytes.fromhex(parts[n][1].strip('"')) for n in numbers)).hexdigest()
+        self.objects[Key] = (data, f'"{digest}-{len(numbers)}"')
+
+    def list_objects_v2(self, Bucket, Prefix=''):
+        self._wait()
+        return {'Contents': [{'Key': key, 'Size': len(data), 'ETag': etag}
+                             for key, (data, etag) in self.objects.items() if key.startswith(Prefix)]}
+
+class TransferBenchmark:
+    def __init__(self, files=200, file_kb=256, large_mb=64, latency_ms=20, bandwidth_mbps=100):
+        self.files = files
+        self.file_kb = file_kb
+        self.large_mb = large_mb
+        self.latency = latency_ms / 1000
+        self.bandwidth = bandwidth_mbps * MB
+
+    def generate(self, root):
+        rng = random.Random(7)
+        for n in range(self.files):
+            directory = os.path.join(root, f'dir{n % 8}')
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, f'file{n}.bin'), 'wb') as f:
+                f.write(rng.randbytes(self.file_kb * 1024))
+        with open(os.path.join(root, 'large.bin'), 'wb') as f:
+            f.write(rng.randbytes(self.large_mb * MB))
+
+    def sequential(self, root, client):
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                with open(path, 'rb') as f:
+                    client.put_object(Bucket='bench', Key=os.path.relpath(path, root), Body=f.read())
+
+    def run(self):
+        print("\n=== S3 Transfer Manager Benchmark ===")
+        total = self.files * self.file_kb * 1024 + self.large_mb * MB
+        print(f"{self.files} x {self.file_kb} KB + 1 x {self.large_mb} MB, {self.latency * 1000:.0f} ms per request, "
+              f"{self.bandwidth / MB:.0f} MB/s per connection")
+        work = tempfile.mkdtemp()
+        try:
+            source = os.path.join(work, 'tree')
+            self.generate(source)
+            print(f"{'Scenario':<30} {'Time':>8} {'MB/s':>8} {'Requests':>9} {'Peak parts':>11}")
+
+            client = StubS3(self.latency, self.bandwidth)
+            start = time.perf_counter()
+            self.sequential(source, client)
+            seconds = time.perf_counter() - start
+            print(f"{'One request per file':<30} {seconds:>7.2f}s {total / MB / seconds:>8.1f} "
+                  f"{client.requests:>9} {1:>11}")
+
+            client = StubS3(self.latency, self.bandwidth)
+            for label in ('TransferManager sync', 'Re-sync, nothing changed'):
+                manager = TransferManager(client, checkpoint_dir=os.path.join(work, 'checkpoints'))
+                requests = client.requests
+                start = time.perf_counter()
+                summary = manager.upload_directory(source, 'bench')
+                seconds = time.perf_counter() - start
+                stats = summary['stats']
+                print(f"{label:<30} {seconds:>7.2f}s {stats['bytes'] / MB / seconds:>8.1f} "
+                      f"{client.requests - requests:>9} {stats['peak_parts_in_flight']:>11}")
+                manager.close()
+
+            client = StubS3(self.latency, self.bandwidth)
+            client.fail_part = 3
+            manager = TransferManager(client, checkpoint_dir=os.path.join(work, 'checkpoints'))
+            try:
+                manager.upload_file(os.path.join(source, 'large.bin'), 'bench', 'large.bin')
+            except ConnectionError:
+                pass
+            client.fail_part = None
+            requests = client.requests
+            start = time.perf_counter()
+            result = manager.upload_file(os.path.join(source, 'large.bin'), 'bench', 'large.bin')
+            seconds = time.perf_counter() - start
+            print(f"{'Resume after failed part':<30} {seconds:>7.2f}s {'':>8} {client.requests - requests:>9} "
+                  f"{'':>11}  ({result['resumed_parts']} of {result['parts']} parts reused)")
+            manager.close()
+        finally:
+            shutil.rmtree(work)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="S3 transfer manager benchmark")
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--file-kb', type=int, default=256)
+    parser.add_argument('--large-mb', type=int, default=64)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--bandwidth-mbps', type=float, default=100)
+    args = parser.parse_args()
+    TransferBenchmark(args.files, args.file_kb, args.large_mb, args.latency_ms, args.bandwidth_mbps).run()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""WAF Rule Engine Benchmark
+
+Measures inspected requests/s for the compiled rule engine and for the
+previous sequential scan of "method path headers body", as the number of
+rules and the request body size grow.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../..'))
+from implementation.security.waf.waf import WAFRule
+from implementation.security.waf.rule_engine import RuleEngine
+
+KEYWORDS = ['select', 'union', 'insert', 'update', 'delete', 'exec', 'script', 'iframe',
+            'onload', 'onerror', 'eval', 'passwd', 'shadow', 'cmd', 'powershell', 'wget']
+
+def make_rules(count, seed=9):
+    """Synthetic CRS-style rules: keyword pairs, function calls and a few literal-free patterns"""
+    rng = random.Random(seed)
+    rules = []
+    for i in range(count):
+        kind = i % 10
+        word = f"{rng.choice(KEYWORDS)}{i}"
+        if kind < 6:
+            pattern = rf"\b{word}\b.{{0,40}}\b{rng.choice(KEYWORDS)}\b"
+        elif kind < 9:
+            pattern = rf"(?:{word}|{rng.choice(KEYWORDS)}_{i})\s*\("
+        else:
+            pattern = rf"%[0-9a-f]{{2}}[\x00-\x08]{{{2 + i % 5}}}"
+        targets = ('query', 'body') if kind < 8 else ('path', 'query', 'headers', 'body')
+        rules.append(WAFRule(f"BENCH_{i}", pattern, "block", "benchmark rule", targets=targets))
+    return rules
+
+def make_request(body_size, seed=3):
+    rng = random.Random(seed)
+    words = ['user', 'name', 'order', 'items', 'price', 'total', 'comment', 'shipping', 'value']
+    body = []
+    size = 0
+    while size < body_size:
+        word = f'"{rng.choice(words)}": "{rng.choice(words)} {rng.randrange(10000)}", '
+        body.append(word)
+        size += len(word)
+    headers = {'Host': 'api.example.com', 'User-Agent': 'Mozilla/5.0', 'Accept': 'application/json'}
+    return '/api/v1/orders?page=2&sort=desc', headers, ''.join(body)[:body_size]
+
+def sequential(rules, method, path, headers, body):
+    """The previous WAF.inspect_request scan"""
+    request_data = f"{method} {path} {str(headers)} {body}"
+    for rule in rules:
+        if rule.match(request_data):
+            return rule.rule_id
+    return None
+
+def compiled(engine, method, path, headers, body):
+    for rule, target in engine.matches(path, headers, body):
+        return rule.rule_id
+    return None
+
+class WAFBenchmark:
+    def __init__(self, duration=0.5):
+        self.duration = duration
+    
+    def rate(self, func, *args):
+        """Requests/s of func(*args) over about self.duration seconds"""
+        count = 0
+        start = time.perf_counter()
+        while True:
+            func(*args)
+            count += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= self.duration:
+                return count / elapsed
+    
+    def compare(self, rule_count, body_size):
+        rules = make_rules(rule_count)
+        engine = RuleEngine(rules)
+        start = time.perf_counter()
+        engine.compile()
+        compile_time = time.perf_counter() - start
+        path, headers, body = make_request(body_size)
+        legacy = self.rate(sequential, rules, 'POST', path, headers, body)
+        fast = self.rate(compiled, engine, 'POST', path, headers, body)
+        return legacy, fast, compile_time
+    
+    def run(self, rule_counts, body_sizes):
+        print("\n=== WAF Rule Engine Benchmark ===")
+        print(f"{'Rules':>7} {'Body':>9} {'Sequential':>14} {'Compiled':>14} {'Speedup':>8} {'Compile':>8}")
+        cases = [(count, body_sizes[0]) for count in rule_counts]
+        cases += [(rule_counts[-1], size) for size in body_sizes[1:]]
+        for rule_count, body_size in cases:
+            legacy, fast, compile_time = self.compare(rule_count, body_size)
+            print(f"{rule_count:>7,} {body_size:>8,}B {legacy:>12,.1f}/s {fast:>12,.1f}/s "
+                  f"{fast / legacy:>7.1f}x {compile_time:>7.2f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="WAF rule engine benchmark")
+    parser.add_argument('--rules', type=int, nargs='+', default=[10, 100, 1000, 3000])
+    parser.add_argument('--body-sizes', type=int, nargs='+', default=[1024, 65536, 1048576])
+    parser.add_argument('--duration', type=float, default=0.5)
+    args = parser.parse_args()
+    WAFBenchmark(args.duration).run(args.rules, args.body_sizes)
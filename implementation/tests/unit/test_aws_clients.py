@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Unit tests for the shared AWS client registry"""
+
+import os
+import sys
+import threading
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../utils'))
+from aws_clients import AWSClientRegistry
+
+class TestAWSClientRegistry(unittest.TestCase):
+    
+    def setUp(self):
+        self.registry = AWSClientRegistry(max_pool_connections=20)
+    
+    def test_clients_are_shared(self):
+        first = self.registry.client('ec2', region_name='us-east-1')
+        self.assertIs(self.registry.client('ec2', region_name='us-east-1'), first)
+        self.assertIsNot(self.registry.client('ec2', region_name='eu-west-1'), first)
+        self.assertEqual(self.registry.get_stats()['misses'], 2)
+        self.assertEqual(first.meta.config.max_pool_connections, 20)
+    
+    def test_retry_settings_are_opt_in(self):
+        self.assertIsNone(self.registry.config.retries)
+        registry = AWSClientRegistry(retry_mode='adaptive', max_attempts=10)
+        self.assertEqual(registry.config.retries, {'mode': 'adaptive', 'max_attempts': 10})
+    
+    def test_credentials_are_part_of_the_key(self):
+        a = self.registry.client('s3', region_name='us-east-1', aws_access_key_id='AKIA1', aws_secret_access_key='x')
+        b = self.registry.client('s3', region_name='us-east-1', aws_access_key_id='AKIA1', aws_secret_access_key='y')
+        self.assertIsNot(a, b)
+        self.assertEqual(self.registry.get_stats()['sessions'], 2)
+    
+    def test_entries_expire_after_ttl(self):
+        registry = AWSClientRegistry(ttl=0)
+        self.assertIsNot(registry.client('sqs', region_name='us-east-1'),
+                         registry.client('sqs', region_name='us-east-1'))
+    
+    def test_concurrent_callers_get_one_client(self):
+        clients = []
+        barrier = threading.Barrier(16)
+        
+        def worker():
+            barrier.wait()
+            clients.append(self.registry.client('dynamodb', region_name='us-east-1'))
+        
+        threads = [threading.Thread(target=worker) for _ in range(16)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len({id(c) for c in clients}), 1)
+    
+    def test_resources_are_per_thread(self):
+        main = self.registry.resource('s3', region_name='us-east-1')
+        self.assertIs(self.registry.resource('s3', region_name='us-east-1'), main)
+        other = []
+        thread = threading.Thread(target=lambda: other.append(self.registry.resource('s3', region_name='us-east-1')))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], main)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""Unit tests for the deduplicating chunked backup engine"""
+
+import io
+import os
+import sys
+import random
+import shutil
+import tempfile
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../services'))
+from chunked_backup import ChunkIndex, ChunkedBackupEngine, ContentChunker, LocalObjectStore, S3ObjectStore
+
+try:
+    import boto3
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+
+def random_bytes(size, seed):
+    return random.Random(seed).randbytes(size)
+
+def small_chunker():
+    return ContentChunker(min_size=2 * 1024, avg_size=8 * 1024, max_size=32 * 1024, read_size=64 * 1024)
+
+class TestContentChunker(unittest.TestCase):
+
+    def test_chunks_reassemble_within_size_bounds(self):
+        chunker = small_chunker()
+        data = random_bytes(1024 * 1024, 1)
+        chunks = list(chunker.chunks(io.BytesIO(data)))
+        self.assertEqual(b''.join(chunks), data)
+        for chunk in chunks[:-1]:
+            self.assertGreaterEqual(len(chunk), chunker.min_size)
+            self.assertLessEqual(len(chunk), chunker.max_size)
+        average = len(data) / len(chunks)
+        self.assertTrue(chunker.avg_size / 2 < average < chunker.avg_size * 2)
+
+    def test_boundaries_do_not_depend_on_read_size(self):
+        data = random_bytes(512 * 1024, 2)
+        whole = ContentChunker(2 * 1024, 8 * 1024, 32 * 1024, read_size=len(data))
+        streamed = small_chunker()
+        self.assertEqual([len(c) for c in whole.chunks(io.BytesIO(data))],
+                         [len(c) for c in streamed.chunks(io.BytesIO(data))])
+
+    def test_insert_only_changes_nearby_chunks(self):
+        chunker = small_chunker()
+        data = random_bytes(1024 * 1024, 3)
+        edited = data[:300000] + b'inserted bytes' + data[300000:]
+        before = set(chunker.chunks(io.BytesIO(data)))
+        after = list(chunker.chunks(io.BytesIO(edited)))
+        changed = [chunk for chunk in after if chunk not in before]
+        self.assertLessEqual(len(changed), 3)
+
+    def test_empty_and_tiny_inputs(self):
+        chunker = small_chunker()
+        self.assertEqual(list(chunker.chunks(io.BytesIO(b''))), [])
+        self.assertEqual(list(chunker.chunks(io.BytesIO(b'abc'))), [b'abc'])
+
+    def test_rejects_inconsistent_sizes(self):
+        with self.assertRaises(ValueError):
+            ContentChunker(min_size=8192, avg_size=4096, max_size=16384)
+
+class TestChunkedBackupEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmp, 'data')
+        os.makedirs(os.path.join(self.source, 'nested'))
+        with open(os.path.join(self.source, 'a.bin'), 'wb') as f:
+            f.write(random_bytes(300 * 1024, 4))
+        with open(os.path.join(self.source, 'nested', 'b.txt'), 'wb') as f:
+            f.write(b'hello world\n' * 20000)
+        with open(os.path.join(self.source, 'copy.bin'), 'wb') as f:
+            f.write(random_bytes(300 * 1024, 4))
+        open(os.path.join(self.source, 'empty'), 'wb').close()
+        os.symlink('a.bin', os.path.join(self.source, 'link'))
+        self.store = LocalObjectStore(os.path.join(self.tmp, 'store'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def engine(self, index=None):
+        return ChunkedBackupEngine(self.store, index=index, chunker=small_chunker(), compression_workers=1,
+                                   part_size=0, pack_size=128 * 1024)
+
+    def assertSameTree(self, left, right):
+        for dirpath, dirnames, filenames in os.walk(left):
+            relative = os.path.relpath(dirpath, left)
+            for name in filenames:
+                a, b = os.path.join(dirpath, name), os.path.join(right, relative, name)
+                self.assertEqual(os.path.islink(a), os.path.islink(b))
+                with open(a, 'rb') as fa, open(b, 'rb') as fb:
+                    self.assertEqual(fa.read(), fb.read(), name)
+                self.assertEqual(os.lstat(a).st_mtime_ns, os.lstat(b).st_mtime_ns)
+
+    def test_backup_and_restore_round_trip(self):
+        engine = self.engine()
+        stats = engine.backup(self.source, 'first')
+        self.assertEqual(stats['files'], 4)
+        self.assertGreater(stats['packs'], 1)
+        # copy.bin duplicates a.bin, and b.txt compresses well
+        self.assertLess(stats['bytes_new'], stats['bytes_read'])
+        self.assertLess(stats['bytes_uploaded'], stats['bytes_new'])
+
+        destination = os.path.join(self.tmp, 'restored')
+        engine.restore('first', destination)
+        self.assertSameTree(self.source, os.path.join(destination, 'data'))
+        self.assertEqual(os.readlink(os.path.join(destination, 'data', 'link')), 'a.bin')
+        self.assertEqual(engine.list_backups(), ['first'])
+
+    def test_second_backup_stores_only_changed_chunks(self):
+        engine = self.engine()
+        engine.backup(self.source, 'first')
+        with open(os.path.join(self.source, 'a.bin'), 'r+b') as f:
+            f.seek(100000)
+            f.write(b'changed')
+        stats = engine.backup(self.source, 'second')
+        self.assertEqual(stats['chunks_new'], 1)
+
+        incremental = engine.backup(self.source, 'third', parent='second')
+        self.assertEqual(incremental['files_unchanged'], 4)
+        self.assertEqual(incremental['bytes_read'], 0)
+
+        destination = os.path.join(self.tmp, 'restored')
+        engine.restore('third', destination)
+        self.assertSameTree(self.source, os.path.join(destination, 'data'))
+
+    def test_new_engine_syncs_index_from_store(self):
+        self.engine().backup(self.source, 'first')
+        index = ChunkIndex()
+        engine = self.engine(index)
+        self.assertGreater(len(index), 0)
+        self.assertEqual(engine.backup(self.source, 'second')['chunks_new'], 0)
+
+    def test_corrupt_pack_fails_restore(self):
+        engine = self.engine()
+        engine.backup(self.source, 'first')
+        pack = next(key for key in self.store.list_keys('packs/'))
+        path = os.path.join(self.store.root, 'packs', pack.split('/')[-1])
+        with open(path, 'r+b') as f:
+            f.write(b'\x00' * 64)
+        with self.assertRaises(Exception):
+            engine.restore('first', os.path.join(self.tmp, 'restored'))
+
+    def test_process_pool_compression(self):
+        engine = ChunkedBackupEngine(self.store, chunker=small_chunker(), compression_workers=2)
+        engine.backup(self.source, 'pooled')
+        destination = os.path.join(self.tmp, 'restored')
+        engine.restore('pooled', destination)
+        self.assertSameTree(self.source, os.path.join(destination, 'data'))
+
+@unittest.skipIf(mock_aws is None, "moto is not installed")
+class TestS3ObjectStore(unittest.TestCase):
+
+    def test_round_trip_through_multipart_upload(self):
+        with mock_aws():
+            client = boto3.client('s3', region_name='us-east-1')
+            client.create_bucket(Bucket='backups')
+            tmp = tempfile.mkdtemp()
+            try:
+                source = os.path.join(tmp, 'big.bin')
+                with open(source, 'wb') as f:
+                    f.write(random_bytes(12 * 1024 * 1024, 5))
+                engine = ChunkedBackupEngine(S3ObjectStore(client, 'backups', 'chunks/'), compression_workers=1)
+                stats = engine.backup(source, 'big')
+                self.assertEqual(stats['packs'], 1)
+                keys = [obj['Key'] for obj in client.list_objects_v2(Bucket='backups')['Contents']]
+                self.assertTrue(all(key.startswith('chunks/') for key in keys))
+
+                engine.restore('big', os.path.join(tmp, 'out'))
+                with open(source, 'rb') as a, open(os.path.join(tmp, 'out', 'big.bin'), 'rb') as b:
+                    self.assertEqual(a.read(), b.read())
+            finally:
+                shutil.rmtree(tmp)
+
+if __name__ == '__main__':
+    unittest.main()
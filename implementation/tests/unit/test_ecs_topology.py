@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Unit tests for the batched ECS topology loader"""
+
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../utils'))
+from ecs_topology import EcsTopologyLoader
+
+try:
+    import boto3
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class FakePaginator:
+    def __init__(self, client, operation):
+        self.client = client
+        self.operation = operation
+
+    def paginate(self, PaginationConfig=None, cluster=None):
+        cluster = cluster and cluster.split('/')[-1]
+        if self.operation == 'list_clusters':
+            arns, key = [f'arn:aws:ecs:us-east-1:1:cluster/{c}' for c in self.client.clusters], 'clusterArns'
+        elif self.operation == 'list_services':
+            arns, key = [f'arn:aws:ecs:us-east-1:1:service/{cluster}/{s}' for s in self.client.clusters[cluster]], 'serviceArns'
+        else:
+            arns, key = [t['taskArn'] for t in self.client.tasks[cluster]], 'taskArns'
+        size = PaginationConfig['PageSize']
+        for start in range(0, max(len(arns), 1), size):
+            yield {key: arns[start:start + size]}
+
+class FakeECS:
+    """Clusters of services; every service runs two tasks and each cluster one standalone task"""
+
+    def __init__(self, clusters, services):
+        self.clusters = {f'cluster-{c}': [f'svc-{s}' for s in range(services)] for c in range(clusters)}
+        self.tasks = {name: [{'taskArn': f'arn:aws:ecs:us-east-1:1:task/{name}/{svc}-{n}', 'group': f'service:{svc}',
+                              'lastStatus': 'RUNNING'} for svc in svcs for n in range(2)]
+                      + [{'taskArn': f'arn:aws:ecs:us-east-1:1:task/{name}/batch', 'group': 'family:batch',
+                          'lastStatus': 'PENDING'}]
+                      for name, svcs in self.clusters.items()}
+        self.batches = {'describe_clusters': [], 'describe_services': [], 'describe_tasks': []}
+
+    def get_paginator(self, operation):
+        return FakePaginator(self, operation)
+
+    def describe_clusters(self, clusters):
+        self.batches['describe_clusters'].append(len(clusters))
+        return {'clusters': [{'clusterName': c, 'clusterArn': f'arn:aws:ecs:us-east-1:1:cluster/{c}', 'status': 'ACTIVE'}
+                             for c in clusters if c in self.clusters],
+                'failures': [{'arn': c, 'reason': 'MISSING'} for c in clusters if c not in self.clusters]}
+
+    def describe_services(self, cluster, services):
+        self.batches['describe_services'].append(len(services))
+        return {'services': [{'serviceName': s.split('/')[-1], 'status': 'ACTIVE'} for s in services]}
+
+    def describe_tasks(self, cluster, tasks):
+        self.batches['describe_tasks'].append(len(tasks))
+        by_arn = {t['taskArn']: t for t in self.tasks[cluster.split('/')[-1]]}
+        return {'tasks': [by_arn[t] for t in tasks]}
+
+class TestEcsTopologyLoader(unittest.TestCase):
+
+    def test_batches_every_describe_call(self):
+        ecs = FakeECS(clusters=150, services=25)
+        tree = EcsTopologyLoader(ecs, max_workers=4).load()
+
+        self.assertEqual(len(tree), 150)
+        self.assertEqual(ecs.batches['describe_clusters'], [100, 50])
+        self.assertEqual(max(ecs.batches['describe_services']), 10)
+        self.assertEqual(len(ecs.batches['describe_services']), 150 * 3)
+        self.assertEqual(len(ecs.batches['describe_tasks']), 150)
+
+        node = tree['cluster-7']
+        self.assertEqual(len(node['services']), 25)
+        self.assertEqual(len(node['services']['svc-24']['tasks']), 2)
+        self.assertEqual([t['group'] for t in node['standalone_tasks']], ['family:batch'])
+
+    def test_summary_counts_past_first_page(self):
+        loader = EcsTopologyLoader(FakeECS(clusters=2, services=130))
+        row = loader.summary()[0]
+        self.assertEqual((row['services'], row['active_services']), (130, 130))
+        self.assertEqual((row['running_tasks'], row['pending_tasks'], row['tasks']), (260, 1, 261))
+
+    def test_cache_and_invalidation(self):
+        ecs, clock = FakeECS(clusters=3, services=4), Clock()
+        loader = EcsTopologyLoader(ecs, ttl=60, clock=clock)
+        loader.load()
+        calls = sum(loader.calls.values())
+
+        clock.now = 30
+        self.assertEqual(set(loader.load()), {'cluster-0', 'cluster-1', 'cluster-2'})
+        self.assertEqual(sum(loader.calls.values()), calls)
+
+        ecs.clusters['cluster-1'].append('svc-new')
+        loader.invalidate('arn:aws:ecs:us-east-1:1:cluster/cluster-1')
+        tree = loader.load()
+        self.assertIn('svc-new', tree['cluster-1']['services'])
+        self.assertEqual(ecs.batches['describe_clusters'][-1], 1)
+        self.assertEqual(loader.calls['list_clusters'], 1)
+
+        del ecs.clusters['cluster-2']
+        clock.now = 120
+        self.assertEqual(set(loader.load()), {'cluster-0', 'cluster-1'})
+        self.assertEqual(loader.calls['list_clusters'], 2)
+
+    def test_named_clusters_only(self):
+        ecs = FakeECS(clusters=5, services=1)
+        loader = EcsTopologyLoader(ecs)
+        self.assertEqual(set(loader.load(['cluster-3', 'missing'])), {'cluster-3'})
+        self.assertEqual(loader.calls['list_clusters'], 0)
+
+@unittest.skipIf(mock_aws is None, 'moto is not installed')
+class TestEcsTopologyMoto(unittest.TestCase):
+
+    def test_services_and_tasks_from_moto(self):
+        with mock_aws():
+            ecs = boto3.client('ecs', region_name='us-east-1')
+            ecs.create_cluster(clusterName='web')
+            ecs.create_cluster(clusterName='jobs')
+            task_definition = ecs.register_task_definition(
+                family='web', containerDefinitions=[{'name': 'web', 'image': 'nginx', 'memory': 128}]
+            )['taskDefinition']['taskDefinitionArn']
+            for n in range(12):
+                ecs.create_service(cluster='web', serviceName=f'site-{n}', taskDefinition=task_definition,
+                                   desiredCount=1)
+            ecs.run_task(cluster='web', taskDefinition=task_definition, count=2, group='service:site-3',
+                         launchType='FARGATE')
+            ecs.run_task(cluster='jobs', taskDefinition=task_definition, count=1, launchType='FARGATE')
+
+            tree = EcsTopologyLoader(ecs).load()
+            self.assertEqual(len(tree['web']['services']), 12)
+            self.assertEqual(len(tree['web']['services']['site-3']['tasks']), 2)
+            self.assertEqual(len(tree['jobs']['standalone_tasks']), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Unit tests for the multi-region inventory engine"""
+
+import os
+import sys
+import threading
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../services'))
+from inventory_engine import InventoryEngine, InventoryTask, aws_instance_pages
+
+try:
+    import boto3
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+
+def fake_pages(location, pages, page_size, fail_after=None):
+    def fetch():
+        for page in range(pages):
+            if fail_after is not None and page >= fail_after:
+                raise ConnectionError('throttled')
+            yield [{'id': f'{location}-{page}-{i}', 'provider': 'fake', 'location': location}
+                   for i in range(page_size)]
+    return InventoryTask('fake', location, fetch)
+
+class TestInventoryEngine(unittest.TestCase):
+    
+    def test_snapshot_consolidates_all_locations(self):
+        tasks = [fake_pages(f'region-{n}', pages=5, page_size=20) for n in range(8)]
+        snapshot = InventoryEngine(max_workers=3, queue_pages=2).snapshot(tasks)
+        self.assertEqual(snapshot['count'], 800)
+        self.assertEqual(len({i['id'] for i in snapshot['instances']}), 800)
+        self.assertEqual(snapshot['by_location']['fake/region-3'], 100)
+        self.assertEqual(snapshot['errors'], [])
+    
+    def test_failed_location_is_reported(self):
+        tasks = [fake_pages('ok', pages=2, page_size=10), fake_pages('bad', pages=3, page_size=10, fail_after=1)]
+        snapshot = InventoryEngine().snapshot(tasks)
+        self.assertEqual(snapshot['count'], 30)
+        self.assertEqual([(e['location'], e['error']) for e in snapshot['errors']], [('bad', 'throttled')])
+    
+    def test_stream_can_stop_early(self):
+        tasks = [fake_pages(f'region-{n}', pages=1000, page_size=10) for n in range(4)]
+        stream = InventoryEngine(max_workers=4, queue_pages=1).stream(tasks)
+        first = [next(stream) for _ in range(25)]
+        stream.close()
+        self.assertEqual(len(first), 25)
+        for thread in threading.enumerate():
+            if thread.name.startswith('inventory'):
+                thread.join(timeout=5)
+                self.assertFalse(thread.is_alive())
+
+@unittest.skipIf(mock_aws is None, 'moto is not installed')
+class TestAwsInstancePages(unittest.TestCase):
+    
+    def test_pages_through_every_region(self):
+        with mock_aws():
+            tasks = []
+            for region, count in (('us-east-1', 23), ('eu-west-1', 7)):
+                client = boto3.client('ec2', region_name=region)
+                image = client.describe_images()['Images'][0]['ImageId']
+                client.run_instances(ImageId=image, InstanceType='t3.micro', MinCount=count, MaxCount=count,
+                                     TagSpecifications=[{'ResourceType': 'instance',
+                                                         'Tags': [{'Key': 'Name', 'Value': 'web'}]}])
+                tasks.append(InventoryTask('aws', region,
+                                           lambda c=client, r=region: aws_instance_pages(c, r, page_size=5)))
+            snapshot = InventoryEngine().snapshot(tasks)
+        self.assertEqual(snapshot['by_location'], {'aws/us-east-1': 23, 'aws/eu-west-1': 7})
+        self.assertEqual({i['name'] for i in snapshot['instances']}, {'web'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Unit tests for the WAF IP blocklist"""
+
+import os
+import sys
+import unittest
+import threading
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../security/waf'))
+from ip_blocklist import IPBlocklist, TimingWheel
+
+class TestTimingWheel(unittest.TestCase):
+    
+    def test_expires_at_deadline(self):
+        wheel = TimingWheel(now=0)
+        wheel.schedule('a', 5)
+        wheel.schedule('b', 100)
+        wheel.schedule('c', 10000)
+        self.assertEqual(wheel.advance(4.9), [])
+        self.assertEqual(wheel.advance(5), ['a'])
+        self.assertEqual(wheel.advance(99), [])
+        self.assertEqual(wheel.advance(100), ['b'])
+        self.assertEqual(wheel.advance(20000), ['c'])
+        self.assertEqual(len(wheel), 0)
+    
+    def test_reschedule_and_cancel(self):
+        wheel = TimingWheel(now=0)
+        wheel.schedule('a', 5)
+        wheel.schedule('a', 50)
+        wheel.schedule('b', 5)
+        self.assertTrue(wheel.cancel('b'))
+        self.assertEqual(wheel.advance(10), [])
+        self.assertEqual(wheel.advance(50), ['a'])
+    
+    def test_long_idle_gap(self):
+        wheel = TimingWheel(now=0)
+        for i in range(1000):
+            wheel.schedule(i, i * 3600)
+        self.assertEqual(len(wheel.advance(10 ** 8)), 1000)
+
+class TestIPBlocklist(unittest.TestCase):
+    
+    def test_cidr_block_covers_range(self):
+        blocklist = IPBlocklist(now=0)
+        blocklist.block('10.1.0.0/16', 100)
+        self.assertEqual(len(blocklist), 1)
+        self.assertTrue(blocklist.is_blocked('10.1.200.7', now=1))
+        self.assertFalse(blocklist.is_blocked('10.2.0.1', now=1))
+    
+    def test_blocks_expire_without_lookups_of_the_same_ip(self):
+        blocklist = IPBlocklist(now=0)
+        for i in range(1000):
+            blocklist.block(f'192.0.2.{i % 256}' if i < 256 else f'198.51.{i // 256}.{i % 256}', 60)
+        self.assertFalse(blocklist.is_blocked('203.0.113.1', now=61))
+        self.assertEqual(len(blocklist), 0)
+    
+    def test_address_blocked_by_any_covering_range(self):
+        blocklist = IPBlocklist(now=0)
+        blocklist.block('10.1.2.3', 10)
+        blocklist.block('10.0.0.0/8', 100)
+        self.assertEqual(blocklist.blocked_by('10.1.2.3', now=50), ('10.0.0.0/8', 100))
+    
+    def test_ipv6_and_non_ip_keys(self):
+        blocklist = IPBlocklist(now=0)
+        blocklist.block('2001:db8::/32', 100)
+        blocklist.block('unknown', 100)
+        self.assertTrue(blocklist.is_blocked('2001:db8::1', now=1))
+        self.assertTrue(blocklist.is_blocked('unknown', now=1))
+        self.assertTrue(blocklist.unblock('unknown'))
+        self.assertFalse(blocklist.is_blocked('unknown', now=1))
+    
+    def test_unblock_range(self):
+        blocklist = IPBlocklist(now=0)
+        blocklist.block('10.1.0.0/16', 100)
+        self.assertTrue(blocklist.unblock('10.1.0.0/16'))
+        self.assertFalse(blocklist.is_blocked('10.1.0.1', now=1))
+        self.assertEqual(len(blocklist.wheel), 0)
+    
+    def test_concurrent_requests(self):
+        blocklist = IPBlocklist(now=0)
+        errors = []
+        
+        def worker(n):
+            try:
+                for i in range(2000):
+                    now = i / 10
+                    # Short blocks expire while other threads look up and unblock
+                    blocklist.block(f'10.{n}.{i % 50}.0/24', now + 1 + i % 7)
+                    blocklist.is_blocked(f'10.{(n + 1) % 8}.{i % 50}.9', now=now)
+                    if i % 3 == 0:
+                        blocklist.unblock(f'10.{n}.{(i - 3) % 50}.0/24')
+                blocklist.block(f'192.0.2.{n}', 10 ** 9)
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+        self.assertEqual(len(blocklist), len(blocklist.wheel))
+        remaining = len(blocklist)
+        self.assertEqual(blocklist.expire(10 ** 6), remaining - 8)
+        self.assertTrue(all(blocklist.is_blocked(f'192.0.2.{n}', now=10 ** 6) for n in range(8)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Unit tests for rate limiter middleware"""
+
+import os
+import sys
+import unittest
+from unittest.mock import Mock
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../middleware'))
+from rate_limiter import RateLimiter, LocalSlidingWindows
+
+class TestLocalSlidingWindows(unittest.TestCase):
+    
+    def test_allows_up_to_rate(self):
+        windows = LocalSlidingWindows(rate=3, per=60, shards=4)
+        results = [windows.consume('client', now=100.0)[0] for _ in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+    
+    def test_previous_window_is_weighted_by_overlap(self):
+        windows = LocalSlidingWindows(rate=10, per=10, shards=4)
+        for _ in range(10):
+            windows.consume('client', now=5.0)
+        # At t=12.5 three quarters of the previous window still overlap: 7.5 counted
+        self.assertEqual(windows.consume('client', now=12.5), (True, 1))
+        self.assertEqual(windows.consume('client', now=12.5), (True, 0))
+        self.assertFalse(windows.consume('client', now=12.5)[0])
+        self.assertTrue(windows.consume('client', now=19.0)[0])
+    
+    def test_denied_requests_are_not_counted(self):
+        windows = LocalSlidingWindows(rate=2, per=10, shards=1)
+        for _ in range(50):
+            windows.consume('client', now=0.0)
+        self.assertTrue(windows.consume('client', now=20.0)[0])
+        self.assertEqual(windows.stats()['allowed'], 3)
+        self.assertEqual(windows.stats()['denied'], 48)
+    
+    def test_idle_keys_are_evicted(self):
+        windows = LocalSlidingWindows(rate=5, per=10, shards=1)
+        for i in range(100):
+            windows.consume(f'ip-{i}', now=0.0)
+        windows.consume('late', now=21.0)
+        self.assertEqual(windows.active_keys(), 1)
+        self.assertEqual(windows.stats()['evictions'], 100)
+    
+    def test_sweep_evicts_all_shards(self):
+        windows = LocalSlidingWindows(rate=5, per=10, shards=8)
+        for i in range(100):
+            windows.consume(f'ip-{i}', now=0.0)
+        self.assertEqual(windows.sweep(now=10.0), 0)
+        self.assertEqual(windows.sweep(now=21.0), 100)
+        self.assertEqual(windows.active_keys(), 0)
+    
+    def test_max_keys_bounds_memory(self):
+        windows = LocalSlidingWindows(rate=5, per=60, shards=2, max_keys=10)
+        for i in range(1000):
+            windows.consume(f'ip-{i}', now=0.0)
+        self.assertLessEqual(windows.active_keys(), 10)
+    
+    def test_remaining(self):
+        windows = LocalSlidingWindows(rate=5, per=60)
+        self.assertEqual(windows.remaining('client'), 5)
+        windows.consume('client', now=0.0)
+        self.assertEqual(windows.remaining('client', now=0.0), 4)
+
+class TestRateLimiter(unittest.TestCase):
+    
+    def test_is_allowed(self):
+        limiter = RateLimiter(rate=2, per=60)
+        self.assertTrue(limiter.is_allowed('client'))
+        self.assertTrue(limiter.is_allowed('client'))
+        self.assertFalse(limiter.is_allowed('client'))
+        self.assertTrue(limiter.is_allowed('other'))
+    
+    def test_get_stats(self):
+        limiter = RateLimiter(rate=1, per=60)
+        limiter.is_allowed('a')
+        limiter.is_allowed('a')
+        limiter.is_allowed('b')
+        stats = limiter.get_stats()
+        self.assertEqual(stats['active_keys'], 2)
+        self.assertEqual(stats['allowed'], 2)
+        self.assertEqual(stats['denied'], 1)
+    
+    def test_redis_backend(self):
+        redis_client = Mock()
+        redis_client.register_script.return_value = Mock(return_value=[1, 41])
+        limiter = RateLimiter(rate=42, per=60, redis_client=redis_client)
+        self.assertEqual(limiter.check('client'), (True, 41))
+    
+    def test_redis_failure_falls_back_to_local(self):
+        redis_client = Mock()
+        redis_client.register_script.return_value = Mock(side_effect=ConnectionError())
+        limiter = RateLimiter(rate=1, per=60, redis_client=redis_client)
+        self.assertTrue(limiter.is_allowed('client'))
+        self.assertFalse(limiter.is_allowed('client'))
+
+if __name__ == '__main__':
+    unittest.main()
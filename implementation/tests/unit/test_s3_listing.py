@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Unit tests for paginated and sharded S3 listing"""
+
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../utils'))
+from s3_listing import ShardedLister, iter_keys, iter_objects, shard_ranges
+
+try:
+    import boto3
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+
+class FailingPaginator:
+    def paginate(self, **kwargs):
+        yield {'Contents': [{'Key': 'a'}]}
+        raise ConnectionError('throttled')
+
+class FailingClient:
+    def get_paginator(self, operation):
+        return FailingPaginator()
+
+@unittest.skipIf(mock_aws is None, "moto is not installed")
+class TestS3Listing(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.mock = mock_aws()
+        cls.mock.start()
+        cls.client = boto3.client('s3', region_name='us-east-1')
+        cls.client.create_bucket(Bucket='listing')
+        cls.keys = sorted([f'backups/{day:02d}/backup-{n:04d}.tar.gz' for day in range(1, 13) for n in range(100)]
+                          + [f'flat/item-{n:05d}' for n in range(1100)] + ['backups/readme.txt'])
+        for key in cls.keys:
+            cls.client.put_object(Bucket='listing', Key=key, Body=b'')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.mock.stop()
+
+    def test_iter_keys_follows_every_page(self):
+        keys = list(iter_keys(self.client, 'listing', 'backups/', page_size=500))
+        self.assertEqual(keys, [k for k in self.keys if k.startswith('backups/')])
+        self.assertEqual(len(keys), 1201)
+
+    def test_key_range(self):
+        keys = list(iter_keys(self.client, 'listing', 'backups/', start_at='backups/03/', end_before='backups/05/'))
+        self.assertEqual(len(keys), 200)
+        self.assertTrue(all('backups/03/' <= k < 'backups/05/' for k in keys))
+        resumed = list(iter_keys(self.client, 'listing', 'flat/', start_after='flat/item-01000'))
+        self.assertEqual(resumed[0], 'flat/item-01001')
+
+    def test_shards_cover_keyspace_exactly_once(self):
+        for prefix in ('backups/', 'flat/', ''):
+            ranges = shard_ranges(self.client, 'listing', prefix, shards=5)
+            self.assertLessEqual(len(ranges), 5)
+            keys = list(ShardedLister(self.client, shards=5, page_size=100).iter_keys('listing', prefix))
+            self.assertEqual(sorted(keys), [k for k in self.keys if k.startswith(prefix)], prefix)
+
+    def test_early_stop_releases_workers(self):
+        lister = ShardedLister(self.client, shards=4, queue_pages=1, page_size=10)
+        stream = lister.iter_objects('listing', 'flat/')
+        self.assertEqual(len([next(stream) for _ in range(25)]), 25)
+        stream.close()
+
+    def test_listing_error_propagates(self):
+        with self.assertRaises(ConnectionError):
+            list(iter_objects(FailingClient(), 'listing'))
+
+if __name__ == '__main__':
+    unittest.main()
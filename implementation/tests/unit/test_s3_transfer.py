@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Unit tests for the S3 transfer manager"""
+
+import os
+import sys
+import random
+import shutil
+import tempfile
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../utils'))
+from s3_transfer import MB, TransferManager, file_etag, part_size_for
+
+try:
+    import boto3
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+
+def write_random(path, size, seed):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(random.Random(seed).randbytes(size))
+
+class FailingClient:
+    """Wraps an S3 client and fails chosen part numbers of upload_part"""
+
+    def __init__(self, client, fail_parts):
+        self.client = client
+        self.fail_parts = set(fail_parts)
+        self.uploaded_parts = []
+
+    def upload_part(self, **kwargs):
+        if kwargs['PartNumber'] in self.fail_parts:
+            raise ConnectionError('connection reset')
+        self.uploaded_parts.append(kwargs['PartNumber'])
+        return self.client.upload_part(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+class TestPartSizing(unittest.TestCase):
+
+    def test_part_size_respects_limits(self):
+        self.assertEqual(part_size_for(100 * MB, 1 * MB), 5 * MB)
+        self.assertEqual(part_size_for(100 * MB, 16 * MB), 16 * MB)
+        huge = 1024 * 1024 * MB
+        self.assertLessEqual(-(-huge // part_size_for(huge, 16 * MB)), 10000)
+
+@unittest.skipIf(mock_aws is None, "moto is not installed")
+class TestTransferManager(unittest.TestCase):
+
+    def setUp(self):
+        self.mock = mock_aws()
+        self.mock.start()
+        self.client = boto3.client('s3', region_name='us-east-1')
+        self.client.create_bucket(Bucket='transfers')
+        self.tmp = tempfile.mkdtemp()
+        self.checkpoints = os.path.join(self.tmp, 'checkpoints')
+
+    def tearDown(self):
+        self.mock.stop()
+        shutil.rmtree(self.tmp)
+
+    def manager(self, client=None, **kwargs):
+        kwargs.setdefault('part_size', 5 * MB)
+        kwargs.setdefault('multipart_threshold', 5 * MB)
+        return TransferManager(client or self.client, checkpoint_dir=self.checkpoints, max_concurrency=4, **kwargs)
+
+    def test_multipart_round_trip_and_etag(self):
+        source = os.path.join(self.tmp, 'src', 'big.bin')
+        write_random(source, 12 * MB + 17, 1)
+        manager = self.manager()
+        result = manager.upload_file(source, 'transfers', 'big.bin')
+        self.assertEqual(result['parts'], 3)
+        remote = self.client.head_object(Bucket='transfers', Key='big.bin')
+        self.assertEqual(remote['ETag'], file_etag(source, 5 * MB))
+
+        target = os.path.join(self.tmp, 'dst', 'big.bin')
+        self.assertEqual(manager.download_file('transfers', 'big.bin', target)['parts'], 3)
+        with open(source, 'rb') as a, open(target, 'rb') as b:
+            self.assertEqual(a.read(), b.read())
+        self.assertFalse(os.path.exists(target + '.part'))
+        stats = manager.get_stats()
+        self.assertEqual(stats['files'], 2)
+        self.assertGreater(stats['peak_parts_in_flight'], 1)
+
+    def test_interrupted_upload_resumes_missing_parts(self):
+        source = os.path.join(self.tmp, 'src', 'big.bin')
+        write_random(source, 16 * MB, 2)
+        failing = FailingClient(self.client, fail_parts=[3])
+        with self.assertRaises(ConnectionError):
+            self.manager(failing).upload_file(source, 'transfers', 'big.bin')
+        self.assertEqual(len(os.listdir(self.checkpoints)), 1)
+
+        retry = FailingClient(self.client, fail_parts=[])
+        result = self.manager(retry).upload_file(source, 'transfers', 'big.bin')
+        self.assertEqual(retry.uploaded_parts, [3])
+        self.assertEqual(result['resumed_parts'], 3)
+        self.assertEqual(os.listdir(self.checkpoints), [])
+        body = self.client.get_object(Bucket='transfers', Key='big.bin')['Body'].read()
+        with open(source, 'rb') as f:
+            self.assertEqual(body, f.read())
+
+    def test_changed_file_restarts_upload(self):
+        source = os.path.join(self.tmp, 'src', 'big.bin')
+        write_random(source, 11 * MB, 3)
+        with self.assertRaises(ConnectionError):
+            self.manager(FailingClient(self.client, fail_parts=[2])).upload_file(source, 'transfers', 'big.bin')
+        write_random(source, 11 * MB, 4)
+        retry = FailingClient(self.client, fail_parts=[])
+        self.assertEqual(self.manager(retry).upload_file(source, 'transfers', 'big.bin')['resumed_parts'], 0)
+        self.assertEqual(sorted(retry.uploaded_parts), [1, 2, 3])
+
+    def test_directory_sync_skips_unchanged_files(self):
+        source = os.path.join(self.tmp, 'tree')
+        for n in range(6):
+            write_random(os.path.join(source, f'dir{n % 2}', f'file{n}.bin'), 1024 * (n + 1), n)
+        write_random(os.path.join(source, 'large.bin'), 7 * MB, 9)
+
+        first = self.manager().upload_directory(source, 'transfers', 'backup')
+        self.assertEqual(len(first['transferred']), 7)
+        second = self.manager().upload_directory(source, 'transfers', 'backup')
+        self.assertEqual((len(second['transferred']), len(second['skipped'])), (0, 7))
+
+        write_random(os.path.join(source, 'dir0', 'file0.bin'), 1024, 99)
+        os.remove(os.path.join(source, 'dir1', 'file1.bin'))
+        third = self.manager().upload_directory(source, 'transfers', 'backup/', delete=True)
+        self.assertEqual(third['transferred'], [os.path.join(source, 'dir0', 'file0.bin')])
+        self.assertEqual(third['deleted'], ['backup/dir1/file1.bin'])
+
+        target = os.path.join(self.tmp, 'copy')
+        pulled = self.manager().download_directory('transfers', 'backup', target)
+        self.assertEqual(len(pulled['transferred']), 6)
+        self.assertEqual(len(self.manager().download_directory('transfers', 'backup', target)['skipped']), 6)
+        with open(os.path.join(source, 'large.bin'), 'rb') as a, open(os.path.join(target, 'large.bin'), 'rb') as b:
+            self.assertEqual(a.read(), b.read())
+
+if __name__ == '__main__':
+    unittest.main()
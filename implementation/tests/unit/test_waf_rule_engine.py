@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Unit tests for the compiled WAF rule engine"""
+
+import os
+import re
+import sys
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../security/waf'))
+from rule_engine import RuleEngine, TARGETS, parse_secrules, required_literals
+
+class Rule:
+    def __init__(self, rule_id, pattern, action='block', targets=TARGETS, literals=None):
+        self.rule_id = rule_id
+        self.pattern = re.compile(pattern, re.IGNORECASE)
+        self.action = action
+        self.targets = tuple(targets)
+        self.literals = literals
+
+class TestRequiredLiterals(unittest.TestCase):
+    
+    def test_literal_run(self):
+        self.assertEqual(required_literals(r'\bunion\b.*\bselect\b'), {'select'})
+    
+    def test_alternation(self):
+        self.assertEqual(required_literals(r'(<script|javascript:)'), {'<script', 'javascript:'})
+    
+    def test_case_folded(self):
+        self.assertEqual(required_literals(r'OnError='), {'onerror='})
+    
+    def test_no_literal(self):
+        self.assertIsNone(required_literals(r'[a-z]+\d*'))
+        self.assertIsNone(required_literals(r'(?:abc)?x*'))
+    
+    @unittest.skipIf(sys.version_info < (3, 11), 'atomic groups need Python 3.11')
+    def test_atomic_group_and_possessive_repeat(self):
+        self.assertEqual(required_literals(r'(?>eval)\('), {'eval'})
+        self.assertEqual(required_literals(r'(?>system|exec)\s*\('), {'system', 'exec'})
+        self.assertEqual(required_literals(r'(?:select)++\s'), {'select'})
+    
+    def test_unparseable_shape_always_runs(self):
+        import rule_engine
+        original = rule_engine._required
+        rule_engine._required = lambda items: 1 / 0
+        try:
+            self.assertIsNone(required_literals(r'eval\('))
+        finally:
+            rule_engine._required = original
+
+class TestRuleEngine(unittest.TestCase):
+    
+    def matched(self, engine, path='/', headers=None, body=''):
+        return [(rule.rule_id, target) for rule, target in engine.matches(path, headers or {}, body)]
+    
+    def test_rules_only_see_their_targets(self):
+        engine = RuleEngine([Rule('XSS', r'<script', targets=('body',))])
+        self.assertEqual(self.matched(engine, path='/?q=<script>'), [])
+        self.assertEqual(self.matched(engine, body='<SCRIPT>'), [('XSS', 'body')])
+    
+    def test_query_is_split_from_path(self):
+        engine = RuleEngine([Rule('TRAVERSAL', r'\.\./', targets=('path',)),
+                             Rule('AMP', r'&', targets=('query',))])
+        self.assertEqual(self.matched(engine, path='/a/../b?x=1'), [('TRAVERSAL', 'path')])
+        self.assertEqual(self.matched(engine, path='/a?x=1&y=2'), [('AMP', 'query')])
+    
+    def test_headers(self):
+        engine = RuleEngine([Rule('UA', r'sqlmap', targets=('headers',))])
+        self.assertEqual(self.matched(engine, headers={'User-Agent': 'sqlmap/1.7'}), [('UA', 'headers')])
+    
+    def test_matches_follow_rule_order(self):
+        rules = [Rule('LOG', r'select', action='log'), Rule('SQLI', r'union.*select'),
+                 Rule('ANY', r'\w+\(\)')]
+        engine = RuleEngine(rules)
+        self.assertEqual([r for r, _ in self.matched(engine, body='union select f()')],
+                         ['LOG', 'SQLI', 'ANY'])
+    
+    def test_prefix_literals_are_found(self):
+        engine = RuleEngine([Rule('SEL', r'sel\w'), Rule('SELECT', r'select\s')])
+        self.assertEqual([r for r, _ in self.matched(engine, body='select x')], ['SEL', 'SELECT'])
+    
+    def test_body_is_capped(self):
+        engine = RuleEngine([Rule('XSS', r'<script')], max_body_bytes=100)
+        self.assertEqual(self.matched(engine, body='a' * 100 + '<script>'), [])
+        self.assertEqual(self.matched(engine, body=b'a' * 50 + b'<script>'), [('XSS', 'body')])
+    
+    def test_rules_added_after_compile(self):
+        rules = [Rule('A', r'alpha')]
+        engine = RuleEngine(rules)
+        self.assertEqual(self.matched(engine, body='beta'), [])
+        rules.append(Rule('B', r'beta'))
+        engine.invalidate()
+        self.assertEqual(self.matched(engine, body='beta'), [('B', 'body')])
+
+    @unittest.skipIf(sys.version_info < (3, 11), 'atomic groups need Python 3.11')
+    def test_atomic_group_rule(self):
+        engine = RuleEngine([Rule('ATOMIC', r'(?>eval)\('), Rule('POSSESSIVE', r'a++b')])
+        self.assertEqual(self.matched(engine, body='x=eval(1)'), [('ATOMIC', 'body')])
+        self.assertEqual(self.matched(engine, body='aaab'), [('POSSESSIVE', 'body')])
+        self.assertEqual(self.matched(engine, body='evaluate'), [])
+
+class TestParseSecrules(unittest.TestCase):
+    
+    def test_rx_and_pm(self):
+        rules = parse_secrules('''
+# comment
+SecRule ARGS|REQUEST_HEADERS:User-Agent "@rx (?i)union\\s+select" \\
+    "id:942100,phase:2,block,msg:'SQL Injection, union'"
+SecRule REQUEST_FILENAME "@pm .env .git" "id:930130,phase:1,pass,msg:'Restricted file'"
+''')
+        self.assertEqual([r['rule_id'] for r in rules], ['942100', '930130'])
+        self.assertEqual(rules[0]['targets'], ('query', 'body', 'headers'))
+        self.assertEqual(rules[0]['description'], 'SQL Injection, union')
+        self.assertEqual(rules[1]['action'], 'log')
+        self.assertEqual(rules[1]['literals'], ['.env', '.git'])
+    
+    def test_chained_and_unsupported_rules_are_skipped(self):
+        rules = parse_secrules('''
+SecRule ARGS "@rx a" "id:1,chain"
+    SecRule ARGS "@rx b" "t:none"
+SecRule ARGS "@detectSQLi" "id:2"
+SecRule TX:ANOMALY "@rx c" "id:3"
+SecRule ARGS "@rx d" "id:4"
+''')
+        self.assertEqual([r['rule_id'] for r in rules], ['4'])
+
+if __name__ == '__main__':
+    unittest.main()
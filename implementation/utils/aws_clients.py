@@ -0,0 +1,147 @@
+"""
+Process-wide AWS client registry
+"""
+import os
+import time
+import hashlib
+import threading
+import logging
+from typing import Dict, Optional, Tuple
+
+import boto3
+from botocore.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class AWSClientRegistry:
+    """Lazily built, shared boto3 clients keyed by (service, region, credentials)
+
+    Building a client costs tens of milliseconds and opens a new connection
+    pool, so managers take theirs from here instead of calling boto3.client().
+    Clients are thread-safe and shared by every thread. Resources are not, so
+    each thread gets its own. Entries are rebuilt after ttl seconds so rotated
+    credentials from the environment or profile files are picked up.
+    """
+
+    def __init__(self, max_pool_connections: int = 50, ttl: float = 3600,
+                 retry_mode: Optional[str] = None, max_attempts: Optional[int] = None):
+        self.ttl = ttl
+        # botocore's own retry settings (AWS_RETRY_MODE, AWS_MAX_ATTEMPTS, the
+        # profile) apply unless a mode or attempt count is given explicitly
+        retries = {}
+        if retry_mode:
+            retries['mode'] = retry_mode
+        if max_attempts:
+            retries['max_attempts'] = max_attempts
+        self.config = Config(
+            max_pool_connections=max_pool_connections,
+            retries=retries or None,
+            tcp_keepalive=True
+        )
+        self._lock = threading.Lock()
+        self._sessions: Dict[Tuple, Tuple[boto3.session.Session, float]] = {}
+        self._clients: Dict[Tuple, Tuple[object, float]] = {}
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _credentials_key(aws_access_key_id, aws_secret_access_key, aws_session_token, profile_name) -> Tuple:
+        # Never keep the secret itself in the key
+        secret = hashlib.sha256(f"{aws_secret_access_key}:{aws_session_token}".encode()).hexdigest()
+        return (aws_access_key_id, secret if aws_secret_access_key or aws_session_token else None, profile_name)
+
+    def _session(self, credentials: Tuple, now: float, **session_args) -> boto3.session.Session:
+        """Session for a credential set; callers hold self._lock because sessions are not thread-safe"""
+        cached = self._sessions.get(credentials)
+        if cached and now - cached[1] < self.ttl:
+            return cached[0]
+        session = boto3.session.Session(**{k: v for k, v in session_args.items() if v is not None})
+        self._sessions[credentials] = (session, now)
+        return session
+
+    def client(self, service_name: str, region_name: Optional[str] = None,
+               aws_access_key_id: Optional[str] = None, aws_secret_access_key: Optional[str] = None,
+               aws_session_token: Optional[str] = None, profile_name: Optional[str] = None,
+               endpoint_url: Optional[str] = None):
+        """Shared client; same arguments as boto3.client()"""
+        credentials = self._credentials_key(aws_access_key_id, aws_secret_access_key,
+                                            aws_session_token, profile_name)
+        key = (service_name, region_name, endpoint_url, credentials)
+        now = time.monotonic()
+        cached = self._clients.get(key)
+        if cached and now - cached[1] < self.ttl:
+            self.hits += 1
+            return cached[0]
+
+        with self._lock:
+            cached = self._clients.get(key)
+            if cached and now - cached[1] < self.ttl:
+                self.hits += 1
+                return cached[0]
+            session = self._session(credentials, now, aws_access_key_id=aws_access_key_id,
+                                    aws_secret_access_key=aws_secret_access_key,
+                                    aws_session_token=aws_session_token, profile_name=profile_name)
+            client = session.client(service_name, region_name=region_name,
+                                    endpoint_url=endpoint_url, config=self.config)
+            self._clients[key] = (client, now)
+            self.misses += 1
+            logger.debug(f"Created {service_name} client for {region_name or 'default region'}")
+            return client
+
+    def resource(self, service_name: str, region_name: Optional[str] = None,
+                 aws_access_key_id: Optional[str] = None, aws_secret_access_key: Optional[str] = None,
+                 aws_session_token: Optional[str] = None, profile_name: Optional[str] = None,
+                 endpoint_url: Optional[str] = None):
+        """Per-thread resource; same arguments as boto3.resource()"""
+        credentials = self._credentials_key(aws_access_key_id, aws_secret_access_key,
+                                            aws_session_token, profile_name)
+        key = (service_name, region_name, endpoint_url, credentials)
+        now = time.monotonic()
+        resources = self._local.__dict__.setdefault('resources', {})
+        cached = resources.get(key)
+        if cached and now - cached[1] < self.ttl:
+            self.hits += 1
+            return cached[0]
+
+        with self._lock:
+            session = self._session(credentials, now, aws_access_key_id=aws_access_key_id,
+                                    aws_secret_access_key=aws_secret_access_key,
+                                    aws_session_token=aws_session_token, profile_name=profile_name)
+            resource = session.resource(service_name, region_name=region_name,
+                                        endpoint_url=endpoint_url, config=self.config)
+        resources[key] = (resource, now)
+        self.misses += 1
+        return resource
+
+    def clear(self):
+        """Drop every cached session, client and this thread's resources"""
+        with self._lock:
+            self._sessions.clear()
+            self._clients.clear()
+        self._local.__dict__.pop('resources', None)
+
+    def get_stats(self) -> Dict:
+        return {
+            'clients': len(self._clients),
+            'sessions': len(self._sessions),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+registry = AWSClientRegistry(
+    max_pool_connections=int(os.getenv('AWS_MAX_POOL_CONNECTIONS', '50')),
+    ttl=float(os.getenv('AWS_CLIENT_TTL', '3600'))
+)
+
+
+def get_client(service_name: str, region_name: Optional[str] = None, **kwargs):
+    """Shared boto3 client from the process-wide registry"""
+    return registry.client(service_name, region_name=region_name, **kwargs)
+
+
+def get_resource(service_name: str, region_name: Optional[str] = None, **kwargs):
+    """Per-thread boto3 resource from the process-wide registry"""
+    return registry.resource(service_name, region_name=region_name, **kwargs)
@@ -0,0 +1,137 @@
+"""
+Lazy, paginated S3 object listing with optional parallel key-range shards
+"""
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def _before(key: str) -> str:
+    """A string sorting just before key, to use as StartAfter when listing from key onwards"""
+    if not key or key[-1] == '\x00':
+        return key[:-1]
+    return key[:-1] + chr(ord(key[-1]) - 1) + '\U0010ffff'
+
+
+def iter_objects(client, bucket: str, prefix: str = '', start_at: Optional[str] = None,
+                 end_before: Optional[str] = None, page_size: int = 1000,
+                 start_after: Optional[str] = None) -> Iterator[Dict]:
+    """Every object under prefix in key order, one page in memory at a time
+
+    start_at/end_before restrict the listing to a key range, which is how
+    shards split a bucket; start_after resumes after a key already seen.
+    """
+    kwargs = {'Bucket': bucket, 'Prefix': prefix, 'PaginationConfig': {'PageSize': page_size}}
+    if start_at:
+        kwargs['StartAfter'] = max(_before(start_at), start_after or '')
+    elif start_after:
+        kwargs['StartAfter'] = start_after
+    for page in client.get_paginator('list_objects_v2').paginate(**kwargs):
+        for obj in page.get('Contents', []):
+            if start_at is not None and obj['Key'] < start_at:
+                continue
+            if end_before is not None and obj['Key'] >= end_before:
+                return
+            yield obj
+
+
+def iter_keys(client, bucket: str, prefix: str = '', **kwargs) -> Iterator[str]:
+    for obj in iter_objects(client, bucket, prefix, **kwargs):
+        yield obj['Key']
+
+
+def shard_ranges(client, bucket: str, prefix: str = '', shards: int = 8) -> List[Tuple[Optional[str], Optional[str]]]:
+    """Split the keys under prefix into up to `shards` contiguous (start_at, end_before) ranges
+
+    Boundaries come from one delimiter listing of the next level of "folders",
+    so shards follow the bucket's real layout; a flat prefix is split on the
+    next character instead.
+    """
+    folders = []
+    for page in client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix, Delimiter='/'):
+        folders.extend(common['Prefix'] for common in page.get('CommonPrefixes', []))
+    if len(folders) >= 2:
+        step = max(len(folders) / shards, 1)
+        bounds = sorted({folders[int(i * step)] for i in range(1, min(shards, len(folders)))})
+    else:
+        # Printable ASCII after the prefix, in equal slices
+        first, last = 0x21, 0x7e
+        step = (last - first + 1) / shards
+        bounds = [prefix + chr(first + int(i * step)) for i in range(1, shards)]
+    return list(zip([None] + bounds, bounds + [None]))
+
+
+class ShardedLister:
+    """Lists huge prefixes with several concurrent key-range listings
+
+    Each shard pages through its range on a thread pool and hands pages to a
+    bounded queue, so objects stream out as soon as any shard has a page and
+    memory stays flat. Objects are in key order within a shard but shards
+    interleave; sort afterwards when order matters.
+    """
+
+    def __init__(self, client, shards: int = 8, queue_pages: int = 32, page_size: int = 1000):
+        self.client = client
+        self.shards = shards
+        self.queue_pages = queue_pages
+        self.page_size = page_size
+
+    @staticmethod
+    def _put(pages: queue.Queue, item, stop: threading.Event) -> bool:
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run_shard(self, bucket: str, prefix: str, start_at, end_before,
+                   pages: queue.Queue, stop: threading.Event, errors: list):
+        try:
+            page = []
+            for obj in iter_objects(self.client, bucket, prefix, start_at, end_before, self.page_size):
+                page.append(obj)
+                if len(page) >= self.page_size:
+                    if not self._put(pages, page, stop):
+                        return
+                    page = []
+            if page:
+                self._put(pages, page, stop)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            self._put(pages, _DONE, stop)
+
+    def iter_objects(self, bucket: str, prefix: str = '') -> Iterator[Dict]:
+        ranges = shard_ranges(self.client, bucket, prefix, self.shards)
+        pages = queue.Queue(maxsize=self.queue_pages)
+        stop = threading.Event()
+        errors: list = []
+        executor = ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix='s3-list')
+        for start_at, end_before in ranges:
+            executor.submit(self._run_shard, bucket, prefix, start_at, end_before, pages, stop, errors)
+        remaining = len(ranges)
+        try:
+            while remaining:
+                page = pages.get()
+                if page is _DONE:
+                    remaining -= 1
+                    continue
+                yield from page
+            if errors:
+                # A partial listing must not pass for a complete one
+                raise errors[0]
+        finally:
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def iter_keys(self, bucket: str, prefix: str = '') -> Iterator[str]:
+        for obj in self.iter_objects(bucket, prefix):
+            yield obj['Key']
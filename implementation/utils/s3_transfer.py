@@ -0,0 +1,367 @@
+"""
+Parallel, resumable S3 transfers and directory sync
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+MIN_PART_SIZE = 5 * MB
+MAX_PARTS = 10000
+
+
+def part_size_for(size: int, part_size: int) -> int:
+    """part_size, grown in whole MiB if needed to stay within S3's 10,000 part limit"""
+    part_size = max(part_size, MIN_PART_SIZE)
+    if size > part_size * MAX_PARTS:
+        part_size = -(-size // MAX_PARTS // MB) * MB
+    return part_size
+
+
+def file_etag(path: str, part_size: Optional[int] = None) -> str:
+    """The ETag S3 reports for path uploaded whole (part_size None) or in parts of part_size"""
+    with open(path, 'rb') as f:
+        if part_size is None:
+            digest = hashlib.md5()
+            for block in iter(lambda: f.read(8 * MB), b''):
+                digest.update(block)
+            return f'"{digest.hexdigest()}"'
+        digests = [hashlib.md5(block).digest() for block in iter(lambda: f.read(part_size), b'')]
+    return f'"{hashlib.md5(b"".join(digests)).hexdigest()}-{len(digests)}"'
+
+
+class TransferStats:
+    """Thread-safe counters of a TransferManager's work"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.bytes = 0
+        self.files = 0
+        self.skipped = 0
+        self.failed = 0
+        self.parts = 0
+        self.resumed_parts = 0
+        self.parts_in_flight = 0
+        self.peak_parts_in_flight = 0
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+            self.peak_parts_in_flight = max(self.peak_parts_in_flight, self.parts_in_flight)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            return {
+                'bytes': self.bytes,
+                'files': self.files,
+                'skipped': self.skipped,
+                'failed': self.failed,
+                'parts': self.parts,
+                'resumed_parts': self.resumed_parts,
+                'parts_in_flight': self.parts_in_flight,
+                'peak_parts_in_flight': self.peak_parts_in_flight,
+                'elapsed': elapsed,
+                'mb_per_s': self.bytes / MB / elapsed if elapsed else 0.0,
+            }
+
+
+class UploadCheckpoint:
+    """Persisted state of multipart uploads, one JSON file per upload
+
+    A checkpoint is tied to the source file's size and mtime, so a file that
+    changed since the interrupted attempt starts over instead of mixing parts.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, bucket: str, key: str, file_path: str) -> str:
+        name = hashlib.sha256(f"{bucket}\0{key}\0{os.path.abspath(file_path)}".encode()).hexdigest()
+        return os.path.join(self.directory, f'{name}.json')
+
+    def load(self, bucket: str, key: str, file_path: str) -> Optional[Dict]:
+        try:
+            with open(self._path(bucket, key, file_path)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, bucket: str, key: str, file_path: str, state: Dict):
+        path = self._path(bucket, key, file_path)
+        with self._lock:
+            with open(path + '.tmp', 'w') as f:
+                json.dump(state, f)
+            os.replace(path + '.tmp', path)
+
+    def delete(self, bucket: str, key: str, file_path: str):
+        try:
+            os.remove(self._path(bucket, key, file_path))
+        except FileNotFoundError:
+            pass
+
+
+class TransferManager:
+    """Multipart uploads and ranged downloads with shared concurrency limits
+
+    Parts of every transfer run on one pool of max_concurrency threads, so
+    syncing many files at once never has more than that many requests (and
+    part_size * max_concurrency bytes) in flight. Multipart uploads record
+    each finished part in an UploadCheckpoint; calling upload_file again
+    after an interruption uploads only the missing parts.
+    """
+
+    def __init__(self, client, part_size: int = 16 * MB, multipart_threshold: int = 16 * MB,
+                 max_concurrency: int = 16, file_workers: int = 8, checkpoint_dir: Optional[str] = None):
+        self.client = client
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.multipart_threshold = max(multipart_threshold, MIN_PART_SIZE)
+        self.max_concurrency = max_concurrency
+        self.file_workers = file_workers
+        checkpoint_dir = checkpoint_dir or os.getenv(
+            'S3_TRANSFER_CHECKPOINT_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'autocloud', 'transfers'))
+        self.checkpoints = UploadCheckpoint(checkpoint_dir)
+        self.parts = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='s3-part')
+        self.stats = TransferStats()
+
+    def close(self):
+        self.parts.shutdown(wait=True)
+
+    def get_stats(self) -> Dict:
+        return self.stats.snapshot()
+
+    def _part(self, func, *args):
+        self.stats.add(parts_in_flight=1)
+        try:
+            return func(*args)
+        finally:
+            self.stats.add(parts_in_flight=-1, parts=1)
+
+    def _read(self, file_path: str, offset: int, length: int) -> bytes:
+        with open(file_path, 'rb') as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def _upload_part(self, file_path: str, bucket: str, key: str, upload_id: str,
+                     number: int, offset: int, length: int) -> str:
+        data = self._read(file_path, offset, length)
+        response = self.client.upload_part(Bucket=bucket, Key=key, UploadId=upload_id,
+                                           PartNumber=number, Body=data)
+        self.stats.add(bytes=length)
+        return response['ETag']
+
+    def _resume_state(self, bucket: str, key: str, file_path: str, size: int, mtime_ns: int) -> Optional[Dict]:
+        state = self.checkpoints.load(bucket, key, file_path)
+        if state is None:
+            return None
+        if (state['size'], state['mtime_ns']) != (size, mtime_ns):
+            self._abort(bucket, key, state['upload_id'])
+            return None
+        try:
+            # Trust only the parts S3 still has for this upload
+            stored = {}
+            paginator = self.client.get_paginator('list_parts')
+            for page in paginator.paginate(Bucket=bucket, Key=key, UploadId=state['upload_id']):
+                for part in page.get('Parts', []):
+                    stored[part['PartNumber']] = part['ETag']
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'NoSuchUpload':
+                raise
+            return None
+        state['parts'] = {n: etag for n, etag in state['parts'].items() if stored.get(int(n)) == etag}
+        return state
+
+    def _abort(self, bucket: str, key: str, upload_id: str):
+        try:
+            self.client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        except ClientError as e:
+            logger.warning(f"Could not abort upload {upload_id} of {key}: {e}")
+
+    def upload_file(self, file_path: str, bucket: str, key: str, extra_args: Optional[Dict] = None) -> Dict:
+        """Upload one file, resuming an interrupted multipart upload of it if one is checkpointed"""
+        st = os.stat(file_path)
+        extra_args = extra_args or {}
+        if st.st_size < self.multipart_threshold:
+            with open(file_path, 'rb') as f:
+                self._part(lambda: self.client.put_object(Bucket=bucket, Key=key, Body=f, **extra_args))
+            self.stats.add(bytes=st.st_size, files=1)
+            return {'key': key, 'bytes': st.st_size, 'parts': 1, 'resumed_parts': 0}
+
+        state = self._resume_state(bucket, key, file_path, st.st_size, st.st_mtime_ns)
+        if state is None:
+            response = self.client.create_multipart_upload(Bucket=bucket, Key=key, **extra_args)
+            state = {'upload_id': response['UploadId'], 'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                     'part_size': part_size_for(st.st_size, self.part_size), 'parts': {}}
+            self.checkpoints.save(bucket, key, file_path, state)
+        part_size = state['part_size']
+        count = -(-st.st_size // part_size)
+        resumed = len(state['parts'])
+        self.stats.add(resumed_parts=resumed)
+        if resumed:
+            logger.info(f"Resuming upload of {key}: {resumed} of {count} parts already stored")
+
+        futures = {}
+        for number in range(1, count + 1):
+            if str(number) in state['parts']:
+                continue
+            offset = (number - 1) * part_size
+            futures[number] = self.parts.submit(
+                self._part, self._upload_part, file_path, bucket, key, state['upload_id'],
+                number, offset, min(part_size, st.st_size - offset))
+        errors = []
+        for number, future in futures.items():
+            try:
+                state['parts'][str(number)] = future.result()
+                self.checkpoints.save(bucket, key, file_path, state)
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            # The checkpoint keeps the finished parts for the next attempt
+            raise errors[0]
+
+        self.client.complete_multipart_upload(
+            Bucket=bucket, Key=key, UploadId=state['upload_id'],
+            MultipartUpload={'Parts': [{'PartNumber': n, 'ETag': state['parts'][str(n)]}
+                                       for n in range(1, count + 1)]}
+        )
+        self.checkpoints.delete(bucket, key, file_path)
+        self.stats.add(files=1)
+        return {'key': key, 'bytes': st.st_size, 'parts': count, 'resumed_parts': resumed}
+
+    def _download_range(self, bucket: str, key: str, file_path: str, offset: int, length: int, version: str):
+        response = self.client.get_object(Bucket=bucket, Key=key, IfMatch=version,
+                                          Range=f"bytes={offset}-{offset + length - 1}")
+        data = response['Body'].read()
+        with open(file_path, 'r+b') as f:
+            f.seek(offset)
+            f.write(data)
+        self.stats.add(bytes=len(data))
+
+    def download_file(self, bucket: str, key: str, file_path: str) -> Dict:
+        """Download one object, in parallel byte ranges when it is large; the file appears only when complete"""
+        head = self.client.head_object(Bucket=bucket, Key=key)
+        size = head['ContentLength']
+        directory = os.path.dirname(os.path.abspath(file_path))
+        os.makedirs(directory, exist_ok=True)
+        partial = file_path + '.part'
+        with open(partial, 'wb') as f:
+            f.truncate(size)
+        try:
+            ranges = [(offset, min(self.part_size, size - offset)) for offset in range(0, size, self.part_size)]
+            # IfMatch keeps every range from the same version of the object
+            futures = [self.parts.submit(self._part, self._download_range, bucket, key, partial,
+                                         offset, length, head['ETag']) for offset, length in ranges]
+            for future in futures:
+                future.result()
+            os.replace(partial, file_path)
+        except Exception:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        self.stats.add(files=1)
+        return {'key': key, 'bytes': size, 'parts': len(ranges)}
+
+    def list_objects(self, bucket: str, prefix: str = '') -> Dict[str, Tuple[int, str]]:
+        """key -> (size, ETag) of every object under prefix"""
+        objects = {}
+        for page in self.client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                objects[obj['Key']] = (obj['Size'], obj['ETag'])
+        return objects
+
+    def unchanged(self, file_path: str, size: int, remote: Optional[Tuple[int, str]]) -> bool:
+        """Whether a local file matches a remote (size, ETag): sizes first, ETags only when sizes match"""
+        if remote is None or remote[0] != size:
+            return False
+        etag = remote[1]
+        if '-' not in etag:
+            return file_etag(file_path) == etag
+        parts = int(etag.strip('"').rsplit('-', 1)[1])
+        # Try our own part size first, then the smallest whole-MiB size giving that many parts
+        candidates = [part_size_for(size, self.part_size), -(-size // parts // MB) * MB]
+        return any(-(-size // c) == parts and file_etag(file_path, c) == etag for c in candidates)
+
+    @staticmethod
+    def _walk(local_dir: str) -> Iterator[Tuple[str, str]]:
+        for dirpath, dirnames, filenames in os.walk(local_dir):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                yield path, os.path.relpath(path, local_dir).replace(os.sep, '/')
+
+    def _run_files(self, jobs: List[Tuple], work) -> Dict:
+        summary = {'transferred': [], 'skipped': [], 'failed': []}
+        with ThreadPoolExecutor(max_workers=self.file_workers, thread_name_prefix='s3-file') as files:
+            futures = {files.submit(work, *job): job for job in jobs}
+            for future, job in futures.items():
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    logger.error(f"Transfer of {job[0]} failed: {str(e)}")
+                    self.stats.add(failed=1)
+                    summary['failed'].append({'path': job[0], 'error': str(e)})
+                    continue
+                summary['transferred' if outcome else 'skipped'].append(job[0])
+        summary['stats'] = self.get_stats()
+        return summary
+
+    def upload_directory(self, local_dir: str, bucket: str, prefix: str = '',
+                         delete: bool = False, extra_args: Optional[Dict] = None) -> Dict:
+        """Sync a directory tree to bucket/prefix, skipping files whose size and ETag already match"""
+        if prefix and not prefix.endswith('/'):
+            prefix += '/'
+        remote = self.list_objects(bucket, prefix)
+
+        def upload(path, key):
+            if self.unchanged(path, os.path.getsize(path), remote.get(key)):
+                self.stats.add(skipped=1)
+                return False
+            self.upload_file(path, bucket, key, extra_args)
+            return True
+
+        jobs = [(path, prefix + relative) for path, relative in self._walk(local_dir)]
+        summary = self._run_files(jobs, upload)
+        if delete:
+            local_keys = {key for _, key in jobs}
+            stale = [key for key in remote if key not in local_keys]
+            for offset in range(0, len(stale), 1000):
+                self.client.delete_objects(Bucket=bucket, Delete={
+                    'Objects': [{'Key': key} for key in stale[offset:offset + 1000]], 'Quiet': True})
+            summary['deleted'] = stale
+        return summary
+
+    def download_directory(self, bucket: str, prefix: str, local_dir: str) -> Dict:
+        """Sync bucket/prefix into a local directory, skipping files whose size and ETag already match"""
+        if prefix and not prefix.endswith('/'):
+            prefix += '/'
+        root = os.path.abspath(local_dir)
+        jobs = []
+        for key, remote in self.list_objects(bucket, prefix).items():
+            if key.endswith('/'):
+                continue
+            path = os.path.abspath(os.path.join(root, *key[len(prefix):].split('/')))
+            if os.path.commonpath([root, path]) != root:
+                raise ValueError(f"Refusing to download outside {local_dir}: {key}")
+            jobs.append((path, key, remote))
+
+        def download(path, key, remote):
+            if os.path.exists(path) and self.unchanged(path, os.path.getsize(path), remote):
+                self.stats.add(skipped=1)
+                return False
+            self.download_file(bucket, key, path)
+            return True
+
+        return self._run_files(jobs, download)